@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+from Configuration.Configuration import EXECUTION_MODE_BLOCK, \
+                                        EXECUTION_MODE_INTERPRETER
+from ToolChain.Runner.BatchRunner import BatchRunner
+from ToolChain.Runner.Runner import RUN_STATUS_HALTED
+
+import argparse
+import json
+import os
+import sys
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2015, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+
+EXECUTION_MODES = {"interpreter": EXECUTION_MODE_INTERPRETER,
+                   "block": EXECUTION_MODE_BLOCK}
+
+
+def parseCommandLineArgs():
+    """
+    As implied by the name, this will parse the command line arguments so we can use them.
+    :return: A parsed object as provided by argparse.parse_args()
+    """
+    parser = argparse.ArgumentParser(prog="BatchRunner.py",
+                                     description="Capua Batch Runner Version {}".format(__version__,),
+                                     epilog="This tool is provided as part of Spartacus learning environment under {} "
+                                            "licence. Feel free to distribute, modify, "
+                                            "contribute and learn!".format(__license__,))
+    parser.add_argument("-i", "--input",
+                        required=True,
+                        type=str,
+                        help="Define the JSON manifest listing the jobs to be run.")
+
+    parser.add_argument("-o", "--output",
+                        required=False,
+                        type=str,
+                        default=None,
+                        help="Define the file where results are written, one JSON line per job. "
+                             "If absent, results are written to the standard output.")
+
+    parser.add_argument("-w", "--workers",
+                        required=False,
+                        type=int,
+                        default=None,
+                        help="Number of worker processes. If absent, one per CPU.")
+
+    parser.add_argument("-m", "--mode",
+                        required=False,
+                        choices=sorted(EXECUTION_MODES.keys()),
+                        default="block",
+                        help="Execution mode of the cores.")
+
+    args = parser.parse_args()
+
+    return args
+
+
+if __name__ == '__main__':
+    usableArgs = parseCommandLineArgs()
+
+    if not os.path.exists(usableArgs.input):
+        raise ValueError("ERROR: file {} does not exists.".format(usableArgs.input,))
+
+    output = sys.stdout if usableArgs.output is None else open(usableArgs.output, "w")
+    allHalted = True
+
+    batchRunner = BatchRunner(manifestFile=usableArgs.input)
+    for result in batchRunner.run(workerCount=usableArgs.workers, executionMode=EXECUTION_MODES[usableArgs.mode]):
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+        allHalted = allHalted and result["status"] == RUN_STATUS_HALTED
+
+    if output is not sys.stdout:
+        output.close()
+
+    # 0 when every program halted, 2 otherwise
+    sys.exit(0 if allHalted else 2)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+from ToolChain.Benchmark.Benchmark import Benchmark, BENCHMARK_NAMES, compareResults
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2015, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+
+def parseCommandLineArgs():
+    """
+    As implied by the name, this will parse the command line arguments so we can use them.
+    :return: A parsed object as provided by argparse.parse_args()
+    """
+    parser = argparse.ArgumentParser(prog="Benchmark.py",
+                                     description="Capua Benchmark Version {}".format(__version__,),
+                                     epilog="This tool is provided as part of Spartacus learning environment under {} "
+                                            "licence. Feel free to distribute, modify, "
+                                            "contribute and learn!".format(__license__,))
+    parser.add_argument("-n", "--iterations",
+                        required=False,
+                        type=int,
+                        default=100000,
+                        help="Number of operations to be timed for each measurement.")
+
+    parser.add_argument("-b", "--benchmark",
+                        required=False,
+                        choices=BENCHMARK_NAMES,
+                        action="append",
+                        default=None,
+                        help="Benchmark to be run, can be given many times. If absent, all benchmarks are run.")
+
+    parser.add_argument("-o", "--output",
+                        required=False,
+                        type=str,
+                        default=None,
+                        help="Save the results, as JSON, to this file.")
+
+    parser.add_argument("-c", "--compare",
+                        required=False,
+                        type=str,
+                        default=None,
+                        help="Compare the results to those saved in this file (see -o). The exit code is 1 "
+                             "if a measurement regressed.")
+
+    parser.add_argument("-t", "--tolerance",
+                        required=False,
+                        type=float,
+                        default=10.0,
+                        help="Growth, in percent, accepted before a measurement is reported as a regression.")
+
+    args = parser.parse_args()
+
+    return args
+
+
+if __name__ == '__main__':
+    usableArgs = parseCommandLineArgs()
+
+    benchmark = Benchmark(iterations=usableArgs.iterations)
+    results = benchmark.runAll(benchmarkNames=usableArgs.benchmark)
+
+    for benchmarkName in results:
+        print(benchmarkName)
+        for measurementName in results[benchmarkName]:
+            print("  {:<24}{:>12} ns".format(measurementName, results[benchmarkName][measurementName]))
+
+    if usableArgs.output is not None:
+        try:
+            commit = subprocess.run(["git", "rev-parse", "HEAD"], stdout=subprocess.PIPE,
+                                    stderr=subprocess.DEVNULL, universal_newlines=True,
+                                    cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+        except OSError:
+            commit = ""
+        outputFile = open(usableArgs.output, "w")
+        json.dump({"date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                   "commit": commit or None,
+                   "python": platform.python_version(),
+                   "platform": platform.platform(),
+                   "iterations": usableArgs.iterations,
+                   "results": results}, outputFile, indent=2)
+        outputFile.close()
+
+    if usableArgs.compare is not None:
+        baselineFile = open(usableArgs.compare, "r")
+        baseline = json.load(baselineFile)
+        baselineFile.close()
+
+        comparison = compareResults(baseline["results"], results, usableArgs.tolerance / 100)
+        print("\nCompared to {} ({})".format(usableArgs.compare, baseline.get("commit")))
+        for benchmarkName, measurementName, baselineValue, value, ratio, isRegression in comparison:
+            print("  {:<46}{:>12} ns{:>12} ns{:>+9.1f}%{}".format(benchmarkName + "." + measurementName,
+                                                                   baselineValue, value, (ratio - 1) * 100,
+                                                                   "  REGRESSION" if isRegression else ""))
+        if any(entry[5] for entry in comparison):
+            sys.exit(1)
@@ -24,6 +24,12 @@ from CapuaEnvironment.ExecutionUnit.ExecutionUnit import ExecutionUnit
 from CapuaEnvironment.IntructionFetchUnit.InstructionFetchUnit import InstructionFetchUnit
 from CapuaEnvironment.IOComponent.MemoryIOController import MemoryIOController
 from CapuaEnvironment.MemoryArray.MemoryArray import MemoryArray
+from Configuration.Configuration import CORE_SCHEDULING_QUANTUM, \
+                                        MEMORY_START_AT, \
+                                        MEMORY_PAGE_SIZE
+
+import mmap
+import struct
 
 __author__ = "CSE"
 __copyright__ = "Copyright 2015, CSE"
@@ -34,22 +40,50 @@ __maintainer__ = "CSE"
 __status__ = "Dev"
 
 
+# Snapshot file format, every value is big endian:
+#   header:   magic, version, core count, device count, page size, stored page count
+#   cores:    for each core, 16 registers, I, FLAGS, IS, IVR, pending interrupt (-1 for None)
+#   devices:  for each device, start address, state length, state bytes
+#   pages:    stored page numbers, then the content of every stored page, in the same order
+SNAPSHOT_MAGIC = b"CAPUASNP"
+SNAPSHOT_VERSION = 3
+_SNAPSHOT_HEADER = struct.Struct(">8sHHHIIQ")
+_SNAPSHOT_CORE = struct.Struct(">16I4Ii")
+_SNAPSHOT_DEVICE = struct.Struct(">II")
+
+
 class Capua:
     """
     This is the heart of the whole system. This is the glue that is holding all of CapuaEnvironment
     devices together.
+
+    A Capua can have many cores (ExecutionUnit), they all share the memory, the devices and the
+    InstructionFetchUnit. Core 0 is also available as eu. Devices interrupt core 0 unless the
+    interrupt is routed to another core (see MemoryIOController.setInterruptRouting). Cores are
+    run by run(), which interleaves them in a fixed order, a fixed number of instructions at a
+    time, so that a run is repeatable. SFSTOR is atomic across cores.
     """
 
     ma = None
     mioc = None
     ifu = None
     eu = None
+    cores = None
 
-    def __init__(self, ma=None, mioc=None, name="System"):
+    def __init__(self, ma=None, mioc=None, name="System", displayBackend=None, coreCount: int=1,
+                 deviceThreads: bool=True, virtualTime: bool=None):
         """
         Preparing the whole execution environment for this Capua instance. Note that a single memory
-        array can be shared between multiple Capua environment.
+        array can be shared between multiple Capua environment. For isolated environments starting
+        from the same memory content, give each one its own ma.fork() instead.
+        :param displayBackend: DisplayBackend to be used by the Terminal when the MIOC is built here
+        :param coreCount: int, the number of cores, secondary cores are named name:coreId
+        :param deviceThreads: bool, when the MIOC is built here, should devices run their own threads
+        :param virtualTime: bool, when the MIOC is built here, should devices use virtual time
+                            (see MemoryIOController), None for VIRTUAL_TIME_ENABLED
         """
+        if type(coreCount) is not int or coreCount < 1:
+            raise ValueError("Capua needs at least one core")
 
         # Two execution units CAN share a single memory array and MIOC
         if ma is None:
@@ -58,11 +92,160 @@ class Capua:
             self.ma = ma
 
         if mioc is None:
-            self.mioc = MemoryIOController(self.ma, testOnly=False)
+            self.mioc = MemoryIOController(self.ma, testOnly=False, displayBackend=displayBackend,
+                                           deviceThreads=deviceThreads, virtualTime=virtualTime)
         else:
             self.mioc = mioc
 
         self.ifu = InstructionFetchUnit(self.ma)
         self.eu = ExecutionUnit(self.mioc, self.ifu, name)
+        self.cores = [self.eu]
+        for i in range(1, coreCount):
+            self.cores.append(ExecutionUnit(self.mioc, self.ifu, "{}:{}".format(name, i)))
+
+    def run(self, count: int=None, quantum: int=CORE_SCHEDULING_QUANTUM):
+        """
+        Run all cores, one after the other, quantum instructions at a time. Every core needs to have
+        been setup (see ExecutionUnit.setupCore) before this is called.
+        :param count: int, the total number of instructions to be run, across all cores. None for no limit
+        :param quantum: int, the number of instructions a core runs before the next core gets to run
+        :return: list, the number of instructions run by each core
+        """
+        if type(quantum) is not int or quantum < 1:
+            raise ValueError("Invalid core scheduling quantum {}".format(quantum))
+
+        executed = [0] * len(self.cores)
+        remaining = count
+        while remaining is None or remaining > 0:
+            for coreId, core in enumerate(self.cores):
+                coreQuantum = quantum if remaining is None else min(quantum, remaining)
+                if coreQuantum == 0:
+                    break
+                ran = core.run(count=coreQuantum)
+                executed[coreId] += ran
+                if remaining is not None:
+                    remaining -= ran
+        return executed
+
+    def loadProgram(self, filePath=None, loadAddress: int=MEMORY_START_AT, softwareLoader: bool=False):
+        """
+        Place a binary in memory, in a single copy, and point core 0 to its first instruction. The
+        file is memory mapped so that it is never read in small pieces. This is used by the
+        debugger, the runner and virtual boot alike.
+        :param filePath: str, path to the binary
+        :param loadAddress: int, the address at which the binary will be loaded
+        :param softwareLoader: bool, is the load address given by the first 4 bytes of the binary
+        :return: int, the address at which the binary got loaded
+        """
+        binFile = open(filePath, "rb")
+        try:
+            binMap = mmap.mmap(binFile.fileno(), length=0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise ValueError("{} is empty, nothing to be loaded".format(filePath))
+        finally:
+            binFile.close()
+
+        binView = memoryview(binMap)
+        try:
+            content = binView
+            if softwareLoader:
+                if len(binView) < 4:
+                    raise ValueError("{} is too short to hold a load address".format(filePath))
+                # In this case, the load address to be used is the first 4 bytes...
+                loadAddress = struct.unpack_from(">I", binView, 0)[0]
+                content = binView[4:]
+            self.ma.load(loadAddress, content)
+        finally:
+            # The map can only be closed once every view on it has been released
+            content.release()
+            binView.release()
+            binMap.close()
+
+        self.eu.setupCore(I=loadAddress)
+        return loadAddress
+
+    def snapshot(self, filePath=None):
+        """
+        Save the complete machine state to a file: cores state, virtual clock, memory and memory mapped
+        devices state. Only memory pages that differ from the initial memory value are saved. This is
+        to be called while the cores are not running.
+        :param filePath: str, the file to be written
+        :return: Nothing
+        """
+        coreStates = [core.getState() for core in self.cores]
+        deviceStates = self.mioc.getDeviceStates()
+        pages = self.ma.getModifiedPages(MEMORY_PAGE_SIZE)
+
+        snapshotFile = open(filePath, "wb")
+        try:
+            snapshotFile.write(_SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(coreStates),
+                                                     len(deviceStates), MEMORY_PAGE_SIZE, len(pages),
+                                                     self.mioc.retiredInstructions))
+            for registers, I, FLAGS, IS, IVR, interruptSignal in coreStates:
+                snapshotFile.write(_SNAPSHOT_CORE.pack(*registers, I, FLAGS, IS, IVR,
+                                                       -1 if interruptSignal is None else interruptSignal))
+            for startAddress, state in deviceStates:
+                snapshotFile.write(_SNAPSHOT_DEVICE.pack(startAddress, len(state)))
+                snapshotFile.write(state)
+            snapshotFile.write(struct.pack(">{}I".format(len(pages)), *pages))
+            for page in pages:
+                pageAddress = MEMORY_START_AT + page * MEMORY_PAGE_SIZE
+                snapshotFile.write(self.ma.readMemory(pageAddress, MEMORY_PAGE_SIZE))
+        finally:
+            snapshotFile.close()
+
+    def restore(self, filePath=None):
+        """
+        Put the machine back in the state saved by snapshot. The file is memory mapped and only
+        the stored pages are read from it. Restored pages are shared, immutable, copies until written.
+        Many machines can be restored from the same file. This is to be called while the cores are
+        not running.
+        :param filePath: str, the file written by snapshot
+        :return: Nothing
+        """
+        snapshotFile = open(filePath, "rb")
+        try:
+            snapshotMap = mmap.mmap(snapshotFile.fileno(), length=0, access=mmap.ACCESS_READ)
+        finally:
+            snapshotFile.close()
+
+        snapshotView = memoryview(snapshotMap)
+        try:
+            magic, version, coreCount, deviceCount, pageSize, pageCount, retiredInstructions = \
+                _SNAPSHOT_HEADER.unpack_from(snapshotView, 0)
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                raise ValueError("{} is not a valid Capua snapshot".format(filePath))
+            if coreCount != len(self.cores):
+                raise ValueError("{} holds {} cores, this machine has {}".format(filePath, coreCount,
+                                                                                len(self.cores)))
+            offset = _SNAPSHOT_HEADER.size
+
+            coreStates = []
+            for i in range(coreCount):
+                coreValues = _SNAPSHOT_CORE.unpack_from(snapshotView, offset)
+                offset += _SNAPSHOT_CORE.size
+                interruptSignal = coreValues[20] if coreValues[20] != -1 else None
+                coreStates.append((list(coreValues[0:16]),) + coreValues[16:20] + (interruptSignal,))
+
+            deviceStates = []
+            for i in range(deviceCount):
+                startAddress, length = _SNAPSHOT_DEVICE.unpack_from(snapshotView, offset)
+                offset += _SNAPSHOT_DEVICE.size
+                deviceStates.append((startAddress, bytes(snapshotView[offset:offset + length])))
+                offset += length
 
+            pages = struct.unpack_from(">{}I".format(pageCount), snapshotView, offset)
+            offset += 4 * pageCount
+            if offset + pageCount * pageSize != len(snapshotView):
+                raise ValueError("{} is a truncated Capua snapshot".format(filePath))
 
+            self.ma.restorePages(pageSize, ((page, snapshotView[offset + i * pageSize:offset + (i + 1) * pageSize])
+                                            for i, page in enumerate(pages)))
+            # The virtual clock goes back first, devices resuming their work schedule against it
+            self.mioc.retiredInstructions = retiredInstructions
+            self.mioc.setDeviceStates(deviceStates)
+            for core, coreState in zip(self.cores, coreStates):
+                core.setState(coreState)
+        finally:
+            snapshotView.release()
+            snapshotMap.close()
@@ -0,0 +1,426 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+from CapuaEnvironment.ExecutionUnit.TraceRecorder import NO_REGISTER
+from Configuration.Configuration import REGISTER_A, \
+                                        REGISTER_B, \
+                                        REGISTER_C, \
+                                        REGISTER_D, \
+                                        REGISTER_E, \
+                                        REGISTER_F, \
+                                        REGISTER_G, \
+                                        REGISTER_A2, \
+                                        REGISTER_B2, \
+                                        REGISTER_C2, \
+                                        REGISTER_D2, \
+                                        REGISTER_E2, \
+                                        REGISTER_F2, \
+                                        REGISTER_G2, \
+                                        REGISTER_S, \
+                                        REGISTER_S2, \
+                                        BLOCK_TRANSLATION_MAX_LENGTH, \
+                                        INSTRUCTION_CACHE_PAGE_SHIFT
+
+import threading
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2015, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+
+# Register code to the expression accessing that register in the ExecutionUnit register file.
+# Register codes are the register file indexes.
+REGISTER_EXPRESSIONS = {registerCode: "registers[{}]".format(registerCode)
+                        for registerCode in (REGISTER_A, REGISTER_B, REGISTER_C, REGISTER_D,
+                                             REGISTER_E, REGISTER_F, REGISTER_G, REGISTER_S,
+                                             REGISTER_A2, REGISTER_B2, REGISTER_C2, REGISTER_D2,
+                                             REGISTER_E2, REGISTER_F2, REGISTER_G2, REGISTER_S2)}
+STACK_POINTER = REGISTER_EXPRESSIONS[REGISTER_S]
+
+# A basic block ends right after one of these. They either transfer execution or change
+# the interrupt state of the core. Ending blocks on interrupt state change allows pending
+# interrupts to be handled as soon as the core makes them possible.
+BLOCK_TERMINATORS = ("JMP", "JMPR", "CALL", "RET", "INT", "HIRET", "ACTI", "DACTI")
+
+# Translated instructions accessing memory, they might read a device. Instructions going through
+# the generic path are always considered to access memory.
+MEMORY_ACCESS_MNEMONICS = ("MEMR", "MEMW", "PUSH", "POP", "CALL", "RET")
+
+# Binary operations that are compiled inline as "destination = (expression) & 0xFFFFFFFF"
+BINARY_OPERATION_EXPRESSIONS = {
+    "ADD": "({source} + {destination})",
+    "SUB": "({destination} - {source})",
+    "AND": "({source} & {destination})",
+    "OR": "({source} | {destination})",
+    "XOR": "({source} ^ {destination})",
+    "SHL": "({destination} << {source})",
+    "SHR": "({destination} >> {source})",
+}
+
+# Index of the different parts of a translated block
+BLOCK_RUN = 0       # The generated function, returns the number of executed instructions
+BLOCK_END = 1       # Address of the first byte following the block
+BLOCK_LENGTH = 2    # Number of instructions in the block
+BLOCK_VALID = 3     # [bool], set to False when memory covered by the block gets written
+
+
+class BlockTranslator:
+    """
+    The BlockTranslator is an alternative to the LogicUnit instruction per instruction dispatch. It
+    finds basic blocks (straight line code ending at a control transfer instruction) and compiles each
+    of them, once, into a generated Python function. In that function, every instruction has been
+    specialized: operands are literals or direct register file accesses and no mnemonic lookup
+    happens. Running a block is therefore a single Python call no matter how many instructions it holds.
+
+    Instructions that are complex and rarely used (INT, HIRET, SFSTOR, DIV, ...) are not specialized.
+    For these, the generated code simply calls the LogicUnit method directly. This guarantees that
+    both execution modes behave the same way.
+
+    Note about self modifying code:
+    The translator registers to the MemoryArray writes just like the InstructionFetchUnit. A write
+    touching a block drops it from the cache and marks it invalid. Since a block could be writing
+    into itself, generated code checks that its block is still valid after every memory write and
+    returns early if it is not. The rest of the block will then be translated again from memory.
+    """
+
+    eu = None       # The execution unit owning this translator
+    _blocks = None                  # {address: block}
+    _singleInstructionBlocks = None  # {address: block} Blocks limited to a single instruction
+    _blockPages = None              # {page: set(address of blocks touching that page)}
+    blocksTranslated = 0
+
+    def __init__(self, executionUnit=None):
+        """
+        Prepare the translator for a given ExecutionUnit.
+        :param executionUnit: ExecutionUnit, the core for which the code is translated
+        """
+        if executionUnit is None:
+            raise RuntimeError("Capua environment, error initializing the block translator")
+
+        self.eu = executionUnit
+        self._blocks = {}
+        self._singleInstructionBlocks = {}
+        self._blockPages = {}
+        self._blockLock = threading.Lock()
+        self.eu.ifu.registerCodeWriteObserver(self._invalidateBlocksForRange)
+
+    def runAt(self, address=None, limit=BLOCK_TRANSLATION_MAX_LENGTH):
+        """
+        Run the block starting at address. If the block holds more than limit instructions, only
+        a single instruction is run. Caller is expected to loop until its own budget is exhausted.
+        :param address: int, address of the first instruction to be run, this is the current I
+        :param limit: int, maximum number of instructions that can be run
+        :return: int, the number of instructions that were run
+        """
+        if limit > 1:
+            block = self._blocks.get(address)
+            if block is None:
+                block = self._translate(address, BLOCK_TRANSLATION_MAX_LENGTH, self._blocks)
+            if block[BLOCK_LENGTH] <= limit:
+                return block[BLOCK_RUN]()
+
+        block = self._singleInstructionBlocks.get(address)
+        if block is None:
+            block = self._translate(address, 1, self._singleInstructionBlocks)
+
+        return block[BLOCK_RUN]()
+
+    def invalidateAllBlocks(self):
+        """
+        Drop every translated block.
+        :return: Nothing
+        """
+        self._blockLock.acquire()
+        for blocks in (self._blocks, self._singleInstructionBlocks):
+            for block in blocks.values():
+                block[BLOCK_VALID][0] = False
+            blocks.clear()
+        self._blockPages.clear()
+        self._blockLock.release()
+
+    def _translate(self, address=None, maximumLength=BLOCK_TRANSLATION_MAX_LENGTH, cache=None):
+        """
+        Find the basic block starting at address, compile it and put it in the cache.
+        :param address: int, where the block starts
+        :param maximumLength: int, maximum number of instructions in the block
+        :param cache: dict, the cache where the block needs to be stored
+        :return: the translated block
+        """
+        self._blockLock.acquire()
+        try:
+            instructions = []
+            currentAddress = address
+            while len(instructions) < maximumLength:
+                try:
+                    instruction, nextInstructionAddress = self.eu.ifu.fetchInstructionAtAddress(currentAddress)
+                except (ValueError, MemoryError):
+                    if len(instructions) == 0:
+                        raise
+                    # Not necessarily an error, this might be data that will never be reached.
+                    # Should it be reached, the error will be raised when translating from there.
+                    break
+                instructions.append((instruction, nextInstructionAddress))
+                currentAddress = nextInstructionAddress
+                if instruction.operationMnemonic in BLOCK_TERMINATORS:
+                    break
+
+            block = self._compileBlock(address, instructions)
+            cache[address] = block
+            for page in range(address >> INSTRUCTION_CACHE_PAGE_SHIFT,
+                              ((block[BLOCK_END] - 1) >> INSTRUCTION_CACHE_PAGE_SHIFT) + 1):
+                if page not in self._blockPages:
+                    self._blockPages[page] = set()
+                self._blockPages[page].add(address)
+            self.blocksTranslated += 1
+        finally:
+            self._blockLock.release()
+
+        return block
+
+    def _compileBlock(self, address=None, instructions=None):
+        """
+        Generates the Python code for a list of instructions and compiles it. When the core has a trace
+        recorder, every instruction is recorded right after it is executed.
+        :param address: int, address of the first instruction
+        :param instructions: list, [(instruction, nextInstructionAddress), ...]
+        :return: the compiled block
+        """
+        valid = [True]
+        namespace = {"eu": self.eu,
+                     "registers": self.eu._registers,
+                     "lu": self.eu.lu,
+                     "read": self.eu.mioc.memoryReadAtAddressForLength,
+                     "write": self.eu.mioc.memoryWriteAtAddressForLength,
+                     "valid": valid,
+                     "chunkEnd": self.eu._chunkEnd,
+                     "chunkProgress": self.eu._chunkProgress}
+        traceRecorder = self.eu.traceRecorder
+        if traceRecorder is not None:
+            namespace["trace"] = traceRecorder.recordInstruction
+        body = []
+        flagsAreZero = False    # Allows skipping redundant FLAGS reset
+        instructionAddress = address
+        tracksProgress = False
+
+        for count, (instruction, nextInstructionAddress) in enumerate(instructions, start=1):
+            code, setsFlags, writesMemory = self._generateInstructionCode(instruction, nextInstructionAddress)
+            exitCondition = None
+            progressCode = []
+            if count > 1 and (code is None or instruction.operationMnemonic in MEMORY_ACCESS_MNEMONICS):
+                # A device might be read, the virtual time has to account for the instructions already
+                # run in this block (see ExecutionUnit.getChunkProgress)
+                progressCode = ["chunkProgress[0] = blockProgress + {}".format(count - 1)]
+                tracksProgress = True
+            if code is None:
+                # Generic path, the LogicUnit method is called directly
+                namespace["ins{}".format(count)] = instruction
+                namespace["op{}".format(count)] = getattr(self.eu.lu, instruction.operationMnemonic)
+                code = ["eu.I = {}".format(hex(nextInstructionAddress)),
+                        "lu.ci = ins{}".format(count),
+                        "result = op{}(False)".format(count),
+                        "if 0 <= result <= 0b111:",
+                        "    eu.FLAGS = result"]
+                exitCondition = "not valid[0] or chunkEnd[0]"
+                flagsAreZero = False
+            elif setsFlags:
+                flagsAreZero = False
+            elif not flagsAreZero:
+                code.append("eu.FLAGS = 0")
+                flagsAreZero = True
+            if writesMemory:
+                # The instruction might have written into this very block, or to a device ending
+                # the current virtual time chunk (see ExecutionUnit.endVirtualChunk)
+                exitCondition = "not valid[0] or chunkEnd[0]"
+            elif instruction.operationMnemonic in ("MEMR", "POP"):
+                exitCondition = "chunkEnd[0]"
+            if traceRecorder is not None:
+                namespace["enc{}".format(count)] = instruction.encoding
+                code.append(self._generateTraceCode(instruction, instructionAddress, count))
+            if exitCondition is not None:
+                code.extend(["if {}:".format(exitCondition),
+                             "    return {}".format(count)])
+            instructionAddress = nextInstructionAddress
+            body.append("# {} : {}".format(hex(nextInstructionAddress), instruction.operationMnemonic))
+            body.extend(progressCode)
+            body.extend(code)
+
+        lastInstruction, endAddress = instructions[-1]
+        if lastInstruction.operationMnemonic not in BLOCK_TERMINATORS:
+            body.append("eu.I = {}".format(hex(endAddress)))
+        body.append("return {}".format(len(instructions)))
+
+        if tracksProgress:
+            body.insert(0, "blockProgress = chunkProgress[0]")
+        source = "def runBlock():\n    " + "\n    ".join(body) + "\n"
+        exec(compile(source, "<Capua block {}>".format(hex(address)), "exec"), namespace)
+
+        return namespace["runBlock"], endAddress, len(instructions), valid
+
+    def _generateInstructionCode(self, instruction=None, nextInstructionAddress=None):
+        """
+        Generates specialized code for a single instruction. The code does not reset FLAGS, this is
+        taken care of by the caller since it can often be skipped.
+        :param instruction: Instruction, the instruction to be translated
+        :param nextInstructionAddress: int, the address following the instruction (I while it executes)
+        :return: (list of code lines or None if generic path should be used,
+                  bool True if code sets FLAGS,
+                  bool True if code writes to memory)
+        """
+        mnemonic = instruction.operationMnemonic
+        source = self._generateSourceExpression(instruction)
+        destination = REGISTER_EXPRESSIONS.get(instruction.destinationRegister)
+        code = None
+        setsFlags = False
+        writesMemory = False
+
+        if mnemonic == "NOP":
+            code = []
+        elif mnemonic == "MOV" and source is not None and destination is not None:
+            code = ["{} = {} & 0xFFFFFFFF".format(destination, source)]
+        elif mnemonic in BINARY_OPERATION_EXPRESSIONS and source is not None and destination is not None:
+            expression = BINARY_OPERATION_EXPRESSIONS[mnemonic].format(source=source, destination=destination)
+            code = ["{} = {} & 0xFFFFFFFF".format(destination, expression)]
+        elif mnemonic == "CMP" and source is not None and destination is not None:
+            code = ["result = {} - {}".format(source, destination),
+                    "eu.FLAGS = 0b100 if result == 0 else (0b010 if result < 0 else 0b001)"]
+            setsFlags = True
+        elif mnemonic == "NOT" and instruction.sourceRegister in REGISTER_EXPRESSIONS:
+            register = REGISTER_EXPRESSIONS[instruction.sourceRegister]
+            code = ["{0} = ({0} ^ 0xFFFFFFFF) & 0xFFFFFFFF".format(register)]
+        elif mnemonic == "SIVR" and instruction.sourceRegister in REGISTER_EXPRESSIONS:
+            code = ["eu.IVR = {} & 0xFFFFFFFF".format(REGISTER_EXPRESSIONS[instruction.sourceRegister])]
+        elif mnemonic == "JMP" and source is not None:
+            flags = instruction.flags
+            code = ["if ({} & eu.FLAGS) > 0 or {} == eu.FLAGS:".format(flags, flags),
+                    "    eu.I = {}".format(source),
+                    "else:",
+                    "    eu.I = {}".format(hex(nextInstructionAddress))]
+        elif mnemonic == "MEMR" and source is not None and destination is not None:
+            code = ["eu.I = {}".format(hex(nextInstructionAddress)),
+                    "{} = read({}, {}) & 0xFFFFFFFF".format(destination, source, instruction.width)]
+        elif mnemonic == "MEMW" and source is not None:
+            if instruction.destinationImmediate is not None:
+                target = hex(instruction.destinationImmediate)
+            elif destination is not None:
+                target = destination
+            else:
+                return None, False, False
+            valueMask = (1 << (8 * instruction.width)) - 1
+            code = ["eu.I = {}".format(hex(nextInstructionAddress)),
+                    "write({}, {}, {} & {}, source=eu.name)".format(target, instruction.width, source, hex(valueMask))]
+            writesMemory = True
+        elif mnemonic == "PUSH" and source is not None:
+            code = ["eu.I = {}".format(hex(nextInstructionAddress)),
+                    "stackPointer = {} + 4".format(STACK_POINTER),
+                    "{} = stackPointer".format(STACK_POINTER),
+                    "write(stackPointer, 4, {}, source=eu.name)".format(source)]
+            writesMemory = True
+        elif mnemonic == "POP" and instruction.sourceRegister in REGISTER_EXPRESSIONS:
+            code = ["eu.I = {}".format(hex(nextInstructionAddress)),
+                    "stackPointer = {}".format(STACK_POINTER),
+                    "result = read(stackPointer, 4)",
+                    "{} = stackPointer - 4".format(STACK_POINTER),
+                    "{} = result & 0xFFFFFFFF".format(REGISTER_EXPRESSIONS[instruction.sourceRegister])]
+        elif mnemonic == "CALL" and source is not None:
+            code = ["eu.I = {}".format(hex(nextInstructionAddress)),
+                    "stackPointer = {} + 4".format(STACK_POINTER),
+                    "{} = stackPointer".format(STACK_POINTER),
+                    "write(stackPointer, 4, {}, source=eu.name)".format(hex(nextInstructionAddress)),
+                    "eu.I = {}".format(source)]
+        elif mnemonic == "RET":
+            code = ["eu.I = {}".format(hex(nextInstructionAddress)),
+                    "stackPointer = {}".format(STACK_POINTER),
+                    "result = read(stackPointer, 4)",
+                    "{} = stackPointer - 4".format(STACK_POINTER),
+                    "eu.I = result"]
+
+        return code, setsFlags, writesMemory
+
+    def _generateTraceCode(self, instruction=None, address=None, count: int=1):
+        """
+        Generates the call recording an instruction once executed (see TraceRecorder.recordInstruction).
+        The bytes of the instruction are expected in the block namespace as enc<count>.
+        :param instruction: Instruction, the instruction to be recorded
+        :param address: int, the address of the instruction
+        :param count: int, the position of the instruction in its block, starting at 1
+        :return: str, the code line
+        """
+        registerCode = instruction.destinationRegister
+        if registerCode is None:
+            registerCode = instruction.sourceRegister
+        if registerCode not in REGISTER_EXPRESSIONS:
+            return "trace({}, enc{}, eu.FLAGS, {}, 0, {})".format(hex(address), count, NO_REGISTER, STACK_POINTER)
+        return "trace({}, enc{}, eu.FLAGS, {}, {}, {})".format(hex(address), count, registerCode,
+                                                               REGISTER_EXPRESSIONS[registerCode], STACK_POINTER)
+
+    def _generateSourceExpression(self, instruction=None):
+        """
+        Builds the expression giving the source value for an instruction
+        :param instruction: Instruction, the instruction for which we need the source
+        :return: str, the expression or None if the source register is not valid
+        """
+        if instruction.sourceImmediate is not None:
+            return hex(instruction.sourceImmediate)
+        if instruction.sourceRegister in REGISTER_EXPRESSIONS:
+            return REGISTER_EXPRESSIONS[instruction.sourceRegister]
+        return None
+
+    def _invalidateBlocksForRange(self, address=None, length=1):
+        """
+        This is called by the MemoryArray after every write. Any block that has at least one of
+        its bytes in the written range is removed from the cache and marked as invalid.
+        :param address: int, start address of the write
+        :param length: int, length of the write
+        :return: Nothing
+        """
+        if not self._blockPages:
+            return
+
+        endAddress = address + length
+        firstPage = address >> INSTRUCTION_CACHE_PAGE_SHIFT
+        lastPage = (endAddress - 1) >> INSTRUCTION_CACHE_PAGE_SHIFT
+
+        self._blockLock.acquire()
+        if lastPage - firstPage < len(self._blockPages):
+            impactedPages = range(firstPage, lastPage + 1)
+        else:
+            impactedPages = [page for page in self._blockPages if firstPage <= page <= lastPage]
+        for page in impactedPages:
+            blockAddresses = self._blockPages.get(page)
+            if blockAddresses is None:
+                continue
+            for blockAddress in list(blockAddresses):
+                for blocks in (self._blocks, self._singleInstructionBlocks):
+                    block = blocks.get(blockAddress)
+                    if block is not None and blockAddress < endAddress and address < block[BLOCK_END]:
+                        block[BLOCK_VALID][0] = False
+                        del blocks[blockAddress]
+                if blockAddress not in self._blocks and blockAddress not in self._singleInstructionBlocks:
+                    # Entries left in other pages are cleaned up whenever these pages get written
+                    blockAddresses.discard(blockAddress)
+            if len(blockAddresses) == 0:
+                del self._blockPages[page]
+        self._blockLock.release()
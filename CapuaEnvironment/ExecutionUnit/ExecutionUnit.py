@@ -20,7 +20,10 @@ with this program; if not, write to the Free Software Foundation, Inc.,
 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 """
 
+from CapuaEnvironment.ExecutionUnit.BlockTranslator import BlockTranslator
+from CapuaEnvironment.ExecutionUnit.TraceRecorder import NO_REGISTER
 from CapuaEnvironment.Instruction.Instruction import Instruction
+from CapuaEnvironment.IntructionFetchUnit.DecodeTable import mnemonicTable
 from CapuaEnvironment.IntructionFetchUnit.InstructionFetchUnit import InstructionFetchUnit
 from CapuaEnvironment.IntructionFetchUnit.FormDescription import formDescription
 from CapuaEnvironment.IOComponent.MemoryIOController import MemoryIOController
@@ -41,7 +44,11 @@ from Configuration.Configuration import REGISTER_A, \
                                         REGISTER_S, \
                                         REGISTER_S2, \
                                         MEMORY_END_AT, \
-                                        MEMORY_START_AT
+                                        MEMORY_START_AT, \
+                                        EXECUTION_MODE, \
+                                        EXECUTION_MODE_BLOCK, \
+                                        EXECUTION_MODE_INTERPRETER, \
+                                        BLOCK_TRANSLATION_MAX_LENGTH
 
 import threading
 
@@ -54,6 +61,29 @@ __maintainer__ = "CSE"
 __status__ = "Dev"
 
 
+# Register codes used by instructions are also the index of the register in the register file
+REGISTER_CODES = frozenset((REGISTER_A, REGISTER_B, REGISTER_C, REGISTER_D,
+                            REGISTER_E, REGISTER_F, REGISTER_G, REGISTER_S,
+                            REGISTER_A2, REGISTER_B2, REGISTER_C2, REGISTER_D2,
+                            REGISTER_E2, REGISTER_F2, REGISTER_G2, REGISTER_S2))
+REGISTER_FILE_SIZE = len(REGISTER_CODES)
+
+
+def _registerView(registerCode: int=None):
+    """
+    Builds a property giving named access (eu.A, eu.S2, ...) to a slot of the register file.
+    :param registerCode: int, the code (index) of the register
+    :return: property
+    """
+    def getRegister(self):
+        return self._registers[registerCode]
+
+    def setRegister(self, value):
+        self._registers[registerCode] = value
+
+    return property(getRegister, setRegister)
+
+
 class ExecutionUnit:
     """
     The execution unit represent a single core in the system. Registers are hosted here. This can be
@@ -61,22 +91,26 @@ class ExecutionUnit:
     """
 
     # All registers are hosted in the ExecutionUnit
-    A = 0           # Software limited to 32 bits General purpose register
-    B = 0           # Software limited to 32 bits General purpose register
-    C = 0           # Software limited to 32 bits General purpose register
-    D = 0           # Software limited to 32 bits General purpose register
-    E = 0           # Software limited to 32 bits General purpose register
-    F = 0           # Software limited to 32 bits General purpose register
-    G = 0           # Software limited to 32 bits General purpose register
-    S = 0           # Software limited to 32 bits Stack pointer. Can be used as a GPR if not using the stack
-    A2 = 0          # Software limited to 32 bits General purpose register
-    B2 = 0          # Software limited to 32 bits General purpose register
-    C2 = 0          # Software limited to 32 bits General purpose register
-    D2 = 0          # Software limited to 32 bits General purpose register
-    E2 = 0          # Software limited to 32 bits General purpose register
-    F2 = 0          # Software limited to 32 bits General purpose register
-    G2 = 0          # Software limited to 32 bits General purpose register
-    S2 = 0          # Software limited to 32 bits General purpose register. Not currently configured for stack.
+    # Registers that can be referenced by instructions live in the register file, a list indexed
+    # by register code. Named attributes are views on that list. The list object itself is never
+    # replaced so that other components (BlockTranslator) can safely keep a reference to it.
+    _registers = None
+    A = _registerView(REGISTER_A)    # Software limited to 32 bits General purpose register
+    B = _registerView(REGISTER_B)    # Software limited to 32 bits General purpose register
+    C = _registerView(REGISTER_C)    # Software limited to 32 bits General purpose register
+    D = _registerView(REGISTER_D)    # Software limited to 32 bits General purpose register
+    E = _registerView(REGISTER_E)    # Software limited to 32 bits General purpose register
+    F = _registerView(REGISTER_F)    # Software limited to 32 bits General purpose register
+    G = _registerView(REGISTER_G)    # Software limited to 32 bits General purpose register
+    S = _registerView(REGISTER_S)    # Software limited to 32 bits Stack pointer. Can be used as a GPR if not using the stack
+    A2 = _registerView(REGISTER_A2)  # Software limited to 32 bits General purpose register
+    B2 = _registerView(REGISTER_B2)  # Software limited to 32 bits General purpose register
+    C2 = _registerView(REGISTER_C2)  # Software limited to 32 bits General purpose register
+    D2 = _registerView(REGISTER_D2)  # Software limited to 32 bits General purpose register
+    E2 = _registerView(REGISTER_E2)  # Software limited to 32 bits General purpose register
+    F2 = _registerView(REGISTER_F2)  # Software limited to 32 bits General purpose register
+    G2 = _registerView(REGISTER_G2)  # Software limited to 32 bits General purpose register
+    S2 = _registerView(REGISTER_S2)  # Software limited to 32 bits General purpose register. Not currently configured for stack.
     I = 0           # Software limited to 32 bits Instruction pointer. This one is not accessible from instructions
     FLAGS = 0b000   # 3 bits limited ZLH = Zero, Lower, Higher
     IS = 0b0        # 1 bit boolean indicating if interrupts are activated or not
@@ -88,24 +122,41 @@ class ExecutionUnit:
     # will cause interrupts to be disabled until the hardware interrupt had been handled.
     # This means that a single hardware interrupt at a time can be handled.
     _interruptSignal = None
-    interruptSignalLock = threading.Lock()
+    interruptSignalLock = None  # Every core has its own, see __init__
 
     # Other required hardware components
     mioc = None  # MemoryInputOutputController
     ifu = None   # InstructionFetchUnit
     lu = None    # LogicUnit
+    bt = None    # BlockTranslator, only used when executionMode is EXECUTION_MODE_BLOCK
+    profiler = None  # Profiler, every executed instruction is reported to it when set (see setProfiler)
+    traceRecorder = None  # TraceRecorder, every executed instruction is recorded when set (see setTraceRecorder)
+    executionHistory = None  # ExecutionHistory, hardware interrupts are reported to it (see setExecutionHistory)
+    _instrumented = False  # True when instructions are to be reported to a profiler, a trace recorder or a history
+    instrumentedCount = 0  # Instructions started by the instrumented loop, used to date what an instruction does
+    stopRequested = False  # Set by requestStop, the instrumented loop stops after the current instruction
+    _chunkEnd = None  # [bool], set by endVirtualChunk, a virtual time chunk stops after the current instruction
+    _chunkProgress = None  # [int], instructions of the current chunk done before the running one, see getChunkProgress
+
+    executionMode = EXECUTION_MODE_INTERPRETER
 
     # Simple "process" identification token, this is changed to the name of the player
     # program when in game mode
     name = "System"
+    coreId = 0      # Identifier of this core on its MIOC, used to route interrupts
 
-    def __init__(self, mioc: MemoryIOController=None, ifu: InstructionFetchUnit=None, name: str="System"):
+    def __init__(self,
+                 mioc: MemoryIOController=None,
+                 ifu: InstructionFetchUnit=None,
+                 name: str="System",
+                 executionMode: int=EXECUTION_MODE):
         """
         This will setup the ExecutionUnit so that it is in a state that it can be used to run code
         from memory.
         :param mioc: A MemoryIOController for this core so that it can have access to memory
         :param ifu: An InstructionFetchUnit so this core can correctly get the instruction from memory
         :param name: str, a name identifying the core
+        :param executionMode: int, EXECUTION_MODE_INTERPRETER or EXECUTION_MODE_BLOCK
         """
         if mioc is None or type(mioc) is not MemoryIOController:
             raise RuntimeError("Capua core initialisation error - unstable state")
@@ -114,11 +165,86 @@ class ExecutionUnit:
         if name is None or type(name) is not str:
             raise RuntimeError("Capua core initialisation error - unstable state")
 
+        self._registers = [0] * REGISTER_FILE_SIZE
+        self._chunkEnd = [False]
+        self._chunkProgress = [0]
+        self.interruptSignalLock = threading.Lock()
         self.mioc = mioc
-        self.mioc.eu = self     # Need to make MIOC eu aware for memory mapped device to be able to signal interrupts
+        # Need to make MIOC eu aware for memory mapped device to be able to signal interrupts
+        self.coreId = self.mioc.registerExecutionUnit(self)
         self.ifu = ifu
         self.name = name
         self.lu = LogicUnit(self)  # LogicUnit is lower in this file
+        self.bt = BlockTranslator(self)
+        self.setExecutionMode(executionMode)
+
+    def setExecutionMode(self, executionMode: int=EXECUTION_MODE_INTERPRETER):
+        """
+        Select how instructions get executed by this core. EXECUTION_MODE_INTERPRETER dispatches
+        every instruction to the LogicUnit. EXECUTION_MODE_BLOCK runs basic blocks translated by
+        the BlockTranslator. Both modes produce the exact same core state.
+        :param executionMode: int, EXECUTION_MODE_INTERPRETER or EXECUTION_MODE_BLOCK
+        :return: Nothing
+        """
+        if executionMode not in (EXECUTION_MODE_INTERPRETER, EXECUTION_MODE_BLOCK):
+            raise ValueError("Capua core {} invalid execution mode {}".format(self.name, executionMode))
+        self.executionMode = executionMode
+        self._updateInstrumentation()
+
+    def setProfiler(self, profiler=None):
+        """
+        Start or stop profiling this core. While a profiler is set, instructions are run one at a time
+        by the interpreter, no matter the execution mode, and every one of them is reported to the
+        profiler. The profiler is also given to the MIOC so that device accesses get counted. Since
+        the MIOC is shared, device accesses of all cores go to the last profiler that was set.
+        :param profiler: Profiler, the profiler to report to, None to stop profiling
+        :return: Nothing
+        """
+        self.profiler = profiler
+        self.mioc.profiler = profiler
+        self._updateInstrumentation()
+
+    def setTraceRecorder(self, traceRecorder=None):
+        """
+        Start or stop recording the instructions run by this core. In block mode, blocks are translated
+        again with the recording built in and the core keeps running whole blocks. In interpreter mode,
+        instructions go through the instrumented loop. The recorder is also given to the MIOC so that
+        memory writes are recorded along with the instruction doing them. This can be used along with
+        a profiler, instructions are then run by the interpreter.
+        :param traceRecorder: TraceRecorder, the recorder to use, None to stop recording
+        :return: Nothing
+        """
+        self.traceRecorder = traceRecorder
+        self.mioc.traceRecorder = traceRecorder
+        self.bt.invalidateAllBlocks()
+        self._updateInstrumentation()
+
+    def setExecutionHistory(self, executionHistory=None):
+        """
+        Start or stop reporting this core to an execution history (see ToolChain.Debugger.ExecutionHistory).
+        While a history is set, instructions are run one at a time by the interpreter and every hardware
+        interrupt handled is reported to it. The history is also given to the MIOC so that device accesses
+        can be recorded and, later, replayed.
+        :param executionHistory: ExecutionHistory, the history to report to, None to stop reporting
+        :return: Nothing
+        """
+        # Transfers left to the core while recording are done, and recorded, before the history changes.
+        # Those kept while replaying are done once there is no history anymore.
+        self.mioc.runPendingDirectMemoryAccesses()
+        self.executionHistory = executionHistory
+        self.mioc.executionHistory = executionHistory
+        if executionHistory is None:
+            self.mioc.runPendingDirectMemoryAccesses()
+        self._updateInstrumentation()
+
+    def _updateInstrumentation(self):
+        """
+        Decide whether instructions have to go through the instrumented loop. A trace recorder alone
+        does not require it in block mode since translated blocks record instructions themselves.
+        :return: Nothing
+        """
+        self._instrumented = self.profiler is not None or self.executionHistory is not None or \
+            (self.traceRecorder is not None and self.executionMode != EXECUTION_MODE_BLOCK)
 
     def setupCore(self, I: int=MEMORY_START_AT):
         """
@@ -141,27 +267,38 @@ class ExecutionUnit:
         :param I: int, a memory address where I pointer should be pointing
         :return: nothing
         """
-        self.A = 0
-        self.B = 0
-        self.C = 0
-        self.D = 0
-        self.E = 0
-        self.F = 0
-        self.G = 0
-        self.A2 = 0
-        self.B2 = 0
-        self.C2 = 0
-        self.D2 = 0
-        self.E2 = 0
-        self.F2 = 0
-        self.G2 = 0
+        self._registers[:] = [0] * REGISTER_FILE_SIZE
         self.I = I
         self.IS = 0
         self.IVR = 0
-        self.S = 0
-        self.S2 = 0
         self.FLAGS = 0
 
+    def getState(self):
+        """
+        Gives the complete state of the core, this is used to snapshot a machine.
+        :return: tuple, (registers list, I, FLAGS, IS, IVR, pending interrupt number or None)
+        """
+        return list(self._registers), self.I, self.FLAGS, self.IS, self.IVR, self._interruptSignal
+
+    def setState(self, state=None):
+        """
+        Put the core back in a state previously given by getState.
+        :param state: tuple, as returned by getState
+        :return: Nothing
+        """
+        registers, I, FLAGS, IS, IVR, interruptSignal = state
+        if len(registers) != REGISTER_FILE_SIZE:
+            raise ValueError("Capua core {} invalid register file in state".format(self.name))
+
+        self.interruptSignalLock.acquire()
+        self._registers[:] = registers
+        self.I = I
+        self.FLAGS = FLAGS
+        self.IS = IS
+        self.IVR = IVR
+        self._interruptSignal = interruptSignal
+        self.interruptSignalLock.release()
+
     def halt(self):
         """
         This method is to be called when the core is going down. This method will signal the MIOC so that it can
@@ -182,18 +319,197 @@ class ExecutionUnit:
         # When handling interrupt first, we end-up with an instruction
         # that is executed without it being visible to the debugger.
 
-        # First we need to run the current instruction
-        instruction, nextInstructionAddress = self.ifu.fetchInstructionAtAddress(self.I)
-        self.I = nextInstructionAddress
-        self.lu.executeInstruction(instruction)
+        if self.mioc.virtualTime:
+            # Virtual events have to be dated the same way no matter how the core is run
+            self.run(count=1)
+            return
 
-        # Then we can handle the interrupt
-        self.interruptSignalLock.acquire()
-        currentInterrupt = self._interruptSignal
-        self.interruptSignalLock.release()
-        if currentInterrupt is not None:
+        # First we need to run the current instruction
+        if self._instrumented:
+            # The instrumented loop also takes care of the interrupt
+            self._runInstrumentedInstructions(1)
+            self.mioc.retireInstructions(1)
+            return
+
+        if self.executionMode == EXECUTION_MODE_BLOCK:
+            self.bt.runAt(self.I, 1)
+        else:
+            instruction, nextInstructionAddress = self.ifu.fetchInstructionAtAddress(self.I)
+            self.I = nextInstructionAddress
+            self.lu.executeInstruction(instruction)
+        self.mioc.retireInstructions(1)
+
+        # Then we can handle the interrupt. Reading the pending interrupt does not require the lock,
+        # see signalHardwareInterrupt.
+        if self._interruptSignal is not None:
             self._handleHardwareInterrupt()
 
+    def executeMany(self, count: int=1):
+        """
+        Run count instructions. This is the bulk equivalent of calling execute() count times.
+        See run for details.
+        :param count: int, the number of instructions to be run
+        :return: int, the number of instructions actually run
+        """
+        return self.run(count=count)
+
+    def run(self, count: int=None, until=None):
+        """
+        Run instructions without going back to the caller between instructions. Pending interrupts
+        are polled without taking the interrupt lock. In interpreter mode, they are handled at
+        instruction boundaries, exactly as execute() would. In block mode, whole translated blocks
+        are run at once and pending interrupts are only handled in between blocks. Since blocks end
+        on every instruction that can change the interrupt state, a pending interrupt is delayed by,
+        at most, BLOCK_TRANSLATION_MAX_LENGTH instructions. Interrupts signaled by virtual events
+        are not delayed, see below.
+        When the MIOC is in virtual time, execution is split so that the core stops right on every
+        scheduled virtual event, an interrupt signaled by the event is handled before going on. An
+        instruction scheduling a new event (a guest arming the InterruptClock for example) ends the
+        current chunk so that the event is dated right after that instruction (see endVirtualChunk).
+        An instrumented core also stops as soon as a stop is requested (see requestStop).
+        :param count: int, the maximum number of instructions to be run (0 or more), None for no limit
+        :param until: container of addresses (a set is best), execution stops as soon as I points
+                      to one of them. The first instruction is always executed.
+        :return: int, the number of instructions actually run
+        """
+        if count is not None and count < 0:
+            raise ValueError("Invalid instruction count {}".format(count))
+        mioc = self.mioc
+        if not mioc.virtualTime:
+            executed = self._runInstructions(count, until)
+            mioc.retireInstructions(executed)
+            return executed
+
+        executed = 0
+        while count is None or executed < count:
+            chunk = mioc.getInstructionsToNextVirtualEvent()
+            if count is not None:
+                chunk = count - executed if chunk is None else min(chunk, count - executed)
+            self._chunkEnd[0] = False
+            mioc.virtualChunkCore = self
+            try:
+                ran = self._runInstructions(chunk, until)
+            finally:
+                mioc.virtualChunkCore = None
+            executed += ran
+            mioc.retireInstructions(ran)
+            if self._interruptSignal is not None:
+                if self._instrumented:
+                    self._handleInstrumentedHardwareInterrupt()
+                else:
+                    self._handleHardwareInterrupt()
+            if until is not None and self.I in until:
+                break
+            if self.stopRequested and self._instrumented:
+                break
+        return executed
+
+    def _runInstructions(self, count: int=None, until=None):
+        """
+        This is the actual implementation of run, instructions are not reported to the MIOC.
+        :param count: int, the maximum number of instructions to be run, None for no limit
+        :param until: container of addresses, see run
+        :return: int, the number of instructions actually run
+        """
+        if self._instrumented:
+            return self._runInstrumentedInstructions(count, until)
+
+        executed = 0
+        limit = count if count is not None else -1
+        chunkEnd = self._chunkEnd
+        chunkProgress = self._chunkProgress
+
+        if self.executionMode == EXECUTION_MODE_BLOCK and until is None:
+            runAt = self.bt.runAt
+            while executed != limit:
+                chunkProgress[0] = executed
+                executed += runAt(self.I, limit - executed if limit > 0 else BLOCK_TRANSLATION_MAX_LENGTH)
+                if self._interruptSignal is not None:
+                    self._handleHardwareInterrupt()
+                if chunkEnd[0]:
+                    break
+            return executed
+
+        if self.executionMode == EXECUTION_MODE_BLOCK:
+            # Blocks could run past a stop address, go one instruction at a time
+            runAt = self.bt.runAt
+            while executed != limit:
+                chunkProgress[0] = executed
+                runAt(self.I, 1)
+                executed += 1
+                if self._interruptSignal is not None:
+                    self._handleHardwareInterrupt()
+                if self.I in until or chunkEnd[0]:
+                    break
+            return executed
+
+        # This is the interpreter hot loop, everything used here is kept in local variables
+        fetchInstructionAtAddress = self.ifu.fetchInstructionAtAddress
+        executeInstruction = self.lu.executeInstruction
+        while executed != limit:
+            instruction, self.I = fetchInstructionAtAddress(self.I)
+            chunkProgress[0] = executed
+            executeInstruction(instruction)
+            executed += 1
+            if self._interruptSignal is not None:
+                self._handleHardwareInterrupt()
+            if until is not None and self.I in until:
+                break
+            if chunkEnd[0]:
+                break
+
+        return executed
+
+    def _runInstrumentedInstructions(self, count: int=None, until=None):
+        """
+        Same as _runInstructions, through the interpreter, reporting every instruction to the profiler
+        and to the trace recorder. Transfers devices left to the core while an execution history is
+        recording are done before the next instruction. This also stops when requested to (see requestStop).
+        :param count: int, the maximum number of instructions to be run, None for no limit
+        :param until: container of addresses, see run
+        :return: int, the number of instructions actually run
+        """
+        executed = 0
+        limit = count if count is not None else -1
+        chunkProgress = self._chunkProgress
+
+        profiler = self.profiler
+        traceRecorder = self.traceRecorder
+        registers = self._registers
+        fetchInstructionAtAddress = self.ifu.fetchInstructionAtAddress
+        executeInstruction = self.lu.executeInstruction
+        pendingDirectMemoryAccesses = self.mioc.pendingDirectMemoryAccesses
+        while executed != limit:
+            if pendingDirectMemoryAccesses:
+                self.mioc.runPendingDirectMemoryAccesses()
+            address = self.I
+            instruction, nextInstructionAddress = fetchInstructionAtAddress(address)
+            self.I = nextInstructionAddress
+            self.instrumentedCount += 1
+            chunkProgress[0] = executed
+            executeInstruction(instruction)
+            if profiler is not None:
+                profiler.recordInstruction(address, instruction.operationMnemonic, nextInstructionAddress, self.I)
+            if traceRecorder is not None:
+                registerCode = instruction.destinationRegister
+                if registerCode is None:
+                    registerCode = instruction.sourceRegister
+                if registerCode is None:
+                    traceRecorder.recordInstruction(address, instruction.encoding, self.FLAGS, NO_REGISTER, 0,
+                                                    registers[REGISTER_S])
+                else:
+                    traceRecorder.recordInstruction(address, instruction.encoding, self.FLAGS, registerCode,
+                                                    registers[registerCode], registers[REGISTER_S])
+            executed += 1
+            if self._interruptSignal is not None:
+                self._handleInstrumentedHardwareInterrupt()
+            if until is not None and self.I in until:
+                break
+            if self.stopRequested or self._chunkEnd[0]:
+                break
+
+        return executed
+
     def setRegisterValue(self, registerCode: int=None, value: int=None):
         """
         This is the gate keeper to setting registers value. It make sure that the
@@ -203,41 +519,9 @@ class ExecutionUnit:
         :param value: int, the value that needs to be written into the registerCode
         :return:
         """
-        value &= 0xFFFFFFFF
-        if registerCode == REGISTER_A:
-            self.A = value
-        elif registerCode == REGISTER_B:
-            self.B = value
-        elif registerCode == REGISTER_C:
-            self.C = value
-        elif registerCode == REGISTER_D:
-            self.D = value
-        elif registerCode == REGISTER_E:
-            self.E = value
-        elif registerCode == REGISTER_F:
-            self.F = value
-        elif registerCode == REGISTER_G:
-            self.G = value
-        elif registerCode == REGISTER_A2:
-            self.A2 = value
-        elif registerCode == REGISTER_B2:
-            self.B2 = value
-        elif registerCode == REGISTER_C2:
-            self.C2 = value
-        elif registerCode == REGISTER_D2:
-            self.D2 = value
-        elif registerCode == REGISTER_E2:
-            self.E2 = value
-        elif registerCode == REGISTER_F2:
-            self.F2 = value
-        elif registerCode == REGISTER_G2:
-            self.G2 = value
-        elif registerCode == REGISTER_S:
-            self.S = value
-        elif registerCode == REGISTER_S2:
-            self.S2 = value
-        else:
+        if registerCode not in REGISTER_CODES:
             raise ValueError("Core {} caused an invalid instruction to be executed - GameOver". format(self.name,))
+        self._registers[registerCode] = value & 0xFFFFFFFF
 
     def getRegisterValue(self, registerCode=None):
         """
@@ -246,46 +530,46 @@ class ExecutionUnit:
         :param registerCode: int, from 0b00 to 0b11
         :return:
         """
-        if registerCode == REGISTER_A:
-            register = self.A
-        elif registerCode == REGISTER_B:
-            register = self.B
-        elif registerCode == REGISTER_C:
-            register = self.C
-        elif registerCode == REGISTER_D:
-            register = self.D
-        elif registerCode == REGISTER_E:
-            register = self.E
-        elif registerCode == REGISTER_F:
-            register = self.F
-        elif registerCode == REGISTER_G:
-            register = self.G
-        elif registerCode == REGISTER_A2:
-            register = self.A2
-        elif registerCode == REGISTER_B2:
-            register = self.B2
-        elif registerCode == REGISTER_C2:
-            register = self.C2
-        elif registerCode == REGISTER_D2:
-            register = self.D2
-        elif registerCode == REGISTER_E2:
-            register = self.E2
-        elif registerCode == REGISTER_F2:
-            register = self.F2
-        elif registerCode == REGISTER_G2:
-            register = self.G2
-        elif registerCode == REGISTER_S:
-            register = self.S
-        elif registerCode == REGISTER_S2:
-            register = self.S2
-        else:
+        if registerCode not in REGISTER_CODES:
             raise ValueError("Core exception access to invalid register")
 
-        return register
+        return self._registers[registerCode]
+
+    def requestStop(self):
+        """
+        Ask the core to stop running once the current instruction is over. This is only honored while
+        the core is instrumented (see setProfiler, setTraceRecorder and setExecutionHistory), the debugger
+        uses it to stop on watchpoints. Whoever requested the stop is responsible for resetting stopRequested.
+        :return: Nothing
+        """
+        self.stopRequested = True
+
+    def endVirtualChunk(self):
+        """
+        Have the core stop the virtual time chunk it is running once the current instruction is over.
+        The MIOC calls this when the instruction schedules a virtual event (see
+        MemoryIOController.scheduleVirtualEvent), the core then goes back to run() which takes the new
+        event into account.
+        :return: Nothing
+        """
+        self._chunkEnd[0] = True
+
+    def getChunkProgress(self):
+        """
+        Gives the number of instructions of the running virtual time chunk executed before the current
+        instruction. The MIOC adds it to the retired instructions so that devices read the exact
+        virtual time in the middle of a chunk (see MemoryIOController.getVirtualTime).
+        :return: int
+        """
+        return self._chunkProgress[0]
 
     def signalHardwareInterrupt(self, interruptNumber=None):
         """
-        This will safely line up an interrupt to be handled by the execution unit.
+        This will safely line up an interrupt to be handled by the execution unit. Checking that the
+        interrupt can be signaled and setting it is done as a single atomic operation under the interrupt
+        lock so that two devices can't overwrite each other's interrupt. The core itself only reads
+        _interruptSignal, without the lock, after every instruction: a single attribute read is atomic and
+        a signal racing with that read is simply picked up at the next instruction boundary.
         :param interruptNumber: int, this is the number to be used for the interrupt handler
         :return: bool, True if interrupt was signaled, false otherwise. This gives a second chance if ever needed
         """
@@ -302,6 +586,19 @@ class ExecutionUnit:
 
         return signalingValue
 
+    def _handleInstrumentedHardwareInterrupt(self):
+        """
+        Handle a hardware interrupt and report it to the profiler, as a call to the interrupt handler,
+        and to the execution history. The trace recorder is told by _handleHardwareInterrupt.
+        :return: Nothing
+        """
+        interruptNumber = self._interruptSignal
+        self._handleHardwareInterrupt()
+        if self.profiler is not None:
+            self.profiler.recordCall(self.I)
+        if self.executionHistory is not None:
+            self.executionHistory.recordInterrupt(interruptNumber)
+
     def _handleHardwareInterrupt(self):
         """
         This will handle an hardwareInterrupt. It will deactivate the interrupts on a given core and
@@ -317,6 +614,9 @@ class ExecutionUnit:
                                      form=formDescription["InsImm"])
         self.lu.executeInstruction(instruction=intInstruction, hardware=True)
 
+        if self.traceRecorder is not None:
+            self.traceRecorder.recordInterrupt(self._interruptSignal)
+
         self._interruptSignal = None  # Interrupt has been handled, we need to reset this
 
         self.interruptSignalLock.release()
@@ -349,6 +649,7 @@ class LogicUnit:
 
     eu = None  # The execution unit.
     ci = None  # The current instruction that is being executed.
+    _handlers = None  # Operation methods indexed by instruction code, None for unknown codes.
 
     def __init__(self, executionUnit: ExecutionUnit=None):
         """
@@ -362,6 +663,10 @@ class LogicUnit:
         else:
             RuntimeError("Capua environment, error initializing the logic unit")
 
+        # Resolving the operation methods once avoids a mnemonic lookup for every executed instruction
+        self._handlers = [getattr(self, mnemonic, None) if mnemonic is not None else None
+                          for mnemonic in mnemonicTable]
+
     def executeInstruction(self, instruction: Instruction=None, hardware: bool=False):
         """
         This is the "public" entry point for the LogicUnit. The individual operations are not to be directly
@@ -378,9 +683,9 @@ class LogicUnit:
 
         self.ci = instruction
 
-        if hasattr(self, self.ci.operationMnemonic):
-            # Using the mnemonic to find the correct method for the call
-            callableOperation = getattr(self, self.ci.operationMnemonic)
+        # Using the instruction code to find the correct method for the call
+        callableOperation = self._handlers[self.ci.instructionCode]
+        if callableOperation is not None:
             # This simply calls the correct mnemonic method
             result = callableOperation(hardware)
 
@@ -463,8 +768,9 @@ class LogicUnit:
         """
 
         # Lets adjust the stack!
-        stackPointer = self.eu.S + 4  # Stack grows upward!!!
-        self.eu.S = stackPointer
+        registers = self.eu._registers
+        stackPointer = registers[REGISTER_S] + 4  # Stack grows upward!!!
+        registers[REGISTER_S] = stackPointer
 
         # return I address
         # I has already been incremented at this point we can simply use it as is for return address
@@ -561,15 +867,16 @@ class LogicUnit:
         """
         currentInstruction = self.ci
 
-        oldAValue = self.eu.A
+        registers = self.eu._registers
+        oldAValue = registers[REGISTER_A]
         # First save the return address
         popInstruction = Instruction(binaryInstruction=(0b01110100 << 8) | REGISTER_A, form=formDescription["InsReg"])
         self.executeInstruction(popInstruction, hardware=True)
-        returnAddress = self.eu.A
+        returnAddress = registers[REGISTER_A]
         self.executeInstruction(popInstruction, hardware=True)
-        flagsToBeRestored = self.eu.A
+        flagsToBeRestored = registers[REGISTER_A]
 
-        self.eu.A = oldAValue
+        registers[REGISTER_A] = oldAValue
         self.eu.I = returnAddress
 
         self.ci = currentInstruction
@@ -869,14 +1176,14 @@ class LogicUnit:
         :return:
         """
 
-        stackPointer = self.eu.S
+        registers = self.eu._registers
+        stackPointer = registers[REGISTER_S]
 
         # Read value to top of stack
         topStackValue = self.eu.mioc.memoryReadAtAddressForLength(stackPointer, 4)
 
         # Lets adjust the stack!
-        stackPointer = self.eu.S - 4  # Stack grows upward!!!
-        self.eu.S = stackPointer
+        registers[REGISTER_S] = stackPointer - 4  # Stack grows upward!!!
 
         # Save value to register
         self.eu.setRegisterValue(self.ci.sourceRegister, topStackValue)
@@ -897,9 +1204,9 @@ class LogicUnit:
         """
 
         # Lets adjust the stack!
-        stackPointer = self.eu.S
-        stackPointer = self.eu.S + 4  # Stack grows upward!!!
-        self.eu.S = stackPointer
+        registers = self.eu._registers
+        stackPointer = registers[REGISTER_S] + 4  # Stack grows upward!!!
+        registers[REGISTER_S] = stackPointer
 
         sourceValue = 0
 
@@ -926,14 +1233,14 @@ class LogicUnit:
         :return:
         """
 
-        stackPointer = self.eu.S
+        registers = self.eu._registers
+        stackPointer = registers[REGISTER_S]
 
         # Read value to top of stack
         topStackValue = self.eu.mioc.memoryReadAtAddressForLength(stackPointer, 4)
 
         # Lets adjust the stack!
-        stackPointer = self.eu.S - 4  # Stack grows upward!!!
-        self.eu.S = stackPointer
+        registers[REGISTER_S] = stackPointer - 4  # Stack grows upward!!!
 
         # Adjust next instruction pointer
         self.eu.I = topStackValue
@@ -964,6 +1271,26 @@ class LogicUnit:
         else:
             sourceValue = self.ci.sourceImmediate
 
+        # Read, compare and write have to happen as a single operation, even if other cores
+        # are running concurrently
+        self.eu.mioc.atomicOperationLock.acquire()
+        try:
+            cmpFlags = self._safeStore(condition, destinationPointer, sourceValue)
+        finally:
+            self.eu.mioc.atomicOperationLock.release()
+
+        self.ci = sfstorInstruction
+        # Need to return the current FLAGS as these would be overwritten upon return of this method.
+        return cmpFlags
+
+    def _safeStore(self, condition=0, destinationPointer=0, sourceValue=0):
+        """
+        This is the memory part of SFSTOR. It has to be called with the MIOC atomic operation lock held.
+        :param condition: int, the SFSTOR flags
+        :param destinationPointer: int, the address where the value is to be stored
+        :param sourceValue: int, the value to be compared and stored
+        :return: int, the flags resulting from the comparison
+        """
         # Now first step is to read the data
         widthAndDestination = 0b01000000  # width = 4, destination = reg A
         memrInstruction = Instruction(binaryInstruction=(0b00000001 << 8 * 5) |
@@ -996,8 +1323,6 @@ class LogicUnit:
                                           form=formDescription["InsWidthImmReg"])
             self.executeInstruction(memwInstruction)
 
-        self.ci = sfstorInstruction
-        # Need to return the current FLAGS as these would be overwritten upon return of this method.
         return cmpFlags
 
     def SHL(self, hardware=False):
@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+from CapuaEnvironment.Instruction.OperationDescription import operationExecutionTime
+
+import bisect
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2015, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+
+
+def loadSymbols(symbolsFile=None):
+    """
+    Read a symbols file as produced by the linker. Every line looks like "file.symbol:0xaddress".
+    :param symbolsFile: str, path to the symbols file
+    :return: dict, {"file.symbol": address as int}
+    """
+    symbols = {}
+    file = open(symbolsFile, "r")
+    for line in file:
+        line = line.strip()
+        if line != "":
+            name, address = line.split(":")
+            symbols[name] = int(address, 16)
+    file.close()
+    return symbols
+
+
+def buildLocator(symbols=None):
+    """
+    Build the function giving the location of an address as "symbol+offset". The closest symbol
+    at or before the address is used, the first one defined when many share an address. Addresses
+    before the first symbol are given as is.
+    :param symbols: dict, {"file.symbol": address}, None for no symbols
+    :return: callable, locate(address) -> str
+    """
+    names = {}
+    for name, address in (symbols or {}).items():
+        names.setdefault(address, name)
+    addresses = sorted(names)
+    table = [(address, names[address]) for address in addresses]
+
+    def locate(address):
+        index = bisect.bisect_right(addresses, address) - 1
+        if index < 0:
+            return hex(address)
+        symbolAddress, name = table[index]
+        if symbolAddress == address:
+            return name
+        return "{}+{}".format(name, hex(address - symbolAddress))
+
+    return locate
+
+
+class Profiler:
+    """
+    The Profiler gathers execution statistics for a core. Once a profiler is set on an ExecutionUnit
+    (see ExecutionUnit.setProfiler), the core runs every instruction through the interpreter, even
+    in block mode, and reports each of them here. Device accesses are reported by the MIOC.
+
+    The following is counted:
+        - Executed instructions and simulated cycles per address. Cycles are the "exec time"
+          documented for every operation in the LogicUnit (see operationExecutionTime).
+        - Executed instructions per mnemonic.
+        - Reads and writes per memory mapped device.
+        - Instructions and cycles per function. Functions are identified by their entry address,
+          that is, the destination of a CALL. Software and hardware interrupts are treated as calls
+          to their handler. RET and HIRET return to the calling function. The function that was
+          running when profiling started is identified by the first address that got profiled.
+        - Calls between functions (call graph), along with the instructions and cycles spent
+          in the callee (and everything it called) for these calls.
+
+    Everything is kept by address. Symbols are only used when building a report, the same profile
+    can therefore be reported with different symbols files.
+    """
+
+    instructionCount = 0
+    cycleCount = 0
+
+    def __init__(self):
+        """
+        Build an empty profile.
+        """
+        self.addressCounts = {}         # {address: executed instructions}
+        self.addressCycles = {}         # {address: cycles}
+        self.mnemonicCounts = {}        # {mnemonic: executed instructions}
+        self.functionCounts = {}        # {function entry: executed instructions, callees excluded}
+        self.functionCycles = {}        # {function entry: cycles, callees excluded}
+        self.functionInclusive = {}     # {function entry: [instructions, cycles]}, callees included
+        self.callEdges = {}             # {(caller entry, callee entry): [calls, instructions, cycles]}
+        self.deviceAccesses = {}        # {device name: [reads, writes]}
+        self._callStack = []            # [[function entry, caller entry, instructionCount, cycleCount], ...]
+
+    def recordInstruction(self, address: int=0, mnemonic: str="NOP", nextAddress: int=0, I: int=0):
+        """
+        Account for an instruction that was just executed.
+        :param address: int, address of the instruction
+        :param mnemonic: str, mnemonic of the instruction
+        :param nextAddress: int, address of the instruction following it in memory
+        :param I: int, the I pointer once the instruction is executed
+        :return: Nothing
+        """
+        callStack = self._callStack
+        if not callStack:
+            callStack.append([address, None, self.instructionCount, self.cycleCount])
+
+        cycles = operationExecutionTime[mnemonic]
+        self.instructionCount += 1
+        self.cycleCount += cycles
+        self.addressCounts[address] = self.addressCounts.get(address, 0) + 1
+        self.addressCycles[address] = self.addressCycles.get(address, 0) + cycles
+        self.mnemonicCounts[mnemonic] = self.mnemonicCounts.get(mnemonic, 0) + 1
+        function = callStack[-1][0]
+        self.functionCounts[function] = self.functionCounts.get(function, 0) + 1
+        self.functionCycles[function] = self.functionCycles.get(function, 0) + cycles
+
+        if mnemonic == "CALL" or (mnemonic == "INT" and I != nextAddress):
+            self.recordCall(I)
+        elif mnemonic == "RET" or mnemonic == "HIRET":
+            self.recordReturn()
+
+    def recordCall(self, function: int=0):
+        """
+        Account for a transfer of execution to a function. This is also used for hardware interrupts.
+        :param function: int, the entry address of the called function
+        :return: Nothing
+        """
+        caller = self._callStack[-1][0] if self._callStack else None
+        edge = self.callEdges.get((caller, function))
+        if edge is None:
+            edge = self.callEdges[(caller, function)] = [0, 0, 0]
+        edge[0] += 1
+        self._callStack.append([function, caller, self.instructionCount, self.cycleCount])
+
+    def recordReturn(self):
+        """
+        Account for the return from the function currently running. Returning from the function
+        that was running when profiling started simply empties the call stack.
+        :return: Nothing
+        """
+        if not self._callStack:
+            return
+        frame = self._callStack.pop()
+        self._accountForFrame(frame, self.functionInclusive, self.callEdges)
+
+    def recordDeviceAccess(self, device=None, isWrite: bool=False):
+        """
+        Account for an access to a memory mapped device.
+        :param device: the device that was accessed
+        :param isWrite: bool, True for a write, False for a read
+        :return: Nothing
+        """
+        name = type(device).__name__
+        accesses = self.deviceAccesses.get(name)
+        if accesses is None:
+            accesses = self.deviceAccesses[name] = [0, 0]
+        accesses[1 if isWrite else 0] += 1
+
+    def getReport(self, symbols=None):
+        """
+        Build the profile report. Functions still running are accounted for up to now.
+        :param symbols: dict, {"file.symbol": address}, as given by loadSymbols, None for no symbols
+        :return: dict, that can be directly serialised as JSON:
+                 {"instructions": int, "cycles": int,
+                  "mnemonics": [{"mnemonic", "count", "cycles"}, ...],
+                  "addresses": [{"address", "location", "count", "cycles"}, ...],
+                  "functions": [{"function", "address", "instructions", "cycles", "calls",
+                                 "inclusiveInstructions", "inclusiveCycles"}, ...],
+                  "callGraph": [{"caller", "callee", "calls", "inclusiveInstructions", "inclusiveCycles"}, ...],
+                  "devices": [{"device", "reads", "writes"}, ...]}
+                 Lists are sorted, most expensive first.
+        """
+        locate = buildLocator(symbols)
+
+        # Functions still on the call stack have not returned yet, account for them on copies
+        functionInclusive = {function: list(inclusive) for function, inclusive in self.functionInclusive.items()}
+        callEdges = {edge: list(counts) for edge, counts in self.callEdges.items()}
+        for depth in range(len(self._callStack)):
+            self._accountForFrame(self._callStack[depth], functionInclusive, callEdges, self._callStack[:depth])
+
+        calls = {}
+        for (caller, callee), counts in callEdges.items():
+            calls[callee] = calls.get(callee, 0) + counts[0]
+
+        mnemonics = [{"mnemonic": mnemonic,
+                      "count": count,
+                      "cycles": count * operationExecutionTime[mnemonic]}
+                     for mnemonic, count in self.mnemonicCounts.items()]
+        addresses = [{"address": address,
+                      "location": locate(address),
+                      "count": count,
+                      "cycles": self.addressCycles[address]}
+                     for address, count in self.addressCounts.items()]
+        functions = [{"function": locate(function),
+                      "address": function,
+                      "instructions": count,
+                      "cycles": self.functionCycles[function],
+                      "calls": calls.get(function, 0),
+                      "inclusiveInstructions": functionInclusive.get(function, [0, 0])[0],
+                      "inclusiveCycles": functionInclusive.get(function, [0, 0])[1]}
+                     for function, count in self.functionCounts.items()]
+        callGraph = [{"caller": locate(caller) if caller is not None else None,
+                      "callee": locate(callee),
+                      "calls": counts[0],
+                      "inclusiveInstructions": counts[1],
+                      "inclusiveCycles": counts[2]}
+                     for (caller, callee), counts in callEdges.items()]
+        devices = [{"device": name,
+                    "reads": accesses[0],
+                    "writes": accesses[1]}
+                   for name, accesses in self.deviceAccesses.items()]
+
+        mnemonics.sort(key=lambda entry: (-entry["cycles"], entry["mnemonic"]))
+        addresses.sort(key=lambda entry: (-entry["cycles"], entry["address"]))
+        functions.sort(key=lambda entry: (-entry["inclusiveCycles"], -entry["cycles"], entry["address"]))
+        callGraph.sort(key=lambda entry: (-entry["inclusiveCycles"], -entry["calls"], entry["callee"]))
+        devices.sort(key=lambda entry: (-(entry["reads"] + entry["writes"]), entry["device"]))
+
+        return {"instructions": self.instructionCount,
+                "cycles": self.cycleCount,
+                "mnemonics": mnemonics,
+                "addresses": addresses,
+                "functions": functions,
+                "callGraph": callGraph,
+                "devices": devices}
+
+    def formatReport(self, symbols=None, limit: int=20):
+        """
+        Build a human readable version of the report (see getReport).
+        :param symbols: dict, {"file.symbol": address}, None for no symbols
+        :param limit: int, maximum number of lines in the per address and per function tables
+        :return: str, the report
+        """
+        report = self.getReport(symbols)
+        totalCycles = max(report["cycles"], 1)
+        lines = ["Profile: {} instructions, {} cycles".format(report["instructions"], report["cycles"]),
+                 "",
+                 "Flat profile (self and inclusive cycles per function):",
+                 "{:>7} {:>12} {:>12} {:>12} {:>8}  {}".format("%", "self cycles", "self instr",
+                                                                "incl cycles", "calls", "function")]
+        for entry in report["functions"][:limit]:
+            lines.append("{:>7.2f} {:>12} {:>12} {:>12} {:>8}  {}".format(entry["cycles"] * 100 / totalCycles,
+                                                                          entry["cycles"],
+                                                                          entry["instructions"],
+                                                                          entry["inclusiveCycles"],
+                                                                          entry["calls"],
+                                                                          entry["function"]))
+
+        lines += ["", "Call graph:",
+                  "{:>8} {:>12} {:>12}  {}".format("calls", "incl cycles", "incl instr", "caller -> callee")]
+        for entry in report["callGraph"][:limit]:
+            lines.append("{:>8} {:>12} {:>12}  {} -> {}".format(entry["calls"],
+                                                                entry["inclusiveCycles"],
+                                                                entry["inclusiveInstructions"],
+                                                                entry["caller"] if entry["caller"] is not None
+                                                                else "<start>",
+                                                                entry["callee"]))
+
+        lines += ["", "Hot spots:",
+                  "{:>7} {:>12} {:>12}  {:<10}  {}".format("%", "cycles", "count", "address", "location")]
+        for entry in report["addresses"][:limit]:
+            lines.append("{:>7.2f} {:>12} {:>12}  {:<10}  {}".format(entry["cycles"] * 100 / totalCycles,
+                                                                     entry["cycles"],
+                                                                     entry["count"],
+                                                                     hex(entry["address"]),
+                                                                     entry["location"]))
+
+        lines += ["", "Mnemonics:",
+                  "{:>7} {:>12} {:>12}  {}".format("%", "cycles", "count", "mnemonic")]
+        for entry in report["mnemonics"]:
+            lines.append("{:>7.2f} {:>12} {:>12}  {}".format(entry["cycles"] * 100 / totalCycles,
+                                                             entry["cycles"],
+                                                             entry["count"],
+                                                             entry["mnemonic"]))
+
+        lines += ["", "Memory mapped devices:",
+                  "{:>12} {:>12}  {}".format("reads", "writes", "device")]
+        for entry in report["devices"]:
+            lines.append("{:>12} {:>12}  {}".format(entry["reads"], entry["writes"], entry["device"]))
+
+        return "\n".join(lines) + "\n"
+
+    def _accountForFrame(self, frame=None, functionInclusive=None, callEdges=None, callersStack=None):
+        """
+        Add the instructions and cycles spent in a call to the call graph and to the inclusive
+        counts of the function. For recursive functions, only the outermost call counts toward
+        the inclusive counts of the function, the same cycles would be counted many times otherwise.
+        :param frame: list, [function entry, caller entry, instructionCount, cycleCount] at the time of the call
+        :param functionInclusive: dict, the inclusive counts to be updated
+        :param callEdges: dict, the call graph to be updated
+        :param callersStack: list, frames under this one, None for the current call stack
+        :return: Nothing
+        """
+        function, caller, instructionCount, cycleCount = frame
+        instructions = self.instructionCount - instructionCount
+        cycles = self.cycleCount - cycleCount
+
+        if callersStack is None:
+            callersStack = self._callStack
+        if all(callerFrame[0] != function for callerFrame in callersStack):
+            inclusive = functionInclusive.get(function)
+            if inclusive is None:
+                inclusive = functionInclusive[function] = [0, 0]
+            inclusive[0] += instructions
+            inclusive[1] += cycles
+
+        edge = callEdges.get((caller, function))
+        if edge is not None:
+            edge[1] += instructions
+            edge[2] += cycles
@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+from Configuration.Configuration import TRACE_BUFFER_RECORD_COUNT
+
+import struct
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2015, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+
+# One record per executed instruction, big endian:
+#   address, instruction length, instruction bytes (padded to the longest instruction), FLAGS,
+#   register code, register value, memory write length (0 if none), memory write address,
+#   memory write value, S, hardware interrupt handled after the instruction
+TRACE_RECORD = struct.Struct(">IB10sBBIBIIIB")
+TRACE_FILE_HEADER = struct.Struct(">4sBHII")    # magic, version, record size, capacity, recorded instructions
+TRACE_FILE_MAGIC = b"CTRC"
+TRACE_FILE_VERSION = 1
+NO_REGISTER = 0xFF
+NO_INTERRUPT = 0xFF
+
+
+class TraceRecorder:
+    """
+    The TraceRecorder keeps the last instructions executed by a core so that what led to a crash
+    can be looked at after the fact (see TraceDecoder). Once a recorder is set on an ExecutionUnit
+    (see ExecutionUnit.setTraceRecorder), every instruction is recorded. In block mode, translated
+    blocks call the recorder themselves and the core keeps running whole blocks.
+
+    Records have a fixed size and are written in a buffer allocated once, when the recorder is
+    built. The buffer is used as a ring, the oldest records get overwritten. Nothing is kept per
+    instruction besides the bytes of the record, leaving the recorder on costs a fixed amount of
+    memory no matter how long the run is.
+
+    A record holds:
+        - The address and bytes of the instruction, as they were when it got decoded.
+        - The register the instruction works on (its destination register or, for single register
+          instructions, its only register) and the value of that register once the instruction
+          is executed.
+        - FLAGS and S once the instruction is executed.
+        - The last memory (or memory mapped device) write done by the instruction, as reported by
+          the MIOC.
+        - The number of the hardware interrupt handled right after the instruction, if any.
+    """
+
+    capacity = 0
+    recordCount = 0     # Number of instructions recorded since the recorder was built
+
+    _memoryWriteLength = 0
+    _memoryWriteAddress = 0
+    _memoryWriteValue = 0
+    _nextRecordOffset = 0   # Where, in the buffer, the next record goes
+
+    def __init__(self, capacity: int=TRACE_BUFFER_RECORD_COUNT):
+        """
+        Allocate the ring buffer.
+        :param capacity: int, number of records the buffer can hold
+        """
+        if type(capacity) is not int or capacity <= 0:
+            raise ValueError("TraceRecorder error, capacity has to be a positive integer")
+        self.capacity = capacity
+        self._buffer = bytearray(capacity * TRACE_RECORD.size)
+        self._bufferSize = len(self._buffer)
+        self._packRecord = TRACE_RECORD.pack_into
+
+    def recordInstruction(self, address: int=0, encoding: bytes=b"", FLAGS: int=0,
+                          registerCode: int=NO_REGISTER, registerValue: int=0, S: int=0):
+        """
+        Record an instruction that was just executed.
+        :param address: int, address of the instruction
+        :param encoding: bytes, the instruction itself
+        :param FLAGS: int, FLAGS once the instruction is executed
+        :param registerCode: int, the register worked on by the instruction, NO_REGISTER for none
+        :param registerValue: int, the value of that register once the instruction is executed
+        :param S: int, S once the instruction is executed
+        :return: Nothing
+        """
+        offset = self._nextRecordOffset
+        if self._memoryWriteLength == 0:
+            self._packRecord(self._buffer, offset, address, len(encoding), encoding, FLAGS, registerCode,
+                             registerValue, 0, 0, 0, S, NO_INTERRUPT)
+        else:
+            self._packRecord(self._buffer, offset, address, len(encoding), encoding, FLAGS, registerCode,
+                             registerValue, self._memoryWriteLength, self._memoryWriteAddress,
+                             self._memoryWriteValue, S, NO_INTERRUPT)
+            self._memoryWriteLength = self._memoryWriteAddress = self._memoryWriteValue = 0
+        offset += TRACE_RECORD.size
+        self._nextRecordOffset = offset if offset < self._bufferSize else 0
+        self.recordCount += 1
+
+    def recordMemoryWrite(self, address: int=0, length: int=4, value: int=0):
+        """
+        This is called by the MIOC for every write, the last one will be part of the next record.
+        :param address: int, address written
+        :param length: int, length of the write
+        :param value: int, value written
+        :return: Nothing
+        """
+        self._memoryWriteLength = length
+        self._memoryWriteAddress = address
+        self._memoryWriteValue = value & 0xFFFFFFFF
+
+    def recordInterrupt(self, interruptNumber: int=0):
+        """
+        Mark the last record, the hardware interrupt has been handled right after its instruction.
+        Memory writes done while handling the interrupt are not part of any record.
+        :param interruptNumber: int, the number of the interrupt
+        :return: Nothing
+        """
+        if self.recordCount > 0:
+            lastRecord = (self.recordCount - 1) % self.capacity
+            self._buffer[(lastRecord + 1) * TRACE_RECORD.size - 1] = interruptNumber & 0xFF
+        self._memoryWriteLength = self._memoryWriteAddress = self._memoryWriteValue = 0
+
+    def getRecords(self):
+        """
+        Give the records currently in the ring, oldest first.
+        :return: list, [(address, encoding, FLAGS, registerCode, registerValue, memoryWriteLength,
+                 memoryWriteAddress, memoryWriteValue, S, interruptNumber), ...]
+                 registerCode is NO_REGISTER and interruptNumber NO_INTERRUPT when not applicable
+        """
+        return [self._unpackRecord(self._buffer, recordNumber % self.capacity)
+                for recordNumber in range(max(0, self.recordCount - self.capacity), self.recordCount)]
+
+    def save(self, traceFile=None):
+        """
+        Write the records, oldest first, to a file that can be read back with load.
+        :param traceFile: str, path of the file
+        :return: Nothing
+        """
+        file = open(traceFile, "wb")
+        file.write(TRACE_FILE_HEADER.pack(TRACE_FILE_MAGIC, TRACE_FILE_VERSION, TRACE_RECORD.size,
+                                          self.capacity, self.recordCount))
+        if self.recordCount <= self.capacity:
+            file.write(self._buffer[:self.recordCount * TRACE_RECORD.size])
+        else:
+            # The ring wrapped, the oldest record is the one to be overwritten next
+            oldestRecordStart = (self.recordCount % self.capacity) * TRACE_RECORD.size
+            file.write(self._buffer[oldestRecordStart:])
+            file.write(self._buffer[:oldestRecordStart])
+        file.close()
+
+    @staticmethod
+    def load(traceFile=None):
+        """
+        Read a file written by save.
+        :param traceFile: str, path of the file
+        :return: tuple, (number of instructions recorded, records as given by getRecords)
+        """
+        file = open(traceFile, "rb")
+        content = file.read()
+        file.close()
+
+        if len(content) < TRACE_FILE_HEADER.size:
+            raise ValueError("TraceRecorder error, {} is not a trace file".format(traceFile))
+        magic, version, recordSize, capacity, recordCount = TRACE_FILE_HEADER.unpack_from(content)
+        if magic != TRACE_FILE_MAGIC or version != TRACE_FILE_VERSION or recordSize != TRACE_RECORD.size:
+            raise ValueError("TraceRecorder error, {} is not a supported trace file".format(traceFile))
+
+        records = memoryview(content)[TRACE_FILE_HEADER.size:]
+        return recordCount, [TraceRecorder._unpackRecord(records, recordNumber)
+                             for recordNumber in range(len(records) // TRACE_RECORD.size)]
+
+    @staticmethod
+    def _unpackRecord(buffer=None, recordNumber: int=0):
+        """
+        Read a record from a buffer of records.
+        :param buffer: bytes like, the records
+        :param recordNumber: int, index of the record in the buffer
+        :return: tuple, see getRecords
+        """
+        (address, length, encoding, FLAGS, registerCode, registerValue, memoryWriteLength,
+         memoryWriteAddress, memoryWriteValue, S, interruptNumber) = TRACE_RECORD.unpack_from(buffer, recordNumber *
+                                                                                              TRACE_RECORD.size)
+        return (address, encoding[:length], FLAGS, registerCode, registerValue, memoryWriteLength,
+                memoryWriteAddress, memoryWriteValue, S, interruptNumber)
@@ -28,7 +28,13 @@ from CapuaEnvironment.IOComponent.MemoryIOController import MemoryIOController
 from CapuaEnvironment.MemoryArray.MemoryArray import MemoryArray
 
 from Configuration.Configuration import MEMORY_START_AT, \
-                                        MEMORY_END_AT
+                                        MEMORY_END_AT, \
+                                        REGISTER_A, \
+                                        REGISTER_B, \
+                                        REGISTER_G2, \
+                                        REGISTER_S2, \
+                                        EXECUTION_MODE_BLOCK, \
+                                        EXECUTION_MODE_INTERPRETER
 
 __author__ = "CSE"
 __copyright__ = "Copyright 2015, CSE"
@@ -311,6 +317,145 @@ class TestExecutionUnit(unittest.TestCase):
         topStack = self.mioc.memoryReadAtAddressForLength(self.eu.S, 4)
         self.assertEqual(iMarker + 5, topStack, "INT when IS is 1 broken - Bad return address")
 
+    def test_executeMany(self):
+        """
+        Validates good working of the executeMany method for ExecutionUnit
+        def executeMany(self, count: int=1):
+        """
+        self.eu.setupCore(MEMORY_START_AT)
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT, 1, 0b01100000)          # MOV 0x00 $A
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 1, 4, 0x00)
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 5, 1, 0b00)
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 6, 1, 0b01100110)      # ADD 0x01 $A
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 7, 4, 0x01)
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 11, 1, 0b00)
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 12, 1, 0b00100000)     # MEMW [4] $A address
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 13, 1, 0b01000000)
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 14, 4, MEMORY_START_AT + 0x100)
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 18, 1, 0b01101000)     # CMP 0x0A $A
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 19, 4, 0x0A)
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 23, 1, 0b00)
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 24, 1, 0b01000001)     # JMP <H> ADD
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 25, 1, 0b001)
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 26, 4, MEMORY_START_AT + 6)
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 30, 1, 0b01000001)     # JMP <> itself
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 31, 1, 0b000)
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 32, 4, MEMORY_START_AT + 30)
+
+        # MOV + 10 loop iterations of 4 instructions
+        self.assertEqual(41, self.eu.executeMany(41))
+        self.assertEqual(10, self.eu.A)
+        self.assertEqual(10, self.mioc.memoryReadAtAddressForLength(MEMORY_START_AT + 0x100, 4))
+        self.assertEqual(MEMORY_START_AT + 30, self.eu.I)
+        self.assertEqual(0, self.eu.FLAGS)
+
+        # Count has to be honoured even in the middle of a block
+        self.eu.setupCore(MEMORY_START_AT)
+        self.assertEqual(3, self.eu.executeMany(3))
+        self.assertEqual(MEMORY_START_AT + 18, self.eu.I)
+        self.assertEqual(1, self.eu.A)
+        self.assertEqual(5, self.eu.executeMany(5))
+        self.assertEqual(MEMORY_START_AT + 24, self.eu.I)
+        self.assertEqual(2, self.eu.A)
+        self.assertEqual(0, self.eu.executeMany(0))
+
+        # Self modifying code, the MEMW rewrites the immediate of the following ADD
+        self.eu.setupCore(MEMORY_START_AT)
+        self.eu.B = 0x05
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT, 1, 0b00100000)          # MEMW [1] $B address
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 1, 1, 0b00010001)
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 2, 4, MEMORY_START_AT + 10)
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 6, 1, 0b01100110)      # ADD 0x01 $A
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 7, 4, 0x01)
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 11, 1, 0b00)
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 12, 1, 0b01000001)     # JMP <> itself
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 13, 1, 0b000)
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 14, 4, MEMORY_START_AT + 12)
+        self.assertEqual(3, self.eu.executeMany(3))
+        self.assertEqual(0x05, self.eu.A)
+        self.assertEqual(MEMORY_START_AT + 12, self.eu.I)
+        self.eu.setupCore(MEMORY_START_AT)
+        self.eu.B = 0x07
+        self.assertEqual(3, self.eu.executeMany(3))
+        self.assertEqual(0x07, self.eu.A)
+
+    def test_run(self):
+        """
+        Validates good working of the run method for ExecutionUnit
+        def run(self, count: int=None, until=None):
+        """
+        self.eu.setupCore(MEMORY_START_AT)
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT, 1, 0b01100000)          # MOV 0x00 $A
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 1, 4, 0x00)
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 5, 1, 0b00)
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 6, 1, 0b01100110)      # ADD 0x01 $A
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 7, 4, 0x01)
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 11, 1, 0b00)
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 12, 1, 0b01101000)     # CMP 0x0A $A
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 13, 4, 0x0A)
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 17, 1, 0b00)
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 18, 1, 0b01000001)     # JMP <H> ADD
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 19, 1, 0b001)
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 20, 4, MEMORY_START_AT + 6)
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 24, 1, 0b01000001)     # JMP <> itself
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 25, 1, 0b000)
+        self.mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 26, 4, MEMORY_START_AT + 24)
+
+        # MOV + 10 loop iterations of 3 instructions
+        self.assertEqual(31, self.eu.run(until={MEMORY_START_AT + 24}))
+        self.assertEqual(10, self.eu.A)
+        self.assertEqual(MEMORY_START_AT + 24, self.eu.I)
+
+        # The first instruction is always executed, even if I already is a stop address
+        self.eu.setupCore(MEMORY_START_AT)
+        self.assertEqual(2, self.eu.run(count=100, until={MEMORY_START_AT + 12}))
+        self.assertEqual(3, self.eu.run(count=100, until={MEMORY_START_AT + 12}))
+        self.assertRaises(ValueError, self.eu.run, -1)
+        self.assertEqual(2, self.eu.A)
+        self.assertEqual(1, self.eu.run(count=1, until={MEMORY_START_AT + 6}))
+        self.assertEqual(MEMORY_START_AT + 18, self.eu.I)
+        self.assertEqual(0, self.eu.run(count=0))
+
+    def test_setExecutionMode(self):
+        """
+        Validates good working of the setExecutionMode method for ExecutionUnit
+        def setExecutionMode(self, executionMode: int=EXECUTION_MODE_INTERPRETER):
+        """
+        eu = ExecutionUnit(self.mioc, self.ifu, "System")
+        self.assertRaises(ValueError, eu.setExecutionMode, 0x41414141)
+        eu.setExecutionMode(EXECUTION_MODE_BLOCK)
+        self.assertEqual(EXECUTION_MODE_BLOCK, eu.executionMode)
+        eu.setExecutionMode(EXECUTION_MODE_INTERPRETER)
+        self.assertEqual(EXECUTION_MODE_INTERPRETER, eu.executionMode)
+        self.assertRaises(ValueError, ExecutionUnit, self.mioc, self.ifu, "System", 0x41414141)
+
+    def test_registerValue(self):
+        """
+        Validates good working of the setRegisterValue and getRegisterValue methods for ExecutionUnit
+        def setRegisterValue(self, registerCode: int=None, value: int=None):
+        def getRegisterValue(self, registerCode=None):
+        """
+        self.eu.reset(MEMORY_START_AT)
+        self.eu.setRegisterValue(REGISTER_A, 0x41)
+        self.eu.setRegisterValue(REGISTER_S2, 0x1FFFFFFFF)
+        self.assertEqual(0x41, self.eu.A)
+        self.assertEqual(0xFFFFFFFF, self.eu.S2)  # Value is truncated to 32 bits
+        self.eu.G2 = 0x42
+        self.assertEqual(0x42, self.eu.getRegisterValue(REGISTER_G2))
+        self.assertEqual(0x41, self.eu.getRegisterValue(REGISTER_A))
+        self.assertEqual(0, self.eu.getRegisterValue(REGISTER_B))
+
+        self.assertRaises(ValueError, self.eu.setRegisterValue, 0x10, 0)
+        self.assertRaises(ValueError, self.eu.setRegisterValue, -1, 0)
+        self.assertRaises(ValueError, self.eu.setRegisterValue, None, 0)
+        self.assertRaises(ValueError, self.eu.getRegisterValue, 0x10)
+        self.assertRaises(ValueError, self.eu.getRegisterValue, None)
+
+        # Every core has its own register file
+        eu = ExecutionUnit(self.mioc, self.ifu, "System")
+        self.assertEqual(0, eu.A)
+        eu.mioc.eu = self.eu
+
     def test_reset(self):
         self.eu.setupCore(MEMORY_START_AT)
         self.eu.A = 1
@@ -363,3 +508,13 @@ class TestExecutionUnit(unittest.TestCase):
                 self.eu.S + self.eu.S2 + self.eu.IS + self.eu.IVR + self.eu.I + self.eu.FLAGS
         self.assertEqual(count, MEMORY_START_AT)
 
+
+class TestExecutionUnitBlockMode(TestExecutionUnit):
+    """
+    The very same tests are run with the ExecutionUnit using translated blocks
+    """
+
+    ma = MemoryArray()
+    mioc = MemoryIOController(ma)
+    ifu = InstructionFetchUnit(ma)
+    eu = ExecutionUnit(mioc, ifu, "System", EXECUTION_MODE_BLOCK)
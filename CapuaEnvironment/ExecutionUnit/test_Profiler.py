@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+import os
+import tempfile
+import unittest
+
+from CapuaEnvironment.ExecutionUnit.ExecutionUnit import ExecutionUnit
+from CapuaEnvironment.ExecutionUnit.Profiler import Profiler, loadSymbols
+from CapuaEnvironment.IntructionFetchUnit.InstructionFetchUnit import InstructionFetchUnit
+from CapuaEnvironment.IOComponent.MemoryIOController import MemoryIOController
+from CapuaEnvironment.MemoryArray.MemoryArray import MemoryArray
+
+from Configuration.Configuration import MEMORY_START_AT, \
+                                        EXECUTION_MODE_BLOCK
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2015, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+
+class TestProfiler(unittest.TestCase):
+
+    def test_profile(self):
+        """
+        Validates good working of the Profiler when set on an ExecutionUnit
+        """
+        ma = MemoryArray()
+        mioc = MemoryIOController(ma)
+        eu = ExecutionUnit(mioc, InstructionFetchUnit(ma), "System", executionMode=EXECUTION_MODE_BLOCK)
+        function = MEMORY_START_AT + 0x20
+        mioc.memoryWriteAtAddressForLength(MEMORY_START_AT, 1, 0b10000010)           # CALL function
+        mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 1, 4, function)
+        mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 5, 1, 0b01000001)       # JMP <> itself
+        mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 6, 1, 0b000)
+        mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 7, 4, MEMORY_START_AT + 5)
+        mioc.memoryWriteAtAddressForLength(function, 1, 0b01100110)                  # ADD 0x01 $A
+        mioc.memoryWriteAtAddressForLength(function + 1, 4, 0x01)
+        mioc.memoryWriteAtAddressForLength(function + 5, 1, 0b00)
+        mioc.memoryWriteAtAddressForLength(function + 6, 1, 0b11110000)              # RET
+
+        profiler = Profiler()
+        eu.setupCore(MEMORY_START_AT)
+        eu.S = MEMORY_START_AT + 0x100
+        eu.setProfiler(profiler)
+        self.assertEqual(3, eu.run(until={MEMORY_START_AT + 5}))
+        eu.execute()
+        self.assertEqual(2, eu.run(count=2))
+        mioc.memoryReadAtAddressForLength(0x20000100, 4)
+        self.assertRaises(MemoryError, mioc.memoryWriteAtAddressForLength, 0x20000100, 4, 0)
+
+        self.assertEqual(6, profiler.instructionCount)
+        self.assertEqual(2 + 1 + 1 + 3 * 2, profiler.cycleCount)
+        self.assertEqual({"CALL": 1, "ADD": 1, "RET": 1, "JMP": 3}, profiler.mnemonicCounts)
+        self.assertEqual({MEMORY_START_AT: 4, function: 2}, profiler.functionCounts)
+
+        symbols = {"test.start": MEMORY_START_AT, "test.function": function}
+        report = profiler.getReport(symbols)
+        self.assertEqual({"address": MEMORY_START_AT + 5, "location": "test.start+0x5", "count": 3, "cycles": 6},
+                         report["addresses"][0])
+        self.assertEqual([{"function": "test.start", "address": MEMORY_START_AT, "instructions": 4,
+                           "cycles": 8, "calls": 0, "inclusiveInstructions": 6, "inclusiveCycles": 10},
+                          {"function": "test.function", "address": function, "instructions": 2,
+                           "cycles": 2, "calls": 1, "inclusiveInstructions": 2, "inclusiveCycles": 2}],
+                         report["functions"])
+        self.assertEqual([{"caller": "test.start", "callee": "test.function", "calls": 1,
+                           "inclusiveInstructions": 2, "inclusiveCycles": 2}],
+                         report["callGraph"])
+        self.assertEqual([{"device": "Clock", "reads": 1, "writes": 1}], report["devices"])
+        self.assertIn("test.start -> test.function", profiler.formatReport(symbols))
+
+        # Without symbols, addresses are reported as is
+        self.assertEqual(hex(function), profiler.getReport()["callGraph"][0]["callee"])
+
+        eu.setProfiler(None)
+        self.assertEqual(1, eu.run(count=1))
+        self.assertEqual(6, profiler.instructionCount)
+        self.assertIsNone(mioc.profiler)
+
+    def test_loadSymbols(self):
+        """
+        Validates good working of the loadSymbols function
+        """
+        symbolsFile = tempfile.NamedTemporaryFile("w", suffix=".sym", delete=False)
+        symbolsFile.write("test.start:0x40000000\ntest.function:0x40000020\n")
+        symbolsFile.close()
+        try:
+            self.assertEqual({"test.start": 0x40000000, "test.function": 0x40000020}, loadSymbols(symbolsFile.name))
+        finally:
+            os.remove(symbolsFile.name)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+import os
+import tempfile
+import unittest
+
+from CapuaEnvironment.ExecutionUnit.ExecutionUnit import ExecutionUnit
+from CapuaEnvironment.ExecutionUnit.TraceRecorder import TraceRecorder, NO_INTERRUPT, NO_REGISTER
+from CapuaEnvironment.IntructionFetchUnit.InstructionFetchUnit import InstructionFetchUnit
+from CapuaEnvironment.IOComponent.MemoryIOController import MemoryIOController
+from CapuaEnvironment.MemoryArray.MemoryArray import MemoryArray
+
+from Configuration.Configuration import MEMORY_START_AT, \
+                                        REGISTER_A, \
+                                        EXECUTION_MODE_BLOCK, \
+                                        EXECUTION_MODE_INTERPRETER
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2015, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+
+class TestTraceRecorder(unittest.TestCase):
+
+    def test_init(self):
+        """
+        Validates good working of the __init__ method for TraceRecorder
+        """
+        self.assertRaises(ValueError, TraceRecorder, 0)
+        self.assertRaises(ValueError, TraceRecorder, None)
+        self.assertEqual([], TraceRecorder(4).getRecords())
+
+    def test_record(self):
+        """
+        Validates good working of the TraceRecorder when set on an ExecutionUnit
+        """
+        ma = MemoryArray()
+        mioc = MemoryIOController(ma)
+        eu = ExecutionUnit(mioc, InstructionFetchUnit(ma), "System", executionMode=EXECUTION_MODE_BLOCK)
+        function = MEMORY_START_AT + 0x20
+        stack = MEMORY_START_AT + 0x100
+        mioc.memoryWriteAtAddressForLength(MEMORY_START_AT, 1, 0b10000010)           # CALL function
+        mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 1, 4, function)
+        mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 5, 1, 0b01000001)       # JMP <> itself
+        mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 6, 1, 0b000)
+        mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 7, 4, MEMORY_START_AT + 5)
+        mioc.memoryWriteAtAddressForLength(function, 1, 0b01100110)                  # ADD 0x01 $A
+        mioc.memoryWriteAtAddressForLength(function + 1, 4, 0x01)
+        mioc.memoryWriteAtAddressForLength(function + 5, 1, REGISTER_A)
+        mioc.memoryWriteAtAddressForLength(function + 6, 1, 0b11110000)              # RET
+
+        traceRecorder = TraceRecorder(4)
+        eu.setupCore(MEMORY_START_AT)
+        eu.S = stack
+        eu.setTraceRecorder(traceRecorder)
+        self.assertEqual(3, eu.run(until={MEMORY_START_AT + 5}))
+
+        records = traceRecorder.getRecords()
+        self.assertEqual(3, len(records))
+        self.assertEqual((MEMORY_START_AT, b"\x82" + function.to_bytes(4, "big"), 0, NO_REGISTER, 0,
+                          4, stack + 4, MEMORY_START_AT + 5, stack + 4, NO_INTERRUPT), records[0])
+        self.assertEqual((function, b"\x66\x00\x00\x00\x01\x00", 0, REGISTER_A, 1,
+                          0, 0, 0, stack + 4, NO_INTERRUPT), records[1])
+        self.assertEqual(function + 6, records[2][0])
+        self.assertEqual(stack, records[2][8])
+
+        # Once the ring is full, the oldest records are overwritten
+        eu.execute()
+        self.assertEqual(2, eu.run(count=2))
+        traceRecorder.recordInterrupt(0x01)
+        self.assertEqual(6, traceRecorder.recordCount)
+        records = traceRecorder.getRecords()
+        self.assertEqual([function + 6] + [MEMORY_START_AT + 5] * 3, [record[0] for record in records])
+        self.assertEqual(0x01, records[-1][9])
+
+        traceFile = tempfile.NamedTemporaryFile(suffix=".trc", delete=False)
+        traceFile.close()
+        try:
+            traceRecorder.save(traceFile.name)
+            self.assertEqual((6, records), TraceRecorder.load(traceFile.name))
+        finally:
+            os.remove(traceFile.name)
+
+        eu.setTraceRecorder(None)
+        self.assertEqual(1, eu.run(count=1))
+        self.assertEqual(6, traceRecorder.recordCount)
+        self.assertIsNone(mioc.traceRecorder)
+
+    def test_recordExecutionModes(self):
+        """
+        Validates that translated blocks record the very same trace as the interpreter
+        """
+        traces = []
+        for executionMode in (EXECUTION_MODE_INTERPRETER, EXECUTION_MODE_BLOCK):
+            ma = MemoryArray()
+            mioc = MemoryIOController(ma)
+            eu = ExecutionUnit(mioc, InstructionFetchUnit(ma), "System", executionMode=executionMode)
+            ma.load(MEMORY_START_AT, bytes([0b01100110]) + (1).to_bytes(4, "big") + bytes([REGISTER_A]) +   # ADD 0x01 $A
+                    bytes([0b00100000, 0b01000000]) + (MEMORY_START_AT + 0x100).to_bytes(4, "big") +       # MEMW [4] $A
+                    bytes([0b01101000]) + (3).to_bytes(4, "big") + bytes([REGISTER_A]) +                   # CMP 0x03 $A
+                    bytes([0b01000001, 0b001]) + MEMORY_START_AT.to_bytes(4, "big"))                       # JMP <H>
+            eu.setupCore(MEMORY_START_AT)
+            traceRecorder = TraceRecorder(16)
+            eu.setTraceRecorder(traceRecorder)
+            self.assertEqual(12, eu.run(count=12))
+            traces.append(traceRecorder.getRecords())
+
+        self.assertEqual(12, len(traces[0]))
+        self.assertEqual(traces[0], traces[1])
+        self.assertEqual((MEMORY_START_AT + 6, b"\x20\x40" + (MEMORY_START_AT + 0x100).to_bytes(4, "big"), 0,
+                          REGISTER_A, 3, 4, MEMORY_START_AT + 0x100, 3, 0, NO_INTERRUPT), traces[1][-3])
@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+import heapq
+import selectors
+import socket
+import threading
+import time
+import traceback
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2015, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+
+class DeviceEventLoop:
+    """
+    This is the single place where memory mapped devices get their asynchronous work done, instead
+    of each device running its own threads. It is owned by the MemoryIOController. Devices register:
+        - Timed events (callLater, callSoon): a callback to be run once a delay has elapsed. Periodic
+          work (timer interrupts, display refresh) is done by a callback scheduling itself again.
+        - I/O events (addReader): a callback to be run every time a file descriptor is readable.
+
+    When threaded, a single thread runs the events. That thread is only started when the first event
+    is registered and it sleeps until the next timed event or I/O event, it does not poll. Callbacks
+    are run one at a time, in deadline order, and must never block. When not threaded, nothing runs
+    unless runPending is called (see MemoryIOController.pollDevices).
+
+    shutdown is immediate: the thread is woken up, runs the events that are already due (devices
+    use callSoon to clean up when asked to shutdown) and stops. Events scheduled for later are dropped.
+    """
+
+    threaded = True
+    _events = None      # Heap of (deadline, sequence, callback, args), deadlines are time.monotonic() values
+    _sequence = 0       # Keeps events having the same deadline in scheduling order
+    _readers = None     # {fileDescriptor: callback}
+    _selector = None
+    _thread = None
+    _closed = False
+
+    def __init__(self, threaded: bool=True):
+        """
+        :param threaded: bool, if False, events are only run when runPending is called
+        """
+        self.threaded = threaded
+        self._events = []
+        self._readers = {}
+        self._lock = threading.Lock()
+        self._wakeUpReader = None
+        self._wakeUpWriter = None
+
+    def callLater(self, delay: float=0.0, callback=None, *args):
+        """
+        Have a callback run, from the event loop, once delay seconds have elapsed.
+        :param delay: float, in seconds
+        :param callback: callable, called with args
+        :return: Nothing
+        """
+        deadline = time.monotonic() + delay
+        self._lock.acquire()
+        try:
+            if self._closed:
+                return
+            heapq.heappush(self._events, (deadline, self._sequence, callback, args))
+            self._sequence += 1
+            isEarliest = self._events[0][1] == self._sequence - 1
+            self._startIfRequired()
+        finally:
+            self._lock.release()
+
+        if isEarliest:
+            # The loop might be sleeping until a later deadline
+            self._wakeUp()
+
+    def callSoon(self, callback=None, *args):
+        """
+        Have a callback run, from the event loop, as soon as possible.
+        :param callback: callable, called with args
+        :return: Nothing
+        """
+        self.callLater(0.0, callback, *args)
+
+    def addReader(self, fileDescriptor: int=None, callback=None):
+        """
+        Have a callback run, from the event loop, every time a file descriptor is readable.
+        :param fileDescriptor: int, the file descriptor to watch
+        :param callback: callable, called without argument
+        :return: Nothing
+        """
+        self._lock.acquire()
+        try:
+            if self._closed:
+                return
+            self._startIfRequired()
+            self._readers[fileDescriptor] = callback
+            self._selector.register(fileDescriptor, selectors.EVENT_READ, callback)
+        finally:
+            self._lock.release()
+        self._wakeUp()
+
+    def removeReader(self, fileDescriptor: int=None):
+        """
+        Stop watching a file descriptor. Nothing is done if it was not watched.
+        :param fileDescriptor: int, the file descriptor
+        :return: Nothing
+        """
+        self._lock.acquire()
+        try:
+            if self._readers.pop(fileDescriptor, None) is not None:
+                self._selector.unregister(fileDescriptor)
+        finally:
+            self._lock.release()
+
+    def runPending(self):
+        """
+        Run the events that are due, this is how a loop that is not threaded does its work. It is
+        meant to be called regularly by whoever is running the machine.
+        :return: Nothing
+        """
+        self._runDueEvents()
+        if self._readers:
+            self._runReadyReaders(0)
+
+    def shutdown(self):
+        """
+        Stop the event loop. Events already due are run, later ones are dropped. This waits for the
+        loop thread to be done unless it is called from that very thread.
+        :return: Nothing
+        """
+        self._lock.acquire()
+        alreadyClosed = self._closed
+        self._closed = True
+        thread = self._thread
+        self._lock.release()
+        if alreadyClosed:
+            return
+
+        if thread is None:
+            # Not threaded, or never started
+            self._runDueEvents()
+            self._closeSelector()
+            return
+
+        self._wakeUp()
+        if thread is not threading.current_thread():
+            thread.join()
+
+    def isLoopThread(self):
+        """
+        :return: bool, True if called from the thread running the events
+        """
+        return self._thread is not None and self._thread is threading.current_thread()
+
+    def getThreadCount(self):
+        """
+        :return: int, the number of threads used by the loop, 0 until the first event is registered
+        """
+        return 1 if self._thread is not None and self._thread.is_alive() else 0
+
+    def _startIfRequired(self):
+        """
+        Create the selector and, if threaded, start the loop thread. Has to be called with the lock held.
+        :return: Nothing
+        """
+        if self._selector is None:
+            self._selector = selectors.DefaultSelector()
+        if self.threaded and self._thread is None:
+            # A socket pair rather than a pipe, the selector only accepts sockets on Windows
+            self._wakeUpReader, self._wakeUpWriter = socket.socketpair()
+            self._wakeUpReader.setblocking(False)
+            self._wakeUpWriter.setblocking(False)
+            self._selector.register(self._wakeUpReader, selectors.EVENT_READ, self._drainWakeUp)
+            # Daemon, a machine that was never shut down does not prevent the process from exiting
+            self._thread = threading.Thread(target=self._loop, name="DeviceEventLoop", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        """
+        This is the loop thread: run due events, then sleep until the next event or I/O.
+        :return: Nothing
+        """
+        while not self._closed:
+            timeout = self._runDueEvents()
+            if self._closed:
+                break
+            self._runReadyReaders(timeout)
+        # Devices cleaning up on shutdown did it using callSoon, these events are due now
+        self._runDueEvents()
+        self._closeSelector()
+
+    def _runDueEvents(self):
+        """
+        Run every timed event whose deadline has passed.
+        :return: float, seconds until the next timed event, None if there is none
+        """
+        now = time.monotonic()
+        while True:
+            self._lock.acquire()
+            if self._events and self._events[0][0] <= now:
+                deadline, sequence, callback, args = heapq.heappop(self._events)
+                self._lock.release()
+            else:
+                timeout = max(self._events[0][0] - now, 0) if self._events else None
+                self._lock.release()
+                return timeout
+            self._runCallback(callback, args)
+
+    def _runReadyReaders(self, timeout=None):
+        """
+        Wait, at most timeout seconds, for watched file descriptors to be readable and run their callback.
+        :param timeout: float, seconds, None to wait until something happens
+        :return: Nothing
+        """
+        for key, events in self._selector.select(timeout):
+            self._runCallback(key.data, ())
+
+    def _runCallback(self, callback=None, args=()):
+        """
+        A failing device must not stop the other devices, the error is reported and the loop goes on.
+        :param callback: callable
+        :param args: tuple, arguments for the callback
+        :return: Nothing
+        """
+        try:
+            callback(*args)
+        except Exception:
+            traceback.print_exc()
+
+    def _wakeUp(self):
+        """
+        Wake the loop thread up so that it takes newly registered events into account.
+        :return: Nothing
+        """
+        writer = self._wakeUpWriter
+        if writer is None or self.isLoopThread():
+            return
+        try:
+            writer.send(b"\x00")
+        except OSError:
+            pass    # The socket buffer is full, the loop will wake up anyway
+
+    def _drainWakeUp(self):
+        """
+        Called by the loop when it has been woken up.
+        :return: Nothing
+        """
+        try:
+            while self._wakeUpReader.recv(512):
+                pass
+        except OSError:
+            pass
+
+    def _closeSelector(self):
+        """
+        Release the selector and the wake up sockets.
+        :return: Nothing
+        """
+        self._lock.acquire()
+        if self._selector is not None:
+            self._selector.close()
+        if self._wakeUpReader is not None:
+            self._wakeUpReader.close()
+            self._wakeUpWriter.close()
+            self._wakeUpReader = None
+            self._wakeUpWriter = None
+        self._readers.clear()
+        self._lock.release()
@@ -20,13 +20,22 @@ with this program; if not, write to the Free Software Foundation, Inc.,
 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 """
 
+from CapuaEnvironment.IOComponent.DeviceEventLoop import DeviceEventLoop
 from CapuaEnvironment.MemoryArray.MemoryArray import MemoryArray
 from CapuaEnvironment.IOComponent.MemoryMappedDevices.Clock.Clock import Clock
 from CapuaEnvironment.IOComponent.MemoryMappedDevices.Terminal.Terminal import Terminal
 from CapuaEnvironment.IOComponent.MemoryMappedDevices.InterruptClock.InterruptClock import InterruptClock
 from CapuaEnvironment.IOComponent.MemoryMappedDevices.HardDrive.HardDrive import HardDrive
-from Configuration.Configuration import MEMORY_START_AT
-
+from Configuration.Configuration import MEMORY_START_AT, \
+                                        MEMORY_PAGE_SHIFT, \
+                                        MEMORY_BUS_LOCK_FREE_RAM, \
+                                        MEMORY_MAPPED_DEVICE_PAGE_SHIFT, \
+                                        MEMORY_MAPPED_DEVICE_MAXIMUM_PAGES, \
+                                        VIRTUAL_TIME_ENABLED, \
+                                        VIRTUAL_TIME_INSTRUCTIONS_PER_MILLISECOND
+
+import collections
+import heapq
 import struct
 import threading
 
@@ -46,8 +55,15 @@ class MemoryIOController:
 
 
     Note about memory mapped device:
-    Devices are mapped using their start address and mask. Overlaps between devices is NOT
-    validated. It is the programmer's job to make sure that he is not overlapping.
+    Devices are mapped using their start address and mask. Overlaps between devices are detected
+    when a device gets registered, a ValueError is raised if the new device would overlap an
+    existing one.
+
+    In order to avoid testing every device on every access, the memory mapped address space is
+    split into pages (see MEMORY_MAPPED_DEVICE_PAGE_SHIFT). At registration time, every page covered
+    by a device is added to a dict. Finding the device for an access is then a single dict lookup,
+    no matter how many devices are mapped. Devices mapped on less than a page (their mask covers
+    bits inside the page offset) are kept in a per page list and are tested using their mask.
 
     Determining if an address belongs to a memory mapped device:
     Lets say that the device is mapped at 0x10000000 with a 0xFFFF0000 mask
@@ -87,16 +103,71 @@ class MemoryIOController:
     If you need more information about this, simply do online searches about the
     IP protocol and how subnet mask works. You will find plenty of information.
 
+    Note about the memory bus:
+    Memory mapped devices hold state shared with the device event loop, accesses to them are always
+    serialized using the memory bus lock. When lockFreeRam is True (see MEMORY_BUS_LOCK_FREE_RAM),
+    plain RAM accesses skip that lock: a single 1 to 4 bytes access to the MemoryArray is atomic
+    by itself. What still needs protection are devices moving whole buffers in and out of memory
+    (Direct Memory Access, the HardDrive for example). Such transfers have to be bracketed by
+    beginDirectMemoryAccess and endDirectMemoryAccess. This works as a sequence lock:
+        - The sequence counter is odd while a transfer is in progress
+        - RAM accesses made by other threads during a transfer wait for it to be over
+        - A RAM read overlapped by the start of a transfer (sequence changed) is done again
+        - A RAM write overlapped by a transfer is done again once the transfer is over, the write
+          then always lands after the transfer. Writing the same value twice is harmless and this
+          keeps the bus lock out of the way
+    This way, the core never sees a half transferred buffer while only paying for two attribute
+    reads per access. Every time the core and a device actually collide (on the bus lock or on a
+    transfer), the contention counter is incremented. See getBusStatistics.
+
+    Note about virtual time:
+    Cores report every instruction they execute (see retireInstructions). The total number of
+    executed instructions is the virtual time of the machine. Devices can schedule work to be
+    done once a given number of instructions has been executed (see scheduleVirtualEvent). When
+    virtualTime is True, devices measure time with it instead of the wall clock (see
+    VIRTUAL_TIME_INSTRUCTIONS_PER_MILLISECOND) and cores stop exactly on every scheduled event.
+    A run then always gives the same result, no matter how fast the host is.
     """
 
     _memoryArray = None
     _memoryMappedDevice = None
-
-    def __init__(self, memoryArray: MemoryArray=None, testOnly: bool=True):
+    _memoryMappings = None          # [(startAddress, mask, device), ...]
+    _memoryMappedPages = None       # {page: device} for devices mapped on whole pages
+    _memoryMappedSubPages = None    # {page: [(startAddress, mask, device), ...]} for devices mapped on part of a page
+
+    lockFreeRam = MEMORY_BUS_LOCK_FREE_RAM
+    _dmaSequence = 0        # Odd while a direct memory access transfer is in progress
+    _dmaOwner = None        # Thread identifier of the thread doing the current transfer
+    _dmaTransfers = 0
+    _contentions = 0
+
+    virtualTime = VIRTUAL_TIME_ENABLED
+    retiredInstructions = 0
+    _virtualEvents = None       # Heap of (instruction count, sequence, callback)
+    _virtualEventSequence = 0   # Keeps events scheduled for the same instruction count in scheduling order
+    _nextVirtualEventAt = None  # Instruction count of the earliest scheduled event, None if there is none
+    _deferredVirtualEvents = None   # [(delay, callback)] scheduled by the running instruction, see scheduleVirtualEvent
+    virtualChunkCore = None     # Core running a virtual time chunk, set by ExecutionUnit.run
+
+    profiler = None     # Profiler counting device accesses, see ExecutionUnit.setProfiler
+    traceRecorder = None    # TraceRecorder recording memory writes, see ExecutionUnit.setTraceRecorder
+    executionHistory = None     # ExecutionHistory recording device accesses, see ExecutionUnit.setExecutionHistory
+    pendingDirectMemoryAccesses = None  # deque of (address, data) left to the core, see directMemoryAccessWrite
+    _watchpoints = None         # [(startAddress, endAddress, onRead, onWrite)], see setWatchpoints
+    _watchedPages = None        # Memory pages covered by watchpoints, None when there is no watchpoint
+    _watchpointObserver = None
+
+    def __init__(self, memoryArray: MemoryArray=None, testOnly: bool=True, displayBackend=None,
+                 deviceThreads: bool=True, virtualTime: bool=None):
         """
         Simple initialisation, this class is dependant on the presence of a memory array
         for it to work properly.
         :param memoryArray: A valid MemoryArray
+        :param testOnly: bool, if True, only the Clock device is added
+        :param displayBackend: DisplayBackend to be used by the Terminal, None for the configured one
+        :param deviceThreads: bool, if False, the device event loop does not run its thread (see pollDevices)
+                              and the HardDrive, which needs its file and the event loop thread, is not added
+        :param virtualTime: bool, should devices use virtual time, None for VIRTUAL_TIME_ENABLED
         :param eu: The execution unit owning this MIOC
         """
         if memoryArray is None or type(memoryArray) is not MemoryArray:
@@ -104,8 +175,27 @@ class MemoryIOController:
 
         self._memoryArray = memoryArray
         self._memoryMappedDevice = []
+        self._memoryMappings = []
+        self._memoryMappedPages = {}
+        self._memoryMappedSubPages = {}
+
+        self._memoryBusLock = threading.Lock()
+        self._dmaLock = threading.Lock()
+        self.pendingDirectMemoryAccesses = collections.deque()
+
+        self.eu = None                  # First core registered, kept for single core code
+        self._executionUnits = []
+        self._interruptRouting = {}     # {interruptNumber: core identifier}, core 0 when not routed
+        # Taken by instructions that need to read and write memory as a single operation (SFSTOR)
+        self.atomicOperationLock = threading.Lock()
+
+        if virtualTime is not None:
+            self.virtualTime = virtualTime
+        self._virtualEvents = []
+        self._deferredVirtualEvents = []
 
-        self.eu = None
+        # Devices do their asynchronous work (timers, display, disk transfers) on this loop
+        self.eventLoop = DeviceEventLoop(threaded=deviceThreads)
 
         clock = Clock(parentMIOC=self)
         self.registerMemoryMappedDevice(device=clock,
@@ -118,17 +208,16 @@ class MemoryIOController:
                                             startAddress=iClock.startAddress,
                                             mask=iClock.mask)
 
-            terminal = Terminal(parentMIOC=self)
+            terminal = Terminal(parentMIOC=self, displayBackend=displayBackend, threaded=deviceThreads)
             self.registerMemoryMappedDevice(device=terminal,
                                             startAddress=terminal.startAddress,
                                             mask=terminal.mask)
 
-            hardDrive = HardDrive(parentMIOC=self)
-            self.registerMemoryMappedDevice(device=hardDrive,
-                                            startAddress=hardDrive.startAddress,
-                                            mask=hardDrive.mask)
-
-        self._memoryBusLock = threading.Lock()
+            if deviceThreads:
+                hardDrive = HardDrive(parentMIOC=self)
+                self.registerMemoryMappedDevice(device=hardDrive,
+                                                startAddress=hardDrive.startAddress,
+                                                mask=hardDrive.mask)
 
     def memoryWriteAtAddressForLength(self, address=0x00, length=4, value=0x00, source="System"):
         """
@@ -140,23 +229,38 @@ class MemoryIOController:
         :param source: string, who is at the origin of this
         :return: None
         """
-
-        self._memoryBusLock.acquire()
-
-        # If action taken on memory mapped hardware we need to send it to the hardware!
-        if address < MEMORY_START_AT:
-            self._passMemoryReadWriteToMemoryMappedHardware(address=address,
-                                                            length=length,
-                                                            value=value,
-                                                            isWrite=True,
-                                                            source=source)
-        else:
-            # First, we prepare a list of values to be written
-            valueArray = self._prepareNumericValueToBeWrittenToMemory(length, value)
-            # Now we write to memory!
-            self._memoryArray.writeMemory(address=address, values=valueArray)
-
-        self._memoryBusLock.release()
+        if self.traceRecorder is not None:
+            self.traceRecorder.recordMemoryWrite(address, length, value)
+        if self._watchedPages is not None:
+            self._checkWatchpoints(address, length, True, value)
+
+        if address >= MEMORY_START_AT and self.lockFreeRam:
+            sequence = self._dmaSequence
+            self._memoryArray.writeValue(address, length, value)
+            while (sequence & 1 or sequence != self._dmaSequence) and self._dmaOwner != threading.get_ident():
+                # A transfer was in progress, or started, while we were writing. It may have overwritten
+                # the value, write it again once done so that the write lands after the transfer.
+                self._waitForDirectMemoryAccess()
+                sequence = self._dmaSequence
+                self._memoryArray.writeValue(address, length, value)
+            return
+
+        self._acquireMemoryBus()
+
+        # The bus has to be released even when the access is invalid (bad address or value)
+        try:
+            # If action taken on memory mapped hardware we need to send it to the hardware!
+            if address < MEMORY_START_AT:
+                self._passMemoryReadWriteToMemoryMappedHardware(address=address,
+                                                                length=length,
+                                                                value=value,
+                                                                isWrite=True,
+                                                                source=source)
+            else:
+                # Value is packed straight into memory
+                self._memoryArray.writeValue(address, length, value)
+        finally:
+            self._memoryBusLock.release()
         return
 
     def memoryReadAtAddressForLength(self, address=0x00, length=4):
@@ -167,39 +271,411 @@ class MemoryIOController:
         :param length: int, the length for the read (maximum is 4 bytes)
         :return: int value
         """
+        if self._watchedPages is not None:
+            self._checkWatchpoints(address, length, False, None)
+
+        if address >= MEMORY_START_AT and self.lockFreeRam:
+            sequence = self._dmaSequence
+            extractedValue = self._memoryArray.readValue(address, length)
+            while (sequence & 1 or sequence != self._dmaSequence) and self._dmaOwner != threading.get_ident():
+                # A transfer was in progress, or started, while we were reading. Read again once done.
+                self._waitForDirectMemoryAccess()
+                sequence = self._dmaSequence
+                extractedValue = self._memoryArray.readValue(address, length)
+            return extractedValue
+
+        self._acquireMemoryBus()
+
+        # The bus has to be released even when the access is invalid (bad address)
+        try:
+            # If action taken on memory mapped hardware we need to send it to the hardware!
+            if address < MEMORY_START_AT:
+                extractedValue = self._passMemoryReadWriteToMemoryMappedHardware(address=address,
+                                                                                 length=length,
+                                                                                 isWrite=False)
+            else:
+                extractedValue = self._memoryArray.readValue(address, length)
+        finally:
+            self._memoryBusLock.release()
+        return extractedValue
 
-        self._memoryBusLock.acquire()
+    def beginDirectMemoryAccess(self):
+        """
+        A device about to move a buffer in or out of memory has to call this first. Other threads
+        accessing RAM will wait until endDirectMemoryAccess is called. Transfers are serialized.
+        :return: Nothing
+        """
+        self._dmaLock.acquire()
+        self._dmaOwner = threading.get_ident()
+        self._dmaSequence += 1  # Now odd, transfer in progress
 
-        # If action taken on memory mapped hardware we need to send it to the hardware!
-        if address < MEMORY_START_AT:
-            extractedValue = self._passMemoryReadWriteToMemoryMappedHardware(address=address,
-                                                                             length=length,
-                                                                             isWrite=False)
-        else:
-            extractedMemoryCells = self._memoryArray.readMemory(address, length)
-            valueToBeUnpacked = b""
+    def endDirectMemoryAccess(self):
+        """
+        Marks the end of a transfer started using beginDirectMemoryAccess
+        :return: Nothing
+        """
+        self._dmaSequence += 1  # Back to even, transfer done
+        self._dmaOwner = None
+        self._dmaTransfers += 1
+        self._dmaLock.release()
 
-            # Build a value list to be unpacked
-            for i in range(0, length):
-                valueToBeUnpacked += bytes([extractedMemoryCells[i]])
+    def directMemoryAccessWrite(self, address=None, data=None):
+        """
+        Copies a whole buffer into RAM as a single transfer. This is meant for devices moving
+        blocks of data (hard drive sectors for example). No memory mapped device can be reached
+        using this. While an execution history is set, the transfer is left to the core which does
+        it in between two instructions (see runPendingDirectMemoryAccesses). This way, the transfer
+        is recorded at the exact position it became visible to the core.
+        :param address: int, the RAM address where the first byte is to be written
+        :param data: bytes like object, the data to be copied
+        :return: Nothing
+        """
+        if address is None or address < MEMORY_START_AT:
+            raise MemoryError("Direct memory access to invalid address: {}".format(address))
 
-            # For the unpack to work, we need a 4 bytes len bytes object
-            # This loop make sure that we have a usable bytes object
-            while len(valueToBeUnpacked) < 4:
-                valueToBeUnpacked = b'\x00' + valueToBeUnpacked
-            extractedValue = struct.unpack(">I", valueToBeUnpacked)[0]
+        if self.executionHistory is not None:
+            self.pendingDirectMemoryAccesses.append((address, bytes(data)))
+            return
+        self.transferToMemory(address, data)
 
-        self._memoryBusLock.release()
-        return extractedValue
+    def runPendingDirectMemoryAccesses(self):
+        """
+        Called by a core recording an execution history, in between two instructions, to do the
+        transfers devices left to it. Transfers are kept for later while the history is replaying.
+        :return: Nothing
+        """
+        pending = self.pendingDirectMemoryAccesses
+        while pending and (self.executionHistory is None or not self.executionHistory.replaying):
+            address, data = pending.popleft()
+            self.transferToMemory(address, data)
+            if self.executionHistory is not None:
+                self.executionHistory.recordDirectMemoryAccessWrite(address, data)
+
+    def transferToMemory(self, address=None, data=None):
+        """
+        This is the actual transfer done by directMemoryAccessWrite, right away. The execution history
+        uses it to replay recorded transfers.
+        :param address: int, the RAM address where the first byte is to be written
+        :param data: bytes like object, the data to be copied
+        :return: Nothing
+        """
+        if address is None or address < MEMORY_START_AT:
+            raise MemoryError("Direct memory access to invalid address: {}".format(address))
+
+        self.beginDirectMemoryAccess()
+        try:
+            self._memoryArray.writeMemory(address, data)
+        finally:
+            self.endDirectMemoryAccess()
+
+        if self._watchedPages is not None:
+            self._checkWatchpoints(address, len(data), True, None)
+
+    def directMemoryAccessRead(self, address=None, length=None):
+        """
+        Copies a whole buffer out of RAM as a single transfer.
+        :param address: int, the RAM address of the first byte to be read
+        :param length: int, number of bytes to be read
+        :return: bytes, a copy of the memory content
+        """
+        if address is None or address < MEMORY_START_AT:
+            raise MemoryError("Direct memory access to invalid address: {}".format(address))
+
+        self.beginDirectMemoryAccess()
+        try:
+            data = bytes(self._memoryArray.readMemory(address, length))
+        finally:
+            self.endDirectMemoryAccess()
+
+        return data
+
+    def setWatchpoints(self, watchpoints=None, observer=None):
+        """
+        Watch memory ranges. Every read or write, by a core or by a device transfer, touching a watched
+        range is reported to the observer. Memory accesses are only slowed down, by a page lookup, while
+        watchpoints are set. The observer is called before the access is done and from the thread doing
+        the access.
+        :param watchpoints: list, [(startAddress, length, onRead, onWrite)], None or empty to stop watching
+        :param observer: callable, called as observer(address, length, isWrite, value), value is None for reads
+        :return: Nothing
+        """
+        if not watchpoints:
+            self._watchedPages = None
+            self._watchpoints = None
+            self._watchpointObserver = None
+            return
+
+        if observer is None or not callable(observer):
+            raise ValueError("Invalid watchpoint observer")
+
+        ranges = []
+        pages = set()
+        for startAddress, length, onRead, onWrite in watchpoints:
+            if type(startAddress) is not int or type(length) is not int or length <= 0:
+                raise ValueError("Invalid watchpoint at {} for length {}".format(startAddress, length))
+            ranges.append((startAddress, startAddress + length, onRead, onWrite))
+            pages.update(range(startAddress >> MEMORY_PAGE_SHIFT,
+                               ((startAddress + length - 1) >> MEMORY_PAGE_SHIFT) + 1))
+
+        self._watchpointObserver = observer
+        self._watchpoints = ranges
+        self._watchedPages = pages
+
+    def getBusStatistics(self):
+        """
+        Gives information about the memory bus usage. Counters are updated without lock, under heavy
+        contention they are close approximations.
+        :return: dict, {"lockFreeRam": bool, "dmaTransfers": int, "contentions": int}
+        """
+        return {"lockFreeRam": self.lockFreeRam,
+                "dmaTransfers": self._dmaTransfers,
+                "contentions": self._contentions}
+
+    def _checkWatchpoints(self, address=0x00, length=4, isWrite=False, value=None):
+        """
+        Report the access to the watchpoint observer if it touches a watched range.
+        :param address: int, address of the access
+        :param length: int, length of the access
+        :param isWrite: bool, True for a write
+        :param value: int, the value written, None for reads and device transfers
+        :return: Nothing
+        """
+        endAddress = address + length
+        firstPage = address >> MEMORY_PAGE_SHIFT
+        lastPage = (endAddress - 1) >> MEMORY_PAGE_SHIFT
+        watchedPages = self._watchedPages
+        if lastPage - firstPage <= 1 and firstPage not in watchedPages and lastPage not in watchedPages:
+            # Accesses spanning more pages (device transfers) go straight to the range check
+            return
+
+        for startAddress, watchEndAddress, onRead, onWrite in self._watchpoints:
+            if startAddress < endAddress and address < watchEndAddress and (onWrite if isWrite else onRead):
+                self._watchpointObserver(address, length, isWrite, value)
+                return
+
+    def _acquireMemoryBus(self):
+        """
+        Takes the memory bus lock, counting the cases where another thread is already holding it
+        :return: Nothing
+        """
+        if not self._memoryBusLock.acquire(blocking=False):
+            self._contentions += 1
+            self._memoryBusLock.acquire()
+
+    def _waitForDirectMemoryAccess(self):
+        """
+        Called when a RAM access collides with a transfer done by another thread. Simply waits
+        for the transfer to be over.
+        :return: Nothing
+        """
+        self._contentions += 1
+        self._dmaLock.acquire()
+        self._dmaLock.release()
+
+    def registerExecutionUnit(self, executionUnit=None):
+        """
+        Every core using this MIOC has to be registered so that devices can interrupt it.
+        :param executionUnit: ExecutionUnit, the core
+        :return: int, the core identifier, cores are numbered in order of registration
+        """
+        if executionUnit is None:
+            raise ValueError("Invalid execution unit registered")
+        if self.eu is None:
+            self.eu = executionUnit
+        self._executionUnits.append(executionUnit)
+        return len(self._executionUnits) - 1
+
+    def getExecutionUnits(self):
+        """
+        :return: list, the registered cores, indexed by core identifier
+        """
+        return list(self._executionUnits)
+
+    def setInterruptRouting(self, interruptNumber=None, coreId: int=0):
+        """
+        Choose which core will receive a given hardware interrupt. Interrupts that are not routed
+        go to core 0.
+        :param interruptNumber: int, the hardware interrupt number
+        :param coreId: int, the identifier of the core that will handle the interrupt
+        :return: Nothing
+        """
+        if type(coreId) is not int or not 0 <= coreId < len(self._executionUnits):
+            raise ValueError("Invalid core {} for interrupt routing".format(coreId))
+        self._interruptRouting[interruptNumber] = coreId
+
+    def signalHardwareInterrupt(self, interruptNumber=None):
+        """
+        This is how devices signal interrupts. The interrupt is handed to the core it is routed to.
+        :param interruptNumber: int, the hardware interrupt number
+        :return: bool, True if interrupt was signaled, False otherwise (see ExecutionUnit.signalHardwareInterrupt)
+        """
+        if not self._executionUnits:
+            return False
+        if self.executionHistory is not None and self.executionHistory.replaying:
+            # Replayed execution only gets the recorded interrupts, devices will try again later
+            return False
+        core = self._executionUnits[self._interruptRouting.get(interruptNumber, 0)]
+        return core.signalHardwareInterrupt(interruptNumber)
+
+    def retireInstructions(self, count: int=1):
+        """
+        Cores call this with the number of instructions they executed. Scheduled events that are
+        due are run, in order.
+        :param count: int, the number of instructions executed since the last call
+        :return: Nothing
+        """
+        self.retiredInstructions += count
+        if self._deferredVirtualEvents:
+            deferredEvents = self._deferredVirtualEvents
+            self._deferredVirtualEvents = []
+            for delay, callback in deferredEvents:
+                self._pushVirtualEvent(self.retiredInstructions + delay, callback)
+        if self._nextVirtualEventAt is not None and self.retiredInstructions >= self._nextVirtualEventAt:
+            self._runVirtualEvents()
+
+    def getInstructionsToNextVirtualEvent(self):
+        """
+        This is used by cores running in virtual time so that they stop right on the next event.
+        :return: int, the number of instructions left before the next scheduled event, None if there is none
+        """
+        if self._nextVirtualEventAt is None:
+            return None
+        return max(self._nextVirtualEventAt - self.retiredInstructions, 1)
+
+    def scheduleVirtualEvent(self, delay: int=1, callback=None):
+        """
+        Have a callback called once the cores have executed delay more instructions. When an instruction
+        schedules the event (through a device access) while its core runs in virtual time, the core does
+        not know yet how far in its chunk it is. The core is then told to stop right after the instruction
+        and the event is dated when that instruction gets retired.
+        :param delay: int, number of instructions, at least 1
+        :param callback: callable, called without argument from the core that reached the event
+        :return: Nothing
+        """
+        if type(delay) is not int or delay < 1:
+            raise ValueError("Invalid virtual event delay {}".format(delay))
+        if self.virtualChunkCore is not None:
+            self._deferredVirtualEvents.append((delay, callback))
+            self.virtualChunkCore.endVirtualChunk()
+            return
+        self._pushVirtualEvent(self.retiredInstructions + delay, callback)
+
+    def _pushVirtualEvent(self, dueAt: int=0, callback=None):
+        """
+        Add an event to the scheduled events.
+        :param dueAt: int, the retired instruction count at which the event is due
+        :param callback: callable, see scheduleVirtualEvent
+        :return: Nothing
+        """
+        heapq.heappush(self._virtualEvents, (dueAt, self._virtualEventSequence, callback))
+        self._virtualEventSequence += 1
+        self._nextVirtualEventAt = self._virtualEvents[0][0]
+
+    def getVirtualEventDueAt(self, callback=None):
+        """
+        Find when a scheduled event is due, this is used by devices saving their state.
+        :param callback: callable, as given to scheduleVirtualEvent
+        :return: int, the retired instruction count at which the first event for callback is due, None if
+                 there is none
+        """
+        for delay, deferredCallback in self._deferredVirtualEvents:
+            if deferredCallback == callback:
+                return self.retiredInstructions + delay
+        dueAts = [dueAt for dueAt, sequence, eventCallback in self._virtualEvents if eventCallback == callback]
+        return min(dueAts) if dueAts else None
+
+    def cancelVirtualEvents(self, callback=None):
+        """
+        Remove every scheduled event for a callback, this is used by devices having their state put back.
+        :param callback: callable, as given to scheduleVirtualEvent
+        :return: Nothing
+        """
+        self._deferredVirtualEvents = [event for event in self._deferredVirtualEvents if event[1] != callback]
+        self._virtualEvents[:] = [event for event in self._virtualEvents if event[2] != callback]
+        heapq.heapify(self._virtualEvents)
+        self._nextVirtualEventAt = self._virtualEvents[0][0] if self._virtualEvents else None
+
+    def getVirtualTime(self):
+        """
+        Gives the virtual time, this is what devices use instead of the wall clock when virtualTime is True.
+        Instructions are only retired once a core is done with its chunk, the instructions the running
+        core already executed in its chunk are counted as well. This way, the time an instruction reads
+        does not depend on how execution is split in chunks.
+        :return: float, the number of virtual seconds elapsed since the machine was built
+        """
+        executed = self.retiredInstructions
+        if self.virtualChunkCore is not None:
+            executed += self.virtualChunkCore.getChunkProgress()
+        return executed / (VIRTUAL_TIME_INSTRUCTIONS_PER_MILLISECOND * 1000)
+
+    def _runVirtualEvents(self):
+        """
+        Run every scheduled event that is due. Events scheduled by a callback are run in the same
+        pass if they are due as well.
+        :return: Nothing
+        """
+        events = self._virtualEvents
+        while events and events[0][0] <= self.retiredInstructions:
+            callback = heapq.heappop(events)[2]
+            callback()
+        self._nextVirtualEventAt = events[0][0] if events else None
+
+    def getDevice(self, startAddress=None):
+        """
+        Find a memory mapped device using the address it is mapped at.
+        :param startAddress: int, the start address of the device
+        :return: The device, None if no device is mapped at that address
+        """
+        for device in self._memoryMappedDevice:
+            if device.startAddress == startAddress:
+                return device
+        return None
+
+    def getDeviceStates(self):
+        """
+        Gives the state of every memory mapped device, this is used to snapshot a machine.
+        :return: list, [(startAddress, state)] as given by device.getState
+        """
+        return [(device.startAddress, device.getState()) for device in self._memoryMappedDevice]
+
+    def setDeviceStates(self, states=None):
+        """
+        Put back the state of memory mapped devices. Devices are identified by their start address
+        and every device present in states needs to be present in this MIOC. Devices are then resumed,
+        the InterruptClock restarts its timer for example.
+        :param states: list, as given by getDeviceStates
+        :return: Nothing
+        """
+        devices = {device.startAddress: device for device in self._memoryMappedDevice}
+        for startAddress, state in states:
+            if startAddress not in devices:
+                raise ValueError("No device mapped at {} to restore state into".format(hex(startAddress)))
+            devices[startAddress].setState(state)
+        # Only once every buffer is back can devices start working on it again
+        for startAddress, state in states:
+            devices[startAddress].resume()
+
+    def pollDevices(self):
+        """
+        Give every device a chance to do the work the device event loop thread would otherwise be
+        doing. This is only needed when the MIOC was built with deviceThreads=False and has to be
+        called regularly by whoever runs the machine, between two batches of instructions for example.
+        :return: Nothing
+        """
+        self.eventLoop.runPending()
+        for device in self._memoryMappedDevice:
+            device.poll()
 
     def prepareForShutdown(self):
         """
         This method is called when the MIOC needs to get ready to be shutdown. This translate in the MIOC letting
-        all devices be aware that they should arrange for any running thread to stop.
+        all devices be aware that they should stop their work. The device event loop is then stopped, this
+        does not wait for anything but the clean up work devices scheduled.
         :return:
         """
         for device in self._memoryMappedDevice:
             device.prepareForShutdown()
+        self.eventLoop.shutdown()
 
     def _passMemoryReadWriteToMemoryMappedHardware(self,
                                                    address=0x00,
@@ -217,20 +693,29 @@ class MemoryIOController:
         :return: int value if read, None otherwise
         """
         # We need to find a device that accept response for this memory access
-        selectedDevice = None
-        for device in self._memoryMappedDevice:
-            if device.mask & address == device.startAddress:
-                # We found a device mapped at the right place!
-                # for more info about how the selection works, please see note at beginning of the class
-                selectedDevice = device
-                break
+        # for more info about how the selection works, please see note at beginning of the class
+        page = address >> MEMORY_MAPPED_DEVICE_PAGE_SHIFT
+        selectedDevice = self._memoryMappedPages.get(page)
+        if selectedDevice is None and page in self._memoryMappedSubPages:
+            for startAddress, mask, device in self._memoryMappedSubPages[page]:
+                if mask & address == startAddress:
+                    # We found a device mapped at the right place!
+                    selectedDevice = device
+                    break
 
         if selectedDevice is not None:
+            if self.profiler is not None:
+                self.profiler.recordDeviceAccess(selectedDevice, isWrite)
+            if self.executionHistory is not None and self.executionHistory.replaying:
+                # Devices are not driven by replayed execution, what they did is in the history
+                return self.executionHistory.replayDeviceAccess(selectedDevice, isWrite)
             returnValue = selectedDevice.takeAction(address=address,
                                                     length=length,
                                                     value=value,
                                                     isWrite=isWrite,
                                                     source=source)
+            if self.executionHistory is not None:
+                self.executionHistory.recordDeviceAccess(selectedDevice, isWrite, returnValue)
         else:
             # If we are here, no device responded to this device "call"
             raise MemoryError("Access to Memory Mapped Hardware with invalid address: {}".format(address))
@@ -274,7 +759,52 @@ class MemoryIOController:
         if type(startAddress) is not int or startAddress >= MEMORY_START_AT:
             raise ValueError("Invalid start address for memory mapped device")
 
-        if startAddress & mask != startAddress:
+        if type(mask) is not int or startAddress & mask != startAddress:
             raise ValueError("Invalid mask for memory mapped device")
 
+        # Two mappings overlap if there is an address matching both, meaning that both start
+        # addresses are equal on every bit that is covered by both masks.
+        for mappedStartAddress, mappedMask, mappedDevice in self._memoryMappings:
+            if (startAddress ^ mappedStartAddress) & mask & mappedMask == 0:
+                raise ValueError("Memory mapped device at {} overlaps a device mapped at {}".format(
+                    hex(startAddress), hex(mappedStartAddress)))
+
+        isSubPageMapping = (mask & ((1 << MEMORY_MAPPED_DEVICE_PAGE_SHIFT) - 1)) != 0
+        for page in self._computeMappedPages(startAddress, mask):
+            if isSubPageMapping:
+                if page not in self._memoryMappedSubPages:
+                    self._memoryMappedSubPages[page] = []
+                self._memoryMappedSubPages[page].append((startAddress, mask, device))
+            else:
+                self._memoryMappedPages[page] = device
+
+        self._memoryMappings.append((startAddress, mask, device))
         self._memoryMappedDevice.append(device)
+
+    def _computeMappedPages(self, startAddress=None, mask=None):
+        """
+        Computes the list of pages on which a mapping lays. Address bits above the page offset that
+        are not covered by the mask can take any value, every combination of these gives a page.
+        Pages beyond MEMORY_START_AT are ignored since accesses there always go to the memory array.
+        :param startAddress: int, the start address of the mapping
+        :param mask: int, the mask of the mapping
+        :return: list of pages
+        """
+        pageOffsetMask = (1 << MEMORY_MAPPED_DEVICE_PAGE_SHIFT) - 1
+        freeBits = ~mask & 0xFFFFFFFF & ~pageOffsetMask
+        if (1 << bin(freeBits).count("1")) > MEMORY_MAPPED_DEVICE_MAXIMUM_PAGES:
+            raise ValueError("Memory mapped device range is too large")
+
+        pages = []
+        baseAddress = startAddress & ~pageOffsetMask
+        combination = freeBits
+        while True:
+            # Going through every subset of freeBits
+            address = baseAddress | combination
+            if address < MEMORY_START_AT:
+                pages.append(address >> MEMORY_MAPPED_DEVICE_PAGE_SHIFT)
+            if combination == 0:
+                break
+            combination = (combination - 1) & freeBits
+
+        return pages
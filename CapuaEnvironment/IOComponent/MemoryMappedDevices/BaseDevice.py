@@ -20,7 +20,7 @@ with this program; if not, write to the Free Software Foundation, Inc.,
 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 """
 
-import struct
+from CapuaEnvironment.MemoryArray.MemoryValue import packValue, unpackValue
 
 __author__ = "CSE"
 __copyright__ = "Copyright 2015, CSE"
@@ -31,6 +31,10 @@ __maintainer__ = "CSE"
 __status__ = "Dev"
 
 
+# Mask keeping the bytes of a value that fit in a given width (index is the width in bytes)
+VALUE_MASKS = (0x00, 0xFF, 0xFFFF, 0xFFFFFF, 0xFFFFFFFF)
+
+
 class BaseDevice:
     """
     This is a base device allowing other devices to be created from it. This device is not to be
@@ -43,7 +47,7 @@ class BaseDevice:
     startAddress = 0x00000000  # This is the address where the device will be mapped in memory
                                # obviously, this is different for every devices.
     mask = 0x00  # This indicate the memory range for this device. Think of this as a subnet mask in IPv4.
-    _data = None  # To be initialised by a device doing b"\x00" * maskValue
+    _data = None  # To be initialised by a device doing bytearray(maskValue), it is updated in place
 
     _interruptGenerator = False  # This is used to indicate that this device will be a source of interruption
     _interruptNumber = None      # This will be used to hold the interrupt mapping for a device
@@ -60,6 +64,40 @@ class BaseDevice:
         """
         self._shutdownProcedureInAction = True
 
+    def poll(self):
+        """
+        Called by the MemoryIOController (see pollDevices) so that devices not running their own
+        thread get a chance to do their work. Most devices have nothing to do here.
+        :return: Nothing
+        """
+        pass
+
+    def getState(self):
+        """
+        Gives a copy of the device memory buffer, this is used to snapshot a machine.
+        :return: bytes
+        """
+        return bytes(self._data)
+
+    def setState(self, state=None):
+        """
+        Put back the device memory buffer as given by getState. The buffer is updated in place.
+        :param state: bytes like object, as returned by getState
+        :return: Nothing
+        """
+        if len(state) != len(self._data):
+            raise ValueError("Device - invalid state length")
+        self._data[:] = state
+
+    def resume(self):
+        """
+        Called by the MemoryIOController once the state of every device has been put back (see
+        setDeviceStates) so that a device can restart the work its state describes. Most devices have
+        nothing to do here.
+        :return: Nothing
+        """
+        pass
+
     def takeAction(self, address=None, length=None, value=None, isWrite=False, source="System"):
         """
         This is the public facing interface for the device. Both read and write happens from
@@ -87,19 +125,13 @@ class BaseDevice:
         """
         This will read length number of bytes from the buffer, The max read is 4 bytes
         :param offset: int, Where are we reading
-        :param length: int, For how long
+        :param length: int, For how long, 1 to 4 bytes
         :return: int representing the value read from the buffer
         """
-
-        intData = None
-        # Get the data
-        rData = self._data[offset:offset + length]
-        if length == 4:
-            intData = struct.unpack(">I", rData)[0]
-        elif length == 1:
-            intData = struct.unpack(">B", rData)[0]
-        else:
-            raise RuntimeError("Device memory read with invalid length - Should be 1 or 4")
+        try:
+            intData = unpackValue(self._data, offset, length)
+        except ValueError:
+            raise RuntimeError("Device memory read with invalid length - Should be 1 to 4")
 
         return intData
 
@@ -114,15 +146,8 @@ class BaseDevice:
         :return:
         """
 
-        # Let's prepare the data for the write
-        readyData = struct.pack(">I", value)
-
-        # Now write the data
-        dataFirstPart = self._data[0:offset]
-        dataMiddlePart = readyData[-length:]
-        dataLastPart = self._data[offset + length:]
-
-        self._data = dataFirstPart + dataMiddlePart + dataLastPart
+        # Only the lowest length bytes of the value are kept, the buffer is modified in place
+        packValue(self._data, offset, length, value & VALUE_MASKS[length])
 
         self._memoryAction(source=source)
 
@@ -158,6 +183,6 @@ class BaseDevice:
         if (offset + length) > len(self._data):
             raise MemoryError("Device - out of bound memory access detected!")
 
-        if 0 >= length > 4:
+        if not 0 < length <= 4:
             raise ValueError("Device - invalid length detected in read instruction")
 
@@ -21,8 +21,8 @@ with this program; if not, write to the Free Software Foundation, Inc.,
 """
 
 from CapuaEnvironment.IOComponent.MemoryMappedDevices.BaseDevice import BaseDevice
+from CapuaEnvironment.MemoryArray.MemoryValue import packValue
 
-import struct
 import time
 
 __author__ = "CSE"
@@ -38,12 +38,14 @@ class Clock(BaseDevice):
     """
     This device is a Clock providing the user with a source of entropy. It can only be read
     from. A write to this device will result in a system error/exception effectively crashing
-    the context that was using the Clock device.
+    the context that was using the Clock device. The time is given in 100 nanoseconds units,
+    truncated to 32 bits. When the MIOC is in virtual time, the virtual time is given instead
+    of the host time.
     """
 
     def __init__(self, parentMIOC=None):
         super(Clock, self).__init__(parentMIOC=parentMIOC)
-        self._data = b"\x00" * 0xFF
+        self._data = bytearray(0xFF)
         self.startAddress = 0x20000100
         self.mask = 0xFFFFFF00
 
@@ -77,15 +79,15 @@ class Clock(BaseDevice):
         :param length: int, For how long
         :return: int representing the value read from the buffer
         """
-        timeData = struct.pack(">I", int((time.time() * 10000000)) & 0xFFFFFFFF)
-        # Get the time in place
-        self._data = timeData + self._data[4:]
+        if self._parentMIOC.virtualTime:
+            currentTime = self._parentMIOC.getVirtualTime()
+        else:
+            currentTime = time.time()
 
-        # Now get the data
-        rData = self._data[offset:offset + length]
-        intData = struct.unpack(">I", rData)[0]
+        # Get the time in place
+        packValue(self._data, 0, 4, int((currentTime * 10000000)) & 0xFFFFFFFF)
 
-        return intData
+        return super(Clock, self)._readFromDataBuffer(offset=offset, length=length)
 
 
 
@@ -24,14 +24,13 @@ from CapuaEnvironment.IOComponent.MemoryMappedDevices.BaseDevice import BaseDevi
 from Configuration.Configuration import HARD_DRIVE_FILE_PATH, \
                                         HARD_DRIVE_MAX_SIZE, \
                                         HARD_DRIVE_SECTOR_SIZE, \
+                                        HARD_DRIVE_INTERRUPT_RETRY_DELAY, \
                                         INTERRUPT_HARD_DRIVE_DONE_READ,\
                                         INTERRUPT_HARD_DRIVE_DONE_WRITE
 
 
 import mmap
-import struct
 import threading
-import time
 
 __author__ = "CSE"
 __copyright__ = "Copyright 2017, CSE"
@@ -44,12 +43,13 @@ __status__ = "Dev"
 
 class HardDrive(BaseDevice):
     """
-    This device is a virtual hard drive
+    This device is a virtual hard drive. Transfers are done on the device event loop of the MIOC,
+    one at a time, in the order they were requested.
     """
 
     def __init__(self, parentMIOC=None):
         super(HardDrive, self).__init__(parentMIOC=parentMIOC)
-        self._data = b"\x00" * 0xFF
+        self._data = bytearray(0xFF)
         self.startAddress = 0x20000400
         self.mask = 0xFFFFFF00
 
@@ -58,17 +58,20 @@ class HardDrive(BaseDevice):
         self._hdFile = open(HARD_DRIVE_FILE_PATH, "r+b")
         self._hdMmap = mmap.mmap(fileno=self._hdFile.fileno(), length=0)     # Map the whole file
 
-        self._watchDogThread = threading.Thread(target=self._hdWatchDog)
-        self._watchDogThread.start()
+    def prepareForShutdown(self):
+        """
+        The file handle and memory map are closed on the event loop, once transfers already
+        requested are done.
+        :return: Nothing
+        """
+        super(HardDrive, self).prepareForShutdown()
+        self._parentMIOC.eventLoop.callSoon(self._closeDisk)
 
-    def _hdWatchDog(self):
+    def _closeDisk(self):
         """
-        This method is running within a thread. This will watch for the shutdown notice and
-        close file handle and memory map if required.
+        Close file handle and memory map.
         :return: Nothing
         """
-        while not self._shutdownProcedureInAction:
-            time.sleep(2)
         self._hdMmap.close()
         self._hdFile.close()
 
@@ -81,6 +84,7 @@ class HardDrive(BaseDevice):
         0x20000404 = LBA to be written or read
         0x20000408 = Memory Address to write TO or to read FROM
         0x2000040C = Trigger memory action = When this is set to 1, the action is triggered
+        0x20000410 = Number of consecutive sectors to be transferred, 0 is the same as 1
 
         :param source: String, who is at the origin of this action
         :return:
@@ -92,72 +96,81 @@ class HardDrive(BaseDevice):
         operation = self._readFromDataBuffer(offset=0, length=4)
         lba = self._readFromDataBuffer(offset=4, length=4)
         bufferAddress = self._readFromDataBuffer(offset=8, length=4)
+        sectorCount = max(self._readFromDataBuffer(offset=0x10, length=4), 1)
+
+        if (lba + sectorCount) * HARD_DRIVE_SECTOR_SIZE > len(self._hdMmap):
+            raise RuntimeError("Invalid hard drive access, sectors {} to {} are out of the drive".format(
+                lba, lba + sectorCount - 1))
 
         if operation == 0:
             # This is a read operation
-            readThread = threading.Thread(target=self._readDisk, args=(lba, bufferAddress,))
-            readThread.start()
+            self._parentMIOC.eventLoop.callSoon(self._readDisk, lba, bufferAddress, sectorCount)
         elif operation == 1:
             # This is a write operation
-            writeThread = threading.Thread(target=self._writeDisk, args=(lba, bufferAddress,))
-            writeThread.start()
+            self._parentMIOC.eventLoop.callSoon(self._writeDisk, lba, bufferAddress, sectorCount)
         else:
             # This is invalid.
             raise RuntimeError("Invalid hard drive operation code. 1=write, 0=read, else is error")
 
-    def _readDisk(self, lba=None, destBuffer=None):
+    def _readDisk(self, lba=None, destBuffer=None, sectorCount=1):
         """
-        This method will read a specified LBA from the disk and copy it at the specified address.
-        When done, it will generate the appropriate interrupt on the core.
-        :param lba: int, a number indicating the number of the block to be read
-        :param destBuffer: the address of the buffer where the LBA needs to be written in memory
+        This method will read the specified LBAs from the disk and copy them at the specified address.
+        All sectors are copied at once. When done, it will generate the appropriate interrupt on the core.
+        :param lba: int, a number indicating the number of the first block to be read
+        :param destBuffer: the address of the buffer where the LBAs needs to be written in memory
+        :param sectorCount: int, the number of consecutive blocks to be read
         :return: Nothing
         """
 
-        startLocation = lba*HARD_DRIVE_SECTOR_SIZE
+        startLocation = lba * HARD_DRIVE_SECTOR_SIZE
+        endLocation = startLocation + sectorCount * HARD_DRIVE_SECTOR_SIZE
 
         self._hdLock.acquire()
-        lbaData = self._hdMmap[startLocation:startLocation+HARD_DRIVE_SECTOR_SIZE]
-
-        # Read from the data present in the LBA and copy to memory
-        for i in range(0, HARD_DRIVE_SECTOR_SIZE, 4):
-            toBeWrittenInMemory = struct.unpack(">I", lbaData[startLocation:startLocation + 4])[0]
-            self._parentMIOC.memoryWriteAtAddressForLength(address=destBuffer, length=4, value=toBeWrittenInMemory)
-            startLocation += 4  # Reaching next block of memory
-            destBuffer += 4     # Reaching next block of memory
-        # Only thing left is signaling the interrupt. No need to hug the lock from here
-        self._hdLock.release()
-
-        signaled = False
-        while not signaled:
-            signaled = self._parentMIOC.eu.signalHardwareInterrupt(INTERRUPT_HARD_DRIVE_DONE_READ)
+        try:
+            # A single copy from the disk to memory, the core will never see a partial transfer
+            self._parentMIOC.directMemoryAccessWrite(destBuffer, self._hdMmap[startLocation:endLocation])
+        finally:
+            # Only thing left is signaling the interrupt. No need to hug the lock from here
+            self._hdLock.release()
+
+        self._signalTransferDone(INTERRUPT_HARD_DRIVE_DONE_READ)
         return
 
-    def _writeDisk(self, lba=None, srcBuffer=None):
+    def _writeDisk(self, lba=None, srcBuffer=None, sectorCount=1):
         """
-        This method will write data from a specified address (sourceBuffer) to a given LBA on the disk
-        :param lba: int, a number indicating the number of the block to be written
+        This method will write data from a specified address (sourceBuffer) to the given LBAs on the disk
+        :param lba: int, a number indicating the number of the first block to be written
         :param srcBuffer: the address of the buffer where the information is to be read
+        :param sectorCount: int, the number of consecutive blocks to be written
         :return: Nothing
         """
-        startLocation = lba*HARD_DRIVE_SECTOR_SIZE
+        startLocation = lba * HARD_DRIVE_SECTOR_SIZE
+        endLocation = startLocation + sectorCount * HARD_DRIVE_SECTOR_SIZE
 
         self._hdLock.acquire()
+        try:
+            # A single copy from memory to the disk
+            self._hdMmap[startLocation:endLocation] = self._parentMIOC.directMemoryAccessRead(srcBuffer,
+                                                                                              endLocation -
+                                                                                              startLocation)
+        finally:
+            # Only thing left is signaling the interrupt. No need to hug the lock from here
+            self._hdLock.release()
 
-        for i in range(startLocation, startLocation + HARD_DRIVE_SECTOR_SIZE, 4):
-            toBeWrittenOnDisk = self._parentMIOC.memoryReadAtAddressForLength(address=srcBuffer, length=4)
-            readyBytes = struct.pack(">I", toBeWrittenOnDisk)
-            self._hdMmap[startLocation] = readyBytes[0]
-            self._hdMmap[startLocation + 1] = readyBytes[1]
-            self._hdMmap[startLocation + 2] = readyBytes[2]
-            self._hdMmap[startLocation + 3] = readyBytes[3]
-            startLocation += 4
-            srcBuffer += 4
-        # Only thing left is signaling the interrupt. No need to hug the lock from here
-        self._hdLock.release()
-
-        signaled = False
-        while not signaled:
-            signaled = self._parentMIOC.eu.signalHardwareInterrupt(INTERRUPT_HARD_DRIVE_DONE_WRITE)
+        self._signalTransferDone(INTERRUPT_HARD_DRIVE_DONE_WRITE)
 
         return
+
+    def _signalTransferDone(self, interruptNumber=None):
+        """
+        Signal the end of a transfer. The core might not accept the interrupt right away, in that case
+        this is tried again a bit later. The event loop is never blocked waiting for the core.
+        :param interruptNumber: int, INTERRUPT_HARD_DRIVE_DONE_READ or INTERRUPT_HARD_DRIVE_DONE_WRITE
+        :return: Nothing
+        """
+        if self._shutdownProcedureInAction:
+            return
+        if not self._parentMIOC.signalHardwareInterrupt(interruptNumber):
+            self._parentMIOC.eventLoop.callLater(float(HARD_DRIVE_INTERRUPT_RETRY_DELAY) / 1000,
+                                                 self._signalTransferDone,
+                                                 interruptNumber)
@@ -20,11 +20,11 @@ with this program; if not, write to the Free Software Foundation, Inc.,
 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 """
 
-from CapuaEnvironment.IOComponent.MemoryMappedDevices.BaseDevice import BaseDevice
-from Configuration.Configuration import INTERRUPT_CLOCK
+import struct
 
-import threading
-import time
+from CapuaEnvironment.IOComponent.MemoryMappedDevices.BaseDevice import BaseDevice
+from Configuration.Configuration import INTERRUPT_CLOCK, \
+                                        VIRTUAL_TIME_INSTRUCTIONS_PER_MILLISECOND
 
 __author__ = "CSE"
 __copyright__ = "Copyright 2017, CSE"
@@ -35,23 +35,33 @@ __maintainer__ = "CSE"
 __status__ = "Dev"
 
 
+# Saved after the device buffer: is the timer running, retired instruction count of the next virtual tick (-1 if none)
+_TIMER_STATE = struct.Struct(">?q")
+
+
 class InterruptClock(BaseDevice):
     """
     This device is a Clock that will generate interrupts on a given time interval.
     This type of device is required in order to allow for multiprogramming.
     The first 4 bytes of the memory reserved for this device holds the timer value in milliseconds.
+    Ticks are scheduled on the device event loop of the MIOC. When the MIOC is in virtual time, the
+    interrupt is scheduled as a virtual event every timer value * VIRTUAL_TIME_INSTRUCTIONS_PER_MILLISECOND
+    executed instructions instead.
+    The device state also holds the running timer so that a restored machine keeps getting its interrupts.
     """
 
     def __init__(self, parentMIOC=None):
         super(InterruptClock, self).__init__(parentMIOC=parentMIOC)
-        self._data = b"\x00" * 0xFF
+        self._data = bytearray(0xFF)
         self.startAddress = 0x20000300
         self.mask = 0xFFFFFF00
         self._interruptGenerator = True
         self._interruptNumber = INTERRUPT_CLOCK
         self._timerLength = 0.0
+        self._timerMilliseconds = 0
         self._timerRunning = False
-        self._clockThread = threading.Thread(target=self._runClock)
+        self._timerGeneration = 0   # Ticks from an older generation have been cancelled, see _stopTimer
+        self._resumeTickAt = None   # Retired instruction count of the first virtual tick after a resume
 
     def _memoryAction(self, source=None):
         """
@@ -66,32 +76,105 @@ class InterruptClock(BaseDevice):
         if not self._timerRunning:
             self._startTimer()
 
+    def getState(self):
+        """
+        Gives a copy of the device memory buffer followed by the timer state.
+        :return: bytes
+        """
+        nextTickAt = None
+        if self._timerRunning and self._parentMIOC.virtualTime:
+            nextTickAt = self._parentMIOC.getVirtualEventDueAt(self._virtualTick)
+        return bytes(self._data) + _TIMER_STATE.pack(self._timerRunning, -1 if nextTickAt is None else nextTickAt)
+
+    def setState(self, state=None):
+        """
+        Put back the device memory buffer and the timer state as given by getState. The running timer
+        is stopped, the timer from the state is only started by resume.
+        :param state: bytes like object, as returned by getState
+        :return: Nothing
+        """
+        if len(state) != len(self._data) + _TIMER_STATE.size:
+            raise ValueError("InterruptClock - invalid state length")
+        self._stopTimer()
+        self._data[:] = state[:len(self._data)]
+        self._setTimer(self._readFromDataBuffer(offset=0, length=4))
+        timerRunning, nextTickAt = _TIMER_STATE.unpack_from(state, len(self._data))
+        self._timerRunning = timerRunning
+        self._resumeTickAt = None if nextTickAt == -1 else nextTickAt
+
+    def resume(self):
+        """
+        Start the timer again if it was running when the state was saved. In virtual time, the first
+        tick happens when it was due. Otherwise, a full timer interval is waited.
+        :return: Nothing
+        """
+        if not self._timerRunning:
+            return
+        if self._parentMIOC.virtualTime and self._resumeTickAt is not None:
+            delay = max(self._resumeTickAt - self._parentMIOC.retiredInstructions, 1)
+            self._parentMIOC.scheduleVirtualEvent(delay, self._virtualTick)
+        else:
+            self._startTimer()
+        self._resumeTickAt = None
+
     def _setTimer(self, timerLength=0):
         """
         This method is meant to be used for direct manipulation of the timer value.
         :param timerLength: int, this is a value representing the number of milliseconds the timer will wait
         :return: Nothing is returned
         """
+        self._timerMilliseconds = timerLength
         self._timerLength = float(timerLength) / 1000
 
     def _startTimer(self):
         """
-        This will launch the thread that allows the timer to work in a separated thread
+        This will schedule the first tick of the timer.
         :return:
         """
-        self._clockThread.start()
+        self._timerRunning = True
+        if self._parentMIOC.virtualTime:
+            self._scheduleVirtualTick()
+        else:
+            self._parentMIOC.eventLoop.callLater(self._timerLength, self._tick, self._timerGeneration)
 
-    def _runClock(self):
+    def _stopTimer(self):
         """
-        This is an endless loop that will sleep for a certain time and then generate
-        an interrupt to be handled by the execution unit.
-        :return:
+        Cancel the ticks already scheduled. Ticks on the device event loop can not be removed, they are
+        ignored once the generation they were scheduled with is over.
+        :return: Nothing
         """
-        self._timerRunning = True
+        self._timerRunning = False
+        self._timerGeneration += 1
+        if self._parentMIOC.virtualTime:
+            self._parentMIOC.cancelVirtualEvents(self._virtualTick)
+
+    def _scheduleVirtualTick(self):
+        """
+        Schedule the next interrupt, in virtual time, using the current timer value.
+        :return: Nothing
+        """
+        delay = max(self._timerMilliseconds * VIRTUAL_TIME_INSTRUCTIONS_PER_MILLISECOND, 1)
+        self._parentMIOC.scheduleVirtualEvent(delay, self._virtualTick)
 
-        while True:
-            if self._shutdownProcedureInAction:
-                # This allows the method to return if we need to shutdown the system
-                break
-            time.sleep(self._timerLength)
-            self._parentMIOC.eu.signalHardwareInterrupt(self._interruptNumber)
+    def _virtualTick(self):
+        """
+        This is the virtual time equivalent of _tick.
+        :return: Nothing
+        """
+        if self._shutdownProcedureInAction:
+            return
+        self._parentMIOC.signalHardwareInterrupt(self._interruptNumber)
+        self._scheduleVirtualTick()
+
+    def _tick(self, generation=0):
+        """
+        This runs on the device event loop every time the timer expires. It generates an interrupt to
+        be handled by the execution unit and schedules the next tick.
+        :param generation: int, the timer generation the tick was scheduled with
+        :return:
+        """
+        if self._shutdownProcedureInAction or generation != self._timerGeneration:
+            # This allows the timer to stop if we need to shutdown the system or if it got stopped
+            return
+        self._parentMIOC.signalHardwareInterrupt(self._interruptNumber)
+        self._parentMIOC.eventLoop.callLater(self._timerLength, self._tick, generation)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2017, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+
+class DisplayBackend:
+    """
+    This is the base for the objects the Terminal uses to actually show its screen. The Terminal
+    owns the text buffer and knows which lines have been modified, a backend is only told about
+    lines that changed since the previous frame. All the methods are called from the device event
+    loop (see DeviceEventLoop). This is a frame only, it is not to be used directly.
+    """
+
+    _terminal = None        # The Terminal this backend is displaying
+    needsRefresh = False    # When True, refresh is called at every display tick, even if nothing changed
+
+    def open(self, terminal=None):
+        """
+        Called once, from the device event loop, before any frame is rendered.
+        :param terminal: Terminal, the device being displayed. Used to forward key presses.
+        :return: Nothing
+        """
+        self._terminal = terminal
+
+    def render(self, lines=None):
+        """
+        Display a new frame. Only the lines that changed since the previous frame are given.
+        :param lines: dict, {lineNumber: bytes} for every modified line
+        :return: Nothing
+        """
+        raise ValueError("DisplayBackend render needs to be implemented before it is used.")
+
+    def refresh(self):
+        """
+        Called at every display tick when needsRefresh is True, backends that need to pump events
+        (windowing toolkits) do it here. Also called every time the input descriptor is readable.
+        :return: Nothing
+        """
+        pass
+
+    def getInputDescriptor(self):
+        """
+        Backends reading key presses from a file descriptor give it here, once opened. The Terminal
+        has refresh called whenever that file descriptor is readable.
+        :return: int, the file descriptor, None if there is none
+        """
+        return None
+
+    def close(self):
+        """
+        Called once, from the device event loop, when the Terminal is shutting down.
+        :return: Nothing
+        """
+        pass
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+from CapuaEnvironment.IOComponent.MemoryMappedDevices.Terminal.DisplayBackend import DisplayBackend
+
+import os
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2017, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+
+# Control characters would move the cursor around on a real terminal, they are shown as spaces
+_PRINTABLE_TRANSLATION = bytes(0x20 if c < 0x20 or c == 0x7F else c for c in range(256))
+
+
+class HeadlessDisplayBackend(DisplayBackend):
+    """
+    This display does not need any windowing system. The screen is kept in memory so that it can
+    be inspected (tests, batch runs). Optionally, every frame is also written as ANSI escape
+    sequences into a binary stream or into a pseudo terminal. When a pseudo terminal is used, a
+    user can attach to it (ptyName) with any terminal program and bytes typed there are forwarded
+    to the Terminal keyboard buffer. Pseudo terminals only exist on POSIX systems, elsewhere the
+    frames only go to the stream.
+
+    Nobody might be reading the pseudo terminal, writing to it never blocks. What could not be
+    written is kept and sent first by the next render or refresh, a frame is never cut in the middle
+    of an escape sequence. Once the pending output gets larger than the whole screen, the frames
+    that were not started yet are replaced by a redraw of the whole screen.
+    """
+
+    def __init__(self, stream=None, usePty=False, lineCount=25, lineLength=80):
+        """
+        :param stream: binary file like object, frames are written to it if provided
+        :param usePty: bool, frames are written to a newly created pseudo terminal if True
+        :param lineCount: int, number of lines of the screen
+        :param lineLength: int, number of characters per line
+        """
+        self.lines = [b"\x20" * lineLength] * lineCount
+        self.frameCount = 0
+        self._stream = stream
+        self._usePty = usePty
+        self._ptyMaster = None
+        self._ptySlave = None
+        self._ptyPending = []       # Frames not written to the pseudo terminal yet, the first one may be partly written
+        self.ptyName = None
+        # Pending frames are flushed at every display tick, not only when the screen changes
+        self.needsRefresh = usePty
+
+    def open(self, terminal=None):
+        """
+        Create the pseudo terminal if one was requested and the system supports it.
+        :param terminal: Terminal, the device being displayed
+        :return: Nothing
+        """
+        super(HeadlessDisplayBackend, self).open(terminal=terminal)
+        if self._usePty and self._ptyMaster is None and hasattr(os, "openpty"):
+            self._ptyMaster, self._ptySlave = os.openpty()
+            try:
+                # Not imported with the module, tty is POSIX only
+                import tty
+            except ImportError:
+                tty = None
+            if tty is not None:
+                # Raw mode, frames must not be echoed back as key presses nor held until a new line
+                tty.setraw(self._ptySlave)
+            # Nobody might be reading the other side, the event loop must never block on it
+            os.set_blocking(self._ptyMaster, False)
+            self.ptyName = os.ttyname(self._ptySlave)
+
+    def render(self, lines=None):
+        """
+        Update the in memory screen and output the modified lines.
+        :param lines: dict, {lineNumber: bytes} for every modified line
+        :return: Nothing
+        """
+        for lineNumber in lines:
+            self.lines[lineNumber] = lines[lineNumber]
+        output = self._buildFrame(lines)
+        self.frameCount += 1
+
+        if self._stream is not None:
+            self._stream.write(output)
+            self._stream.flush()
+        if self._ptyMaster is not None:
+            self._ptyPending.append(output)
+            if sum(len(frame) for frame in self._ptyPending[1:]) > len(self._buildFrame()):
+                # Too far behind, a redraw of the whole screen supersedes the frames not started yet
+                self._ptyPending[1:] = [self._buildFrame()]
+            self._flushPty()
+
+    def refresh(self):
+        """
+        Forward whatever has been typed in the pseudo terminal to the Terminal keyboard.
+        :return: Nothing
+        """
+        if self._ptyMaster is None:
+            return
+        self._flushPty()
+        try:
+            typed = os.read(self._ptyMaster, 64)
+        except (BlockingIOError, OSError):
+            return
+        for keyCode in typed:
+            self._terminal.pushKeyCode(keyCode)
+
+    def _buildFrame(self, lines=None):
+        """
+        Build the ANSI escape sequences displaying the given lines.
+        :param lines: dict, {lineNumber: bytes}, the whole screen if None
+        :return: bytes, the frame
+        """
+        if lines is None:
+            lines = dict(enumerate(self.lines))
+        output = b""
+        for lineNumber in sorted(lines):
+            output += b"\x1b[%d;1H" % (lineNumber + 1) + lines[lineNumber].translate(_PRINTABLE_TRANSLATION)
+        return output
+
+    def _flushPty(self):
+        """
+        Write as much of the pending frames as the pseudo terminal accepts, the rest is kept for later.
+        :return: Nothing
+        """
+        while self._ptyPending:
+            try:
+                written = os.write(self._ptyMaster, self._ptyPending[0])
+            except BlockingIOError:
+                written = 0
+            if written < len(self._ptyPending[0]):
+                self._ptyPending[0] = self._ptyPending[0][written:]
+                return
+            self._ptyPending.pop(0)
+
+    def getInputDescriptor(self):
+        """
+        :return: int, the pseudo terminal file descriptor, None if no pseudo terminal is used
+        """
+        return self._ptyMaster
+
+    def close(self):
+        """
+        Release the pseudo terminal if one was created.
+        :return: Nothing
+        """
+        if self._ptyMaster is not None:
+            os.close(self._ptyMaster)
+            os.close(self._ptySlave)
+            self._ptyMaster = None
+            self._ptySlave = None
+        self._ptyPending = []
+
+    def getScreenText(self):
+        """
+        This is meant for tests and batch runs.
+        :return: bytes, the current screen, lines separated by new lines
+        """
+        return b"\n".join(self.lines)
@@ -20,151 +20,285 @@ with this program; if not, write to the Free Software Foundation, Inc.,
 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 """
 
-from CapuaEnvironment.IOComponent.MemoryMappedDevices.BaseDevice import BaseDevice
+from CapuaEnvironment.IOComponent.MemoryMappedDevices.BaseDevice import BaseDevice, VALUE_MASKS
+from CapuaEnvironment.MemoryArray.MemoryValue import packValue, unpackValue
 from Configuration.Configuration import DISPLAY_REFRESH_RATE, \
-                                        DISPLAY_FONT_SIZE, \
+                                        DISPLAY_BACKEND, \
+                                        DISPLAY_BACKEND_TK, \
+                                        DISPLAY_BACKEND_HEADLESS, \
                                         INTERRUPT_KEYBOARD, \
                                         KEYBOARD_BUFFER_SIZE, \
                                         KEYBOARD_REFRESH_RATE
 
 
-import struct
 import threading
-import time
-import tkinter
-import tkinter.font
 
 __author__ = "CSE"
 __copyright__ = "Copyright 2017, CSE"
 __credits__ = ["CSE"]
 __license__ = "GPL"
-__version__ = "2.0"
+__version__ = "2.1"
 __maintainer__ = "CSE"
 __status__ = "Dev"
 
 
+DISPLAY_LINE_LENGTH = 80
+DISPLAY_LINE_COUNT = 25
+
+
 class Terminal(BaseDevice):
     """
     This device is a virtual display unit. It allows for a text mode display on an 80x25 char basis
     Char 0 line 0 char is mapped at 0x20001000, char 1 line 0 is mapped at 0x20001001. In order to
     write text to the display, one simply need to write at the appropriate memory address. Following
     a write to the display memory space, the display will then be updated.
+
+    Actually showing the screen is delegated to a display backend (see DisplayBackend). Writes
+    to the display memory remember which lines they modified and schedule a frame on the device
+    event loop of the MIOC. A frame only hands the modified lines to the backend. Nothing runs on
+    the event loop while the screen is not modified and no key is waiting to be signaled, unless
+    the backend needs to be refreshed regularly (needsRefresh).
+
+    When built with threaded=False, the Terminal does not use the event loop at all and the display
+    backend is never opened. Buffered key codes are then delivered by poll(), which the owner of
+    the machine has to call every now and then (see MemoryIOController.pollDevices).
     """
 
-    def __init__(self, parentMIOC=None):
+    def __init__(self, parentMIOC=None, displayBackend=None, threaded: bool=True):
+        """
+        :param parentMIOC: MemoryIOController, the controller this device is attached to
+        :param displayBackend: DisplayBackend, if None, the backend selected by DISPLAY_BACKEND is used
+        :param threaded: bool, if False, the display is not used and the keyboard has to be polled
+        """
         super(Terminal, self).__init__(parentMIOC=parentMIOC)
-        self._data = b"\x20" * 0xFFF
+        self._data = bytearray(b"\x20" * 0xFFF)
         self.startAddress = 0x20001000      # Display is mapped from 0x20001000 to 0x200017ff
                                             # Keyboard is mapped from 0x20001800 all the way to end of range
                                             # but only the first byte is used
         self.mask = 0xFFFFF000
         self._displayRefreshRate = float(DISPLAY_REFRESH_RATE) / 1000
         self._terminalBufferLock = threading.Lock()
+        # Every line starts dirty so that the first frame shows the whole screen
+        self._dirtyLines = set(range(DISPLAY_LINE_COUNT))
 
         self._keyboardCodeListLock = threading.Lock()
         self._keyboardCodeList = []
         self._keyboardRefreshRate = float(KEYBOARD_REFRESH_RATE) / 1000
+        self._keyboardTickScheduled = False
+        self._frameScheduled = False
+        self._displayOpened = False
 
-        self._displayThread = threading.Thread(target=self._displayLoop)
-        self._displayThread.start()
+        self.interruptNumber = INTERRUPT_KEYBOARD
+        self.threaded = threaded
 
-        self._keyboardThread = threading.Thread(target=self._keyboardLoop)
-        self._keyboardThread.start()
+        if displayBackend is None and threaded:
+            displayBackend = self._buildDisplayBackend(DISPLAY_BACKEND)
+        self.displayBackend = displayBackend
 
-        self.interruptNumber = INTERRUPT_KEYBOARD
+        if threaded:
+            self._parentMIOC.eventLoop.callSoon(self._openDisplay)
+
+    def pushKeyCode(self, keyCode=None):
+        """
+        This is how display backends hand key presses to the virtual keyboard. The code is buffered
+        and will be signaled to the machine by the keyboard tick.
+        :param keyCode: int, the scan code of the key
+        :return: Nothing
+        """
+        self._keyboardCodeListLock.acquire()
+
+        self._keyboardCodeList.append(keyCode)
+        if len(self._keyboardCodeList) > KEYBOARD_BUFFER_SIZE:
+            self._keyboardCodeList.pop(0)     # Flush oldest char but keep the rest
+
+        if self.threaded and not self._keyboardTickScheduled:
+            self._keyboardTickScheduled = True
+            self._parentMIOC.eventLoop.callLater(self._keyboardRefreshRate, self._keyboardTick)
 
-    def _generateDisplayText(self):
+        self._keyboardCodeListLock.release()
+
+    def getPendingKeyCodeCount(self):
+        """
+        Tell how many scan codes are buffered, waiting to be signaled to the machine.
+        :return: int
+        """
+        return len(self._keyboardCodeList)
+
+    def poll(self):
+        """
+        When the Terminal is not threaded, this does the work of the keyboard tick: the oldest
+        buffered scan code, if any, is signaled to the machine.
+        :return: Nothing
+        """
+        if not self.threaded:
+            self._signalKeyCode()
+
+    def setState(self, state=None):
         """
-        This method is used to generate the text to be displayed on the screen label. As of now, this is working
-        but, should the bytes string be replaced with actual strings, this would break because of automatic trimming.
-        TK labels seem to support non printable character relatively well when used with byte string.
-        This requires more work to validate.
-        TODO: Validate about non printable character
-        :return: str, the display data ready for printing
+        Put back the display memory as given by getState. The whole screen will be redrawn.
+        :param state: bytes like object, as returned by getState
+        :return: Nothing
         """
-        displayText = b""
         self._terminalBufferLock.acquire()
-        for i in range(0, 80*25, 80):
-            if i != 0:
-                displayText += b"\n"     # Put here at loop beginning to prevent 1 too many lines
-            line = self._data[i:i + 80]
-            line.replace(b"\n", b" ")   # Virtual display will break if we don't prevent \n in bytes
-            displayText += line
+        try:
+            super(Terminal, self).setState(state)
+            self._dirtyLines = set(range(DISPLAY_LINE_COUNT))
+            self._scheduleFrame()
+        finally:
+            self._terminalBufferLock.release()
+
+    def renderFrame(self):
+        """
+        This will hand the lines modified since the last frame to the display backend. Nothing is
+        done if the display memory has not been modified.
+        :return: bool, True if a frame was rendered
+        """
+        if not self._dirtyLines:
+            # Lock free check, a write racing with it will be picked up on next frame
+            return False
+
+        self._terminalBufferLock.acquire()
+        dirtyLines = self._dirtyLines
+        self._dirtyLines = set()
+        lines = {}
+        for lineNumber in dirtyLines:
+            start = lineNumber * DISPLAY_LINE_LENGTH
+            # Virtual display will break if we don't prevent \n in bytes
+            lines[lineNumber] = bytes(self._data[start:start + DISPLAY_LINE_LENGTH]).replace(b"\n", b" ")
         self._terminalBufferLock.release()
 
-        return displayText
+        self.displayBackend.render(lines)
+        return True
+
+    def _buildDisplayBackend(self, backendName=None):
+        """
+        Build the display backend matching the given configuration value. Backend modules are
+        only imported here so that tkinter is never imported unless the Tk display is in use.
+        :param backendName: str, one of the DISPLAY_BACKEND_* configuration values
+        :return: DisplayBackend
+        """
+        if backendName == DISPLAY_BACKEND_TK:
+            from CapuaEnvironment.IOComponent.MemoryMappedDevices.Terminal.TkDisplayBackend import TkDisplayBackend
+            backend = TkDisplayBackend(lineCount=DISPLAY_LINE_COUNT, lineLength=DISPLAY_LINE_LENGTH)
+        elif backendName == DISPLAY_BACKEND_HEADLESS:
+            from CapuaEnvironment.IOComponent.MemoryMappedDevices.Terminal.HeadlessDisplayBackend \
+                import HeadlessDisplayBackend
+            backend = HeadlessDisplayBackend(lineCount=DISPLAY_LINE_COUNT, lineLength=DISPLAY_LINE_LENGTH)
+        else:
+            raise ValueError("Invalid display backend {}".format(backendName))
+        return backend
 
-    def _keyboardLoop(self):
+    def prepareForShutdown(self):
         """
-        This is the threaded loop that allows to put scan codes in the memory for them to be
+        The display is closed on the event loop.
+        :return: Nothing
+        """
+        super(Terminal, self).prepareForShutdown()
+        if self.threaded:
+            self._parentMIOC.eventLoop.callSoon(self._closeDisplay)
+
+    def _keyboardTick(self):
+        """
+        This runs on the event loop and allows to put scan codes in the memory for them to be
         processed by the machine. This is here so we can keep a "python" buffer of scan code
         instead of an "in memory" list of scan code. The scan codes are inserted and
         "signaled" at a specified (see configuration) interval in an attempt to prevent
-        scan code loss.
+        scan code loss. The tick is only scheduled while scan codes are waiting.
         :return:
         """
-        while True:
-            if self._shutdownProcedureInAction:
-                # This allows the method to return if we need to shutdown the system
-                break
-            time.sleep(self._keyboardRefreshRate)     # Division is to honour the milliseconds
-
-            self._keyboardCodeListLock.acquire()
-            if len(self._keyboardCodeList) > 0:
-                # Get the oldest scan code
-                currentCode = self._keyboardCodeList[0]
-                self._writeIntoDataBuffer(offset=0x800, length=1, value=currentCode)
-                sigResult = self._parentMIOC.eu.signalHardwareInterrupt(self.interruptNumber)
-                if sigResult:
-                    # The interrupt has been signaled, we can remove oldest scan code
-                    poppedCode = self._keyboardCodeList.pop(0)
-                    if poppedCode != currentCode:
-                        # If this case is true, code list is corrupted
-                        raise RuntimeError("Scan code list corruption has been detected")
-            self._keyboardCodeListLock.release()
-
-    def _displayLoop(self):
-        """
-        This is the display loop. This is in charge of asynchronous display operations and is
-        launched right after device initialisation is over.
+        if self._shutdownProcedureInAction:
+            # This allows the keyboard to stop if we need to shutdown the system
+            return
+        self._signalKeyCode()
+
+        self._keyboardCodeListLock.acquire()
+        if len(self._keyboardCodeList) > 0:
+            self._parentMIOC.eventLoop.callLater(self._keyboardRefreshRate, self._keyboardTick)
+        else:
+            self._keyboardTickScheduled = False
+        self._keyboardCodeListLock.release()
+
+    def _signalKeyCode(self):
+        """
+        Put the oldest buffered scan code in the keyboard memory and signal it to the machine. The
+        scan code is only removed from the buffer once the interrupt has been accepted.
+        :return: Nothing
+        """
+        self._keyboardCodeListLock.acquire()
+        if len(self._keyboardCodeList) > 0:
+            # Get the oldest scan code
+            currentCode = self._keyboardCodeList[0]
+            self._writeIntoDataBuffer(offset=0x800, length=1, value=currentCode)
+            sigResult = self._parentMIOC.signalHardwareInterrupt(self.interruptNumber)
+            if sigResult:
+                # The interrupt has been signaled, we can remove oldest scan code
+                poppedCode = self._keyboardCodeList.pop(0)
+                if poppedCode != currentCode:
+                    # If this case is true, code list is corrupted
+                    raise RuntimeError("Scan code list corruption has been detected")
+        self._keyboardCodeListLock.release()
+
+    def _openDisplay(self):
+        """
+        This runs on the event loop right after device initialisation is over. The backend is opened
+        and the first frame is rendered.
         :return:
         """
-        self.window = tkinter.Tk()
-        self.window.title("Spartacus Learning VM")
-        self.window.bind("<KeyPress>", self._keyDown)
-        self.customFont = tkinter.font.Font(family="Courier", size=DISPLAY_FONT_SIZE)
-        self.displayWindow = tkinter.Label(self.window,
-                                           text=self._generateDisplayText(),
-                                           font=self.customFont,
-                                           bg="black",
-                                           fg="white",
-                                           justify=tkinter.LEFT)
-        self.displayWindow.grid()
-
-        while True:
-            if self._shutdownProcedureInAction:
-                # This allows the method to return if we need to shutdown the system
-                self.window.quit()
-                break
-            self.displayWindow.config(text=self._generateDisplayText())
-            #TODO need more research on this
-            self.window.update_idletasks()
-            self.window.update()
-            time.sleep(self._displayRefreshRate)
-
-    def _keyDown(self, e):
-        """
-        TODO: This will be used for the virtual keyboard.
-        :param e:
+        if self._shutdownProcedureInAction:
+            return
+        self.displayBackend.open(terminal=self)
+        self._displayOpened = True
+
+        inputDescriptor = self.displayBackend.getInputDescriptor()
+        if inputDescriptor is not None:
+            self._parentMIOC.eventLoop.addReader(inputDescriptor, self.displayBackend.refresh)
+        if self.displayBackend.needsRefresh:
+            self._parentMIOC.eventLoop.callLater(self._displayRefreshRate, self._refreshDisplay)
+        self.renderFrame()
+
+    def _refreshDisplay(self):
+        """
+        This runs on the event loop at every display tick, for backends that need it (needsRefresh).
         :return:
         """
-        self._keyboardCodeListLock.acquire()
+        if self._shutdownProcedureInAction:
+            return
+        self.displayBackend.refresh()
+        self._parentMIOC.eventLoop.callLater(self._displayRefreshRate, self._refreshDisplay)
 
-        self._keyboardCodeList.append(e.keycode)
-        if len(self._keyboardCodeList) > KEYBOARD_BUFFER_SIZE:
-            self._keyboardCodeList.pop(0)     # Flush oldest char but keep the rest
+    def _renderScheduledFrame(self):
+        """
+        This runs on the event loop, a display tick after the display memory got modified.
+        :return:
+        """
+        if self._shutdownProcedureInAction:
+            return
+        # Cleared first, a write racing with this frame schedules another one
+        self._frameScheduled = False
+        self.renderFrame()
 
-        self._keyboardCodeListLock.release()
+    def _scheduleFrame(self):
+        """
+        Have a frame rendered at the next display tick, unless one is already scheduled. This has to
+        be called with the terminal buffer lock held.
+        :return:
+        """
+        if self.threaded and not self._frameScheduled:
+            self._frameScheduled = True
+            self._parentMIOC.eventLoop.callLater(self._displayRefreshRate, self._renderScheduledFrame)
+
+    def _closeDisplay(self):
+        """
+        This runs on the event loop once the system is shutting down.
+        :return:
+        """
+        if not self._displayOpened:
+            return
+        inputDescriptor = self.displayBackend.getInputDescriptor()
+        if inputDescriptor is not None:
+            self._parentMIOC.eventLoop.removeReader(inputDescriptor)
+        self.displayBackend.close()
+        self._displayOpened = False
 
     def _writeIntoDataBuffer(self, offset=None, length=None, value=None, source="System"):
         """
@@ -175,6 +309,7 @@ class Terminal(BaseDevice):
         Important not, only write into buffer is re implemented from the parent because the display can read
         the buffer but not write it. Therefore the parent read literally can't happen at the same time
         as this write is happening.
+        Lines on which at least one byte actually changed are marked dirty for the display loop.
         :param offset: int, Where are we reading
         :param length: int, For how long
         :param value: int, the value to be written in the buffer
@@ -182,14 +317,16 @@ class Terminal(BaseDevice):
         :return:
         """
 
-        # Let's prepare the data for the write
-        readyData = struct.pack(">I", value)
+        # Only the lowest length bytes of the value are kept
+        value &= VALUE_MASKS[length]
 
-        # Now write the data
+        # Now write the data, in place
         self._terminalBufferLock.acquire()
-        dataFirstPart = self._data[0:offset]
-        dataMiddlePart = readyData[-length:]
-        dataLastPart = self._data[offset + length:]
-
-        self._data = dataFirstPart + dataMiddlePart + dataLastPart
+        if unpackValue(self._data, offset, length) != value:
+            packValue(self._data, offset, length, value)
+            if offset < DISPLAY_LINE_LENGTH * DISPLAY_LINE_COUNT:
+                lastOffset = min(offset + length, DISPLAY_LINE_LENGTH * DISPLAY_LINE_COUNT) - 1
+                for lineNumber in range(offset // DISPLAY_LINE_LENGTH, lastOffset // DISPLAY_LINE_LENGTH + 1):
+                    self._dirtyLines.add(lineNumber)
+                self._scheduleFrame()
         self._terminalBufferLock.release()
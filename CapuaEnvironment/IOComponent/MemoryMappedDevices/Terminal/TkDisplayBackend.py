@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+from CapuaEnvironment.IOComponent.MemoryMappedDevices.Terminal.DisplayBackend import DisplayBackend
+from Configuration.Configuration import DISPLAY_FONT_SIZE
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2017, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+
+class TkDisplayBackend(DisplayBackend):
+    """
+    This is the original display of the Terminal: a Tk window holding a single label.
+    tkinter is only imported when the window is opened so that the rest of the
+    system can run on machines where it is not available.
+    """
+
+    needsRefresh = True     # Tk events have to be pumped
+
+    def __init__(self, lineCount=25, lineLength=80):
+        self._lines = [b"\x20" * lineLength] * lineCount
+        self.window = None
+        self.displayWindow = None
+
+    def open(self, terminal=None):
+        """
+        This creates the window. It has to be called from the thread that will be pumping the events.
+        :param terminal: Terminal, the device being displayed. Key presses are forwarded to it.
+        :return: Nothing
+        """
+        super(TkDisplayBackend, self).open(terminal=terminal)
+
+        import tkinter
+        import tkinter.font
+
+        self.window = tkinter.Tk()
+        self.window.title("Spartacus Learning VM")
+        self.window.bind("<KeyPress>", self._keyDown)
+        self.customFont = tkinter.font.Font(family="Courier", size=DISPLAY_FONT_SIZE)
+        self.displayWindow = tkinter.Label(self.window,
+                                           text=self._generateDisplayText(),
+                                           font=self.customFont,
+                                           bg="black",
+                                           fg="white",
+                                           justify=tkinter.LEFT)
+        self.displayWindow.grid()
+
+    def render(self, lines=None):
+        """
+        Update the modified lines and push the new text to the label.
+        :param lines: dict, {lineNumber: bytes} for every modified line
+        :return: Nothing
+        """
+        for lineNumber, line in lines.items():
+            self._lines[lineNumber] = line
+        self.displayWindow.config(text=self._generateDisplayText())
+
+    def refresh(self):
+        """
+        Tk needs its events to be processed even when the screen content did not change.
+        :return: Nothing
+        """
+        #TODO need more research on this
+        self.window.update_idletasks()
+        self.window.update()
+
+    def close(self):
+        """
+        Terminate the Tk main loop.
+        :return: Nothing
+        """
+        if self.window is not None:
+            self.window.quit()
+
+    def _generateDisplayText(self):
+        """
+        TK labels seem to support non printable character relatively well when used with byte string.
+        This requires more work to validate.
+        TODO: Validate about non printable character
+        :return: bytes, the display data ready for printing
+        """
+        return b"\n".join(self._lines)
+
+    def _keyDown(self, e):
+        """
+        Forward the key press to the Terminal keyboard buffer.
+        :param e: the Tk event
+        :return:
+        """
+        self._terminal.pushKeyCode(e.keycode)
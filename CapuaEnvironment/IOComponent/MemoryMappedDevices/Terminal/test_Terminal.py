@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+import os
+import re
+import subprocess
+import sys
+import unittest
+
+from CapuaEnvironment.ExecutionUnit.ExecutionUnit import ExecutionUnit
+from CapuaEnvironment.IntructionFetchUnit.InstructionFetchUnit import InstructionFetchUnit
+from CapuaEnvironment.IOComponent.MemoryIOController import MemoryIOController
+from CapuaEnvironment.IOComponent.MemoryMappedDevices.Terminal.Terminal import Terminal
+from CapuaEnvironment.IOComponent.MemoryMappedDevices.Terminal.HeadlessDisplayBackend import HeadlessDisplayBackend
+from CapuaEnvironment.MemoryArray.MemoryArray import MemoryArray
+from Configuration.Configuration import INTERRUPT_KEYBOARD
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2017, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+
+class TestTerminal(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = HeadlessDisplayBackend()
+        # Not threaded so that frames are only rendered when the test asks for them
+        self.terminal = Terminal(displayBackend=self.backend, threaded=False)
+
+    def test_headlessDoesNotImportTk(self):
+        """
+        Validates that a headless terminal never imports tkinter. This is checked in a fresh interpreter,
+        other tests may have imported it.
+        """
+        check = "import sys\n" \
+                "from CapuaEnvironment.IOComponent.MemoryMappedDevices.Terminal.Terminal import Terminal\n" \
+                "from CapuaEnvironment.IOComponent.MemoryMappedDevices.Terminal.HeadlessDisplayBackend " \
+                "import HeadlessDisplayBackend\n" \
+                "Terminal(displayBackend=HeadlessDisplayBackend(), threaded=False).renderFrame()\n" \
+                "print('tkinter' in sys.modules)\n"
+        rootDirectory = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", ".."))
+        environment = dict(os.environ, PYTHONPATH=rootDirectory)
+        output = subprocess.check_output([sys.executable, "-c", check], cwd=rootDirectory, env=environment)
+        self.assertEqual(b"False", output.strip())
+
+    def test_renderFrame(self):
+        """
+        Validates that frames are only rendered when the display memory actually changed and
+        that only the modified lines are handed to the backend
+        """
+        self.terminal.renderFrame()     # Initial frame, whole screen
+        self.assertFalse(self.terminal.renderFrame())
+        frameCount = self.backend.frameCount
+
+        self.terminal.takeAction(address=0x20001000 + 80 * 2 + 79, length=4, value=0x41424344, isWrite=True)
+        self.assertEqual({2, 3}, self.terminal._dirtyLines)
+        self.assertTrue(self.terminal.renderFrame())
+        self.assertEqual(frameCount + 1, self.backend.frameCount)
+        self.assertEqual(b" " * 79 + b"A", self.backend.lines[2])
+        self.assertEqual(b"BCD" + b" " * 77, self.backend.lines[3])
+
+        # Writing the same value again does not change anything
+        self.terminal.takeAction(address=0x20001000 + 80 * 2 + 79, length=4, value=0x41424344, isWrite=True)
+        self.assertFalse(self.terminal.renderFrame())
+
+        # The keyboard byte is not part of the screen
+        self.terminal.takeAction(address=0x20001800, length=1, value=0x20, isWrite=True)
+        self.terminal.takeAction(address=0x20001800, length=1, value=0x21, isWrite=True)
+        self.assertFalse(self.terminal.renderFrame())
+        self.assertEqual(0x21, self.terminal.takeAction(address=0x20001800, length=1))
+
+    @unittest.skipUnless(hasattr(os, "openpty"), "Pseudo terminals are POSIX only")
+    def test_renderPty(self):
+        """
+        Validates that frames the pseudo terminal could not take are sent later, whole, and that
+        the output kept for a pseudo terminal nobody reads stays bounded
+        """
+        backend = HeadlessDisplayBackend(usePty=True)
+        backend.open(terminal=self.terminal)
+        self.assertTrue(backend.needsRefresh)
+        os.set_blocking(backend._ptySlave, False)
+        fullScreenLength = len(backend._buildFrame())
+        for frameNumber in range(2000):
+            backend.render({frameNumber % 25: bytes([0x41 + frameNumber % 26]) * 80})
+        self.assertNotEqual([], backend._ptyPending)
+        self.assertGreater(2 * fullScreenLength, sum(len(frame) for frame in backend._ptyPending))
+
+        # Whatever was received, replayed on an empty screen, gives the screen of the backend
+        received = b""
+        while True:
+            try:
+                received += os.read(backend._ptySlave, 4096)
+                continue
+            except BlockingIOError:
+                pass
+            if not backend._ptyPending:
+                break
+            backend.refresh()
+        screen = [b"\x20" * 80] * 25
+        self.assertIsNotNone(re.fullmatch(rb"(\x1b\[\d+;1H[^\x1b]{80})*", received))
+        for lineNumber, line in re.findall(rb"\x1b\[(\d+);1H([^\x1b]{80})", received):
+            screen[int(lineNumber) - 1] = line
+        self.assertEqual(backend.lines, screen)
+        backend.close()
+
+    def test_pushKeyCode(self):
+        """
+        Validates that the keyboard buffer keeps the most recent scan codes
+        """
+        for keyCode in range(100):
+            self.terminal.pushKeyCode(keyCode)
+        self.assertEqual(99, self.terminal._keyboardCodeList[-1])
+        self.assertGreater(100, len(self.terminal._keyboardCodeList))
+
+    def test_poll(self):
+        """
+        Validates that a terminal built without threads delivers scan codes when polled
+        """
+        ma = MemoryArray()
+        mioc = MemoryIOController(ma, testOnly=False, deviceThreads=False)
+        eu = ExecutionUnit(mioc, InstructionFetchUnit(ma))
+        terminal = mioc.getDevice(0x20001000)
+        self.assertFalse(terminal.threaded)
+        self.assertIsNone(mioc.getDevice(0x20000400))   # No HardDrive without threads
+
+        terminal.pushKeyCode(0x41)
+        terminal.pushKeyCode(0x42)
+        self.assertEqual(2, terminal.getPendingKeyCodeCount())
+        eu.IS = 1
+        mioc.pollDevices()
+        self.assertEqual(1, terminal.getPendingKeyCodeCount())
+        self.assertEqual(0x41, terminal.takeAction(address=0x20001800, length=1))
+        self.assertEqual(INTERRUPT_KEYBOARD, eu.getState()[5])
+
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+import os
+import threading
+import time
+import unittest
+
+from CapuaEnvironment.IOComponent.DeviceEventLoop import DeviceEventLoop
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2015, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+
+class TestDeviceEventLoop(unittest.TestCase):
+
+    def test_callLater(self):
+        """
+        Validates that timed events are run in deadline order, from a single thread started on demand
+        """
+        loop = DeviceEventLoop()
+        self.assertEqual(0, loop.getThreadCount())
+
+        done = threading.Event()
+        calls = []
+        loop.callLater(0.02, calls.append, "second")
+        loop.callLater(0.01, calls.append, "first")
+        loop.callLater(0.03, done.set)
+        self.assertEqual(1, loop.getThreadCount())
+        self.assertTrue(done.wait(5))
+        self.assertEqual(["first", "second"], calls)
+        loop.shutdown()
+        self.assertEqual(0, loop.getThreadCount())
+
+    def test_wakeUp(self):
+        """
+        Validates that a loop sleeping until a later event is woken up by an earlier one
+        """
+        loop = DeviceEventLoop()
+        done = threading.Event()
+        loop.callLater(60, done.clear)
+        time.sleep(0.05)   # The loop is now sleeping for 60 seconds
+        start = time.perf_counter()
+        loop.callLater(0.01, done.set)
+        self.assertTrue(done.wait(5))
+        self.assertGreater(1, time.perf_counter() - start)
+        loop.shutdown()
+
+    def test_shutdown(self):
+        """
+        Validates that shutdown does not wait for later events but still runs the ones already due
+        """
+        loop = DeviceEventLoop()
+        calls = []
+        loop.callLater(60, calls.append, "never")
+        loop.callSoon(calls.append, "cleanup")
+        start = time.perf_counter()
+        loop.shutdown()
+        self.assertGreater(1, time.perf_counter() - start)
+        self.assertEqual(["cleanup"], calls)
+        loop.callSoon(calls.append, "ignored")
+        self.assertEqual(["cleanup"], calls)
+
+    def test_addReader(self):
+        """
+        Validates that readers are run when their file descriptor is readable, threaded or not
+        """
+        for threaded in (True, False):
+            loop = DeviceEventLoop(threaded=threaded)
+            reader, writer = os.pipe()
+            received = []
+            readDone = threading.Event()
+
+            def readPipe():
+                received.append(os.read(reader, 16))
+                readDone.set()
+
+            loop.addReader(reader, readPipe)
+            os.write(writer, b"key")
+            if not threaded:
+                self.assertFalse(readDone.is_set())
+                loop.runPending()
+            self.assertTrue(readDone.wait(5))
+            self.assertEqual([b"key"], received)
+            loop.removeReader(reader)
+            loop.shutdown()
+            os.close(reader)
+            os.close(writer)
+
@@ -20,11 +20,20 @@ with this program; if not, write to the Free Software Foundation, Inc.,
 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 """
 
+import threading
 import unittest
 
+from CapuaEnvironment.ExecutionUnit.ExecutionUnit import ExecutionUnit
+from CapuaEnvironment.IntructionFetchUnit.InstructionFetchUnit import InstructionFetchUnit
 from CapuaEnvironment.MemoryArray.MemoryArray import MemoryArray
 from CapuaEnvironment.IOComponent.MemoryIOController import MemoryIOController
-from Configuration.Configuration import MEMORY_START_AT
+from CapuaEnvironment.IOComponent.MemoryMappedDevices.BaseDevice import BaseDevice
+from Configuration.Configuration import MEMORY_START_AT, \
+                                        REGISTER_A, \
+                                        REGISTER_B, \
+                                        REGISTER_C, \
+                                        EXECUTION_MODE_BLOCK, \
+                                        EXECUTION_MODE_INTERPRETER
 
 __author__ = "CSE"
 __copyright__ = "Copyright 2015, CSE"
@@ -91,6 +100,307 @@ class TestMemoryIOController(unittest.TestCase):
         """
         self.assertRaises(MemoryError, self.mioc._passMemoryReadWriteToMemoryMappedHardware)
 
+    def test_registerMemoryMappedDevice(self):
+        """
+        Validates good working of the registerMemoryMappedDevice method for MemoryIOController
+        registerMemoryMappedDevice(self, device=None, startAddress=None, mask=None)
+        """
+        mioc = MemoryIOController(MemoryArray())  # Clock is mapped at 0x20000100 with 0xFFFFFF00
+        device = BaseDevice(mioc)
+        self.assertRaises(ValueError, mioc.registerMemoryMappedDevice, None, 0x20000000, 0xFFFFFF00)
+        self.assertRaises(ValueError, mioc.registerMemoryMappedDevice, device, MEMORY_START_AT, 0xFFFFFF00)
+        self.assertRaises(ValueError, mioc.registerMemoryMappedDevice, device, 0x20000010, 0xFFFFFF00)
+        self.assertRaises(ValueError, mioc.registerMemoryMappedDevice, device, 0x20000000, None)
+        # Overlapping devices
+        self.assertRaises(ValueError, mioc.registerMemoryMappedDevice, device, 0x20000100, 0xFFFFFF00)
+        self.assertRaises(ValueError, mioc.registerMemoryMappedDevice, device, 0x20000180, 0xFFFFFFC0)
+        self.assertRaises(ValueError, mioc.registerMemoryMappedDevice, device, 0x20000000, 0xFFFFF000)
+        # Range too large
+        self.assertRaises(ValueError, mioc.registerMemoryMappedDevice, device, 0x00000000, 0x00000000)
+
+        # Multiple pages device
+        pagesDevice = BaseDevice(mioc)
+        mioc.registerMemoryMappedDevice(pagesDevice, 0x20001000, 0xFFFFF000)
+        # Sub page devices, sharing the same page
+        firstDevice = BaseDevice(mioc)
+        secondDevice = BaseDevice(mioc)
+        mioc.registerMemoryMappedDevice(firstDevice, 0x20000200, 0xFFFFFFC0)
+        mioc.registerMemoryMappedDevice(secondDevice, 0x20000240, 0xFFFFFFC0)
+        self.assertRaises(ValueError, mioc.registerMemoryMappedDevice, device, 0x20000240, 0xFFFFFFF0)
+
+        selected = []
+        for mappedDevice in (pagesDevice, firstDevice, secondDevice):
+            mappedDevice.takeAction = lambda address=None, length=None, value=None, isWrite=False, source="System", \
+                mappedDevice=mappedDevice: selected.append(mappedDevice)
+        mioc.memoryReadAtAddressForLength(0x20001000, 4)
+        mioc.memoryReadAtAddressForLength(0x20001FFC, 4)
+        mioc.memoryReadAtAddressForLength(0x2000023C, 4)
+        mioc.memoryReadAtAddressForLength(0x20000240, 4)
+        self.assertEqual([pagesDevice, pagesDevice, firstDevice, secondDevice], selected)
+        self.assertRaises(MemoryError, mioc.memoryReadAtAddressForLength, 0x20000280, 4)
+        self.assertRaises(MemoryError, mioc.memoryReadAtAddressForLength, 0x20002000, 4)
+
+    def test_signalHardwareInterrupt(self):
+        """
+        Validates good working of the setInterruptRouting and signalHardwareInterrupt methods for MemoryIOController
+        """
+        ma = MemoryArray()
+        mioc = MemoryIOController(ma)
+        self.assertFalse(mioc.signalHardwareInterrupt(0x01))
+        ifu = InstructionFetchUnit(ma)
+        cores = [ExecutionUnit(mioc, ifu), ExecutionUnit(mioc, ifu)]
+        for core in cores:
+            core.IS = 1
+        self.assertRaises(ValueError, mioc.setInterruptRouting, 0x01, 2)
+
+        mioc.setInterruptRouting(0x01, 1)
+        self.assertTrue(mioc.signalHardwareInterrupt(0x01))
+        self.assertTrue(mioc.signalHardwareInterrupt(0x00))
+        self.assertEqual(0x00, cores[0].getState()[5])
+        self.assertEqual(0x01, cores[1].getState()[5])
+        # A single interrupt at a time per core
+        self.assertFalse(mioc.signalHardwareInterrupt(0x01))
+
+    def test_virtualTime(self):
+        """
+        Validates that, in virtual time, the clock devices follow the number of executed instructions
+        """
+        ma = MemoryArray()
+        mioc = MemoryIOController(ma, testOnly=False, deviceThreads=False, virtualTime=True)
+        eu = ExecutionUnit(mioc, InstructionFetchUnit(ma))
+        eu.setupCore(MEMORY_START_AT)       # Memory is filled with NOP
+        handlerAddress = MEMORY_START_AT + 0x10000
+        vectorAddress = MEMORY_START_AT + 0x20000
+        mioc.memoryWriteAtAddressForLength(vectorAddress, 4, handlerAddress)
+        eu.IVR = vectorAddress
+        eu.S = MEMORY_START_AT + 0x30000
+        eu.IS = 1
+
+        events = []
+        mioc.scheduleVirtualEvent(10, lambda: events.append(mioc.retiredInstructions))
+        self.assertRaises(ValueError, mioc.scheduleVirtualEvent, 0, None)
+        self.assertEqual(25, eu.run(count=25))
+        self.assertEqual([10], events)
+        self.assertEqual(250, mioc.memoryReadAtAddressForLength(0x20000100, 4))   # 100 ns units
+
+        # A 2 ms timer ticks every 2000 instructions
+        mioc.memoryWriteAtAddressForLength(0x20000300, 4, 2)
+        eu.run(count=1999)
+        self.assertEqual(1, eu.IS)
+        eu.run(count=1)
+        self.assertEqual(0, eu.IS)
+        self.assertEqual(handlerAddress, eu.I)
+        self.assertEqual(2025, mioc.retiredInstructions)
+        mioc.prepareForShutdown()
+
+    def test_virtualTimeGuestTimer(self):
+        """
+        Validates that, in virtual time, a timer armed by the guest in the middle of a run fires on time
+        no matter how the core is run
+        """
+        program = bytes([0b01100000]) + (2).to_bytes(4, "big") + bytes([REGISTER_A])            # MOV #2 $A
+        program += bytes([0b01100110]) + (1).to_bytes(4, "big") + bytes([REGISTER_C])           # ADD #1 $C
+        program += bytes([0b01101000]) + (100).to_bytes(4, "big") + bytes([REGISTER_C])         # CMP #100 $C
+        program += bytes([0b01000001, 0b001]) + (MEMORY_START_AT + 6).to_bytes(4, "big")        # JMP <H> ADD
+        program += bytes([0b00100000, 0b01000000]) + (0x20000300).to_bytes(4, "big")            # MEMW [4] $A timer
+        program += bytes([0b01100110]) + (1).to_bytes(4, "big") + bytes([REGISTER_C])           # ADD #1 $C
+        program += bytes([0b01000001, 0b000]) + (MEMORY_START_AT + 30).to_bytes(4, "big")       # JMP <> ADD
+        handlerAddress = MEMORY_START_AT + 0x10000
+
+        def runGuest(executionMode, runCore):
+            ma = MemoryArray()
+            mioc = MemoryIOController(ma, testOnly=False, deviceThreads=False, virtualTime=True)
+            eu = ExecutionUnit(mioc, InstructionFetchUnit(ma), executionMode=executionMode)
+            ma.load(MEMORY_START_AT, program)
+            eu.setupCore(MEMORY_START_AT)
+            ma.writeValue(MEMORY_START_AT + 0x20000, 4, handlerAddress)
+            eu.IVR = MEMORY_START_AT + 0x20000
+            eu.S = MEMORY_START_AT + 0x30000
+            eu.IS = 1
+            try:
+                runCore(eu)
+            finally:
+                mioc.prepareForShutdown()
+            return eu.C, eu.IS, mioc.retiredInstructions
+
+        def untilHandler(eu):
+            eu.run(until={handlerAddress})
+
+        def runInSlices(eu):
+            for i in range(5):
+                eu.run(count=1000)
+
+        def stepToHandler(eu):
+            while eu.I != handlerAddress:
+                eu.execute()
+
+        # Timer is armed by the 302nd instruction, the interrupt is taken 2000 instructions later
+        for executionMode in (EXECUTION_MODE_INTERPRETER, EXECUTION_MODE_BLOCK):
+            self.assertEqual((1100, 0, 2302), runGuest(executionMode, untilHandler))
+            self.assertEqual((1100, 0, 2302), runGuest(executionMode, stepToHandler))
+            self.assertEqual((1100, 0, 5000), runGuest(executionMode, lambda eu: eu.run(count=5000)))
+            self.assertEqual((1100, 0, 5000), runGuest(executionMode, runInSlices))
+
+    def test_virtualTimeClock(self):
+        """
+        Validates that, in virtual time, the Clock gives an instruction the same time no matter how
+        the core is run
+        """
+        readClock = lambda register: bytes([0b00000001, (4 << 4) | register]) + (0x20000100).to_bytes(4, "big")
+        program = readClock(REGISTER_A)                                                         # MEMR [4] clock $A
+        program += bytes([0b11111111]) * 4                                                      # NOP x 4
+        program += readClock(REGISTER_B)                                                        # MEMR [4] clock $B
+        program += bytes([0b01000001, 0b000]) + (MEMORY_START_AT + 16).to_bytes(4, "big")       # JMP <> itself
+
+        def runGuest(executionMode, runCore):
+            ma = MemoryArray()
+            mioc = MemoryIOController(ma, virtualTime=True)
+            eu = ExecutionUnit(mioc, InstructionFetchUnit(ma), executionMode=executionMode)
+            ma.load(MEMORY_START_AT, program)
+            eu.setupCore(MEMORY_START_AT)
+            eu.run(count=100)   # So that the first read is not at time 0
+            eu.setupCore(MEMORY_START_AT)
+            runCore(eu)
+            return eu.A, eu.B
+
+        def stepThrough(eu):
+            for i in range(20):
+                eu.execute()
+
+        # 100 and 105 instructions at 10 (100 ns units) per instruction
+        for executionMode in (EXECUTION_MODE_INTERPRETER, EXECUTION_MODE_BLOCK):
+            self.assertEqual((1000, 1050), runGuest(executionMode, lambda eu: eu.run(count=20)))
+            self.assertEqual((1000, 1050), runGuest(executionMode, stepThrough))
+            self.assertEqual((1000, 1050), runGuest(executionMode, lambda eu: eu.run(until={MEMORY_START_AT + 16})))
+
+    def test_deviceDataBufferWidths(self):
+        """
+        Validates that memory mapped devices support reads and writes of 1, 2, 3 and 4 bytes
+        """
+        mioc = MemoryIOController(MemoryArray())
+        device = BaseDevice(mioc)
+        device._data = bytearray(0x40)
+        device._memoryAction = lambda source=None: None
+        device.startAddress = 0x20000200
+        mioc.registerMemoryMappedDevice(device, 0x20000200, 0xFFFFFFC0)
+
+        for length, value in ((1, 0xAB), (2, 0xABCD), (3, 0xABCDEF), (4, 0xABCDEF01)):
+            mioc.memoryWriteAtAddressForLength(0x20000210, length, value)
+            self.assertEqual(value, mioc.memoryReadAtAddressForLength(0x20000210, length))
+        self.assertEqual(b"\xAB\xCD\xEF\x01", device._data[0x10:0x14])
+        # Only the lowest bytes of a value are written
+        mioc.memoryWriteAtAddressForLength(0x20000214, 2, 0x12345678)
+        self.assertEqual(0x5678, mioc.memoryReadAtAddressForLength(0x20000214, 2))
+        self.assertEqual(0xABCDEF01, mioc.memoryReadAtAddressForLength(0x20000210, 4))
+        self.assertRaises(MemoryError, mioc.memoryReadAtAddressForLength, 0x2000023E, 4)
+
+    def test_directMemoryAccess(self):
+        """
+        Validates good working of the beginDirectMemoryAccess endDirectMemoryAccess and getBusStatistics
+        methods for MemoryIOController
+        """
+        mioc = MemoryIOController(MemoryArray())
+        statistics = mioc.getBusStatistics()
+        self.assertEqual(0, statistics["dmaTransfers"])
+        self.assertEqual(0, statistics["contentions"])
+
+        # The thread doing the transfer accesses memory freely
+        mioc.beginDirectMemoryAccess()
+        mioc.memoryWriteAtAddressForLength(MEMORY_START_AT, 4, 0x01020304)
+
+        # Any other thread waits for the transfer to be over
+        readValues = []
+        reader = threading.Thread(target=lambda: readValues.append(mioc.memoryReadAtAddressForLength(MEMORY_START_AT,
+                                                                                                     4)))
+        reader.start()
+        reader.join(0.2)
+        self.assertTrue(reader.is_alive())
+        self.assertEqual([], readValues)
+        mioc.memoryWriteAtAddressForLength(MEMORY_START_AT, 4, 0x05060708)
+        mioc.endDirectMemoryAccess()
+        reader.join()
+        self.assertEqual([0x05060708], readValues)
+
+        statistics = mioc.getBusStatistics()
+        self.assertEqual(1, statistics["dmaTransfers"])
+        self.assertEqual(1, statistics["contentions"])
+
+        # Whole buffers
+        mioc.directMemoryAccessWrite(MEMORY_START_AT + 0x10, b"\x01\x02\x03\x04\x05")
+        self.assertEqual(0x02030405, mioc.memoryReadAtAddressForLength(MEMORY_START_AT + 0x11, 4))
+        self.assertEqual(b"\x03\x04\x05\xFF", mioc.directMemoryAccessRead(MEMORY_START_AT + 0x12, 4))
+        self.assertRaises(MemoryError, mioc.directMemoryAccessWrite, 0x20000100, b"\x00")
+        self.assertRaises(MemoryError, mioc.directMemoryAccessRead, 0x20000100, 1)
+        self.assertRaises(MemoryError, mioc.directMemoryAccessRead, MEMORY_START_AT - 1, 1)
+        self.assertEqual(3, mioc.getBusStatistics()["dmaTransfers"])
+
+        # Locked bus behaves the same
+        mioc.lockFreeRam = False
+        mioc.memoryWriteAtAddressForLength(MEMORY_START_AT, 2, 0x0A0B)
+        self.assertEqual(0x0A0B0708, mioc.memoryReadAtAddressForLength(MEMORY_START_AT, 4))
+        self.assertFalse(mioc.getBusStatistics()["lockFreeRam"])
+
+    def test_directMemoryAccessOverlappingWrite(self):
+        """
+        Validates that a lock free RAM write overlapped by the start of a transfer lands after the transfer
+        """
+        ma = MemoryArray()
+        mioc = MemoryIOController(ma)
+        transferStarted = threading.Event()
+        transferRelease = threading.Event()
+
+        def transfer():
+            mioc.beginDirectMemoryAccess()
+            ma.writeMemory(MEMORY_START_AT, b"\x00\x00\x00\x00")
+            transferStarted.set()
+            transferRelease.wait()
+            mioc.endDirectMemoryAccess()
+
+        writeValue = ma.writeValue
+
+        def overlappedWriteValue(address, length, value):
+            # The transfer starts right after the core checked for transfers and wrote its value
+            writeValue(address, length, value)
+            if not transferStarted.is_set():
+                threading.Thread(target=transfer).start()
+                transferStarted.wait()
+                threading.Timer(0.1, transferRelease.set).start()
+
+        ma.writeValue = overlappedWriteValue
+        mioc.memoryWriteAtAddressForLength(MEMORY_START_AT, 4, 0x01020304)
+        self.assertTrue(transferRelease.is_set())
+        self.assertEqual(0x01020304, mioc.memoryReadAtAddressForLength(MEMORY_START_AT, 4))
+        self.assertEqual(1, mioc.getBusStatistics()["contentions"])
+
+    def test_setWatchpoints(self):
+        """
+        Validates good working of the setWatchpoints method for MemoryIOController
+        """
+        mioc = MemoryIOController(MemoryArray())
+        hits = []
+        observer = lambda address, length, isWrite, value: hits.append((address, length, isWrite, value))
+        self.assertRaises(ValueError, mioc.setWatchpoints, [(MEMORY_START_AT, 4, True, True)], None)
+        self.assertRaises(ValueError, mioc.setWatchpoints, [(MEMORY_START_AT, 0, True, True)], observer)
+
+        mioc.setWatchpoints([(MEMORY_START_AT + 0x0FFE, 4, False, True), (0x20000100, 4, True, False)], observer)
+        mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 0x0FFC, 4, 0x01020304)   # Crosses into the range
+        mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 0x1002, 2, 0x0506)       # Right after it
+        mioc.memoryReadAtAddressForLength(MEMORY_START_AT + 0x1000, 4)                # Not watched for reads
+        mioc.memoryReadAtAddressForLength(0x20000100, 4)                              # The clock
+        mioc.directMemoryAccessWrite(MEMORY_START_AT + 0x1000, b"\x00")
+        self.assertEqual([(MEMORY_START_AT + 0x0FFC, 4, True, 0x01020304),
+                          (0x20000100, 4, False, None),
+                          (MEMORY_START_AT + 0x1000, 1, True, None)], hits)
+
+        # A transfer spanning many pages hits a watchpoint on one of its middle pages
+        mioc.setWatchpoints([(MEMORY_START_AT + 0x5800, 4, False, True)], observer)
+        mioc.directMemoryAccessWrite(MEMORY_START_AT + 0x4000, bytes(0x3000))
+        self.assertEqual((MEMORY_START_AT + 0x4000, 0x3000, True, None), hits[-1])
+
+        mioc.setWatchpoints(None)
+        mioc.memoryWriteAtAddressForLength(MEMORY_START_AT + 0x1000, 4, 0)
+        self.assertEqual(4, len(hits))
+
     def test_prepareNumericValueToBeWrittenToMemory(self):
         """
         Validates good working of the passMemoryReadWriteToMemoryMappedHardware method for MemoryIOController
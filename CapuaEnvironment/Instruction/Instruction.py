@@ -20,7 +20,7 @@ with this program; if not, write to the Free Software Foundation, Inc.,
 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 """
 
-from CapuaEnvironment.Instruction.OperationDescription import operationDescription
+from CapuaEnvironment.IntructionFetchUnit.DecodeTable import formFields, mnemonicTable
 
 __author__ = "CSE"
 __copyright__ = "Copyright 2015, CSE"
@@ -50,6 +50,7 @@ class Instruction:
     flags = None
     operationMnemonic = None
     instructionLength = None
+    encoding = None     # bytes the instruction was decoded from, set by the InstructionFetchUnit
 
     def __init__(self, binaryInstruction=0b000000, form=None, skipValidation=False):
         """
@@ -62,21 +63,16 @@ class Instruction:
         if not skipValidation:
             self.instructionLength = form["length"]
 
-            # Parse the description so we can initiate the instruction
-            for descriptionElement in form["description"]:
-                mask = form["description"][descriptionElement]
-                extractedBinary = self._extractValueFromBinaryField(mask, binaryInstruction)
-
+            # Parse the description so we can initiate the instruction. Shifts and masks
+            # for every field of the form have been computed once in the DecodeTable
+            for descriptionElement, shift, mask in formFields[form["typeCode"]]:
                 # There is no validation here for performance reason
                 # WE RELY ON THE FACT that the form description is correct
                 # and does not contain any typo!!!
-                setattr(self, descriptionElement, extractedBinary)
+                setattr(self, descriptionElement, (binaryInstruction >> shift) & mask)
 
-            # This will simply get the instruction mnemonic from a list of possible mnemonics
-            for instructionMnemonic in operationDescription:
-                if self.instructionCode in operationDescription[instructionMnemonic]:
-                    self.operationMnemonic = instructionMnemonic
-                    break
+            # This will simply get the instruction mnemonic from the instruction code
+            self.operationMnemonic = mnemonicTable[self.instructionCode]
 
             if self.operationMnemonic is None:
                 raise ValueError("Invalid instruction detected")
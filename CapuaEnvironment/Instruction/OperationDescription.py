@@ -63,3 +63,40 @@ operationDescription = {
     "SUB": [0b01100111, 0b10010011],
     "XOR": [0b01100011, 0b10010000]
 }
+
+"""
+Simulated execution time, in cycles, as documented for every form in the LogicUnit. All the forms
+of a given operation share the same execution time. Operations that do not document an execution
+time are counted as a single cycle. This has no effect on execution, it is only used for profiling.
+"""
+
+operationExecutionTime = {
+    "ACTI": 1,
+    "ADD": 1,
+    "AND": 1,
+    "CALL": 2,
+    "CMP": 1,
+    "DACTI": 1,
+    "DIV": 3,
+    "HIRET": 1,
+    "INT": 1,
+    "JMP": 2,
+    "JMPR": 1,
+    "MEMR": 2,
+    "MEMW": 3,
+    "MOV": 1,
+    "MUL": 2,
+    "NOP": 1,
+    "NOT": 1,
+    "OR": 1,
+    "POP": 1,
+    "PUSH": 2,
+    "RET": 1,
+    "SFSTOR": 1,
+    "SIVR": 1,
+    "SHL": 1,
+    "SHR": 1,
+    "SNT": 1,
+    "SUB": 1,
+    "XOR": 1
+}
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+from CapuaEnvironment.Instruction.OperationDescription import operationDescription
+from CapuaEnvironment.IntructionFetchUnit.FormDescription import formDescription
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2015, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+"""
+The decode table is built once, at import time, from formDescription and operationDescription.
+It is indexed by the first byte of an instruction (the instruction code) so that decoding an
+instruction becomes a fixed number of table lookups instead of scanning both descriptions.
+
+Each entry of decodeTable is either None (invalid first byte) or a dict:
+    "formName":     str, the name of the form in formDescription
+    "form":         dict, the form itself
+    "length":       int, the length of the instruction in bytes
+    "mnemonic":     str, the operation mnemonic or None if no operation uses this code
+    "fields":       tuple, ((fieldName, shift, mask), ...) value = (binaryInstruction >> shift) & mask
+"""
+
+
+def buildFieldExtractors(form: dict=None):
+    """
+    Precompute how every field of a form is extracted from a binary instruction.
+    :param form: dict, a form as found in formDescription
+    :return: tuple, ((fieldName, shift, mask), ...) where mask is right aligned
+    """
+    fields = []
+    for fieldName in form["description"]:
+        mask = form["description"][fieldName]
+        shift = 0
+        if mask > 0:
+            while (mask & 0b1) != 1:
+                mask >>= 1
+                shift += 1
+        fields.append((fieldName, shift, mask))
+    return tuple(fields)
+
+
+def _buildMnemonicTable():
+    """
+    Builds the instruction code to mnemonic table
+    :return: list, 256 entries, mnemonic or None
+    """
+    table = [None] * 256
+    for mnemonic in operationDescription:
+        for code in operationDescription[mnemonic]:
+            table[code] = mnemonic
+    return table
+
+
+def _buildDecodeTable():
+    """
+    Builds the instruction code to decoding information table
+    :return: list, 256 entries, see module description
+    """
+    table = [None] * 256
+    for formName in formDescription:
+        form = formDescription[formName]
+        fields = formFields[form["typeCode"]]
+        for listingCode in form["listing"]:
+            code = (form["typeCode"] << 4) | listingCode
+            table[code] = {"formName": formName,
+                           "form": form,
+                           "length": form["length"],
+                           "mnemonic": mnemonicTable[code],
+                           "fields": fields}
+    return table
+
+
+# Form type codes are unique, this gives the field extractors for any given form
+formFields = {formDescription[formName]["typeCode"]: buildFieldExtractors(formDescription[formName])
+              for formName in formDescription}
+mnemonicTable = _buildMnemonicTable()
+decodeTable = _buildDecodeTable()
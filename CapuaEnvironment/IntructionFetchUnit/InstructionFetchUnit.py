@@ -21,9 +21,13 @@ with this program; if not, write to the Free Software Foundation, Inc.,
 """
 
 from CapuaEnvironment.Instruction.Instruction import Instruction
-from CapuaEnvironment.IntructionFetchUnit.FormDescription import formDescription
+from CapuaEnvironment.IntructionFetchUnit.DecodeTable import decodeTable
 from CapuaEnvironment.MemoryArray.MemoryArray import MemoryArray
-from Configuration.Configuration import MEMORY_START_AT
+from Configuration.Configuration import MEMORY_START_AT, \
+                                        INSTRUCTION_CACHE_ENABLED, \
+                                        INSTRUCTION_CACHE_PAGE_SHIFT
+
+import threading
 
 __author__ = "CSE"
 __copyright__ = "Copyright 2015, CSE"
@@ -41,8 +45,23 @@ class InstructionFetchUnit:
     access to memory is not allowed, memory cells will cause exception to be raised.
     Since it is available, it is also used in the debugger in order to provide code
     disassembling functionality.
+
+    Note about the decoded instruction cache:
+    Decoding an instruction is costly and tight loops end up decoding the very same bytes over
+    and over. Once decoded, an instruction is kept in a cache keyed by its address along with
+    the address of the next instruction. The cached Instruction instances are shared, nobody is
+    allowed to modify them after they have been built. The MemoryArray lets the fetch unit know
+    about every write so that any cached instruction overlapping written bytes is dropped. This
+    covers self modifying code as well as memory mapped devices doing DMA into code pages since
+    both end up writing through MemoryArray.writeMemory. In order to find the impacted entries
+    quickly, cached addresses are also indexed by the memory pages their bytes are laying on.
     """
     _memoryArray = None
+    _decodeCache = None         # {address: (instruction, nextInstructionAddress)}
+    _decodeCachePages = None    # {page: set(address of cached instructions touching that page)}
+    cacheEnabled = INSTRUCTION_CACHE_ENABLED
+    cacheHits = 0
+    cacheMisses = 0
 
     def __init__(self, memoryArray: MemoryArray=None):
         """
@@ -53,6 +72,13 @@ class InstructionFetchUnit:
             raise RuntimeError("Capua InstructionFetchUnit init error")
         self._memoryArray = memoryArray
 
+        self._decodeCache = {}
+        self._decodeCachePages = {}
+        # Cache lookups are lock free, only filling and invalidating the cache is done under the lock.
+        # This prevents a write happening in another thread (DMA) while we decode from leaving a stale entry.
+        self._decodeCacheLock = threading.Lock()
+        self._memoryArray.registerWriteObserver(self._invalidateCacheForRange)
+
     def fetchInstructionAtAddress(self, address=MEMORY_START_AT):
         """
         This is the high level fetching method for this class. It is the only one
@@ -63,11 +89,97 @@ class InstructionFetchUnit:
         :return: Instruction, nextInstructionAddress
         """
 
-        instructionForm = self._fetchInstructionFormAtAddress(address)
-        instruction = self._fetchInstructionAtAddressUsingForm(address, instructionForm)
-        nextInstructionAddress = address + instructionForm["length"]
+        cachedEntry = self._decodeCache.get(address)
+        if cachedEntry is not None:
+            self.cacheHits += 1
+            return cachedEntry
+
+        self.cacheMisses += 1
+
+        self._decodeCacheLock.acquire()
+        try:
+            instructionForm = self._fetchInstructionFormAtAddress(address)
+            instruction = self._fetchInstructionAtAddressUsingForm(address, instructionForm)
+            nextInstructionAddress = address + instructionForm["length"]
+            cachedEntry = (instruction, nextInstructionAddress)
+
+            if self.cacheEnabled:
+                self._decodeCache[address] = cachedEntry
+                for page in range(address >> INSTRUCTION_CACHE_PAGE_SHIFT,
+                                  ((nextInstructionAddress - 1) >> INSTRUCTION_CACHE_PAGE_SHIFT) + 1):
+                    if page not in self._decodeCachePages:
+                        self._decodeCachePages[page] = set()
+                    self._decodeCachePages[page].add(address)
+        finally:
+            self._decodeCacheLock.release()
+
+        return cachedEntry
+
+    def invalidateCache(self):
+        """
+        This will drop every decoded instruction from the cache. Counters are kept as they are.
+        :return: Nothing
+        """
+        self._decodeCacheLock.acquire()
+        self._decodeCache.clear()
+        self._decodeCachePages.clear()
+        self._decodeCacheLock.release()
+
+    def registerCodeWriteObserver(self, observer=None):
+        """
+        Components building on top of decoded instructions (such as the BlockTranslator) need to be
+        told about memory writes in the exact same way the decoded instruction cache is.
+        :param observer: callable, will be called as observer(address, length) after each memory write
+        :return: Nothing
+        """
+        self._memoryArray.registerWriteObserver(observer)
+
+    def getCacheStatistics(self):
+        """
+        This gives information about how well the decoded instruction cache is doing
+        :return: dict, {"hits": int, "misses": int, "entries": int}
+        """
+        return {"hits": self.cacheHits,
+                "misses": self.cacheMisses,
+                "entries": len(self._decodeCache)}
 
-        return instruction, nextInstructionAddress
+    def _invalidateCacheForRange(self, address=MEMORY_START_AT, length=1):
+        """
+        This is called by the MemoryArray after every write. Any cached instruction that has at
+        least one of its bytes in the written range is removed from the cache.
+        :param address: int, start address of the write
+        :param length: int, length of the write
+        :return: Nothing
+        """
+        if not self._decodeCachePages:
+            return
+
+        endAddress = address + length
+        firstPage = address >> INSTRUCTION_CACHE_PAGE_SHIFT
+        lastPage = (endAddress - 1) >> INSTRUCTION_CACHE_PAGE_SHIFT
+
+        self._decodeCacheLock.acquire()
+        if lastPage - firstPage < len(self._decodeCachePages):
+            impactedPages = range(firstPage, lastPage + 1)
+        else:
+            # Large write (program loading for example), cheaper to go through the cached pages
+            impactedPages = [page for page in self._decodeCachePages if firstPage <= page <= lastPage]
+        for page in impactedPages:
+            cachedAddresses = self._decodeCachePages.get(page)
+            if cachedAddresses is None:
+                continue
+            for cachedAddress in list(cachedAddresses):
+                nextInstructionAddress = self._decodeCache[cachedAddress][1]
+                if cachedAddress < endAddress and address < nextInstructionAddress:
+                    # This instruction overlaps the written bytes, it is now stale
+                    del self._decodeCache[cachedAddress]
+                    for cachedPage in range(cachedAddress >> INSTRUCTION_CACHE_PAGE_SHIFT,
+                                            ((nextInstructionAddress - 1) >> INSTRUCTION_CACHE_PAGE_SHIFT) + 1):
+                        pageAddresses = self._decodeCachePages[cachedPage]
+                        pageAddresses.discard(cachedAddress)
+                        if len(pageAddresses) == 0:
+                            del self._decodeCachePages[cachedPage]
+        self._decodeCacheLock.release()
 
     def _fetchInstructionFormAtAddress(self, address=MEMORY_START_AT):
         """
@@ -77,26 +189,16 @@ class InstructionFetchUnit:
         :param address:
         :return:
         """
-        instructionForm = None
-        mc = self._memoryArray.readMemory(address, 1)[0]
-        value = mc & 0xff   # Making sure we have an 8 bits value
-
-        # Extracting type and instruction codes
-        typeCode = (value & 0b11110000) >> 4
-        instructionCode = value & 0b00001111
-
-        for form in formDescription:
-            if typeCode == formDescription[form]["typeCode"]:
-                if instructionCode in formDescription[form]["listing"]:
-                    # We found the correct form!
-                    instructionForm = formDescription[form]
-                    break
-        if instructionForm is None:
+        value = self._memoryArray.readValue(address, 1)
+
+        # The first byte holds both type and instruction codes, it directly indexes the decode table
+        decodeEntry = decodeTable[value]
+        if decodeEntry is None:
             # If we are here, no instruction were found that are corresponding
             # a user is trying to execute an invalid instruction!
             raise ValueError("Invalid instruction detected at address {}".format(hex(address)))
 
-        return instructionForm
+        return decodeEntry["form"]
 
     def _fetchInstructionAtAddressUsingForm(self, address=MEMORY_START_AT, form=None):
         """
@@ -112,14 +214,13 @@ class InstructionFetchUnit:
         memorySlice = self._memoryArray.readMemory(address, form["length"])
 
         # Now, build a big number (as in real big) with the extracted memory
-        binaryInstruction = 0
-        for mc in memorySlice:
-            binaryInstruction <<= 8
-            binaryInstruction |= mc & 0xff  # Only 8 bits can be used at a time
+        binaryInstruction = int.from_bytes(memorySlice, "big")
 
         # binaryInstruction is now  a big number representing the instruction
         # Time to create the instruction using this big number!
         # Parsing of the details of the instruction will happen in the Instruction class
         instruction = Instruction(binaryInstruction, form)
+        # Kept so that recording the instruction (see TraceRecorder) does not have to read memory again
+        instruction.encoding = memorySlice
 
         return instruction
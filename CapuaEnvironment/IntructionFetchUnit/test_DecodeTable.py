@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+import unittest
+
+from CapuaEnvironment.Instruction.OperationDescription import operationDescription
+from CapuaEnvironment.IntructionFetchUnit.DecodeTable import buildFieldExtractors, \
+                                                             decodeTable, \
+                                                             formFields, \
+                                                             mnemonicTable
+from CapuaEnvironment.IntructionFetchUnit.FormDescription import formDescription
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2015, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+
+class TestDecodeTable(unittest.TestCase):
+
+    def test_decodeTable(self):
+        """
+        Validates that the decode table gives the same result as scanning the descriptions
+        """
+        self.assertEqual(256, len(decodeTable))
+        for code in range(256):
+            expectedForm = None
+            for form in formDescription:
+                if (code >> 4) == formDescription[form]["typeCode"] and \
+                   (code & 0b1111) in formDescription[form]["listing"]:
+                    expectedForm = form
+            expectedMnemonic = None
+            for mnemonic in operationDescription:
+                if code in operationDescription[mnemonic]:
+                    expectedMnemonic = mnemonic
+
+            self.assertEqual(expectedMnemonic, mnemonicTable[code])
+            if expectedForm is None:
+                self.assertIsNone(decodeTable[code])
+            else:
+                entry = decodeTable[code]
+                self.assertEqual(expectedForm, entry["formName"])
+                self.assertIs(formDescription[expectedForm], entry["form"])
+                self.assertEqual(formDescription[expectedForm]["length"], entry["length"])
+                self.assertEqual(expectedMnemonic, entry["mnemonic"])
+                self.assertIs(formFields[formDescription[expectedForm]["typeCode"]], entry["fields"])
+
+    def test_buildFieldExtractors(self):
+        """
+        Validates good working of buildFieldExtractors
+        def buildFieldExtractors(form: dict=None):
+        """
+        fields = dict((name, (shift, mask)) for name, shift, mask in buildFieldExtractors(formDescription["InsFlagReg"]))
+        self.assertEqual((8, 0b11111111), fields["instructionCode"])
+        self.assertEqual((4, 0b1111), fields["flags"])
+        self.assertEqual((0, 0b1111), fields["sourceRegister"])
+        fields = dict((name, (shift, mask)) for name, shift, mask in buildFieldExtractors(formDescription["InsImmReg"]))
+        self.assertEqual((8, 0xFFFFFFFF), fields["sourceImmediate"])
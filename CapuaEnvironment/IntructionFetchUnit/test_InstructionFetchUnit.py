@@ -232,3 +232,52 @@ class TestInstructionFetchUnit(unittest.TestCase):
         self.assertIsNone(ins.flags)
 
 
+
+    def test_decodeCache(self):
+        """
+        Validates good working of the decoded instruction cache for InstructionFetchUnit
+        """
+        ma = MemoryArray()
+        ifu = InstructionFetchUnit(ma)
+
+        # MOV #0x01 $A followed by a NOP
+        ma.writeMemory(MEMORY_START_AT, [0b01100000, 0x00, 0x00, 0x00, 0x01, 0x00, 0xFF])
+        instruction, nextInstructionAddress = ifu.fetchInstructionAtAddress(MEMORY_START_AT)
+        self.assertEqual(1, ifu.cacheMisses)
+        self.assertEqual(0, ifu.cacheHits)
+        cachedInstruction, cachedNextInstructionAddress = ifu.fetchInstructionAtAddress(MEMORY_START_AT)
+        self.assertEqual(1, ifu.cacheMisses)
+        self.assertEqual(1, ifu.cacheHits)
+        self.assertIs(instruction, cachedInstruction)
+        self.assertEqual(nextInstructionAddress, cachedNextInstructionAddress)
+
+        # A write that does not touch the instruction keeps the entry around
+        ma.writeMemory(MEMORY_START_AT + 6, [0xFF])
+        ifu.fetchInstructionAtAddress(MEMORY_START_AT)
+        self.assertEqual(2, ifu.cacheHits)
+
+        # Self modifying code, the immediate value gets changed
+        ma.writeMemory(MEMORY_START_AT + 4, [0x02])
+        instruction, nextInstructionAddress = ifu.fetchInstructionAtAddress(MEMORY_START_AT)
+        self.assertEqual(2, ifu.cacheMisses)
+        self.assertEqual(0x02, instruction.sourceImmediate)
+
+        # The instruction itself is replaced by a NOP
+        ma.writeMemory(MEMORY_START_AT, [0xFF])
+        instruction, nextInstructionAddress = ifu.fetchInstructionAtAddress(MEMORY_START_AT)
+        self.assertEqual("NOP", instruction.operationMnemonic)
+        self.assertEqual(MEMORY_START_AT + 1, nextInstructionAddress)
+
+        # Instruction crossing a cache page boundary
+        pageBoundary = MEMORY_START_AT + 0x1000
+        ma.writeMemory(pageBoundary - 2, [0b01100000, 0x00, 0x00, 0x00, 0x01, 0x00])
+        instruction, nextInstructionAddress = ifu.fetchInstructionAtAddress(pageBoundary - 2)
+        ma.writeMemory(pageBoundary + 3, [0x03])
+        instruction, nextInstructionAddress = ifu.fetchInstructionAtAddress(pageBoundary - 2)
+        self.assertEqual(0x03, instruction.destinationRegister)
+
+        statistics = ifu.getCacheStatistics()
+        self.assertEqual(ifu.cacheHits, statistics["hits"])
+        self.assertEqual(ifu.cacheMisses, statistics["misses"])
+        ifu.invalidateCache()
+        self.assertEqual(0, ifu.getCacheStatistics()["entries"])
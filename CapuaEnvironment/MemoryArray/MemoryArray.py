@@ -20,28 +20,51 @@ with this program; if not, write to the Free Software Foundation, Inc.,
 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 """
 
+from CapuaEnvironment.MemoryArray.MemoryValue import packValue, unpackValue
 from Configuration.Configuration import MEMORY_START_AT, \
                                         MEMORY_CELL_INITIAL_VALUE, \
-                                        MEMORY_END_AT
+                                        MEMORY_END_AT, \
+                                        MEMORY_PAGE_SHIFT, \
+                                        MEMORY_PAGE_SIZE
+
+import threading
 
 __author__ = "CSE"
 __copyright__ = "Copyright 2015, CSE"
 __credits__ = ["CSE"]
 __license__ = "GPL"
-__version__ = "2.1"
+__version__ = "2.2"
 __maintainer__ = "CSE"
 __status__ = "Dev"
 
 
+# Every page that was never written is this very same immutable page, shared by all memory arrays
+INITIAL_PAGE = bytes((MEMORY_CELL_INITIAL_VALUE,)) * MEMORY_PAGE_SIZE
+_PAGE_OFFSET_MASK = MEMORY_PAGE_SIZE - 1
+
+
 class MemoryArray:
     """
     MemoryArray class is used to group and manage access to the MemoryCell composing
     Capua memory array. It will extract MemoryCells based on address and required parameter
     IT WILL NOT manage read and write values to the memory itself. It only provides the memory!
     Read and Write access are managed by whatever code need such access to extracted MemoryCells.
+
+    Memory cells are bytes kept in pages of MEMORY_PAGE_SIZE bytes. A page is either an immutable
+    bytes object, possibly shared with other memory arrays, or a bytearray owned by this memory
+    array. Pages start as the shared INITIAL_PAGE and are copied the first time they are written
+    (copy on write). A new memory array therefore costs nothing more than its page list and only
+    written pages use memory. fork() gives a new memory array sharing every page with this one,
+    both then copy pages as they write them.
+
+    Reads hand out copies of memory content, a slice read from memory does not reflect later
+    writes. Values from 1 to 4 bytes can be accessed directly as big endian integers using
+    readValue and writeValue.
     """
 
-    _memoryCellArray = None  # MemoryCells are kept in there
+    _pages = None            # Memory pages, bytes when shared (copy on write) or bytearray when owned
+    _pageCopyLock = None     # Taken when a page is copied so that concurrent writers end up on the same copy
+    _writeObservers = None   # Callables that need to be told when memory content changes
 
     def __init__(self):
         """
@@ -49,33 +72,78 @@ class MemoryArray:
         environment to be configurable by the user with minimal code change.
         Configuration for memory cell array are in Configuration.Configuration
         """
-        self._memoryCellArray = [
-            MEMORY_CELL_INITIAL_VALUE
-            for x in range(MEMORY_START_AT, MEMORY_END_AT)
-        ]
+        if (MEMORY_END_AT - MEMORY_START_AT) % MEMORY_PAGE_SIZE != 0:
+            raise ValueError("Memory size has to be a multiple of the memory page size")
+        self._pages = [INITIAL_PAGE] * ((MEMORY_END_AT - MEMORY_START_AT) >> MEMORY_PAGE_SHIFT)
+        self._pageCopyLock = threading.Lock()
+        self._writeObservers = []
+
+    def fork(self):
+        """
+        Build a new memory array holding the same content as this one. Pages are shared and will be
+        copied, by either memory array, when they are written. Write observers are not carried over.
+        This is not to be called while some other thread is writing to this memory array.
+        :return: MemoryArray
+        """
+        forked = MemoryArray()
+        self._pageCopyLock.acquire()
+        for pageNumber, page in enumerate(self._pages):
+            if page.__class__ is bytearray:
+                # The page becomes shared, it has to be made immutable
+                page = bytes(page)
+                self._pages[pageNumber] = page
+            forked._pages[pageNumber] = page
+        self._pageCopyLock.release()
+        return forked
 
     def readMemory(self, address, length=1):
         """
         This method allows to read a slice of contiguous memory
         :param address: int, Address for which access is required
         :param length: int length of the required extraction
-        :return: list of MemoryCell that are contiguous in memory
+        :return: bytes like copy of the MemoryCell that are contiguous in memory
         """
         # Check memory access is ok
         self._validateAddressForLengthAccess(address, length)
 
         # Memory extraction from base
-        baseIndex = self._computeArrayIndexFromAddress(address)
-        memorySlice = self._memoryCellArray[baseIndex:baseIndex + length]
+        offset = address - MEMORY_START_AT
+        pageOffset = offset & _PAGE_OFFSET_MASK
+        if pageOffset + length <= MEMORY_PAGE_SIZE:
+            return self._pages[offset >> MEMORY_PAGE_SHIFT][pageOffset:pageOffset + length]
+
+        memorySlice = bytearray()
+        endOffset = offset + length
+        while offset < endOffset:
+            pageOffset = offset & _PAGE_OFFSET_MASK
+            chunkLength = min(MEMORY_PAGE_SIZE - pageOffset, endOffset - offset)
+            memorySlice += self._pages[offset >> MEMORY_PAGE_SHIFT][pageOffset:pageOffset + chunkLength]
+            offset += chunkLength
+
+        return bytes(memorySlice)
+
+    def readValue(self, address, length=4):
+        """
+        This method reads a big endian value from memory
+        :param address: int, Address of the first byte of the value
+        :param length: int, width of the value, 1 to 4 bytes
+        :return: int, the value
+        """
+        self._validateAddressForLengthAccess(address, length)
 
-        return memorySlice
+        offset = address - MEMORY_START_AT
+        pageOffset = offset & _PAGE_OFFSET_MASK
+        if pageOffset + length <= MEMORY_PAGE_SIZE:
+            return unpackValue(self._pages[offset >> MEMORY_PAGE_SHIFT], pageOffset, length)
+
+        # The value spans two pages
+        return unpackValue(self.readMemory(address, length), 0, length)
 
     def writeMemory(self, address, values):
         """
         This method will overwrite values from a given address
         :param address: int, the address where the overwrite is to happen
-        :param values: int list, a list containing values to be writen in memory
-        :param length: int, length of the write operation
+        :param values: int list or bytes like object, values to be writen in memory
         :return: none
         """
         length = len(values)
@@ -83,9 +151,152 @@ class MemoryArray:
         # Check memory access is ok
         self._validateAddressForLengthAccess(address, length)
 
-        # Do memory access
-        base = self._computeArrayIndexFromAddress(address)
-        self._memoryCellArray[base:base + length] = values
+        # Do memory access, page by page
+        values = memoryview(bytes(values) if type(values) is list else values).cast("B")
+        offset = address - MEMORY_START_AT
+        written = 0
+        while written < length:
+            pageOffset = offset & _PAGE_OFFSET_MASK
+            chunkLength = min(MEMORY_PAGE_SIZE - pageOffset, length - written)
+            page = self._pages[offset >> MEMORY_PAGE_SHIFT]
+            if page.__class__ is not bytearray:
+                page = self._copyPage(offset >> MEMORY_PAGE_SHIFT)
+            page[pageOffset:pageOffset + chunkLength] = values[written:written + chunkLength]
+            offset += chunkLength
+            written += chunkLength
+
+        # Let anyone holding a copy of memory derived data know about the change
+        for observer in self._writeObservers:
+            observer(address, length)
+
+    def load(self, address, content):
+        """
+        This method places a whole image (a program for example) in memory. Access is validated
+        once for the whole image. Pages fully covered by the image are replaced by immutable copies
+        of the image content instead of being copied then overwritten, they will only be copied
+        again if they are written. Write observers are told about a single write.
+        :param address: int, the address where the image starts
+        :param content: bytes like object, the image
+        :return: none
+        """
+        content = memoryview(content).cast("B")
+        length = len(content)
+
+        # Check memory access is ok
+        self._validateAddressForLengthAccess(address, length)
+
+        offset = address - MEMORY_START_AT
+        loaded = 0
+        while loaded < length:
+            pageOffset = offset & _PAGE_OFFSET_MASK
+            chunkLength = min(MEMORY_PAGE_SIZE - pageOffset, length - loaded)
+            pageNumber = offset >> MEMORY_PAGE_SHIFT
+            if chunkLength == MEMORY_PAGE_SIZE:
+                self._pageCopyLock.acquire()
+                self._pages[pageNumber] = bytes(content[loaded:loaded + chunkLength])
+                self._pageCopyLock.release()
+            else:
+                page = self._pages[pageNumber]
+                if page.__class__ is not bytearray:
+                    page = self._copyPage(pageNumber)
+                page[pageOffset:pageOffset + chunkLength] = content[loaded:loaded + chunkLength]
+            offset += chunkLength
+            loaded += chunkLength
+
+        # Let anyone holding a copy of memory derived data know about the change
+        for observer in self._writeObservers:
+            observer(address, length)
+
+    def writeValue(self, address, length=4, value=0):
+        """
+        This method writes a big endian value to memory
+        :param address: int, Address where the first byte of the value is to be written
+        :param length: int, width of the value, 1 to 4 bytes
+        :param value: int, the value, it has to fit in length bytes
+        :return: none
+        """
+        self._validateAddressForLengthAccess(address, length)
+
+        offset = address - MEMORY_START_AT
+        pageOffset = offset & _PAGE_OFFSET_MASK
+        if pageOffset + length <= MEMORY_PAGE_SIZE:
+            page = self._pages[offset >> MEMORY_PAGE_SHIFT]
+            if page.__class__ is not bytearray:
+                page = self._copyPage(offset >> MEMORY_PAGE_SHIFT)
+            packValue(page, pageOffset, length, value)
+        else:
+            # The value spans two pages
+            valueBytes = bytearray(length)
+            packValue(valueBytes, 0, length, value)
+            self.writeMemory(address, valueBytes)
+            return  # writeMemory already told the observers
+
+        # Let anyone holding a copy of memory derived data know about the change
+        for observer in self._writeObservers:
+            observer(address, length)
+
+    def getModifiedPages(self, pageSize=MEMORY_PAGE_SIZE):
+        """
+        Find the pages of memory that do not hold the initial memory value anymore. This is used to
+        snapshot memory without saving the (usually many) pages that were never written.
+        :param pageSize: int, the size of a page, it has to be MEMORY_PAGE_SIZE
+        :return: list, the page numbers (page 0 being at MEMORY_START_AT)
+        """
+        if pageSize != MEMORY_PAGE_SIZE:
+            raise ValueError("Invalid memory page size {}".format(pageSize))
+
+        return [pageNumber for pageNumber, page in enumerate(self._pages)
+                if page is not INITIAL_PAGE and page != INITIAL_PAGE]
+
+    def restorePages(self, pageSize=MEMORY_PAGE_SIZE, pages=None):
+        """
+        Put memory back in its initial state except for the given pages, which receive the given
+        content. This is the reverse of getModifiedPages. Restored pages are kept as immutable
+        copies, they will only be copied again if they are written. Write observers are told
+        about a single write covering the whole memory.
+        :param pageSize: int, the size of a page, it has to be MEMORY_PAGE_SIZE
+        :param pages: iterable of (pageNumber, bytes like object of pageSize bytes)
+        :return: none
+        """
+        if pageSize != MEMORY_PAGE_SIZE:
+            raise ValueError("Invalid memory page size {}".format(pageSize))
+
+        restoredPages = [INITIAL_PAGE] * len(self._pages)
+        for pageNumber, pageContent in pages:
+            if len(pageContent) != pageSize or not 0 <= pageNumber < len(restoredPages):
+                raise MemoryError("Invalid memory page {} restored".format(pageNumber))
+            restoredPages[pageNumber] = bytes(pageContent)
+
+        self._pageCopyLock.acquire()
+        self._pages[:] = restoredPages
+        self._pageCopyLock.release()
+
+        for observer in self._writeObservers:
+            observer(MEMORY_START_AT, MEMORY_END_AT - MEMORY_START_AT)
+
+    def getPageStatistics(self):
+        """
+        This gives information about how much memory this memory array really uses
+        :return: dict, {"pages": int, "ownedPages": int, "sharedPages": int}
+        """
+        ownedPages = sum(1 for page in self._pages if page.__class__ is bytearray)
+        initialPages = sum(1 for page in self._pages if page is INITIAL_PAGE)
+        return {"pages": len(self._pages),
+                "ownedPages": ownedPages,
+                "sharedPages": len(self._pages) - ownedPages - initialPages}
+
+    def registerWriteObserver(self, observer=None):
+        """
+        This allows a component keeping data derived from memory content (such as the decoded
+        instruction cache of the InstructionFetchUnit) to be notified whenever memory is written.
+        The observer will be called with the address and the length of every write operation.
+        :param observer: callable, will be called as observer(address, length) after each write
+        :return: none
+        """
+        if observer is None or not callable(observer):
+            raise ValueError("Invalid memory write observer registered")
+
+        self._writeObservers.append(observer)
 
     def _validateAddressForLengthAccess(self, address, length):
         """
@@ -109,7 +320,22 @@ class MemoryArray:
         :return: int, memory cell (8 bits) required by accessing program
         """
         index = self._computeArrayIndexFromAddress(address)
-        return self._memoryCellArray[index]
+        return self._pages[index >> MEMORY_PAGE_SHIFT][index & _PAGE_OFFSET_MASK]
+
+    def _copyPage(self, pageNumber):
+        """
+        Give this memory array its own, writable, copy of a page. This is the copy on write.
+        :param pageNumber: int, the page that is about to be written
+        :return: bytearray, the writable page
+        """
+        self._pageCopyLock.acquire()
+        page = self._pages[pageNumber]
+        if page.__class__ is not bytearray:
+            # Another thread might have done the copy while we were waiting for the lock
+            page = bytearray(page)
+            self._pages[pageNumber] = page
+        self._pageCopyLock.release()
+        return page
 
     def _computeArrayIndexFromAddress(self, address):
         """
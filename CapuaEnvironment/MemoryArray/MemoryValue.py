@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+import struct
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2015, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+"""
+Capua values are big endian and 1 to 4 bytes wide. These helpers read and write such values directly
+from/into any writable buffer (bytearray, memoryview) without building intermediate bytes objects.
+They are shared by the MemoryArray and the memory mapped devices.
+"""
+
+_UINT16 = struct.Struct(">H")
+_UINT24 = struct.Struct(">HB")  # struct has no 3 bytes format, high 16 bits followed by low 8 bits
+_UINT32 = struct.Struct(">I")
+
+
+def unpackValue(buffer=None, offset: int=0, length: int=4):
+    """
+    Read a big endian value from a buffer
+    :param buffer: bytearray, memoryview or bytes holding the value
+    :param offset: int, offset of the first byte of the value in the buffer
+    :param length: int, width of the value, 1 to 4 bytes
+    :return: int, the value
+    """
+    if length == 4:
+        return _UINT32.unpack_from(buffer, offset)[0]
+    elif length == 1:
+        return buffer[offset]
+    elif length == 2:
+        return _UINT16.unpack_from(buffer, offset)[0]
+    elif length == 3:
+        high, low = _UINT24.unpack_from(buffer, offset)
+        return (high << 8) | low
+
+    raise ValueError("Invalid value width {}".format(length))
+
+
+def packValue(buffer=None, offset: int=0, length: int=4, value: int=0):
+    """
+    Write a big endian value into a buffer
+    :param buffer: bytearray or memoryview where the value is to be written
+    :param offset: int, offset of the first byte of the value in the buffer
+    :param length: int, width of the value, 1 to 4 bytes
+    :param value: int, the value, it has to fit in length bytes
+    :return: Nothing
+    """
+    try:
+        if length == 4:
+            _UINT32.pack_into(buffer, offset, value)
+        elif length == 1:
+            buffer[offset] = value
+        elif length == 2:
+            _UINT16.pack_into(buffer, offset, value)
+        elif length == 3:
+            if value > 0xFFFFFF:
+                raise ValueError("Value {} does not fit in 3 bytes".format(hex(value)))
+            _UINT24.pack_into(buffer, offset, value >> 8, value & 0xFF)
+        else:
+            raise ValueError("Invalid value width {}".format(length))
+    except struct.error:
+        raise ValueError("Value {} does not fit in {} bytes".format(hex(value), length))
@@ -24,6 +24,7 @@ import unittest
 
 from CapuaEnvironment.MemoryArray.MemoryArray import MemoryArray
 from Configuration.Configuration import MEMORY_ARRAY_NUMBER_OF_MEMORY_CELL, \
+                                        MEMORY_PAGE_SIZE, \
                                         MEMORY_START_AT, \
                                         MEMORY_CELL_INITIAL_VALUE, \
                                         MEMORY_END_AT
@@ -46,7 +47,8 @@ class TestMemoryArray(unittest.TestCase):
         Validates good working of the __init__ method for MemoryArray
         """
         ma = MemoryArray()
-        self.assertEqual(MEMORY_ARRAY_NUMBER_OF_MEMORY_CELL, len(ma._memoryCellArray))
+        self.assertEqual(MEMORY_ARRAY_NUMBER_OF_MEMORY_CELL,
+                         len(ma.readMemory(MEMORY_START_AT, MEMORY_ARRAY_NUMBER_OF_MEMORY_CELL)))
         for mc in ma.readMemory(MEMORY_START_AT, MEMORY_ARRAY_NUMBER_OF_MEMORY_CELL):
             self.assertEqual(MEMORY_CELL_INITIAL_VALUE, mc)
 
@@ -94,6 +96,67 @@ class TestMemoryArray(unittest.TestCase):
                           MEMORY_START_AT - 1,
                           [1])
 
+    def test_load(self):
+        """
+        Validates good working of the load method for MemoryArray
+        """
+        ma = MemoryArray()
+        observed = []
+        ma.registerWriteObserver(lambda address, length: observed.append((address, length)))
+        image = bytes(range(256)) * ((3 * MEMORY_PAGE_SIZE) // 256)
+        address = MEMORY_START_AT + MEMORY_PAGE_SIZE - 16
+
+        ma.load(address, image)
+        self.assertEqual(image, ma.readMemory(address, len(image)))
+        self.assertEqual([(address, len(image))], observed)
+        self.assertEqual(MEMORY_CELL_INITIAL_VALUE, ma.readMemory(address - 1, 1)[0])
+        self.assertEqual(MEMORY_CELL_INITIAL_VALUE, ma.readMemory(address + len(image), 1)[0])
+
+        # Fully covered pages are shared until written
+        self.assertEqual(2, ma.getPageStatistics()["sharedPages"])
+        ma.writeMemory(MEMORY_START_AT + MEMORY_PAGE_SIZE, [0xff])
+        self.assertEqual(0xff, ma.readMemory(MEMORY_START_AT + MEMORY_PAGE_SIZE, 1)[0])
+        self.assertEqual(image[17:], ma.readMemory(address + 17, len(image) - 17))
+
+        self.assertRaises(MemoryError, ma.load, MEMORY_END_AT - 4, b"12345")
+
+    def test_readWriteValue(self):
+        """
+        Validates good working of the readValue and writeValue methods for MemoryArray
+        """
+        self.ma.writeValue(MEMORY_START_AT, 4, 0x01020304)
+        self.assertEqual([1, 2, 3, 4], list(self.ma.readMemory(MEMORY_START_AT, 4)))
+        self.assertEqual(0x01020304, self.ma.readValue(MEMORY_START_AT, 4))
+        self.assertEqual(0x020304, self.ma.readValue(MEMORY_START_AT + 1, 3))
+        self.assertEqual(0x0304, self.ma.readValue(MEMORY_START_AT + 2, 2))
+        self.assertEqual(0x04, self.ma.readValue(MEMORY_START_AT + 3, 1))
+
+        self.ma.writeValue(MEMORY_START_AT, 3, 0xAABBCC)
+        self.assertEqual(0xAABBCC04, self.ma.readValue(MEMORY_START_AT, 4))
+        self.ma.writeValue(MEMORY_START_AT + 2, 2, 0xDDEE)
+        self.assertEqual(0xAABBDDEE, self.ma.readValue(MEMORY_START_AT, 4))
+        self.ma.writeValue(MEMORY_START_AT, 1, 0x11)
+        self.assertEqual(0x11BBDDEE, self.ma.readValue(MEMORY_START_AT, 4))
+
+        # Slices are copies of memory
+        memorySlice = self.ma.readMemory(MEMORY_START_AT, 4)
+        self.ma.writeValue(MEMORY_START_AT, 4, 0xFFFFFFFF)
+        self.assertEqual(b"\x11\xBB\xDD\xEE", bytes(memorySlice))
+
+        # Values spanning two pages
+        self.ma.writeValue(MEMORY_START_AT + MEMORY_PAGE_SIZE - 2, 4, 0x0A0B0C0D)
+        self.assertEqual(0x0A0B0C0D, self.ma.readValue(MEMORY_START_AT + MEMORY_PAGE_SIZE - 2, 4))
+        self.assertEqual(0x0C0D, self.ma.readValue(MEMORY_START_AT + MEMORY_PAGE_SIZE, 2))
+        self.assertEqual(b"\x0B\x0C", bytes(self.ma.readMemory(MEMORY_START_AT + MEMORY_PAGE_SIZE - 1, 2)))
+
+        self.assertRaises(ValueError, self.ma.writeValue, MEMORY_START_AT, 1, 0x100)
+        self.assertRaises(ValueError, self.ma.writeValue, MEMORY_START_AT, 3, 0x1000000)
+        self.assertRaises(ValueError, self.ma.writeValue, MEMORY_START_AT, 4, 0x100000000)
+        self.assertRaises(ValueError, self.ma.writeValue, MEMORY_START_AT, 5, 0x00)
+        self.assertRaises(ValueError, self.ma.readValue, MEMORY_START_AT, 5)
+        self.assertRaises(MemoryError, self.ma.readValue, MEMORY_END_AT - 2, 4)
+        self.assertRaises(MemoryError, self.ma.writeValue, MEMORY_START_AT - 1, 4, 0x00)
+
     def test_validateAddressForLengthAccess(self):
         """
         Validates good working of the _validateAddressForLengthAccess method
@@ -127,6 +190,25 @@ class TestMemoryArray(unittest.TestCase):
                           self.ma._computeArrayIndexFromAddress,
                           MEMORY_END_AT + 1)  # invalid address
 
+    def test_fork(self):
+        """
+        Validates good working of the fork method for MemoryArray
+        """
+        ma = MemoryArray()
+        self.assertEqual(0, ma.getPageStatistics()["ownedPages"])
+        ma.writeMemory(MEMORY_START_AT + MEMORY_PAGE_SIZE - 1, b"\x01\x02")
+        self.assertEqual(2, ma.getPageStatistics()["ownedPages"])
+        self.assertEqual([0, 1], ma.getModifiedPages())
+
+        forked = ma.fork()
+        self.assertEqual(2, forked.getPageStatistics()["sharedPages"])
+        forked.writeValue(MEMORY_START_AT + MEMORY_PAGE_SIZE, 1, 0x03)
+        ma.writeValue(MEMORY_START_AT + MEMORY_PAGE_SIZE - 1, 1, 0x04)
+        self.assertEqual(0x0103, forked.readValue(MEMORY_START_AT + MEMORY_PAGE_SIZE - 1, 2))
+        self.assertEqual(0x0402, ma.readValue(MEMORY_START_AT + MEMORY_PAGE_SIZE - 1, 2))
+        self.assertEqual(1, forked.getPageStatistics()["ownedPages"])
+        self.assertEqual(MEMORY_CELL_INITIAL_VALUE, forked.readValue(MEMORY_END_AT - 1, 1))
+
 
 if __name__ == '__main__':
     unittest.main()
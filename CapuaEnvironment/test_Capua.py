@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+import os
+import tempfile
+import unittest
+
+from CapuaEnvironment.Capua import Capua
+from CapuaEnvironment.IOComponent.MemoryIOController import MemoryIOController
+from CapuaEnvironment.MemoryArray.MemoryArray import MemoryArray
+from Configuration.Configuration import MEMORY_START_AT, \
+                                        MEMORY_CELL_INITIAL_VALUE, \
+                                        REGISTER_A, \
+                                        REGISTER_C
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2015, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+
+class TestCapua(unittest.TestCase):
+
+    def _buildCapua(self, coreCount=1):
+        ma = MemoryArray()
+        return Capua(ma=ma, mioc=MemoryIOController(ma), coreCount=coreCount)
+
+    def test_init(self):
+        """
+        Validates good working of the __init__ method for Capua
+        """
+        capua = self._buildCapua(coreCount=3)
+        self.assertEqual(3, len(capua.cores))
+        self.assertIs(capua.eu, capua.cores[0])
+        self.assertEqual([0, 1, 2], [core.coreId for core in capua.cores])
+        self.assertEqual(capua.cores, capua.mioc.getExecutionUnits())
+        self.assertRaises(ValueError, self._buildCapua, 0)
+
+    def test_run(self):
+        """
+        Validates good working of the run method for Capua, cores are interleaved deterministically
+        and SFSTOR is a compare and store shared by all cores
+        """
+        capua = self._buildCapua(coreCount=2)
+        capua.ma.writeMemory(MEMORY_START_AT, b"\x66\x00\x00\x00\x01\x00")              # ADD #1 $A
+        capua.ma.writeMemory(MEMORY_START_AT + 6, b"\x41\x00" + (MEMORY_START_AT).to_bytes(4, "big"))  # JMP <>
+        for core in capua.cores:
+            core.setupCore(MEMORY_START_AT)
+        self.assertEqual([150, 100], capua.run(count=250, quantum=50))
+        self.assertEqual([75, 50], [core.A for core in capua.cores])
+        self.assertEqual([300, 200], capua.run(count=500))
+        self.assertRaises(ValueError, capua.run, 10, 0)
+
+        # Both cores try to take the same lock, only the first one can
+        lockAddress = MEMORY_START_AT + 0x100
+        capua.ma.writeMemory(lockAddress, b"\x00\x00\x00\x00")
+        capua.ma.writeMemory(MEMORY_START_AT + 0x10, b"\x52\x31")                            # SFSTOR <LH> $B
+        for core in capua.cores:
+            core.setupCore(MEMORY_START_AT + 0x10)
+            core.A = lockAddress
+            core.B = 0x01
+        self.assertEqual([1, 1], capua.run(count=2, quantum=1))
+        self.assertEqual(0b001, capua.cores[0].FLAGS)
+        self.assertEqual(0b100, capua.cores[1].FLAGS)
+        self.assertEqual(0x01, capua.ma.readValue(lockAddress, 4))
+
+    def test_loadProgram(self):
+        """
+        Validates good working of the loadProgram method for Capua
+        """
+        capua = self._buildCapua()
+        binFile, binPath = tempfile.mkstemp()
+        os.write(binFile, (MEMORY_START_AT + 0x100).to_bytes(4, "big") + b"\x01\x02\x03")
+        os.close(binFile)
+        try:
+            self.assertEqual(MEMORY_START_AT, capua.loadProgram(binPath, MEMORY_START_AT))
+            self.assertEqual(MEMORY_START_AT, capua.eu.I)
+            self.assertEqual(MEMORY_START_AT + 0x100, capua.ma.readValue(MEMORY_START_AT, 4))
+
+            # Software loader, the load address is taken from the binary
+            self.assertEqual(MEMORY_START_AT + 0x100, capua.loadProgram(binPath, softwareLoader=True))
+            self.assertEqual(MEMORY_START_AT + 0x100, capua.eu.I)
+            self.assertEqual(b"\x01\x02\x03", capua.ma.readMemory(MEMORY_START_AT + 0x100, 3))
+
+            with open(binPath, "wb") as shortFile:
+                shortFile.write(b"\x40\x00\x00")
+            self.assertRaises(ValueError, capua.loadProgram, binPath, softwareLoader=True)
+
+            open(binPath, "wb").close()
+            self.assertRaises(ValueError, capua.loadProgram, binPath)
+        finally:
+            os.remove(binPath)
+
+    def test_snapshotRestore(self):
+        """
+        Validates good working of the snapshot and restore methods for Capua
+        """
+        capua = self._buildCapua()
+        capua.ma.writeMemory(MEMORY_START_AT + 0x10, b"\x01\x02\x03\x04")
+        capua.ma.writeMemory(MEMORY_START_AT + 0x5000, b"\x05")
+        capua.eu.setupCore(MEMORY_START_AT + 0x10)
+        capua.eu.A = 0x11
+        capua.eu.S2 = 0x22
+        capua.eu.FLAGS = 0b010
+        capua.eu.IS = 1
+        capua.eu.IVR = MEMORY_START_AT + 0x100
+        capua.eu.signalHardwareInterrupt(0x02)
+
+        snapshotFile, snapshotPath = tempfile.mkstemp()
+        os.close(snapshotFile)
+        try:
+            capua.snapshot(snapshotPath)
+
+            # Fork, the restored machine will be modified independently
+            restored = self._buildCapua()
+            restored.ma.writeMemory(MEMORY_START_AT + 0x9000, b"\x00")
+            restored.ifu.fetchInstructionAtAddress(MEMORY_START_AT + 0x10)
+            restored.restore(snapshotPath)
+            self.assertEqual(capua.eu.getState(), restored.eu.getState())
+            self.assertEqual(b"\x01\x02\x03\x04", bytes(restored.ma.readMemory(MEMORY_START_AT + 0x10, 4)))
+            self.assertEqual(0x05, restored.ma.readValue(MEMORY_START_AT + 0x5000, 1))
+            self.assertEqual(MEMORY_CELL_INITIAL_VALUE, restored.ma.readValue(MEMORY_START_AT + 0x9000, 1))
+            # Decoded instructions from before the restore are gone
+            self.assertEqual(0, restored.ifu.getCacheStatistics()["entries"])
+
+            restored.ma.writeMemory(MEMORY_START_AT + 0x10, b"\xFF")
+            self.assertEqual(0x01, capua.ma.readValue(MEMORY_START_AT + 0x10, 1))
+
+            with open(snapshotPath, "r+b") as corrupted:
+                corrupted.write(b"X")
+            self.assertRaises(ValueError, restored.restore, snapshotPath)
+        finally:
+            os.remove(snapshotPath)
+
+    def test_snapshotRestoreTimer(self):
+        """
+        Validates that a machine restored with its InterruptClock timer running still gets interrupted
+        on time, in virtual time
+        """
+        program = bytes([0b01100000]) + (2).to_bytes(4, "big") + bytes([REGISTER_A])            # MOV #2 $A
+        program += bytes([0b00100000, 0b01000000]) + (0x20000300).to_bytes(4, "big")            # MEMW [4] $A timer
+        program += bytes([0b01100110]) + (1).to_bytes(4, "big") + bytes([REGISTER_C])           # ADD #1 $C
+        program += bytes([0b01000001, 0b000]) + (MEMORY_START_AT + 12).to_bytes(4, "big")       # JMP <> ADD
+        handlerAddress = MEMORY_START_AT + 0x10000
+
+        def buildCapua():
+            ma = MemoryArray()
+            return Capua(ma=ma, mioc=MemoryIOController(ma, testOnly=False, deviceThreads=False, virtualTime=True))
+
+        capua = buildCapua()
+        capua.ma.load(MEMORY_START_AT, program)
+        capua.ma.writeValue(MEMORY_START_AT + 0x20000, 4, handlerAddress)
+        capua.eu.setupCore(MEMORY_START_AT)
+        capua.eu.IVR = MEMORY_START_AT + 0x20000
+        capua.eu.S = MEMORY_START_AT + 0x30000
+        capua.eu.IS = 1
+        restored = buildCapua()
+
+        snapshotFile, snapshotPath = tempfile.mkstemp()
+        os.close(snapshotFile)
+        try:
+            # Timer is armed by the 2nd instruction, the interrupt is due 2000 instructions later
+            capua.eu.run(count=1000)
+            capua.snapshot(snapshotPath)
+
+            # Restoring twice must not leave two timers running
+            restored.restore(snapshotPath)
+            restored.restore(snapshotPath)
+            self.assertEqual(1000, restored.mioc.retiredInstructions)
+            restored.eu.run(until={handlerAddress})
+            self.assertEqual(0, restored.eu.IS)
+            self.assertEqual(2002, restored.mioc.retiredInstructions)
+            self.assertEqual(1000, restored.eu.C)
+            restored.eu.IS = 1
+            restored.eu.I = MEMORY_START_AT + 12
+            restored.eu.run(until={handlerAddress})
+            self.assertEqual(4002, restored.mioc.retiredInstructions)
+        finally:
+            capua.mioc.prepareForShutdown()
+            restored.mioc.prepareForShutdown()
+            os.remove(snapshotPath)
@@ -33,6 +33,16 @@ MEMORY_START_AT = 0x40000000
 MEMORY_ARRAY_NUMBER_OF_MEMORY_CELL = 0x100000 * 16  # 1 048 576 * 16 memory cells = 16 Megs of RAM
 MEMORY_END_AT = MEMORY_START_AT + MEMORY_ARRAY_NUMBER_OF_MEMORY_CELL
 MEMORY_CELL_INITIAL_VALUE = 0XFF  # NOP operation
+MEMORY_PAGE_SHIFT = 12           # Memory is made of 4KiB pages, copied when first written (copy on write)
+MEMORY_PAGE_SIZE = 1 << MEMORY_PAGE_SHIFT
+
+INSTRUCTION_CACHE_ENABLED = True    # When True, the InstructionFetchUnit keeps decoded instructions around
+INSTRUCTION_CACHE_PAGE_SHIFT = 8    # Cached instructions are indexed by 256 bytes pages for invalidation purpose
+
+EXECUTION_MODE_INTERPRETER = 0      # Instructions are dispatched one by one to the LogicUnit
+EXECUTION_MODE_BLOCK = 1            # Basic blocks are translated to Python code by the BlockTranslator
+EXECUTION_MODE = EXECUTION_MODE_INTERPRETER
+BLOCK_TRANSLATION_MAX_LENGTH = 64   # Maximum number of instructions in a translated block
 
 REGISTER_A = 0b0000
 REGISTER_B = 0b0001
@@ -54,8 +64,17 @@ REGISTER_G2 = 0b1110
 
 REGISTER_S2 = 0b1111
 
+CORE_SCHEDULING_QUANTUM = 100     # Instructions a core runs before the next core gets to run (see Capua.run)
+
+MEMORY_BUS_LOCK_FREE_RAM = True     # When True, RAM accesses do not take the memory bus lock (see MemoryIOController)
+MEMORY_MAPPED_DEVICE_PAGE_SHIFT = 8         # Memory mapped devices are looked up using 256 bytes pages
+MEMORY_MAPPED_DEVICE_MAXIMUM_PAGES = 0x10000  # Maximum number of pages a single device can be mapped on
+
 DISPLAY_REFRESH_RATE = 5      # This is in milliseconds
 DISPLAY_FONT_SIZE = 12
+DISPLAY_BACKEND_TK = "tk"                # Display in a Tk window (requires tkinter)
+DISPLAY_BACKEND_HEADLESS = "headless"    # Display into an in memory screen and, optionally, a pseudo terminal
+DISPLAY_BACKEND = DISPLAY_BACKEND_TK
 
 KEYBOARD_REFRESH_RATE = 5      # This is in milliseconds
 KEYBOARD_BUFFER_SIZE = 20       # How big is the keyboard buffer (scan code buffer)
@@ -63,6 +82,10 @@ KEYBOARD_BUFFER_SIZE = 20       # How big is the keyboard buffer (scan code buff
 HARD_DRIVE_FILE_PATH = "HD.bin"
 HARD_DRIVE_SECTOR_SIZE = 512
 HARD_DRIVE_MAX_SIZE = 2048    # Size is given in sectors!!! 2048 sectors of 512 bytes each = 1MB
+HARD_DRIVE_INTERRUPT_RETRY_DELAY = 1    # In milliseconds, delay before signaling again a transfer end the core refused
+
+VIRTUAL_TIME_ENABLED = False     # When True, time is measured in executed instructions instead of wall clock time
+VIRTUAL_TIME_INSTRUCTIONS_PER_MILLISECOND = 1000  # Length of a virtual millisecond, in executed instructions
 
 INTERRUPT_CLOCK = 0x00
 INTERRUPT_KEYBOARD = 0x01
@@ -70,6 +93,12 @@ INTERRUPT_HARD_DRIVE_DONE_READ = 0x02
 INTERRUPT_HARD_DRIVE_DONE_WRITE = 0x03
 
 DEBUGGER_WAKEUP_TICK_COUNT = 0    # Used to keep debugger "in control"
+DEBUGGER_CHECKPOINT_INTERVAL = 1000     # Instructions between two checkpoints of the debugger execution history
+DEBUGGER_HISTORY_MAX_MEMORY = 0x4000000  # Bytes the execution history may use, oldest checkpoints are dropped first
+
+RUNNER_CHECK_INTERVAL = 10000     # Instructions run by the Runner between two checks of its stop conditions
+
+TRACE_BUFFER_RECORD_COUNT = 0x10000   # Number of instructions kept by a TraceRecorder (last ones executed)
 
 VIRTUAL_BOOT_ENABLED = True       # This will enforce booting from the "hard drive" by using the "firmware"
 FIRMWARE_LOAD_ADDRESS = 0x40001000      # Firmware will be loaded at this address when using virtual boot
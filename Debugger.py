@@ -21,7 +21,8 @@ with this program; if not, write to the Free Software Foundation, Inc.,
 """
 
 from Configuration.Configuration import FIRMWARE_BINARY_FILE_PATH, \
-                                        FIRMWARE_LOAD_ADDRESS
+                                        FIRMWARE_LOAD_ADDRESS, \
+                                        DEBUGGER_CHECKPOINT_INTERVAL
 from ToolChain.Debugger.Debugger import Debugger
 from ToolChain.Linker.Constants import DEFAULT_LOAD_ADDRESS, UNDEFINED
 
@@ -73,6 +74,13 @@ def parseCommandLineArgs():
                         help="This is required if -s option was used on the linker. That will allow "
                              "binary to be loader at correct address specified inside the binary")
 
+    parser.add_argument("-k", "--checkpoint",
+                        required=False,
+                        type=int,
+                        default=DEBUGGER_CHECKPOINT_INTERVAL,
+                        help="Number of instructions between two checkpoints of the execution history. "
+                             "Going back in time replays at most that many instructions.")
+
     args = parser.parse_args()
 
     return args
@@ -124,7 +132,8 @@ if __name__ == '__main__':
                         outputFile=usableArgs.output,
                         loadAddress=usableArgs.address,
                         softwareLoader=usableArgs.software,
-                        symbolsFile=symbolsFile)
+                        symbolsFile=symbolsFile,
+                        checkpointInterval=usableArgs.checkpoint)
     if usableArgs.output is not None and os.path.exists(usableArgs.output[0]):
         # The assembler did the job correctly and the out file has been written to disk!
         print("Debug session is over, output file has been written to {}". format(usableArgs.output,))
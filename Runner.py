@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+from Configuration.Configuration import EXECUTION_MODE_BLOCK, \
+                                        EXECUTION_MODE_INTERPRETER
+from CapuaEnvironment.ExecutionUnit.Profiler import loadSymbols
+from ToolChain.Linker.Constants import DEFAULT_LOAD_ADDRESS
+from ToolChain.Runner.Runner import Runner, RUN_STATUS_HALTED, RUN_STATUS_ERROR
+
+import argparse
+import json
+import os
+import sys
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2015, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+
+EXECUTION_MODES = {"interpreter": EXECUTION_MODE_INTERPRETER,
+                   "block": EXECUTION_MODE_BLOCK}
+CLOCK_MODES = {"real": False,
+               "virtual": True}
+
+
+def parseCommandLineArgs():
+    """
+    As implied by the name, this will parse the command line arguments so we can use them.
+    :return: A parsed object as provided by argparse.parse_args()
+    """
+    parser = argparse.ArgumentParser(prog="Runner.py",
+                                     description="Capua Batch Runner Version {}".format(__version__,),
+                                     epilog="This tool is provided as part of Spartacus learning environment under {} "
+                                            "licence. Feel free to distribute, modify, "
+                                            "contribute and learn!".format(__license__,))
+    parser.add_argument("-i", "--input",
+                        required=False,
+                        type=str,
+                        default=None,
+                        help="Define the binary file to be run. If absent, the firmware is used (virtual boot).")
+
+    parser.add_argument("-a", "--address",
+                        required=False,
+                        type=int,
+                        default=DEFAULT_LOAD_ADDRESS,
+                        help="Define the address at which the binary should be loaded.")
+
+    parser.add_argument("-s", "--software",
+                        required=False,
+                        action="store_true",
+                        help="This is required if -s option was used on the linker. The binary will be loaded "
+                             "at the address specified inside the binary")
+
+    parser.add_argument("-r", "--restore",
+                        required=False,
+                        type=str,
+                        default=None,
+                        help="Start from a machine snapshot instead of loading a binary.")
+
+    parser.add_argument("-S", "--snapshot",
+                        required=False,
+                        type=str,
+                        default=None,
+                        help="Save a snapshot of the machine to this file once the run is over.")
+
+    parser.add_argument("-n", "--instructions",
+                        required=False,
+                        type=int,
+                        default=None,
+                        help="Maximum number of instructions to be executed.")
+
+    parser.add_argument("-t", "--time",
+                        required=False,
+                        type=float,
+                        default=None,
+                        help="Maximum number of seconds the program is allowed to run.")
+
+    parser.add_argument("-c", "--clock",
+                        required=False,
+                        choices=sorted(CLOCK_MODES.keys()),
+                        default=None,
+                        help="Use the host clock or virtual time (measured in executed instructions) for "
+                             "the clock devices. If absent, the configured one is used.")
+
+    parser.add_argument("-m", "--mode",
+                        required=False,
+                        choices=sorted(EXECUTION_MODES.keys()),
+                        default="block",
+                        help="Execution mode of the core.")
+
+    parser.add_argument("-p", "--profile",
+                        required=False,
+                        type=str,
+                        default=None,
+                        help="Profile the run and write the profile report to this file. Profiling is slow, "
+                             "instructions are run one at a time.")
+
+    parser.add_argument("-y", "--symbols",
+                        required=False,
+                        type=str,
+                        default=None,
+                        help="Symbols file, as produced by the linker, used to resolve addresses in the "
+                             "profile report.")
+
+    parser.add_argument("-T", "--trace",
+                        required=False,
+                        type=str,
+                        default=None,
+                        help="Record the last instructions executed and save them to this file once the run "
+                             "is over, even if the program crashed. See TraceDecoder.py.")
+
+    args = parser.parse_args()
+
+    return args
+
+
+if __name__ == '__main__':
+    usableArgs = parseCommandLineArgs()
+
+    if usableArgs.input is not None and not os.path.exists(usableArgs.input):
+        raise ValueError("ERROR: file {} does not exists.".format(usableArgs.input,))
+
+    runner = Runner(inputFile=usableArgs.input,
+                    loadAddress=usableArgs.address,
+                    softwareLoader=usableArgs.software,
+                    executionMode=EXECUTION_MODES[usableArgs.mode],
+                    snapshotFile=usableArgs.restore,
+                    virtualTime=CLOCK_MODES.get(usableArgs.clock))
+    if usableArgs.profile is not None:
+        runner.enableProfiling()
+    if usableArgs.trace is not None:
+        runner.enableTracing()
+    summary = runner.run(maxInstructions=usableArgs.instructions,
+                         maxSeconds=usableArgs.time,
+                         snapshotFile=usableArgs.snapshot)
+
+    print(json.dumps(summary, indent=2))
+
+    if usableArgs.trace is not None:
+        runner.traceRecorder.save(usableArgs.trace)
+
+    if usableArgs.profile is not None:
+        symbols = loadSymbols(usableArgs.symbols) if usableArgs.symbols is not None else None
+        profileFile = open(usableArgs.profile, "w")
+        profileFile.write(runner.profiler.formatReport(symbols))
+        profileFile.close()
+
+    # 0 when the program halted, 1 when it crashed, 2 when it was stopped by a limit
+    if summary["status"] == RUN_STATUS_HALTED:
+        sys.exit(0)
+    elif summary["status"] == RUN_STATUS_ERROR:
+        sys.exit(1)
+    sys.exit(2)
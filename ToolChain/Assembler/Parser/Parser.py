@@ -22,6 +22,7 @@ with this program; if not, write to the Free Software Foundation, Inc.,
 
 from CapuaEnvironment.Instruction.Instruction import Instruction
 from CapuaEnvironment.Instruction.OperationDescription import operationDescription
+from CapuaEnvironment.IntructionFetchUnit.DecodeTable import decodeTable, formFields
 from CapuaEnvironment.IntructionFetchUnit.FormDescription import formDescription
 from Configuration.Configuration import REGISTER_A, \
                                         REGISTER_B, \
@@ -482,23 +483,25 @@ class Parser:
         instructionForm = None
 
         for code in possibleCodes:
-            for form in formDescription:
-                if formDescription[form]["typeCode"] is not (code >> 4):
+            # The instruction code directly gives the form to be validated
+            decodeEntry = decodeTable[code]
+            if decodeEntry is None:
+                continue
+            form = decodeEntry["formName"]
+            found = True
+            for subElem in formDescription[form]["description"]:
+                if subElem == "instructionCode":
                     continue
-                found = True
-                for subElem in formDescription[form]["description"]:
-                    if subElem == "instructionCode":
-                        continue
-                    if getattr(partialInstruction, subElem) is None:
-                        # This is not what we are looking for
-                        found = False
-                        break
-                    else:
-                        found = True
-
-                if found:
-                    instructionCode = code
-                    instructionForm = form
+                if getattr(partialInstruction, subElem) is None:
+                    # This is not what we are looking for
+                    found = False
+                    break
+                else:
+                    found = True
+
+            if found:
+                instructionCode = code
+                instructionForm = form
 
         goodInstructionParams = ["instructionCode",
                                  "sourceRegister",
@@ -530,18 +533,9 @@ class Parser:
         instructionPartToBeUsed = None
         memoryRefSymbol = None
 
-        for instructionPart in form["description"]:
-            shiftValue = 0x00  # This will be used in the last shifting operation for this part
-            instructionPartBitMask = form["description"][instructionPart]
-
-            # This is so we are able to use an and followed by a right shift to build the instruction
-            # easiest way that my brain could come up with. All other ways of building instructions
-            # seems to rely on ugly logic based on if chaining... Ugly. This is better. We are shifting
-            # until we find the "edge" of this part of the instruction.
-            while instructionPartBitMask % 2 is not 1:
-                instructionPartBitMask >>= 1  # Shift right one bit
-                shiftValue += 1
-
+        # This is so we are able to use an and followed by a left shift to build the instruction.
+        # Shift values and right aligned masks for every part of the form come from the DecodeTable.
+        for instructionPart, shiftValue, instructionPartBitMask in formFields[form["typeCode"]]:
             instructionPartOriginal = getattr(instruction, instructionPart)
             # We need an intermediate step because a part could be text...
             if type(instructionPartOriginal) is str:
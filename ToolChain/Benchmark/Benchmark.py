@@ -0,0 +1,431 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+from CapuaEnvironment.ExecutionUnit.ExecutionUnit import ExecutionUnit
+from CapuaEnvironment.IntructionFetchUnit.InstructionFetchUnit import InstructionFetchUnit
+from CapuaEnvironment.IOComponent.MemoryIOController import MemoryIOController
+from CapuaEnvironment.IOComponent.MemoryMappedDevices.Terminal.HeadlessDisplayBackend import HeadlessDisplayBackend
+from CapuaEnvironment.MemoryArray.MemoryArray import MemoryArray
+from Configuration.Configuration import EXECUTION_MODE_BLOCK, \
+                                        EXECUTION_MODE_INTERPRETER, \
+                                        MEMORY_START_AT, \
+                                        REGISTER_S2
+from ToolChain.Assembler.Assembler import Assembler
+from ToolChain.Assembler.Parser.Parser import Parser
+from ToolChain.Linker.StaticFlatLinker import StaticFlatLinker
+
+import os
+import tempfile
+import time
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2015, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+
+EXECUTION_MODES = (("interpreter", EXECUTION_MODE_INTERPRETER),
+                   ("block", EXECUTION_MODE_BLOCK))
+
+# Workloads run by the core benchmarks. Every one of them loops forever, the benchmark decides
+# how many instructions get executed. Note that JMP <> only jumps when FLAGS are all cleared.
+ARITHMETIC_LOOP = """
+.global start
+start:
+    MOV #0 $A
+    MOV #0x7FFFFFFF $B
+loop:
+    ADD #1 $A
+    SUB #1 $B
+    CMP $A $B
+    XOR $A $C
+    SHL #1 $C
+    AND #0xFFFF $C
+    OR $C $D
+    JMP <> loop
+"""
+
+MEMORY_LOOP = """
+.global start
+start:
+    MOV buffer $C
+    MOV buffer $D
+    ADD #4 $D
+loop:
+    MEMR [4] $C $A
+    ADD #1 $A
+    MEMW [4] $A $C
+    MEMR [1] $C $B
+    MEMW [1] $B $D
+    MEMW [2] #0x4141 $D
+    JMP <> loop
+buffer:
+.dataNumeric 0x0
+.dataNumeric 0x0
+"""
+
+RECURSION_LOOP = """
+.global start
+start:
+    MOV stack $S
+loop:
+    MOV #16 $A
+    CALL recurse
+    JMP <> loop
+recurse:
+    SUB #1 $A
+    CMP #0 $A
+    JMP <Z> recurseDone
+    CALL recurse
+recurseDone:
+    RET
+stack:
+.dataNumeric 0x0
+"""
+
+TERMINAL_LOOP = """
+.global start
+start:
+    MOV #0x41424344 $B
+    MOV #0 $C
+loop:
+    MOV $C $A
+    ADD #0x20001000 $A
+    MEMW [4] $B $A
+    ADD #4 $C
+    AND #0x3FF $C
+    JMP <> loop
+"""
+
+BENCHMARK_NAMES = ("registerAccess", "registerInstructions", "decode", "arithmeticLoop", "memoryLoop",
+                   "recursion", "terminalWrites", "parser", "linker")
+
+DECODE_REPETITIONS = 64             # Number of copies of ARITHMETIC_LOOP instructions decoded by benchmarkDecode
+PARSER_LINE_COUNT = 5000            # Number of lines of the file parsed by benchmarkParser
+LINKER_WORKLOADS = ((1, 100),       # (number of object files, number of symbols per file) for benchmarkLinker
+                    (8, 100),
+                    (32, 100),
+                    (8, 400))
+
+
+class Benchmark:
+    """
+    The Benchmark measures how fast different parts of the Capua environment are. Every benchmark
+    returns a dict of measurements where each value is a time in nanoseconds per operation. This is
+    meant to be used when working on performance so that changes can be compared on the same machine.
+    Devices are not created (MIOC testOnly mode) so results are not polluted by device threads. The
+    terminal benchmark is the exception, it uses a Terminal that does not run any thread.
+
+    Workloads are fixed so that results of different versions can be compared (see compareResults).
+    Core benchmarks run the given number of iterations, toolchain benchmarks always work on the
+    same generated files.
+    """
+
+    iterations = 0
+
+    def __init__(self, iterations: int=100000):
+        """
+        Prepare the benchmark
+        :param iterations: int, number of operations to be timed for each measurement
+        """
+        if iterations is None or type(iterations) is not int or iterations <= 0:
+            raise ValueError("Benchmark error, iterations has to be a positive integer")
+        self.iterations = iterations
+
+    def runAll(self, benchmarkNames=None):
+        """
+        Run all available benchmarks
+        :param benchmarkNames: list, name of the benchmarks to be run (see BENCHMARK_NAMES), None for all of them
+        :return: dict, {benchmarkName: {measurementName: nanoseconds per operation}}
+        """
+        benchmarks = {"registerAccess": self.benchmarkRegisterAccess,
+                      "registerInstructions": self.benchmarkRegisterInstructions,
+                      "decode": self.benchmarkDecode,
+                      "arithmeticLoop": lambda: self.benchmarkProgram(ARITHMETIC_LOOP),
+                      "memoryLoop": lambda: self.benchmarkProgram(MEMORY_LOOP),
+                      "recursion": lambda: self.benchmarkProgram(RECURSION_LOOP),
+                      "terminalWrites": lambda: self.benchmarkProgram(TERMINAL_LOOP, withDevices=True),
+                      "parser": self.benchmarkParser,
+                      "linker": self.benchmarkLinker}
+
+        results = {}
+        for benchmarkName in BENCHMARK_NAMES:
+            if benchmarkNames is None or benchmarkName in benchmarkNames:
+                results[benchmarkName] = benchmarks[benchmarkName]()
+        return results
+
+    def benchmarkRegisterAccess(self):
+        """
+        Time register file accesses done through the ExecutionUnit. S2 is used since it is the
+        last register code, the worst case when registers were looked up one after the other.
+        :return: dict, nanoseconds per access
+        """
+        eu = self._buildCore(EXECUTION_MODE_INTERPRETER)
+        getRegisterValue = eu.getRegisterValue
+        setRegisterValue = eu.setRegisterValue
+
+        start = time.perf_counter()
+        for _ in range(self.iterations):
+            getRegisterValue(REGISTER_S2)
+        getTime = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(self.iterations):
+            setRegisterValue(REGISTER_S2, 0x41414141)
+        setTime = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(self.iterations):
+            eu.S2 = eu.S2
+        namedTime = time.perf_counter() - start
+
+        return {"getRegisterValue": self._nanosecondsPerOperation(getTime),
+                "setRegisterValue": self._nanosecondsPerOperation(setTime),
+                "namedReadWrite": self._nanosecondsPerOperation(namedTime)}
+
+    def benchmarkRegisterInstructions(self):
+        """
+        Time a loop made of register to register instructions: ADD $G2 $S2, XOR $A $F2, JMP <> loop
+        This is run in every execution mode.
+        :return: dict, nanoseconds per instruction for each execution mode
+        """
+        program = (0x92EF).to_bytes(2, "big")                  # ADD $G2 $S2
+        program += (0x900D).to_bytes(2, "big")                 # XOR $A $F2
+        program += (0x4100).to_bytes(2, "big")                 # JMP <> loop
+        program += MEMORY_START_AT.to_bytes(4, "big")
+
+        results = {}
+        for modeName, executionMode in EXECUTION_MODES:
+            eu = self._buildCore(executionMode, program=program)
+
+            start = time.perf_counter()
+            eu.executeMany(self.iterations)
+            results[modeName] = self._nanosecondsPerOperation(time.perf_counter() - start)
+
+        return results
+
+    def benchmarkDecode(self):
+        """
+        Time the InstructionFetchUnit decoding the instructions of ARITHMETIC_LOOP, copied many times
+        in memory. Every instruction is decoded once per iteration, with and without the decoded
+        instruction cache.
+        :return: dict, nanoseconds per decoded instruction
+        """
+        program = self._buildProgram(ARITHMETIC_LOOP)
+        memoryArray = MemoryArray()
+        memoryArray.writeMemory(MEMORY_START_AT, program * DECODE_REPETITIONS)
+        endAddress = MEMORY_START_AT + len(program) * DECODE_REPETITIONS
+
+        results = {}
+        for measurementName, cacheEnabled in (("uncached", False), ("cached", True)):
+            ifu = InstructionFetchUnit(memoryArray)
+            ifu.cacheEnabled = cacheEnabled
+            fetchInstructionAtAddress = ifu.fetchInstructionAtAddress
+            address = MEMORY_START_AT
+
+            start = time.perf_counter()
+            for _ in range(self.iterations):
+                address = fetchInstructionAtAddress(address)[1]
+                if address == endAddress:
+                    address = MEMORY_START_AT
+            results[measurementName] = self._nanosecondsPerOperation(time.perf_counter() - start)
+
+        return results
+
+    def benchmarkProgram(self, source: str="", withDevices: bool=False):
+        """
+        Time the execution of a Capua program. Programs used are ARITHMETIC_LOOP, MEMORY_LOOP,
+        RECURSION_LOOP and TERMINAL_LOOP. This is run in every execution mode.
+        :param source: str, Capua assembly of a program that never ends
+        :param withDevices: bool, should the core have the Terminal (and InterruptClock) mapped
+        :return: dict, nanoseconds per instruction for each execution mode
+        """
+        program = self._buildProgram(source)
+
+        results = {}
+        for modeName, executionMode in EXECUTION_MODES:
+            eu = self._buildCore(executionMode, withDevices, program)
+
+            start = time.perf_counter()
+            eu.executeMany(self.iterations)
+            results[modeName] = self._nanosecondsPerOperation(time.perf_counter() - start)
+            eu.halt()
+
+        return results
+
+    def benchmarkParser(self):
+        """
+        Time the Parser on a generated file of PARSER_LINE_COUNT lines. Lines are a mix of every
+        operand kind, labels and comments.
+        :return: dict, nanoseconds per line
+        """
+        lines = [".global start", "start:"]
+        while len(lines) < PARSER_LINE_COUNT:
+            label = "label{}".format(len(lines))
+            lines += ["{}:".format(label),
+                      "    MOV #0x{:08X} $A".format(len(lines)),
+                      "    ADD $A $B",
+                      "    ; Comment line",
+                      "    MEMR [4] $C $D",
+                      "    MEMW [2] #0x4141 $D",
+                      "    CMP #0 $A",
+                      "    JMP <LH> {}".format(label),
+                      "    CALL start"]
+        lines = lines[:PARSER_LINE_COUNT]
+
+        workDirectory = tempfile.TemporaryDirectory(prefix="capuaBenchmark")
+        try:
+            sourceFile = self._writeFile(workDirectory.name, "parser.casm", "\n".join(lines) + "\n")
+            start = time.perf_counter()
+            Parser(file=sourceFile)
+            elapsed = time.perf_counter() - start
+        finally:
+            workDirectory.cleanup()
+
+        return {"line": round(elapsed * 1000000000 / PARSER_LINE_COUNT, 1)}
+
+    def benchmarkLinker(self):
+        """
+        Time the StaticFlatLinker as the number of files and symbols grows (see LINKER_WORKLOADS).
+        Every file defines the given number of symbols, each one being used by the code of the file,
+        and calls a global symbol of the next file.
+        :return: dict, {"<files>x<symbols>": nanoseconds per linked symbol}
+        """
+        results = {}
+        workDirectory = tempfile.TemporaryDirectory(prefix="capuaBenchmark")
+        try:
+            for fileCount, symbolCount in LINKER_WORKLOADS:
+                objectFiles = []
+                for fileNumber in range(fileCount):
+                    lines = [".global entry{}".format(fileNumber),
+                             "entry{}:".format(fileNumber)]
+                    for symbolNumber in range(symbolCount):
+                        lines += ["symbol{}:".format(symbolNumber),
+                                  "    MOV symbol{} $A".format(symbolNumber)]
+                    lines.append("    CALL entry{}".format((fileNumber + 1) % fileCount))
+                    sourceFile = self._writeFile(workDirectory.name, "linker{}.casm".format(fileNumber),
+                                                 "\n".join(lines) + "\n")
+                    objectFiles.append(sourceFile[:-len(".casm")] + ".o")
+                    Assembler(sourceFile, objectFiles[-1])
+
+                start = time.perf_counter()
+                StaticFlatLinker(inputFileList=objectFiles,
+                                 outputFile=os.path.join(workDirectory.name, "linker.bin"),
+                                 loadAddress=MEMORY_START_AT)
+                elapsed = time.perf_counter() - start
+                results["{}x{}".format(fileCount, symbolCount)] = round(elapsed * 1000000000 /
+                                                                        (fileCount * (symbolCount + 1)), 1)
+        finally:
+            workDirectory.cleanup()
+
+        return results
+
+    def _buildCore(self, executionMode: int=EXECUTION_MODE_INTERPRETER, withDevices: bool=False, program=None):
+        """
+        Builds a stand alone core with its own memory
+        :param executionMode: int, the execution mode to be used by the core
+        :param withDevices: bool, if True, the InterruptClock and the Terminal are mapped. Devices do
+                            not run any thread and the Terminal displays to an unused headless display.
+        :param program: bytes, if given, loaded at MEMORY_START_AT where the core is set to start
+        :return: ExecutionUnit
+        """
+        memoryArray = MemoryArray()
+        if program is not None:
+            memoryArray.load(MEMORY_START_AT, program)
+        if withDevices:
+            mioc = MemoryIOController(memoryArray, testOnly=False, displayBackend=HeadlessDisplayBackend(),
+                                      deviceThreads=False)
+        else:
+            mioc = MemoryIOController(memoryArray)
+        ifu = InstructionFetchUnit(memoryArray)
+        eu = ExecutionUnit(mioc, ifu, "Benchmark", executionMode)
+        if program is not None:
+            eu.setupCore(MEMORY_START_AT)
+        return eu
+
+    def _buildProgram(self, source: str=""):
+        """
+        Assemble and link a program so that it can be loaded at MEMORY_START_AT
+        :param source: str, Capua assembly of the program
+        :return: bytes, the linked program
+        """
+        workDirectory = tempfile.TemporaryDirectory(prefix="capuaBenchmark")
+        try:
+            sourceFile = self._writeFile(workDirectory.name, "program.casm", source)
+            objectFile = os.path.join(workDirectory.name, "program.o")
+            binaryFile = os.path.join(workDirectory.name, "program.bin")
+            Assembler(sourceFile, objectFile)
+            StaticFlatLinker(inputFileList=[objectFile], outputFile=binaryFile, loadAddress=MEMORY_START_AT)
+            file = open(binaryFile, "rb")
+            program = file.read()
+            file.close()
+        finally:
+            workDirectory.cleanup()
+        return program
+
+    def _writeFile(self, directory: str="", name: str="", content: str=""):
+        """
+        Write a generated source file
+        :param directory: str, where the file is written
+        :param name: str, name of the file
+        :param content: str, content of the file
+        :return: str, path of the file
+        """
+        path = os.path.join(directory, name)
+        file = open(path, "w")
+        file.write(content)
+        file.close()
+        return path
+
+    def _nanosecondsPerOperation(self, elapsedSeconds: float=0.0):
+        """
+        Convert a measured time into nanoseconds per operation
+        :param elapsedSeconds: float, time it took to run all iterations
+        :return: float
+        """
+        return round(elapsedSeconds * 1000000000 / self.iterations, 1)
+
+
+def compareResults(baseline=None, results=None, tolerance: float=0.1):
+    """
+    Compare benchmark results to results obtained earlier (with another version for example).
+    Since every measurement is a time, a measurement is a regression when it grew by more than
+    the tolerance.
+    :param baseline: dict, results as given by Benchmark.runAll
+    :param results: dict, results as given by Benchmark.runAll
+    :param tolerance: float, relative growth accepted before a measurement is a regression, 0.1 is 10%
+    :return: list, [(benchmarkName, measurementName, baseline ns, ns, ratio, isRegression), ...]
+             only for measurements found in both results
+    """
+    comparison = []
+    for benchmarkName in results:
+        for measurementName in results[benchmarkName]:
+            baselineValue = baseline.get(benchmarkName, {}).get(measurementName)
+            if baselineValue is None or baselineValue <= 0:
+                continue
+            value = results[benchmarkName][measurementName]
+            ratio = value / baselineValue
+            comparison.append((benchmarkName, measurementName, baselineValue, value, ratio, ratio > 1 + tolerance))
+    return comparison
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+import unittest
+
+from ToolChain.Benchmark.Benchmark import Benchmark, compareResults, ARITHMETIC_LOOP
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2015, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_compareResults(self):
+        """
+        Validates that only measurements that grew by more than the tolerance are regressions
+        """
+        baseline = {"arithmeticLoop": {"interpreter": 100.0, "block": 100.0},
+                    "decode": {"decode": 100.0, "cached": 0.0}}
+        results = {"arithmeticLoop": {"interpreter": 110.0, "block": 110.1},
+                   "decode": {"decode": 50.0, "cached": 10.0},
+                   "parser": {"parser": 100.0}}
+        comparison = compareResults(baseline, results, 0.1)
+        self.assertEqual([("arithmeticLoop", "interpreter", 100.0, 110.0, 1.1, False),
+                          ("arithmeticLoop", "block", 100.0, 110.1, 110.1 / 100.0, True),
+                          ("decode", "decode", 100.0, 50.0, 0.5, False)], comparison)
+
+        # No tolerance, any slow down is a regression
+        comparison = compareResults(baseline, results, 0.0)
+        self.assertEqual([True, True, False], [measurement[5] for measurement in comparison])
+        self.assertEqual([], compareResults({}, results))
+
+    def test_benchmarkProgram(self):
+        """
+        Validates that programs are run in every execution mode
+        """
+        self.assertRaises(ValueError, Benchmark, 0)
+        results = Benchmark(iterations=100).benchmarkProgram(ARITHMETIC_LOOP)
+        self.assertEqual({"interpreter", "block"}, set(results))
+        results = Benchmark(iterations=100).benchmarkRegisterInstructions()
+        self.assertEqual({"interpreter", "block"}, set(results))
@@ -37,11 +37,14 @@ from Configuration.Configuration import REGISTER_A, \
                                         REGISTER_G2, \
                                         REGISTER_S, \
                                         REGISTER_S2, \
-                                        DEBUGGER_WAKEUP_TICK_COUNT
+                                        DEBUGGER_WAKEUP_TICK_COUNT, \
+                                        DEBUGGER_CHECKPOINT_INTERVAL
 
+from ToolChain.Debugger.ExecutionHistory import ExecutionHistory
+from ToolChain.Debugger.SymbolTable import SymbolTable
 from ToolChain.Linker.Constants import DEFAULT_LOAD_ADDRESS
 
-import struct
+import operator
 
 __author__ = "CSE"
 __copyright__ = "Copyright 2015, CSE"
@@ -51,6 +54,16 @@ __version__ = "2.1"
 __maintainer__ = "CSE"
 __status__ = "Dev"
 
+# Operators that can be used in conditional breakpoints: b <address> if <register> <operator> <value>
+BREAKPOINT_CONDITION_OPERATORS = {"==": operator.eq,
+                                  "!=": operator.ne,
+                                  "<": operator.lt,
+                                  "<=": operator.le,
+                                  ">": operator.gt,
+                                  ">=": operator.ge}
+BREAKPOINT_CONDITION_REGISTERS = ("A", "B", "C", "D", "E", "F", "G", "A2", "B2", "C2", "D2", "E2", "F2", "G2",
+                                  "S", "S2", "I", "FLAGS")
+
 
 class Debugger:
     """
@@ -61,14 +74,17 @@ class Debugger:
 
     outputFile = None
     capua = None
-    breakPoints = None
-    symbols = None
+    breakPoints = None  # {address: [condition, hit count target, hits]}, condition is (register, operator, value)
+    watchPoints = None  # [[address, length, onRead, onWrite]]
+    symbols = None  # SymbolTable, empty when no symbols file is given
+    history = None  # ExecutionHistory, every instruction goes through it so that execution can be reversed
 
     def __init__(self, inputFile=None,
                  outputFile=None,
                  loadAddress=DEFAULT_LOAD_ADDRESS,
                  softwareLoader=False,
-                 symbolsFile=None):
+                 symbolsFile=None,
+                 checkpointInterval: int=DEBUGGER_CHECKPOINT_INTERVAL):
         """
         Building the debugger
         :param inputFile: The input file that needs to be loaded in memory
@@ -76,10 +92,14 @@ class Debugger:
         :param loadAddress: int, the address a which the binary will be loaded. This is required to resolve ref address
         :param softwareLoader: bool, is the loading done with the "software" option
         :param symbolsFile: str, the path to the symbols file to be loaded
+        :param checkpointInterval: int, instructions between two checkpoints of the execution history
         :return:
         """
 
-        self.breakPoints = []
+        self.breakPoints = {}
+        self.watchPoints = []
+        self._watchPointHits = []
+        self._reverseStopHits = {}
 
         # First thing we need is to setup logging facilities
         self.setupLoggingFacilities(outputFile)
@@ -92,9 +112,14 @@ class Debugger:
         self.debugLog("Loading {} in memory".format((inputFile,)))
         self.loadProgram(inputFile=inputFile, loadAddress=loadAddress, softwareLoader=softwareLoader)
 
+        # Execution is recorded from the very first instruction so that it can be reversed
+        self.history = ExecutionHistory(executionUnit=self.capua.eu,
+                                        memoryArray=self.capua.ma,
+                                        interval=checkpointInterval)
+
         # If we have the symbols, load them into the appropriate member
+        self.symbols = SymbolTable()
         if symbolsFile != "" and symbolsFile is not None:
-            self.symbols = {}
             self.loadSymbols(symbolsFile=symbolsFile)
 
         # At this point, debugging session is ready to be used
@@ -104,21 +129,14 @@ class Debugger:
 
     def loadSymbols(self, symbolsFile=None):
         """
-        This will simply load the symbols so that they can be used
+        This will simply load the symbols so that they can be used. The symbol table is indexed once
+        here, lookups done afterward never go through all the symbols.
         :param symbolsFile: str, path to the symbols file
         :return:
         """
 
         self.debugLog("Loading symbols from file {}".format(symbolsFile,))
-
-        file = open(symbolsFile, "r")
-        content = file.readlines()
-        file.close()
-
-        for line in content:
-            if line != "":
-                self.symbols[line.split(":")[0]] = line.split(":")[1][:-1]  # Remove the \n at the end
-
+        self.symbols = SymbolTable.load(symbolsFile)
         self.debugLog("Done loading symbols")
 
     def translateSymbolToAddress(self, symbol=None):
@@ -130,45 +148,23 @@ class Debugger:
         :return: int, the address where to find the symbol, none if symbol is can't be resolved
         """
 
-        if "." not in symbol:
-            # User is trying to go without file resolution
-            found = None
-            for key in self.symbols.keys():
-                if key.split(".")[1] == symbol:
-                    if found is None:
-                        found = key
-                    else:
-                        self.debugLog("Symbol {} is conflicting with {}". format(symbol, key,))
-                        return None
-            if found is not None:
-                return int(self.symbols[found], 16)
+        try:
+            address = self.symbols.getAddress(symbol)
+        except ValueError as e:
+            self.debugLog(str(e))
+            return None
 
-        else:
-            if symbol in self.symbols.keys():
-                return int(self.symbols[symbol], 16)
-            else:
-                self.debugLog("Symbol {} could not be resolved".format(symbol,))
-                return None
+        if address is None:
+            self.debugLog("Symbol {} could not be resolved".format(symbol,))
+        return address
 
     def translateAddressToSymbol(self, address=None):
         """
         This will lookup the symbol table and find a corresponding symbol for a given address
         :param address: The address that needs to be looked up
-        :return:
+        :return: str, None if no symbol is defined at that address
         """
-        symbolTable = self.symbols
-        addressInSymbolTable = symbolTable.values()
-        resolvedSymbol = None
-        address = hex(address)  # Address are keep as hex string in the table
-
-        if address in addressInSymbolTable:
-            for symbol in symbolTable:
-                if address == symbolTable[symbol]:
-                    # We found the symbol for this address
-                    resolvedSymbol = symbol
-                    break
-
-        return resolvedSymbol
+        return self.symbols.getSymbol(address)
 
     def setupLoggingFacilities(self, outputFile=None):
         """
@@ -197,43 +193,14 @@ class Debugger:
         :return:
         """
 
-        # First we get the content of the binary file that needs to be loaded into memory
-        content = self.getBinary(inputFile)
-
-        # We need to validate the load address in case of software loading mode...
-        if softwareLoader:
-            # In this case, the load address to be used is the first 4 bytes...
-            loadAddress = struct.unpack(">I", content[0:4])
-            content = content[4:]  # Get rid of the first 4 bytes or we will crash
-
-        # Now that we have a good load address, we load this in memory
-        memoryIndex = loadAddress
-        for dataByte in content:
-            self.capua.mioc.memoryWriteAtAddressForLength(address=memoryIndex, length=1, value=dataByte)
-            memoryIndex += 1  # Move on to the next byte to be written
-
-        # Prepare the core for execution
-        self.capua.eu.setupCore(I=loadAddress)
+        # The whole binary is placed in memory at once and the core is prepared for execution
+        self.capua.loadProgram(filePath=inputFile, loadAddress=loadAddress, softwareLoader=softwareLoader)
 
         # If we are here, the binary is technically loaded into memory
         self.debugLog("Done loading {} into memory".format((inputFile,)))
         # Program is now fully installed in memory!
         return
 
-    def getBinary(self, inputFile=None):
-        """
-        This method simply gets the content of an on disk binary file.
-        :param inputFile: string, path to the file that needs to be loaded into memory.
-        :return: the content of the file in the form of a byte array
-        """
-        content = b""
-
-        binFile = open(inputFile, "rb")
-        content = binFile.read()
-        binFile.close()
-
-        return content
-
     def debug(self, inputFile=None):
         """
         This is an eternal loop that will run until something bad happen or until user breaks the
@@ -280,7 +247,10 @@ class Debugger:
         for i in range(0, x):
             instruction, nextInstructionAddress = self.getInstructionAtAddress(address)
             instructionString = self._buildInstructionString(instruction=instruction)
-            self.debugLog(hex(address) + " : " + instructionString)
+            if len(self.symbols.addresses) > 0:
+                self.debugLog("{} <{}> : {}".format(hex(address), self.symbols.locate(address), instructionString))
+            else:
+                self.debugLog(hex(address) + " : " + instructionString)
             address = nextInstructionAddress
 
     def getInstructionAtAddress(self, address: int=None):
@@ -292,9 +262,11 @@ class Debugger:
         instruction, nextInstructionAddress = self.capua.eu.ifu.fetchInstructionAtAddress(address)
         return instruction, nextInstructionAddress
 
-    def _buildInstructionString(self, instruction=None):
+    @staticmethod
+    def _buildInstructionString(instruction=None):
         """
-        This will rebuild the instruction text information so it can be displayed
+        This will rebuild the instruction text information so it can be displayed. This does not
+        depend on a debugging session, the TraceDecoder uses it as well.
         :param instruction: A valid and fully built instruction
         :return:
         """
@@ -306,15 +278,16 @@ class Debugger:
                              "] " if instruction.width is not None else ""
         instructionString += "#" + hex(instruction.sourceImmediate) + \
                              " " if instruction.sourceImmediate is not None else ""
-        instructionString += "$" + self.convertNumericRegisterToRegisterName(instruction.sourceRegister) + \
+        instructionString += "$" + Debugger.convertNumericRegisterToRegisterName(instruction.sourceRegister) + \
                              " " if instruction.sourceRegister is not None else ""
         instructionString += "#" + hex(instruction.destinationImmediate) + \
                              " " if instruction.destinationImmediate is not None else ""
-        instructionString += "$" + self.convertNumericRegisterToRegisterName(instruction.destinationRegister) + \
+        instructionString += "$" + Debugger.convertNumericRegisterToRegisterName(instruction.destinationRegister) + \
                              " " if instruction.destinationRegister is not None else ""
         return instructionString
 
-    def convertNumericRegisterToRegisterName(self, numericRegister: int=None):
+    @staticmethod
+    def convertNumericRegisterToRegisterName(numericRegister: int=None):
         """
         This will simply convert a numeric register code to the original register name
         :param numericRegister:
@@ -419,15 +392,14 @@ class Debugger:
         # Deal with the display part
         for i in range(0, len(memSlice)):
             valueString = ""
-            # Direct access to _value is to avoid memory protection elements
             if displayFormat == "bin":
-                valueString = bin(memSlice[i]._value)
+                valueString = bin(memSlice[i])
             if displayFormat == "hex":
-                valueString = hex(memSlice[i]._value)
+                valueString = hex(memSlice[i])
             if displayFormat == "dec":
-                valueString = str(memSlice[i]._value)
+                valueString = str(memSlice[i])
             if displayFormat == "char":
-                valueString = chr(memSlice[i]._value)
+                valueString = chr(memSlice[i])
 
             addressString = hex(address + i)
             self.debugLog("{} - {}".format(addressString, valueString,))
@@ -443,20 +415,31 @@ class Debugger:
         self.debugLog("    ex: s")
         self.debugLog(" c - continue - run until next breakpoint")
         self.debugLog("    ex: c")
+        self.debugLog(" rs - reverseStep - go back x instructions (1 if not given)")
+        self.debugLog("    ex: rs 3")
+        self.debugLog(" rc - reverseContinue - go back to the previous breakpoint")
+        self.debugLog("    ex: rc")
+        self.debugLog(" hs - history - display execution history information")
+        self.debugLog("    ex: hs")
         self.debugLog(" d - display - display cpu information")
         self.debugLog("    ex: d")
         self.debugLog(" m - memory - memory inspection")
         self.debugLog("    ex: m 0x40000000 4 [bin|hex|dec|char]")
         self.debugLog(" dia - disassembleInstructionAtAddress - Will display x following instruction")
         self.debugLog("    ex: dia 3 0x4000000")
-        self.debugLog(" b - break - set breakpoint at address")
+        self.debugLog(" b - break - set breakpoint at address, optionally with a condition and a hit count")
         self.debugLog("    ex: b 0x40000000")
+        self.debugLog("    ex: b 0x40000000 if A == 0x10 hits 3")
         self.debugLog(" db - dbreak - display breakpoint list")
         self.debugLog("    ex: db")
         self.debugLog(" rb - rbreak - remove breakpoint")
         self.debugLog("    ex: rb 1")
-        self.debugLog(" b - break - add a breakpoint at address")
-        self.debugLog("    ex: b 0x4000000")
+        self.debugLog(" w - watch - set a watchpoint on a memory range [r|w|rw], w if not given")
+        self.debugLog("    ex: w 0x40000100 4 rw")
+        self.debugLog(" dw - dwatch - display watchpoint list")
+        self.debugLog("    ex: dw")
+        self.debugLog(" rw - rwatch - remove watchpoint")
+        self.debugLog("    ex: rw 0")
         self.debugLog(" ss - showSymbols - Will show all loaded symbols")
         self.debugLog("    ex: ss")
         self.debugLog(" h - help - display help menu")
@@ -466,6 +449,8 @@ class Debugger:
         """
         This is the method responsible for dispatching the user commands
             s - step - move to next instruction
+            rs - reverseStep - go back to previous instruction
+            rc - reverseContinue - go back to previous breakpoint
             d - display - display cpu information
             m - memory - memory inspection
             h - help - display help menu
@@ -481,10 +466,21 @@ class Debugger:
 
         if brokenCommand[0] == "s" or brokenCommand[0] == "step":
             # Execute next command in line
-            self.capua.eu.execute()
+            self.history.step()
+            self.displayWatchPointHits(self._watchPointHits)
+            self._watchPointHits = []
         elif brokenCommand[0] == "c" or brokenCommand[0] == "continue":
             # Run until breakpoint is reached
             self.runToBreakPoint()
+        elif brokenCommand[0] == "rs" or brokenCommand[0] == "reverseStep":
+            # Go back in time
+            count = int(brokenCommand[1]) if len(brokenCommand) > 1 else 1
+            self.reverseStep(count)
+        elif brokenCommand[0] == "rc" or brokenCommand[0] == "reverseContinue":
+            # Go back in time until a breakpoint is reached
+            self.reverseToBreakPoint()
+        elif brokenCommand[0] == "hs" or brokenCommand[0] == "history":
+            self.displayHistory()
         elif brokenCommand[0] == "d" or brokenCommand[0] == "display":
             # Display cpu information
             self.displayCPUInformation()
@@ -500,7 +496,7 @@ class Debugger:
         elif brokenCommand[0] == "b" or brokenCommand[0] == "break":
             # add a break point
             address = brokenCommand[1]
-            self.addBreakPoint(address)
+            self.addBreakPoint(address, brokenCommand[2:])
         elif brokenCommand[0] == "db" or brokenCommand[0] == "dbreak":
             # Display breakpoints
             self.displayBreakPoints()
@@ -508,6 +504,14 @@ class Debugger:
             # Remove breakpoint
             bpNumber = int(brokenCommand[1])
             self.removeBreakPoint(bpNumber)
+        elif brokenCommand[0] == "w" or brokenCommand[0] == "watch":
+            # add a watchpoint
+            mode = brokenCommand[3] if len(brokenCommand) > 3 else "w"
+            self.addWatchPoint(brokenCommand[1], int(brokenCommand[2], 0), mode)
+        elif brokenCommand[0] == "dw" or brokenCommand[0] == "dwatch":
+            self.displayWatchPoints()
+        elif brokenCommand[0] == "rw" or brokenCommand[0] == "rwatch":
+            self.removeWatchPoint(int(brokenCommand[1]))
         elif brokenCommand[0] == "ss" or brokenCommand[0] == "showSymbols":
             self.showSymbols()
         elif brokenCommand[0] == "h" or brokenCommand[0] == "help":
@@ -523,22 +527,31 @@ class Debugger:
         :return:
         """
         self.debugLog("Loaded symbols are:")
-        for symbol in self.symbols.keys():
-            self.debugLog("{} : {}".format(self.symbols[symbol], symbol))
+        for symbol, address in self.symbols.addresses.items():
+            self.debugLog("{} : {}".format(hex(address), symbol))
 
     def runToBreakPoint(self):
         """
-        This will run until a breakpoint is reached. It will also break every DEBUGGER_WAKEUP_TICK_COUNT tick
+        This will run until a breakpoint is reached. It will also break every DEBUGGER_WAKEUP_TICK_COUNT tick.
+        Instructions are run by the core until it reaches one of the breakpoint addresses or a watchpoint
+        is hit, conditions and hit counts are only checked once there.
         :return:
         """
+        self._watchPointHits = []
         tickCounter = 0
-        first = True
         while True:
-            if self.capua.eu.I in self.breakPoints and first is False:
+            count = DEBUGGER_WAKEUP_TICK_COUNT - tickCounter if DEBUGGER_WAKEUP_TICK_COUNT > 0 else None
+            tickCounter += self.history.run(count, self.breakPoints)
+
+            if len(self._watchPointHits) > 0:
+                self.displayWatchPointHits(self._watchPointHits)
+                self._watchPointHits = []
+                break
+            if self.capua.eu.I in self.breakPoints and self.isBreakPointReached():
                 # Break point reached
                 break
-            first = False
-            if 0 < DEBUGGER_WAKEUP_TICK_COUNT == tickCounter:
+
+            if 0 < DEBUGGER_WAKEUP_TICK_COUNT <= tickCounter:
                 # Just check if user want to go back to single step mode
                 self.debugLog(str(DEBUGGER_WAKEUP_TICK_COUNT) + " instructions executed since last break, "
                               "do you want to go back to single step (y/n): ")
@@ -548,8 +561,90 @@ class Debugger:
                 else:
                     tickCounter = 0
 
-            self.capua.eu.execute()
-            tickCounter += 1
+    def isBreakPointReached(self, countHit: bool=True):
+        """
+        This tells if execution has to stop at the current instruction: there is a breakpoint at this
+        address, its condition is met and it was hit at least as many times as its hit count.
+        :param countHit: bool, if True, the hit is counted. Going back in time does not count hits.
+        :return: bool
+        """
+        breakPoint = self.breakPoints.get(self.capua.eu.I)
+        if breakPoint is None:
+            return False
+
+        condition, hitCount, hits = breakPoint
+        if condition is not None:
+            register, operatorString, value = condition
+            if not BREAKPOINT_CONDITION_OPERATORS[operatorString](getattr(self.capua.eu, register), value):
+                return False
+
+        if countHit:
+            breakPoint[2] += 1
+            return breakPoint[2] >= hitCount
+        return True
+
+    def reverseStep(self, count: int=1):
+        """
+        This will bring the machine back to the state it had count instructions ago. It can't go back
+        further than the oldest instruction kept in the execution history.
+        :param count: int, the number of instructions to go back
+        :return:
+        """
+        if count <= 0:
+            self.debugLog("Invalid instruction count given, must be > 0")
+            return
+
+        position = self.history.getPosition() - count
+        if position < self.history.getOldestPosition():
+            position = self.history.getOldestPosition()
+            self.debugLog("Execution history only goes back {} instructions".format(self.history.getPosition() - position,))
+        self.history.goTo(position)
+        self._watchPointHits = []
+
+    def reverseToBreakPoint(self):
+        """
+        This will bring the machine back to the last time a breakpoint was reached. If no breakpoint is
+        found, the machine is brought back to the oldest instruction kept in the execution history.
+        :return:
+        """
+        self._watchPointHits = []
+        self._reverseStopHits = {}
+        found = self.history.reverseContinue(self.breakPoints, self._isReverseStop)
+        # Replaying up to the position found hit the watchpoints again
+        self._watchPointHits = []
+        if not found:
+            self.debugLog("No breakpoint reached, back to the oldest instruction of the execution history")
+        else:
+            self.displayWatchPointHits(self._reverseStopHits.get(self.history.getPosition(), []))
+
+    def _isReverseStop(self):
+        """
+        Used while going back in time, tells if the position where execution stopped is a breakpoint
+        (hit counts are ignored) or right after a watchpoint hit.
+        :return: bool
+        """
+        watchPointHits = self._watchPointHits
+        self._watchPointHits = []
+        if len(watchPointHits) > 0:
+            # Kept so that the hits can be displayed if this is where we end up
+            self._reverseStopHits[self.history.getPosition()] = watchPointHits
+            return True
+        return self.isBreakPointReached(countHit=False)
+
+    def displayHistory(self):
+        """
+        This will display where we are in the execution history
+        :return:
+        """
+        status = self.history.getStatus()
+        self.debugLog("Execution history:")
+        self.debugLog(" instruction:     {}".format(status["position"],))
+        self.debugLog(" oldest:          {}".format(status["oldest"],))
+        self.debugLog(" furthest:        {}".format(status["recordedEnd"],))
+        self.debugLog(" checkpoints:     {} (every {} instructions)".format(status["checkpoints"],
+                                                                        self.history.interval,))
+        self.debugLog(" recorded events: {}".format(status["events"],))
+        self.debugLog(" memory used:     {} bytes".format(status["memory"],))
 
     def removeBreakPoint(self, number: int=None):
         """
@@ -557,8 +652,7 @@ class Debugger:
         :param number: breakpoint number to remove
         :return:
         """
-        self.breakPoints.remove(self.breakPoints[number])
-        self.breakPoints.sort()
+        del self.breakPoints[sorted(self.breakPoints)[number]]
 
     def displayBreakPoints(self):
         """
@@ -566,31 +660,146 @@ class Debugger:
         :return:
         """
         self.debugLog("\nBreakpoints list:")
-        for i in range(0, len(self.breakPoints)):
+        for i, address in enumerate(sorted(self.breakPoints)):
             symbolInfo = ""
-            symbol = self.translateAddressToSymbol(address=self.breakPoints[i])
+            symbol = self.translateAddressToSymbol(address=address)
             if symbol is not None:
                 symbolInfo = "-> " + symbol
 
-            self.debugLog(" {} - {} {}".format(i, hex(self.breakPoints[i]), symbolInfo,))
+            condition, hitCount, hits = self.breakPoints[address]
+            conditionInfo = ""
+            if condition is not None:
+                conditionInfo = "if {} {} {} ".format(condition[0], condition[1], hex(condition[2]),)
+            hitInfo = "hits {}".format(hits,)
+            if hitCount > 0:
+                hitInfo += "/{}".format(hitCount,)
+
+            self.debugLog(" {} - {} {} {}{}".format(i, hex(address), symbolInfo, conditionInfo, hitInfo,))
 
-    def addBreakPoint(self, address=None):
+    def addBreakPoint(self, address=None, options=None):
         """
-        This will simply add a break point into the break point list
+        This will simply add a break point into the break point list. Options can give a condition on
+        a register value and a hit count, the breakpoint only stops execution once reached that many
+        times with its condition met: [if <register> <operator> <value>] [hits <count>]
         :param address: a valid capua address written in hexadecimal
+        :param options: list of str, the options as typed by the user
         :return:
         """
-        # We have to validate the user used a symbol for the address
+        address = self.translateAddress(address)
+        if address is None:
+            return
+
+        condition = None
+        hitCount = 0
+        options = options if options is not None else []
+        i = 0
         try:
-            address = int(address, 16)
+            while i < len(options):
+                if options[i] == "if":
+                    register, operatorString, value = options[i + 1:i + 4]
+                    if register not in BREAKPOINT_CONDITION_REGISTERS or \
+                            operatorString not in BREAKPOINT_CONDITION_OPERATORS:
+                        raise ValueError("Invalid condition")
+                    condition = (register, operatorString, int(value, 0))
+                    i += 4
+                elif options[i] == "hits":
+                    hitCount = int(options[i + 1], 0)
+                    i += 2
+                else:
+                    raise ValueError("Invalid option")
+        except (ValueError, IndexError) as e:
+            self.debugLog("Invalid breakpoint options '{}', expected [if <register> <operator> <value>] "
+                          "[hits <count>]".format(" ".join(options),))
+            return
+
+        self.breakPoints[address] = [condition, hitCount, 0]
+
+    def removeWatchPoint(self, number: int=None):
+        """
+        This will remove a single watchpoint
+        :param number: watchpoint number to remove
+        :return:
+        """
+        self.watchPoints.remove(self.watchPoints[number])
+        self._updateWatchPoints()
+
+    def displayWatchPoints(self):
+        """
+        This will display watchpoints in deletion order
+        :return:
+        """
+        self.debugLog("\nWatchpoints list:")
+        for i in range(0, len(self.watchPoints)):
+            address, length, onRead, onWrite = self.watchPoints[i]
+            mode = ("r" if onRead else "") + ("w" if onWrite else "")
+            self.debugLog(" {} - {} {} {}".format(i, hex(address), length, mode,))
+
+    def addWatchPoint(self, address=None, length: int=4, mode: str="w"):
+        """
+        This will add a watchpoint on a memory range. Execution stops right after an instruction, or a
+        device transfer, reading (mode r) and/or writing (mode w) any byte of the range.
+        :param address: a valid capua address written in hexadecimal or a symbol
+        :param length: int, length of the watched range
+        :param mode: str, "r", "w" or "rw"
+        :return:
+        """
+        address = self.translateAddress(address)
+        if address is None:
+            return
+        if length <= 0 or mode not in ("r", "w", "rw"):
+            self.debugLog("Invalid watchpoint, length must be > 0 and mode one of r, w or rw")
+            return
+
+        self.watchPoints.append([address, length, "r" in mode, "w" in mode])
+        self._updateWatchPoints()
+
+    def displayWatchPointHits(self, hits=None):
+        """
+        This will display the memory accesses that hit watchpoints
+        :param hits: list, [(address, length, isWrite, value)]
+        :return:
+        """
+        for address, length, isWrite, value in hits:
+            if isWrite:
+                valueInfo = " value " + hex(value) if value is not None else ""
+                self.debugLog("Watchpoint hit: write of {} bytes at {}{}".format(length, hex(address), valueInfo,))
+            else:
+                self.debugLog("Watchpoint hit: read of {} bytes at {}".format(length, hex(address),))
+
+    def _updateWatchPoints(self):
+        """
+        Hand the watchpoints over to the MIOC which checks every memory access against them.
+        :return:
+        """
+        self.capua.mioc.setWatchpoints([tuple(watchPoint) for watchPoint in self.watchPoints],
+                                       self._watchPointHit)
+
+    def _watchPointHit(self, address=None, length=None, isWrite=False, value=None):
+        """
+        Called by the MIOC on every memory access touching a watchpoint. The core is asked to stop once
+        the instruction doing the access is over.
+        :param address: int, address of the access
+        :param length: int, length of the access
+        :param isWrite: bool, True for a write
+        :param value: int, the value written, None for reads
+        :return:
+        """
+        self._watchPointHits.append((address, length, isWrite, value))
+        self.capua.eu.requestStop()
+
+    def translateAddress(self, address=None):
+        """
+        This will translate an address typed by the user, in hexadecimal or as a symbol, into an int
+        :param address: str, the address or symbol
+        :return: int, None if the address can't be translated
+        """
+        try:
+            return int(address, 16)
         except ValueError as e:
-            address = self.translateSymbolToAddress(symbol=address)
-            if address is None:
+            translatedAddress = self.translateSymbolToAddress(symbol=address)
+            if translatedAddress is None:
                 self.debugLog("Error while processing address or symbol {}".format(address,))
-                return
-
-        self.breakPoints.append(address)
-        self.breakPoints.sort()
+            return translatedAddress
 
     def debugLog(self, message:str="", screenDisplay:bool=True):
         """
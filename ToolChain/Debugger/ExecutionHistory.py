@@ -0,0 +1,472 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+from Configuration.Configuration import MEMORY_START_AT, \
+                                        MEMORY_PAGE_SHIFT, \
+                                        MEMORY_PAGE_SIZE, \
+                                        DEBUGGER_CHECKPOINT_INTERVAL, \
+                                        DEBUGGER_HISTORY_MAX_MEMORY
+
+import bisect
+import collections
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2015, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+EVENT_INTERRUPT = 0       # A hardware interrupt got handled, payload is the interrupt number
+EVENT_DEVICE_READ = 1     # A memory mapped device was read, payload is the value read
+EVENT_DEVICE_WRITE = 2    # A memory mapped device was written, payload is (startAddress, device state after it)
+EVENT_DMA_WRITE = 3       # A device wrote to memory, payload is (address, data)
+
+
+class ExecutionHistory:
+    """
+    The ExecutionHistory lets the debugger go back in time. Instructions are executed through step and
+    run and counted, the count being the position in the history.
+
+    Every interval instructions, a checkpoint is taken. A checkpoint holds the core state, the memory
+    mapped devices state and the memory pages written since the previous checkpoint (the first one holds
+    every page that is not in its initial state). Memory written is known by observing the MemoryArray.
+
+    Between checkpoints, execution only depends on what comes from outside the core: hardware interrupts,
+    values read from devices and devices writing to memory (DMA). These are recorded as events, along with
+    the position they happened at. Writes to devices are recorded with the state the device was left in.
+    Devices do not write to memory while a history is set, the core does their transfers in between two
+    instructions so that the position they happened at is known.
+
+    Going to an earlier position restores the closest checkpoint before it and replays execution up to
+    that position. While replaying, devices are not driven by the core: device reads are given the recorded
+    values, device writes put back the recorded device state, recorded interrupts and DMA writes are done
+    again at the exact same position and devices signaling interrupts are refused (they try again later).
+    Going back therefore costs a single checkpoint restore and at most interval replayed instructions.
+    Since replay is deterministic, what was recorded after the current position is kept and stepping
+    forward replays it, until the furthest recorded position is reached and execution goes live again.
+
+    Memory used by checkpoints and events is capped. When over the cap, the oldest checkpoint is merged
+    into the next one and the events before it are dropped: the oldest history is forgotten first.
+    """
+
+    recordedEnd = 0     # Furthest position ever reached, execution before it is replayed
+    replaying = False   # True while the position is before recordedEnd
+    interval = DEBUGGER_CHECKPOINT_INTERVAL
+    maxMemory = DEBUGGER_HISTORY_MAX_MEMORY
+    memoryUsage = 0     # Bytes used by checkpoints and events, approximation
+
+    _checkpoints = None             # [[position, core state, device states, {pageNumber: bytes}]], oldest first
+    _checkpointPositions = None     # Positions of the checkpoints, kept for bisect
+    _events = None                  # [(position, event type, payload)], in the order they happened
+    _eventPositions = None          # Positions of the events, kept for bisect
+    _replayCursor = 0               # Index in _events of the next event to be replayed
+    _replayDeviceEvents = None      # Device events of the instruction being replayed
+    _dirtyPages = None              # Pages written since the last checkpoint
+    _liveInterruptSignal = None     # Interrupt that was pending, not yet handled, when leaving recordedEnd
+    _positionOffset = 0             # Position minus the count of instructions the core ran instrumented
+
+    def __init__(self, executionUnit=None, memoryArray=None, interval: int=DEBUGGER_CHECKPOINT_INTERVAL,
+                 maxMemory: int=DEBUGGER_HISTORY_MAX_MEMORY):
+        """
+        Start recording the given core. The first checkpoint is taken right away, the core needs to be
+        ready to run (see ExecutionUnit.setupCore).
+        :param executionUnit: ExecutionUnit, the core to be recorded
+        :param memoryArray: MemoryArray, the memory of that core
+        :param interval: int, number of instructions between two checkpoints
+        :param maxMemory: int, bytes checkpoints and events are allowed to use
+        """
+        if executionUnit is None or memoryArray is None:
+            raise RuntimeError("Capua ExecutionHistory initialisation error - unstable state")
+        if type(interval) is not int or interval <= 0:
+            raise ValueError("Invalid checkpoint interval {}".format(interval))
+        if type(maxMemory) is not int or maxMemory <= 0:
+            raise ValueError("Invalid execution history memory limit {}".format(maxMemory))
+
+        self.interval = interval
+        self.maxMemory = maxMemory
+        self._executionUnit = executionUnit
+        self._memoryArray = memoryArray
+        self._checkpoints = []
+        self._checkpointPositions = []
+        self._events = []
+        self._eventPositions = []
+        self._replayDeviceEvents = collections.deque()
+        self._dirtyPages = set()
+        self._positionOffset = -executionUnit.instrumentedCount
+
+        self._memoryArray.registerWriteObserver(self._markDirtyPages)
+        self._executionUnit.setExecutionHistory(self)
+        self._takeCheckpoint()
+
+    def getPosition(self):
+        """
+        Gives the current position, the number of instructions executed since the history was started.
+        While an instruction is executed, it is already counted.
+        :return: int
+        """
+        return self._executionUnit.instrumentedCount + self._positionOffset
+
+    def step(self):
+        """
+        Execute the next instruction. It is replayed if the position is before the furthest recorded
+        position, it is run and recorded otherwise.
+        :return: Nothing
+        """
+        self.run(1)
+
+    def run(self, count: int=None, until=None):
+        """
+        Execute instructions, replaying them while before recordedEnd. This stops after count instructions,
+        as soon as I points to one of the until addresses (the first instruction is always executed) or
+        when the core is asked to stop (see ExecutionUnit.requestStop). Instructions are run in batches by
+        the core, a batch ends on the next checkpoint and, while replaying, on the next recorded event.
+        :param count: int, the maximum number of instructions to be executed, None for no limit
+        :param until: container of addresses (a set is best), as for ExecutionUnit.run
+        :return: int, the number of instructions executed
+        """
+        executionUnit = self._executionUnit
+        executionUnit.stopRequested = False
+        executed = 0
+        while count is None or executed < count:
+            position = self.getPosition()
+            if self.replaying:
+                nextEventPosition = self._eventPositions[self._replayCursor] \
+                    if self._replayCursor < len(self._eventPositions) else self.recordedEnd + 1
+                if nextEventPosition == position + 1:
+                    self._prepareReplayedInstruction()
+                    batch = 1
+                else:
+                    nextCheckpoint = bisect.bisect_right(self._checkpointPositions, position)
+                    batch = min(nextEventPosition - 1, self.recordedEnd) - position
+                    if nextCheckpoint < len(self._checkpointPositions):
+                        batch = min(batch, self._checkpointPositions[nextCheckpoint] - position)
+            else:
+                batch = self.interval - position % self.interval
+            if count is not None:
+                batch = min(batch, count - executed)
+
+            ran = executionUnit.run(batch, until)
+            executed += ran
+            self._endBatch()
+
+            if ran < batch or (until is not None and executionUnit.I in until) or executionUnit.stopRequested:
+                break
+
+        executionUnit.stopRequested = False
+        return executed
+
+    def goTo(self, position: int=0):
+        """
+        Bring the machine to the state it had at a given position of the history. Going back restores
+        the closest checkpoint and replays from there, going forward replays (or runs when going past
+        recordedEnd) the instructions in between.
+        :param position: int, the position to go to, it can't be before getOldestPosition()
+        :return: Nothing
+        """
+        if type(position) is not int or position < self._checkpointPositions[0]:
+            raise ValueError("Position {} is not in the execution history".format(position))
+
+        index = bisect.bisect_right(self._checkpointPositions, min(position, self.recordedEnd)) - 1
+        if position < self.getPosition() or self._checkpointPositions[index] > self.getPosition():
+            self._restoreCheckpoint(index)
+
+        while self.getPosition() < position:
+            self.run(position - self.getPosition())
+
+    def reverseContinue(self, until=None, isStop=None):
+        """
+        Go back to the last position, before the current one, where execution would have stopped: the
+        core was about to execute an instruction at one of the until addresses or was asked to stop. The
+        history is replayed one checkpoint interval at a time, going backward.
+        :param until: container of addresses, None for none
+        :param isStop: callable, called without parameters where execution would have stopped, it tells if
+                       that position is to be kept. None to keep every position.
+        :return: bool, True if such a position was found, False if the machine was brought to the oldest position
+        """
+        if until is None:
+            until = ()
+
+        end = self.getPosition()
+        index = bisect.bisect_right(self._checkpointPositions, end - 1) - 1
+        while index >= 0:
+            self._restoreCheckpoint(index)
+            hit = None
+            if self._executionUnit.I in until and (isStop is None or isStop()):
+                hit = self.getPosition()
+            while self.getPosition() < end:
+                self.run(end - self.getPosition(), until)
+                # Always asked so that whatever isStop keeps track of is consumed
+                stopped = isStop is None or isStop()
+                if stopped and self.getPosition() < end:
+                    hit = self.getPosition()
+            if hit is not None:
+                self.goTo(hit)
+                return True
+            end = self._checkpointPositions[index]
+            index -= 1
+
+        self.goTo(self._checkpointPositions[0])
+        return False
+
+    def getOldestPosition(self):
+        """
+        Gives the oldest position the machine can be brought back to.
+        :return: int
+        """
+        return self._checkpointPositions[0]
+
+    def getStatus(self):
+        """
+        Gives information about the history, for display purpose.
+        :return: dict, {"position", "oldest", "recordedEnd", "checkpoints", "events", "memory"}
+        """
+        return {"position": self.getPosition(),
+                "oldest": self._checkpointPositions[0],
+                "recordedEnd": self.recordedEnd,
+                "checkpoints": len(self._checkpoints),
+                "events": len(self._events),
+                "memory": self.memoryUsage}
+
+    def recordInterrupt(self, interruptNumber=None):
+        """
+        Called by the ExecutionUnit after handling a hardware interrupt.
+        :param interruptNumber: int, the interrupt number
+        :return: Nothing
+        """
+        if not self.replaying:
+            self._addEvent(EVENT_INTERRUPT, interruptNumber, 0)
+
+    def recordDeviceAccess(self, device=None, isWrite=False, value=None):
+        """
+        Called by the MIOC after a memory mapped device has been accessed.
+        :param device: the memory mapped device
+        :param isWrite: bool, True for a write
+        :param value: int, the value read, None for a write
+        :return: Nothing
+        """
+        if self.replaying:
+            return
+        if isWrite:
+            state = device.getState()
+            self._addEvent(EVENT_DEVICE_WRITE, (device.startAddress, state), len(state))
+        else:
+            self._addEvent(EVENT_DEVICE_READ, value, 0)
+
+    def recordDirectMemoryAccessWrite(self, address=None, data=None):
+        """
+        Called by the MIOC after a device wrote to memory. The core does these transfers in between two
+        instructions (see MemoryIOController.directMemoryAccessWrite), the write is recorded as happening
+        right before the next instruction.
+        :param address: int, address of the first byte written
+        :param data: bytes like object, the data written
+        :return: Nothing
+        """
+        if not self.replaying:
+            self._addEvent(EVENT_DMA_WRITE, (address, bytes(data)), len(data), self.getPosition() + 1)
+
+    def replayDeviceAccess(self, device=None, isWrite=False):
+        """
+        Called by the MIOC, instead of accessing a device, while replaying.
+        :param device: the memory mapped device that would have been accessed
+        :param isWrite: bool, True for a write
+        :return: int, the value recorded for a read, None for a write
+        """
+        if len(self._replayDeviceEvents) == 0:
+            raise RuntimeError("Replayed execution accessed a device that was not accessed when recorded")
+        eventType, payload = self._replayDeviceEvents.popleft()
+        if eventType != (EVENT_DEVICE_WRITE if isWrite else EVENT_DEVICE_READ):
+            raise RuntimeError("Replayed execution accessed a device differently than when recorded")
+        if isWrite:
+            device.setState(payload[1])
+            return None
+        return payload
+
+    def _prepareReplayedInstruction(self):
+        """
+        Bring back what came from outside the core while the next instruction was executed when recorded.
+        :return: Nothing
+        """
+        self._replayDeviceEvents.clear()
+        events = self._events
+        position = self.getPosition() + 1
+        while self._replayCursor < len(events) and events[self._replayCursor][0] == position:
+            position, eventType, payload = events[self._replayCursor]
+            self._replayCursor += 1
+            if eventType == EVENT_INTERRUPT:
+                # The interrupt was accepted while this instruction was executed, it is made pending
+                # as is, Interrupt State could only be checked before the instruction is executed.
+                registers, I, FLAGS, IS, IVR, interruptSignal = self._executionUnit.getState()
+                self._executionUnit.setState((registers, I, FLAGS, IS, IVR, payload))
+            elif eventType == EVENT_DMA_WRITE:
+                self._executionUnit.mioc.transferToMemory(*payload)
+            else:
+                self._replayDeviceEvents.append((eventType, payload))
+
+    def _addEvent(self, eventType=EVENT_INTERRUPT, payload=None, size=0, position: int=None):
+        """
+        Record an event at the current position, the instruction being executed is already counted.
+        :param eventType: int, one of the EVENT_ constants
+        :param payload: depends on the event type
+        :param size: int, bytes held by the payload
+        :param position: int, the position to record the event at, None for the current one
+        :return: Nothing
+        """
+        if position is None:
+            position = self.getPosition()
+        self._events.append((position, eventType, payload))
+        self._eventPositions.append(position)
+        self._replayCursor = len(self._events)
+        self.memoryUsage += size
+
+    def _markDirtyPages(self, address=MEMORY_START_AT, length=1):
+        """
+        Memory write observer, keeps track of the pages written since the last checkpoint.
+        :param address: int, start address of the write
+        :param length: int, length of the write
+        :return: Nothing
+        """
+        firstPage = (address - MEMORY_START_AT) >> MEMORY_PAGE_SHIFT
+        lastPage = (address + length - 1 - MEMORY_START_AT) >> MEMORY_PAGE_SHIFT
+        if firstPage == lastPage:
+            self._dirtyPages.add(firstPage)
+        else:
+            self._dirtyPages.update(range(firstPage, lastPage + 1))
+
+    def _takeCheckpoint(self):
+        """
+        Take a checkpoint at the current position. The first checkpoint holds every modified page,
+        the following ones the pages written since the previous checkpoint.
+        :return: Nothing
+        """
+        if len(self._checkpoints) == 0:
+            pageNumbers = self._memoryArray.getModifiedPages(MEMORY_PAGE_SIZE)
+        else:
+            pageNumbers = self._dirtyPages
+        pages = {}
+        for pageNumber in pageNumbers:
+            pages[pageNumber] = bytes(self._memoryArray.readMemory(MEMORY_START_AT + pageNumber * MEMORY_PAGE_SIZE,
+                                                                   MEMORY_PAGE_SIZE))
+        self._dirtyPages = set()
+
+        checkpoint = [self.getPosition(),
+                      self._executionUnit.getState(),
+                      self._executionUnit.mioc.getDeviceStates(),
+                      pages]
+        self._checkpoints.append(checkpoint)
+        self._checkpointPositions.append(checkpoint[0])
+        self.memoryUsage += self._getCheckpointSize(checkpoint)
+
+        self._enforceMemoryLimit()
+
+    def _restoreCheckpoint(self, index: int=0):
+        """
+        Put the machine back in the state it had when a checkpoint was taken.
+        :param index: int, index of the checkpoint in _checkpoints
+        :return: Nothing
+        """
+        position, coreState, deviceStates, pages = self._checkpoints[index]
+
+        if not self.replaying:
+            # Leaving live execution, an interrupt signaled since the last instruction is not recorded yet
+            self._liveInterruptSignal = self._executionUnit.getState()[5]
+
+        # Devices are refused interrupts before the core state, possibly with a pending interrupt, is put back
+        self.replaying = True
+
+        memoryPages = {}
+        for checkpoint in self._checkpoints[:index + 1]:
+            memoryPages.update(checkpoint[3])
+        self._memoryArray.restorePages(MEMORY_PAGE_SIZE, memoryPages.items())
+        self._dirtyPages = set()
+
+        self._executionUnit.mioc.setDeviceStates(deviceStates)
+        self._executionUnit.setState(coreState)
+
+        self._positionOffset = position - self._executionUnit.instrumentedCount
+        self._replayCursor = bisect.bisect_right(self._eventPositions, position)
+        self._replayDeviceEvents.clear()
+        if position == self.recordedEnd:
+            self._resumeLiveExecution()
+        self.replaying = position < self.recordedEnd
+
+    def _endBatch(self):
+        """
+        Bookkeeping after a batch of instructions: a checkpoint is taken when a live batch ends on the
+        interval, live execution resumes when replay reaches recordedEnd.
+        :return: Nothing
+        """
+        position = self.getPosition()
+        if position > self.recordedEnd:
+            self.recordedEnd = position
+            if position % self.interval == 0:
+                self._takeCheckpoint()
+        elif self._checkpointPositions[bisect.bisect_right(self._checkpointPositions, position) - 1] == position:
+            # Passing over an existing checkpoint, pages written from now on belong to the next one
+            self._dirtyPages = set()
+
+        if self.replaying and position == self.recordedEnd:
+            self._resumeLiveExecution()
+        self.replaying = position < self.recordedEnd
+
+    def _resumeLiveExecution(self):
+        """
+        Replay reached recordedEnd, the interrupt that was pending when leaving it is signaled again.
+        :return: Nothing
+        """
+        if self._liveInterruptSignal is not None:
+            self._executionUnit.signalHardwareInterrupt(self._liveInterruptSignal)
+            self._liveInterruptSignal = None
+
+    def _enforceMemoryLimit(self):
+        """
+        Forget the oldest history until memory usage is under the limit. The oldest checkpoint is merged
+        into the following one, which becomes the oldest, and events that happened before it are dropped.
+        :return: Nothing
+        """
+        while self.memoryUsage > self.maxMemory and len(self._checkpoints) > 1:
+            oldest = self._checkpoints.pop(0)
+            self._checkpointPositions.pop(0)
+            newOldest = self._checkpoints[0]
+            self.memoryUsage -= self._getCheckpointSize(oldest) + self._getCheckpointSize(newOldest)
+            pages = oldest[3]
+            pages.update(newOldest[3])
+            newOldest[3] = pages
+            self.memoryUsage += self._getCheckpointSize(newOldest)
+
+            dropped = bisect.bisect_right(self._eventPositions, newOldest[0])
+            for position, eventType, payload in self._events[:dropped]:
+                if eventType == EVENT_DEVICE_WRITE or eventType == EVENT_DMA_WRITE:
+                    self.memoryUsage -= len(payload[1])
+            del self._events[:dropped]
+            del self._eventPositions[:dropped]
+            self._replayCursor = max(0, self._replayCursor - dropped)
+
+    @staticmethod
+    def _getCheckpointSize(checkpoint=None):
+        """
+        Approximate memory used by a checkpoint, registers are not worth counting.
+        :param checkpoint: list, as kept in _checkpoints
+        :return: int, size in bytes
+        """
+        return len(checkpoint[3]) * MEMORY_PAGE_SIZE + sum(len(state) for startAddress, state in checkpoint[2])
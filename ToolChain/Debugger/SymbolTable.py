@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+from CapuaEnvironment.ExecutionUnit.Profiler import buildLocator, loadSymbols
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2015, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+
+class SymbolTable:
+    """
+    The SymbolTable indexes the symbols produced by the linker ("file.symbol") so that the debugger
+    can go from a symbol to its address, and back, without going through every symbol each time.
+    Everything is built once, when the table is created:
+        - full name to address
+        - short name (symbol without its file) to the full names using it
+        - address to the first symbol defined there
+        - the locator giving the closest symbol at or before any address, the same one the
+          Profiler uses for its reports (see buildLocator)
+    """
+
+    addresses = None        # {"file.symbol": address}
+    _candidates = None      # {"symbol": ["file.symbol", ...]}
+    _names = None           # {address: "file.symbol"}
+    _locate = None
+
+    def __init__(self, symbols=None):
+        """
+        Build the table indexes.
+        :param symbols: dict, {"file.symbol": address}, as given by loadSymbols, None for no symbols
+        """
+        self.addresses = dict(symbols or {})
+        self._candidates = {}
+        self._names = {}
+
+        for name, address in self.addresses.items():
+            self._candidates.setdefault(name.partition(".")[2], []).append(name)
+            self._names.setdefault(address, name)
+
+        self._locate = buildLocator(self.addresses)
+
+    @staticmethod
+    def load(symbolsFile=None):
+        """
+        Build a table from a symbols file as produced by the linker.
+        :param symbolsFile: str, path to the symbols file
+        :return: SymbolTable
+        """
+        return SymbolTable(loadSymbols(symbolsFile))
+
+    def getAddress(self, symbol: str=""):
+        """
+        Give the address of a symbol. The file can be omitted when a single file defines the symbol.
+        :param symbol: str, "file.symbol" or "symbol"
+        :return: int, None if the symbol is unknown
+        """
+        if "." in symbol:
+            return self.addresses.get(symbol)
+
+        candidates = self._candidates.get(symbol, [])
+        if len(candidates) > 1:
+            raise ValueError("Symbol {} is conflicting with {}".format(symbol, ", ".join(candidates)))
+        return self.addresses[candidates[0]] if len(candidates) == 1 else None
+
+    def getSymbol(self, address: int=0):
+        """
+        Give the symbol defined at an address.
+        :param address: int, the address
+        :return: str, "file.symbol", None if no symbol is defined at that exact address
+        """
+        return self._names.get(address)
+
+    def locate(self, address: int=0):
+        """
+        Give the location of an address as "symbol+offset" using the closest symbol at or before it.
+        :param address: int, the address
+        :return: str, the address as is when no symbol is before it
+        """
+        return self._locate(address)
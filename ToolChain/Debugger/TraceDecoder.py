@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+from CapuaEnvironment.ExecutionUnit.TraceRecorder import TraceRecorder, NO_INTERRUPT, NO_REGISTER
+from CapuaEnvironment.Instruction.Instruction import Instruction
+from CapuaEnvironment.IntructionFetchUnit.DecodeTable import decodeTable
+from ToolChain.Debugger.Debugger import Debugger
+from ToolChain.Debugger.SymbolTable import SymbolTable
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2015, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+
+class TraceDecoder:
+    """
+    The TraceDecoder turns a trace file, as saved by a TraceRecorder, into text. Instructions are
+    displayed the way the Debugger displays them. Given the symbols file produced by the linker,
+    addresses are displayed as "symbol+offset". One line is produced per record, oldest first:
+
+    <instruction number>  <address>  <location>  <instruction>  <register>=<value>  FLAGS=<flags>  S=<S>
+    followed, when applicable, by "MEM <address>[<length>] <- <value>" for the last memory write
+    done by the instruction and "INT <number>" when a hardware interrupt got handled right after it.
+    """
+
+    recordCount = 0     # Number of instructions recorded, the trace only holds the last ones
+    records = None
+
+    def __init__(self, traceFile=None, symbolsFile=None):
+        """
+        Load the trace and, if given, the symbols.
+        :param traceFile: str, path of the trace file
+        :param symbolsFile: str, path of the symbols file, None for no symbols
+        """
+        self.recordCount, self.records = TraceRecorder.load(traceFile)
+        self._locate = (SymbolTable.load(symbolsFile) if symbolsFile is not None else SymbolTable()).locate
+
+    def decode(self, last: int=None):
+        """
+        Decode the trace.
+        :param last: int, only decode that many records, the most recent ones, None for all of them
+        :return: list, one str per record, oldest first
+        """
+        records = self.records if last is None else self.records[max(0, len(self.records) - last):]
+        firstInstructionNumber = self.recordCount - len(records)
+        return [self.formatRecord(record, firstInstructionNumber + recordNumber)
+                for recordNumber, record in enumerate(records)]
+
+    def formatRecord(self, record=None, instructionNumber: int=0):
+        """
+        Build the text of a single record.
+        :param record: tuple, a record as given by TraceRecorder.getRecords
+        :param instructionNumber: int, the position of the instruction in the whole run
+        :return: str
+        """
+        (address, encoding, FLAGS, registerCode, registerValue, memoryWriteLength,
+         memoryWriteAddress, memoryWriteValue, S, interruptNumber) = record
+
+        line = "{:>10}  {:<10}  {:<32}  {:<40}".format(instructionNumber, hex(address), self._locate(address),
+                                                       self._buildInstructionString(encoding))
+        if registerCode != NO_REGISTER:
+            line += "  ${}={}".format(Debugger.convertNumericRegisterToRegisterName(registerCode), hex(registerValue))
+        line += "  FLAGS={:03b}  S={}".format(FLAGS, hex(S))
+        if memoryWriteLength != 0:
+            line += "  MEM {}[{}] <- {}".format(hex(memoryWriteAddress), memoryWriteLength, hex(memoryWriteValue))
+        if interruptNumber != NO_INTERRUPT:
+            line += "  INT {}".format(interruptNumber)
+        return line
+
+    def _buildInstructionString(self, encoding: bytes=b""):
+        """
+        Decode the bytes of an instruction and give its text.
+        :param encoding: bytes, the instruction as it was in memory
+        :return: str
+        """
+        decodeEntry = decodeTable[encoding[0]] if len(encoding) > 0 else None
+        if decodeEntry is None or decodeEntry["length"] != len(encoding):
+            return "<invalid {}>".format(encoding.hex())
+        instruction = Instruction(int.from_bytes(encoding, "big"), decodeEntry["form"])
+        return Debugger._buildInstructionString(instruction).strip()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+import unittest
+
+from CapuaEnvironment.ExecutionUnit.ExecutionUnit import ExecutionUnit
+from CapuaEnvironment.IntructionFetchUnit.InstructionFetchUnit import InstructionFetchUnit
+from CapuaEnvironment.IOComponent.MemoryIOController import MemoryIOController
+from CapuaEnvironment.MemoryArray.MemoryArray import MemoryArray
+from ToolChain.Debugger.ExecutionHistory import ExecutionHistory
+
+from Configuration.Configuration import MEMORY_START_AT, \
+                                        REGISTER_A, \
+                                        REGISTER_B
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2015, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+
+class TestExecutionHistory(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Builds a core running a loop that reads the clock, calls a function and jumps back.
+        An interrupt handler is installed for interrupt 0.
+        """
+        self.ma = MemoryArray()
+        self.mioc = MemoryIOController(self.ma)
+        self.eu = ExecutionUnit(self.mioc, InstructionFetchUnit(self.ma), "System")
+        function = MEMORY_START_AT + 0x20
+        handler = MEMORY_START_AT + 0x40
+        vector = MEMORY_START_AT + 0x60
+        write = self.mioc.memoryWriteAtAddressForLength
+        write(MEMORY_START_AT, 1, 0b00000001)            # MEMR [4] #clock $B
+        write(MEMORY_START_AT + 1, 1, (4 << 4) | REGISTER_B)
+        write(MEMORY_START_AT + 2, 4, 0x20000100)
+        write(MEMORY_START_AT + 6, 1, 0b10000010)        # CALL function
+        write(MEMORY_START_AT + 7, 4, function)
+        write(MEMORY_START_AT + 11, 1, 0b01000001)       # JMP <> loop
+        write(MEMORY_START_AT + 12, 1, 0b000)
+        write(MEMORY_START_AT + 13, 4, MEMORY_START_AT)
+        write(function, 1, 0b01100110)                   # ADD 0x01 $A
+        write(function + 1, 4, 0x01)
+        write(function + 5, 1, REGISTER_A)
+        write(function + 6, 1, 0b11110000)               # RET
+        write(handler, 1, 0b01100110)                    # ADD 0x100 $A
+        write(handler + 1, 4, 0x100)
+        write(handler + 5, 1, REGISTER_A)
+        write(handler + 6, 1, 0b11110011)                # HIRET
+        write(vector, 4, handler)
+
+        self.eu.setupCore(MEMORY_START_AT)
+        self.eu.S = MEMORY_START_AT + 0x2000
+        self.eu.IVR = vector
+        self.eu.IS = 1
+
+    def test_init(self):
+        """
+        Validates good working of the __init__ method for ExecutionHistory
+        """
+        self.assertRaises(RuntimeError, ExecutionHistory, None, self.ma)
+        self.assertRaises(ValueError, ExecutionHistory, self.eu, self.ma, 0)
+        self.assertRaises(ValueError, ExecutionHistory, self.eu, self.ma, 10, 0)
+        history = ExecutionHistory(self.eu, self.ma, interval=10)
+        self.assertEqual(0, history.getOldestPosition())
+        self.assertEqual(1, history.getStatus()["checkpoints"])
+        self.assertIs(history, self.mioc.executionHistory)
+
+    def test_reverse(self):
+        """
+        Validates that going back in time, and forward again, gives back the exact recorded states
+        """
+        history = ExecutionHistory(self.eu, self.ma, interval=7)
+        states = []
+        for i in range(60):
+            if i == 23:
+                self.assertTrue(self.mioc.signalHardwareInterrupt(0))
+            states.append(self._getMachineState())
+            history.step()
+        states.append(self._getMachineState())
+        self.assertEqual(60, history.recordedEnd)
+
+        for position in (59, 24, 23, 0, 41, 7, 60):
+            history.goTo(position)
+            self.assertEqual(position, history.getPosition())
+            self.assertEqual(states[position], self._getMachineState())
+        self.assertFalse(history.replaying)
+
+        # While replaying, devices can't interrupt the core
+        history.goTo(30)
+        self.assertFalse(self.mioc.signalHardwareInterrupt(0))
+        history.goTo(60)
+        self.assertTrue(self.mioc.signalHardwareInterrupt(0))
+        history.step()
+        self.assertEqual(61, history.recordedEnd)
+
+        # Last time the core was at the function entry
+        self.assertTrue(history.reverseContinue({MEMORY_START_AT + 0x20}))
+        self.assertEqual(MEMORY_START_AT + 0x20, self.eu.I)
+        self.assertEqual(states[history.getPosition()], self._getMachineState())
+        self.assertFalse(history.reverseContinue({MEMORY_START_AT + 0x1000}))
+        self.assertEqual(0, history.getPosition())
+
+    def test_run(self):
+        """
+        Validates that instructions run in batches stop where asked to and are recorded as when stepped
+        """
+        history = ExecutionHistory(self.eu, self.ma, interval=7)
+        states = [self._getMachineState()]
+        for i in range(30):
+            history.step()
+            states.append(self._getMachineState())
+
+        history.goTo(0)
+        self.assertEqual(2, history.run(10, {MEMORY_START_AT + 0x20}))
+        self.assertEqual(MEMORY_START_AT + 0x20, self.eu.I)
+        self.assertEqual(28, history.run(28))
+        self.assertEqual(states[30], self._getMachineState())
+        self.assertEqual(10, history.run(10))
+        self.assertEqual(6, history.getStatus()["checkpoints"])
+
+        # A stop request ends the run after the current instruction
+        self.mioc.setWatchpoints([(MEMORY_START_AT + 0x2000, 8, False, True)],
+                                 lambda address, length, isWrite, value: self.eu.requestStop())
+        history.goTo(0)
+        self.assertEqual(2, history.run(20))
+        self.assertEqual(states[2], self._getMachineState())
+        self.assertFalse(self.eu.stopRequested)
+
+    def test_directMemoryAccess(self):
+        """
+        Validates that device transfers are done by the core in between two instructions, recorded at that
+        position and done again there when replaying
+        """
+        history = ExecutionHistory(self.eu, self.ma, interval=7)
+        for i in range(10):
+            history.step()
+
+        # The function now adds 0x10 to A
+        self.mioc.directMemoryAccessWrite(MEMORY_START_AT + 0x21, (0x10).to_bytes(4, "big"))
+        self.assertEqual(0x01, self.ma.readValue(MEMORY_START_AT + 0x21, 4))
+        states = [self._getMachineState()]
+        for i in range(10):
+            history.step()
+            states.append(self._getMachineState())
+        self.assertEqual(0x10, self.ma.readValue(MEMORY_START_AT + 0x21, 4))
+        self.assertEqual(2 + 2 * 0x10, self.eu.A)
+
+        history.goTo(5)
+        self.assertEqual(0x01, self.ma.readValue(MEMORY_START_AT + 0x21, 4))
+        for position in range(10, 21):
+            history.goTo(position)
+            self.assertEqual(states[position - 10], self._getMachineState())
+        self.assertEqual(2 + 2 * 0x10, self.eu.A)
+
+        # Transfers done while replaying are kept until execution goes live again
+        history.goTo(15)
+        self.mioc.directMemoryAccessWrite(MEMORY_START_AT + 0x21, (0x20).to_bytes(4, "big"))
+        history.goTo(20)
+        self.assertEqual(0x10, self.ma.readValue(MEMORY_START_AT + 0x21, 4))
+        self.assertEqual(2 + 2 * 0x10, self.eu.A)
+        history.run(4)
+        self.assertEqual(0x20, self.ma.readValue(MEMORY_START_AT + 0x21, 4))
+        self.assertEqual(2 + 2 * 0x10 + 0x20, self.eu.A)
+
+    def test_memoryLimit(self):
+        """
+        Validates that the oldest history is forgotten when memory usage is over the limit
+        """
+        history = ExecutionHistory(self.eu, self.ma, interval=5, maxMemory=0x4000)
+        for i in range(50):
+            history.step()
+        self.assertLessEqual(history.memoryUsage, 0x4000)
+        self.assertLess(0, history.getOldestPosition())
+        self.assertRaises(ValueError, history.goTo, history.getOldestPosition() - 1)
+        history.goTo(history.getOldestPosition())
+
+    def _getMachineState(self):
+        """
+        Core state, without the interrupt pending since it is only made pending when replaying the
+        instruction handling it, along with the stack content.
+        """
+        return self.eu.getState()[:5], self.ma.readMemory(MEMORY_START_AT + 0x2000, 0x10)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+import os
+import tempfile
+import unittest
+
+from ToolChain.Debugger.SymbolTable import SymbolTable
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2015, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+
+class TestSymbolTable(unittest.TestCase):
+
+    def setUp(self):
+        self.symbols = SymbolTable({"main.start": 0x40000000,
+                                    "main.loop": 0x40000010,
+                                    "main.print": 0x40000040,
+                                    "lib.print": 0x40000080,
+                                    "lib.PRINT_ALIAS": 0x40000080})
+
+    def test_load(self):
+        """
+        Validates good working of SymbolTable.load
+        """
+        symbolsFile = tempfile.NamedTemporaryFile("w", suffix=".sym", delete=False)
+        symbolsFile.write("test.start:0x40000000\ntest.function:0x40000020\n")
+        symbolsFile.close()
+        try:
+            symbols = SymbolTable.load(symbolsFile.name)
+        finally:
+            os.remove(symbolsFile.name)
+        self.assertEqual({"test.start": 0x40000000, "test.function": 0x40000020}, symbols.addresses)
+        self.assertEqual("test.function", symbols.getSymbol(0x40000020))
+
+    def test_getAddress(self):
+        """
+        Validates good working of SymbolTable.getAddress
+        """
+        self.assertEqual(0x40000010, self.symbols.getAddress("main.loop"))
+        self.assertEqual(0x40000010, self.symbols.getAddress("loop"))
+        self.assertEqual(0x40000080, self.symbols.getAddress("lib.print"))
+        self.assertIsNone(self.symbols.getAddress("main.nothing"))
+        self.assertIsNone(self.symbols.getAddress("nothing"))
+        # Short names defined by more than one file can't be used
+        self.assertRaises(ValueError, self.symbols.getAddress, "print")
+
+    def test_getSymbol(self):
+        """
+        Validates good working of SymbolTable.getSymbol
+        """
+        self.assertEqual("main.start", self.symbols.getSymbol(0x40000000))
+        # First symbol defined at an address is the one used
+        self.assertEqual("lib.print", self.symbols.getSymbol(0x40000080))
+        self.assertIsNone(self.symbols.getSymbol(0x40000004))
+        self.assertIsNone(SymbolTable().getSymbol(0x40000000))
+
+    def test_locate(self):
+        """
+        Validates good working of SymbolTable.locate
+        """
+        self.assertEqual("main.start", self.symbols.locate(0x40000000))
+        self.assertEqual("main.loop+0x1c", self.symbols.locate(0x4000002c))
+        self.assertEqual("lib.print+0x10", self.symbols.locate(0x40000090))
+        # First symbol defined at an address is the one used
+        self.assertEqual("lib.PRINT_ALIAS+0x10", SymbolTable({"lib.PRINT_ALIAS": 0x40000080,
+                                                              "lib.print": 0x40000080}).locate(0x40000090))
+        self.assertEqual("0x3fffffff", self.symbols.locate(0x3fffffff))
+        self.assertEqual("0x40000000", SymbolTable().locate(0x40000000))
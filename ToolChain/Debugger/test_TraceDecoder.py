@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+import os
+import tempfile
+import unittest
+
+from CapuaEnvironment.ExecutionUnit.ExecutionUnit import ExecutionUnit
+from CapuaEnvironment.ExecutionUnit.TraceRecorder import TraceRecorder
+from CapuaEnvironment.IntructionFetchUnit.InstructionFetchUnit import InstructionFetchUnit
+from CapuaEnvironment.IOComponent.MemoryIOController import MemoryIOController
+from CapuaEnvironment.MemoryArray.MemoryArray import MemoryArray
+from ToolChain.Debugger.TraceDecoder import TraceDecoder
+
+from Configuration.Configuration import MEMORY_START_AT, \
+                                        REGISTER_A, \
+                                        EXECUTION_MODE_BLOCK
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2015, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+
+class TestTraceDecoder(unittest.TestCase):
+
+    def test_decode(self):
+        """
+        Validates that a trace recorded by a core, saved then decoded, gives back what the core did
+        """
+        add = bytes([0b01100110]) + (1).to_bytes(4, "big") + bytes([REGISTER_A])                    # ADD 0x01 $A
+        memw = bytes([0b00100000, 0b01000000]) + (MEMORY_START_AT + 0x100).to_bytes(4, "big")      # MEMW [4] $A
+        jmp = bytes([0b01000001, 0b000]) + (MEMORY_START_AT + 12).to_bytes(4, "big")               # JMP <> itself
+        ma = MemoryArray()
+        eu = ExecutionUnit(MemoryIOController(ma), InstructionFetchUnit(ma), executionMode=EXECUTION_MODE_BLOCK)
+        ma.load(MEMORY_START_AT, add + memw + jmp)
+        eu.setupCore(MEMORY_START_AT)
+        traceRecorder = TraceRecorder(3)
+        eu.setTraceRecorder(traceRecorder)
+        eu.run(count=4)
+
+        traceFile = tempfile.NamedTemporaryFile(suffix=".trc", delete=False)
+        traceFile.close()
+        symbolsFile = tempfile.NamedTemporaryFile("w", suffix=".sym", delete=False)
+        symbolsFile.write("test.start:{}\ntest.loop:{}\n".format(hex(MEMORY_START_AT), hex(MEMORY_START_AT + 12)))
+        symbolsFile.close()
+        try:
+            traceRecorder.save(traceFile.name)
+            traceDecoder = TraceDecoder(traceFile.name, symbolsFile.name)
+            lines = traceDecoder.decode()
+            lastLine = TraceDecoder(traceFile.name).decode(last=1)
+        finally:
+            os.remove(traceFile.name)
+            os.remove(symbolsFile.name)
+
+        # The ring only holds the last 3 of the 4 instructions
+        self.assertEqual(4, traceDecoder.recordCount)
+        self.assertEqual([MEMORY_START_AT + 6, MEMORY_START_AT + 12, MEMORY_START_AT + 12],
+                         [record[0] for record in traceDecoder.records])
+        self.assertEqual([memw, jmp, jmp], [record[1] for record in traceDecoder.records])
+        self.assertEqual(3, len(lines))
+
+        self.assertEqual(["1", hex(MEMORY_START_AT + 6), "test.start+0x6", "MEMW"], lines[0].split()[:4])
+        self.assertIn("$A=0x1", lines[0])
+        self.assertIn("MEM {}[4] <- 0x1".format(hex(MEMORY_START_AT + 0x100)), lines[0])
+        self.assertEqual(["2", hex(MEMORY_START_AT + 12), "test.loop", "JMP"], lines[1].split()[:4])
+        self.assertNotIn("MEM", lines[1])
+        self.assertEqual(["3", hex(MEMORY_START_AT + 12), hex(MEMORY_START_AT + 12), "JMP"], lastLine[0].split()[:4])
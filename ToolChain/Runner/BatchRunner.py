@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+from CapuaEnvironment.MemoryArray.MemoryArray import MemoryArray
+from Configuration.Configuration import EXECUTION_MODE_BLOCK, \
+                                        MEMORY_PAGE_SIZE, \
+                                        MEMORY_START_AT
+from ToolChain.Assembler.Assembler import Assembler
+from ToolChain.Linker.Constants import DEFAULT_LOAD_ADDRESS
+from ToolChain.Linker.StaticFlatLinker import StaticFlatLinker
+from ToolChain.Runner.Runner import Runner, RUN_STATUS_ERROR
+
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2015, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+
+# Memory every job of a worker process starts from, built once per worker by _initializeWorker
+_memoryTemplate = None
+_executionMode = EXECUTION_MODE_BLOCK
+
+
+class BatchRunner:
+    """
+    The BatchRunner runs many independent programs (jobs) over a pool of worker processes. It is meant
+    for grading and regression testing where hundreds of small programs have to be assembled, linked
+    and run.
+
+    Jobs are described by a manifest (JSON):
+        {
+            "instructions": 1000000,                  (optional, default instruction budget of a job)
+            "seconds": 10,                            (optional, default wall clock limit of a job)
+            "preload": [{"input": "lib.bin", "address": 1073745920}],   (optional)
+            "jobs": [
+                {
+                    "name": "hello",
+                    "sources": ["main.casm", "lib.casm"],   (or "input": "prebuilt.bin")
+                    "address": 1073741824,                  (optional, load address)
+                    "keys": "text typed on the keyboard",   (optional)
+                    "digests": [[1073741824, 256]],         (optional, memory ranges to be hashed)
+                    "instructions": 5000,                   (optional)
+                    "seconds": 1                            (optional)
+                }
+            ]
+        }
+    Relative paths are relative to the manifest directory.
+
+    Worker processes are started once and reused for many jobs. When a worker starts, every module
+    is already imported and it builds the memory template (preloaded binaries included) that each
+    job gets a copy on write fork of. Devices run without threads (see Runner) so that building
+    the machine of a job costs next to nothing. The HardDrive is therefore not available to jobs.
+    Jobs run in virtual time (see MemoryIOController), a job always gives the same result.
+
+    Every job produces a result: the Runner summary plus the job name and index, a digest of the
+    whole memory and the digest of every requested memory range. Results are given back as soon
+    as they are available, not in job order.
+    """
+
+    manifest = None
+    baseDirectory = None
+
+    def __init__(self, manifestFile=None, manifest=None):
+        """
+        Prepare a batch run.
+        :param manifestFile: str, path to the JSON manifest
+        :param manifest: dict, the manifest itself, used instead of manifestFile. Paths are then relative
+                         to the current directory.
+        """
+        if manifest is None:
+            if manifestFile is None:
+                raise ValueError("BatchRunner error, no manifest given")
+            manifestContent = open(manifestFile, "r")
+            manifest = json.load(manifestContent)
+            manifestContent.close()
+            self.baseDirectory = os.path.dirname(os.path.abspath(manifestFile))
+        else:
+            self.baseDirectory = os.getcwd()
+
+        if type(manifest) is not dict or type(manifest.get("jobs")) is not list:
+            raise ValueError("BatchRunner error, the manifest needs a list of jobs")
+        self.manifest = manifest
+
+    def run(self, workerCount: int=None, executionMode=EXECUTION_MODE_BLOCK):
+        """
+        Run every job of the manifest.
+        :param workerCount: int, the number of worker processes, None for one per CPU
+        :param executionMode: int, EXECUTION_MODE_INTERPRETER or EXECUTION_MODE_BLOCK
+        :return: generator, yields the result (dict) of every job as soon as it is done
+        """
+        preload = [(self._resolvePath(entry["input"]), entry.get("address", DEFAULT_LOAD_ADDRESS))
+                   for entry in self.manifest.get("preload", [])]
+        jobs = [(index, self._prepareJob(job)) for index, job in enumerate(self.manifest["jobs"])]
+
+        pool = multiprocessing.Pool(processes=workerCount,
+                                    initializer=_initializeWorker,
+                                    initargs=(preload, executionMode))
+        try:
+            for result in pool.imap_unordered(_runJob, jobs):
+                yield result
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def _prepareJob(self, job=None):
+        """
+        Resolve the paths of a job and fill in the manifest wide defaults.
+        :param job: dict, a job as found in the manifest
+        :return: dict, the job ready to be sent to a worker
+        """
+        if "sources" not in job and "input" not in job:
+            raise ValueError("BatchRunner error, job {} has neither sources nor input".format(job.get("name")))
+
+        preparedJob = dict(job)
+        if "sources" in job:
+            preparedJob["sources"] = [self._resolvePath(source) for source in job["sources"]]
+        if "input" in job:
+            preparedJob["input"] = self._resolvePath(job["input"])
+        preparedJob.setdefault("instructions", self.manifest.get("instructions"))
+        preparedJob.setdefault("seconds", self.manifest.get("seconds"))
+        return preparedJob
+
+    def _resolvePath(self, path=None):
+        """
+        Manifest paths are relative to the manifest directory
+        :param path: str, a path found in the manifest
+        :return: str, the absolute path
+        """
+        return os.path.join(self.baseDirectory, path)
+
+
+def _initializeWorker(preload=None, executionMode=EXECUTION_MODE_BLOCK):
+    """
+    Called once in every worker process, before it runs its first job. This builds the memory
+    template jobs are started from.
+    :param preload: list, [(binary path, load address)] to be loaded in the template
+    :param executionMode: int, the execution mode of the cores
+    :return: Nothing
+    """
+    global _memoryTemplate, _executionMode
+
+    _executionMode = executionMode
+    _memoryTemplate = MemoryArray()
+    for inputFile, loadAddress in preload:
+        binFile = open(inputFile, "rb")
+        _memoryTemplate.load(loadAddress, binFile.read())
+        binFile.close()
+
+
+def _runJob(indexedJob=None):
+    """
+    Build, if required, and run a single job. This runs in a worker process and never raises, any
+    problem is reported in the job result.
+    :param indexedJob: tuple, (index of the job in the manifest, job as given by BatchRunner._prepareJob)
+    :return: dict, the job result
+    """
+    index, job = indexedJob
+    loadAddress = job.get("address", DEFAULT_LOAD_ADDRESS)
+
+    workDirectory = tempfile.TemporaryDirectory(prefix="capuaBatch")
+    try:
+        start = time.perf_counter()
+        try:
+            inputFile = job.get("input")
+            if "sources" in job:
+                inputFile = _buildJob(job["sources"], loadAddress, workDirectory.name)
+            runner = Runner(inputFile=inputFile,
+                            loadAddress=loadAddress,
+                            executionMode=_executionMode,
+                            memoryArray=_memoryTemplate.fork(),
+                            deviceThreads=False,
+                            virtualTime=True)
+            runner.typeText(job.get("keys", ""))
+        except Exception as e:
+            result = {"status": RUN_STATUS_ERROR,
+                      "error": "build {}: {}".format(type(e).__name__, e),
+                      "instructions": 0,
+                      "buildSeconds": time.perf_counter() - start}
+        else:
+            buildSeconds = time.perf_counter() - start
+            result = runner.run(maxInstructions=job.get("instructions"), maxSeconds=job.get("seconds"))
+            result["buildSeconds"] = buildSeconds
+            result["memoryDigest"] = _digestMemory(runner.capua.ma)
+            result["digests"] = [{"address": address,
+                                  "length": length,
+                                  "digest": hashlib.sha256(runner.capua.ma.readMemory(address, length)).hexdigest()}
+                                 for address, length in job.get("digests", [])]
+    finally:
+        workDirectory.cleanup()
+
+    result["index"] = index
+    result["name"] = job.get("name", str(index))
+    result["input"] = job.get("sources", job.get("input"))
+    return result
+
+
+def _buildJob(sources=None, loadAddress=DEFAULT_LOAD_ADDRESS, workDirectory=None):
+    """
+    Assemble and link the sources of a job.
+    :param sources: list, path of the .casm files, in link order
+    :param loadAddress: int, the address the binary will be loaded at
+    :param workDirectory: str, where intermediate files are written
+    :return: str, the path of the linked binary
+    """
+    objectFiles = []
+    for sourceNumber, source in enumerate(sources):
+        objectFile = os.path.join(workDirectory, "{}.o".format(sourceNumber))
+        Assembler(source, objectFile)
+        objectFiles.append(objectFile)
+
+    binaryFile = os.path.join(workDirectory, "job.bin")
+    StaticFlatLinker(inputFileList=objectFiles, outputFile=binaryFile, loadAddress=loadAddress)
+    return binaryFile
+
+
+def _digestMemory(memoryArray=None):
+    """
+    Hash the whole memory. Pages still holding the initial memory value are skipped, two memories
+    holding the same content always give the same digest.
+    :param memoryArray: MemoryArray, the memory to be hashed
+    :return: str, hexadecimal SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    for pageNumber in memoryArray.getModifiedPages(MEMORY_PAGE_SIZE):
+        digest.update(pageNumber.to_bytes(4, "big"))
+        digest.update(memoryArray.readMemory(MEMORY_START_AT + pageNumber * MEMORY_PAGE_SIZE, MEMORY_PAGE_SIZE))
+    return digest.hexdigest()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+from CapuaEnvironment.Capua import Capua
+from CapuaEnvironment.ExecutionUnit.Profiler import Profiler
+from CapuaEnvironment.ExecutionUnit.TraceRecorder import TraceRecorder
+from CapuaEnvironment.IOComponent.MemoryMappedDevices.Terminal.HeadlessDisplayBackend import HeadlessDisplayBackend
+from Configuration.Configuration import EXECUTION_MODE_BLOCK, \
+                                        FIRMWARE_BINARY_FILE_PATH, \
+                                        FIRMWARE_LOAD_ADDRESS, \
+                                        KEYBOARD_BUFFER_SIZE, \
+                                        REGISTER_A, \
+                                        REGISTER_B, \
+                                        REGISTER_C, \
+                                        REGISTER_D, \
+                                        REGISTER_E, \
+                                        REGISTER_F, \
+                                        REGISTER_G, \
+                                        REGISTER_A2, \
+                                        REGISTER_B2, \
+                                        REGISTER_C2, \
+                                        REGISTER_D2, \
+                                        REGISTER_E2, \
+                                        REGISTER_F2, \
+                                        REGISTER_G2, \
+                                        REGISTER_S, \
+                                        REGISTER_S2, \
+                                        RUNNER_CHECK_INTERVAL, \
+                                        TRACE_BUFFER_RECORD_COUNT, \
+                                        VIRTUAL_BOOT_ENABLED
+from ToolChain.Linker.Constants import DEFAULT_LOAD_ADDRESS
+
+import time
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2015, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+
+RUN_STATUS_HALTED = "halted"                # The program reached a point where it can not progress anymore
+RUN_STATUS_INSTRUCTION_LIMIT = "instructionLimit"
+RUN_STATUS_TIME_LIMIT = "timeLimit"
+RUN_STATUS_ERROR = "error"                  # The program caused an exception in the core (invalid instruction...)
+
+TERMINAL_ADDRESS = 0x20001000
+
+REGISTER_NAMES = (("A", REGISTER_A), ("B", REGISTER_B), ("C", REGISTER_C), ("D", REGISTER_D),
+                  ("E", REGISTER_E), ("F", REGISTER_F), ("G", REGISTER_G), ("S", REGISTER_S),
+                  ("A2", REGISTER_A2), ("B2", REGISTER_B2), ("C2", REGISTER_C2), ("D2", REGISTER_D2),
+                  ("E2", REGISTER_E2), ("F2", REGISTER_F2), ("G2", REGISTER_G2), ("S2", REGISTER_S2))
+
+
+class Runner:
+    """
+    The Runner executes a program without any user interface. It is meant for unattended runs
+    (grading, regression testing). The Terminal uses the headless display so its content can be
+    reported once the run is over.
+
+    A run stops when:
+        - The program is halted. Capua has no halt instruction, a program ends by jumping on
+          itself (JMP <> end) with interrupts disabled. The core is then stuck forever.
+        - The instruction budget is exhausted.
+        - The wall clock limit is reached.
+        - The core raises an exception.
+    Stop conditions are checked every RUNNER_CHECK_INTERVAL instructions, a program can therefore
+    run up to that many instructions past the point where it halted.
+
+    With deviceThreads=False, devices do not start any thread (see MemoryIOController.pollDevices),
+    the machine is then polled by the Runner every time stop conditions are checked. This is what
+    makes a Runner cheap enough to be built for every job of a batch (see BatchRunner).
+    """
+
+    capua = None
+    display = None
+    profiler = None
+    traceRecorder = None
+
+    def __init__(self, inputFile=None,
+                 loadAddress=DEFAULT_LOAD_ADDRESS,
+                 softwareLoader=False,
+                 executionMode=EXECUTION_MODE_BLOCK,
+                 snapshotFile=None,
+                 memoryArray=None,
+                 deviceThreads: bool=True,
+                 virtualTime: bool=None):
+        """
+        Build the execution environment and load the program in memory.
+        :param inputFile: str, the binary to be run. If None, the firmware is used (virtual boot)
+        :param loadAddress: int, the address at which the binary will be loaded
+        :param softwareLoader: bool, is the load address given by the first 4 bytes of the binary
+        :param executionMode: int, EXECUTION_MODE_INTERPRETER or EXECUTION_MODE_BLOCK
+        :param snapshotFile: str, if given, the machine is restored from this snapshot instead of loading
+                             a program (see Capua.snapshot)
+        :param memoryArray: MemoryArray, the memory to be used, a fresh one is built if None
+        :param deviceThreads: bool, should devices run their own threads
+        :param virtualTime: bool, should devices use virtual time, None for VIRTUAL_TIME_ENABLED
+        """
+        if snapshotFile is not None:
+            inputFile = snapshotFile
+        elif inputFile is None:
+            if not VIRTUAL_BOOT_ENABLED:
+                raise ValueError("Runner error, no input file given and virtual boot is disabled")
+            inputFile = FIRMWARE_BINARY_FILE_PATH
+            loadAddress = FIRMWARE_LOAD_ADDRESS
+            softwareLoader = False
+
+        self.inputFile = inputFile
+        self._typedKeyCodes = []
+        if deviceThreads:
+            self.display = HeadlessDisplayBackend()
+        self.capua = Capua(ma=memoryArray, name=inputFile, displayBackend=self.display,
+                           deviceThreads=deviceThreads, virtualTime=virtualTime)
+        self.capua.eu.setExecutionMode(executionMode)
+        if snapshotFile is not None:
+            self.capua.restore(snapshotFile)
+        else:
+            self.loadProgram(inputFile=inputFile, loadAddress=loadAddress, softwareLoader=softwareLoader)
+
+    def loadProgram(self, inputFile=None, loadAddress=DEFAULT_LOAD_ADDRESS, softwareLoader=False):
+        """
+        Copy the binary in memory and point the core to its first instruction.
+        :param inputFile: str, path to the binary
+        :param loadAddress: int, the address at which the binary will be loaded
+        :param softwareLoader: bool, is the load address given by the first 4 bytes of the binary
+        :return: Nothing
+        """
+        self.capua.loadProgram(filePath=inputFile, loadAddress=loadAddress, softwareLoader=softwareLoader)
+
+    def enableProfiling(self):
+        """
+        Profile the core for the whole run (see Profiler). Profiling forces the core to run
+        instructions one at a time through the interpreter, the run is therefore a lot slower.
+        :return: Profiler, the profiler gathering the statistics
+        """
+        self.profiler = Profiler()
+        self.capua.eu.setProfiler(self.profiler)
+        return self.profiler
+
+    def enableTracing(self, capacity: int=TRACE_BUFFER_RECORD_COUNT):
+        """
+        Record the last instructions executed by the core (see TraceRecorder). In block mode, the
+        core keeps running translated blocks, the recording is built into them.
+        :param capacity: int, number of instructions kept
+        :return: TraceRecorder, the recorder
+        """
+        self.traceRecorder = TraceRecorder(capacity=capacity)
+        self.capua.eu.setTraceRecorder(self.traceRecorder)
+        return self.traceRecorder
+
+    def typeText(self, text=""):
+        """
+        Queue text to be typed on the Terminal keyboard, one scan code per character. Scan codes are
+        handed to the Terminal while the program runs, never more than its keyboard buffer can hold.
+        :param text: str, the text to be typed, only latin-1 characters can be typed
+        :return: Nothing
+        """
+        if self.capua.mioc.getDevice(TERMINAL_ADDRESS) is None:
+            raise ValueError("Runner error, no Terminal to type text into")
+        self._typedKeyCodes.extend(text.encode("latin-1"))
+
+    def _feedKeyboard(self):
+        """
+        Move queued scan codes (see typeText) to the Terminal keyboard buffer, as long as it has room.
+        :return: Nothing
+        """
+        terminal = self.capua.mioc.getDevice(TERMINAL_ADDRESS)
+        while self._typedKeyCodes and terminal.getPendingKeyCodeCount() < KEYBOARD_BUFFER_SIZE:
+            terminal.pushKeyCode(self._typedKeyCodes.pop(0))
+
+    def run(self, maxInstructions: int=None, maxSeconds: float=None, snapshotFile=None):
+        """
+        Run the program until one of the stop conditions is met. Devices are shut down once the
+        run is over, a Runner can only be run once.
+        :param maxInstructions: int, instruction budget, None for no limit
+        :param maxSeconds: float, wall clock limit, None for no limit
+        :param snapshotFile: str, if given, the machine state is saved to this file once the run is over
+        :return: dict, the run summary (see buildSummary)
+        """
+        eu = self.capua.eu
+        mioc = self.capua.mioc
+        executed = 0
+        status = None
+        error = None
+
+        start = time.perf_counter()
+        try:
+            while status is None:
+                count = RUNNER_CHECK_INTERVAL
+                if maxInstructions is not None:
+                    count = min(count, maxInstructions - executed)
+                    if count <= 0:
+                        status = RUN_STATUS_INSTRUCTION_LIMIT
+                        break
+                executed += eu.executeMany(count)
+                if self._typedKeyCodes:
+                    self._feedKeyboard()
+                mioc.pollDevices()
+
+                if maxSeconds is not None and time.perf_counter() - start >= maxSeconds:
+                    status = RUN_STATUS_TIME_LIMIT
+                elif maxInstructions is None or executed < maxInstructions:
+                    executed += 1
+                    if self._executeAndCheckHalted():
+                        status = RUN_STATUS_HALTED
+        except Exception as e:
+            status = RUN_STATUS_ERROR
+            error = "{}: {}".format(type(e).__name__, e)
+        elapsed = time.perf_counter() - start
+        if self.profiler is not None:
+            # Reading the screen for the summary must not show up in the profile
+            eu.setProfiler(None)
+        if self.traceRecorder is not None:
+            eu.setTraceRecorder(None)
+
+        if snapshotFile is not None:
+            self.capua.snapshot(snapshotFile)
+        eu.halt()
+
+        return self.buildSummary(status=status, error=error, instructionCount=executed, elapsed=elapsed)
+
+    def buildSummary(self, status=None, error=None, instructionCount: int=0, elapsed: float=0.0):
+        """
+        Build a summary of the run that can be directly serialised as JSON.
+        :param status: str, one of the RUN_STATUS_* values
+        :param error: str, description of the exception that stopped the run, if any
+        :param instructionCount: int, number of instructions executed
+        :param elapsed: float, duration of the run in seconds
+        :return: dict
+        """
+        eu = self.capua.eu
+        registers = {name: eu.getRegisterValue(code) for name, code in REGISTER_NAMES}
+        registers["I"] = eu.I
+        registers["FLAGS"] = eu.FLAGS
+        registers["IS"] = eu.IS
+        registers["IVR"] = eu.IVR
+
+        return {"input": self.inputFile,
+                "status": status,
+                "error": error,
+                "instructions": instructionCount,
+                "seconds": elapsed,
+                "instructionsPerSecond": int(instructionCount / elapsed) if elapsed > 0 else 0,
+                "registers": registers,
+                "screen": self.getScreen()}
+
+    def getScreen(self):
+        """
+        Read the Terminal display memory. This is read from the device itself rather than from the
+        display backend since the display thread might not have caught up with the last writes.
+        :return: list, the 25 lines of the screen as str, trailing spaces removed
+        """
+        mioc = self.capua.mioc
+        screen = []
+        for lineAddress in range(TERMINAL_ADDRESS, TERMINAL_ADDRESS + 80 * 25, 80):
+            line = b"".join(mioc.memoryReadAtAddressForLength(address, 4).to_bytes(4, "big")
+                            for address in range(lineAddress, lineAddress + 80, 4))
+            screen.append(line.decode("latin-1").rstrip())
+        return screen
+
+    def _executeAndCheckHalted(self):
+        """
+        Execute a single instruction and tell if the core is stuck on it. The core is stuck
+        when the instruction left the whole core state untouched (jump on itself) while
+        interrupts are disabled: nothing can ever get the core out of there.
+        :return: bool, True if the core is halted
+        """
+        eu = self.capua.eu
+        before = (eu.I, eu.FLAGS, eu.IS, eu.IVR, list(eu._registers))
+        eu.execute()
+        after = (eu.I, eu.FLAGS, eu.IS, eu.IVR, list(eu._registers))
+        return before == after and eu.IS == 0
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+import hashlib
+import os
+import tempfile
+import unittest
+
+from ToolChain.Runner import BatchRunner as batchRunnerModule
+from ToolChain.Runner.BatchRunner import BatchRunner, _initializeWorker, _runJob
+from ToolChain.Runner.Runner import RUN_STATUS_ERROR, RUN_STATUS_HALTED
+
+from Configuration.Configuration import MEMORY_START_AT, \
+                                        REGISTER_A, \
+                                        EXECUTION_MODE_BLOCK
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2015, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+
+class TestBatchRunner(unittest.TestCase):
+
+    def setUp(self):
+        self.workDirectory = tempfile.TemporaryDirectory()
+        # Preloaded data, every job overwrites it
+        self.preloadFile = os.path.join(self.workDirectory.name, "preload.bin")
+        with open(self.preloadFile, "wb") as preload:
+            preload.write(b"\x01\x02\x03\x04")
+        self.programFile = os.path.join(self.workDirectory.name, "program.bin")
+        with open(self.programFile, "wb") as program:
+            program.write(bytes([0b01100110]) + (0x55).to_bytes(4, "big") + bytes([REGISTER_A])      # ADD #0x55 $A
+                          + bytes([0b00100000, 0b01000000]) + (MEMORY_START_AT + 0x1000).to_bytes(4, "big")
+                          + bytes([0b01000001, 0b000]) + (MEMORY_START_AT + 12).to_bytes(4, "big"))  # JMP <> itself
+        self.job = {"name": "program",
+                    "input": self.programFile,
+                    "address": MEMORY_START_AT,
+                    "digests": [[MEMORY_START_AT + 0x1000, 4]],
+                    "instructions": 100000}
+
+    def tearDown(self):
+        self.workDirectory.cleanup()
+
+    def test_runJob(self):
+        """
+        Validates that jobs run by the same worker all start from the same, untouched, memory template
+        """
+        _initializeWorker([(self.preloadFile, MEMORY_START_AT + 0x1000)], EXECUTION_MODE_BLOCK)
+        template = batchRunnerModule._memoryTemplate
+
+        first = _runJob((0, self.job))
+        second = _runJob((1, self.job))
+        for index, result in enumerate((first, second)):
+            self.assertEqual(RUN_STATUS_HALTED, result["status"])
+            self.assertEqual(index, result["index"])
+            self.assertEqual("program", result["name"])
+            # The ADD ran once, the preloaded value was not left by the previous job
+            self.assertEqual(0x55, result["registers"]["A"])
+            self.assertEqual([{"address": MEMORY_START_AT + 0x1000,
+                               "length": 4,
+                               "digest": hashlib.sha256(b"\x00\x00\x00\x55").hexdigest()}], result["digests"])
+        self.assertEqual(first["memoryDigest"], second["memoryDigest"])
+        self.assertEqual(first["instructions"], second["instructions"])
+
+        # Jobs wrote in their own copy of the template
+        self.assertIs(template, batchRunnerModule._memoryTemplate)
+        self.assertEqual(b"\x01\x02\x03\x04", bytes(template.readMemory(MEMORY_START_AT + 0x1000, 4)))
+
+    def test_runJobErrors(self):
+        """
+        Validates that a job failing to build gives an error result instead of raising
+        """
+        _initializeWorker([], EXECUTION_MODE_BLOCK)
+        result = _runJob((3, {"name": "missing", "input": os.path.join(self.workDirectory.name, "missing.bin")}))
+        self.assertEqual(RUN_STATUS_ERROR, result["status"])
+        self.assertEqual(3, result["index"])
+        self.assertTrue(result["error"].startswith("build "))
+
+    def test_runSources(self):
+        """
+        Validates that jobs given as sources are assembled, linked and run
+        """
+        testFiles = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "testFiles")
+        _initializeWorker([], EXECUTION_MODE_BLOCK)
+        result = _runJob((0, {"sources": [os.path.join(testFiles, "Length.casm")], "instructions": 100000}))
+        self.assertEqual(RUN_STATUS_HALTED, result["status"])
+        self.assertEqual(len("This is a test string"), result["registers"]["A"])
+
+    def test_run(self):
+        """
+        Validates that a whole manifest runs over a worker pool
+        """
+        self.assertRaises(ValueError, BatchRunner)
+        self.assertRaises(ValueError, BatchRunner, manifest={"jobs": None})
+        self.assertRaises(ValueError, BatchRunner(manifest={"jobs": [{"name": "empty"}]}).run(workerCount=1).__next__)
+
+        manifest = {"preload": [{"input": self.preloadFile, "address": MEMORY_START_AT + 0x1000}],
+                    "jobs": [self.job, dict(self.job, name="again")]}
+        results = sorted(BatchRunner(manifest=manifest).run(workerCount=2), key=lambda result: result["index"])
+        self.assertEqual(["program", "again"], [result["name"] for result in results])
+        self.assertEqual([RUN_STATUS_HALTED, RUN_STATUS_HALTED], [result["status"] for result in results])
+        self.assertEqual(results[0]["memoryDigest"], results[1]["memoryDigest"])
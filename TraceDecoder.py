@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+#  -*- coding: <utf-8> -*-
+
+"""
+This file is part of Spartacus project
+Copyright (C) 2016  CSE
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+from ToolChain.Debugger.TraceDecoder import TraceDecoder
+
+import argparse
+import os
+
+__author__ = "CSE"
+__copyright__ = "Copyright 2015, CSE"
+__credits__ = ["CSE"]
+__license__ = "GPL"
+__version__ = "2.0"
+__maintainer__ = "CSE"
+__status__ = "Dev"
+
+
+def parseCommandLineArgs():
+    """
+    As implied by the name, this will parse the command line arguments so we can use them.
+    :return: A parsed object as provided by argparse.parse_args()
+    """
+    parser = argparse.ArgumentParser(prog="TraceDecoder.py",
+                                     description="Capua Trace Decoder Version {}".format(__version__,),
+                                     epilog="This tool is provided as part of Spartacus learning environment under {} "
+                                            "licence. Feel free to distribute, modify, "
+                                            "contribute and learn!".format(__license__,))
+    parser.add_argument("-i", "--input",
+                        required=True,
+                        type=str,
+                        help="Define the trace file to be decoded (see the -T option of the Runner).")
+
+    parser.add_argument("-y", "--symbols",
+                        required=False,
+                        type=str,
+                        default=None,
+                        help="Symbols file, as produced by the linker, used to resolve addresses.")
+
+    parser.add_argument("-n", "--last",
+                        required=False,
+                        type=int,
+                        default=None,
+                        help="Only decode this many instructions, the last ones executed.")
+
+    parser.add_argument("-o", "--output",
+                        required=False,
+                        type=str,
+                        default=None,
+                        help="Write the decoded trace to this file instead of the console.")
+
+    args = parser.parse_args()
+
+    return args
+
+
+if __name__ == '__main__':
+    usableArgs = parseCommandLineArgs()
+
+    for path in (usableArgs.input, usableArgs.symbols):
+        if path is not None and not os.path.exists(path):
+            raise ValueError("ERROR: file {} does not exists.".format(path,))
+
+    decoder = TraceDecoder(traceFile=usableArgs.input, symbolsFile=usableArgs.symbols)
+    lines = decoder.decode(last=usableArgs.last)
+
+    if usableArgs.output is not None:
+        outputFile = open(usableArgs.output, "w")
+        outputFile.write("\n".join(lines) + "\n")
+        outputFile.close()
+    else:
+        for line in lines:
+            print(line)